@@ -12,6 +12,10 @@ from datetime import datetime, timezone, timedelta
 from enum import Enum
 import uuid
 
+from audit_pipeline import audit_pipeline
+from principal_cache import principal_cache
+from notification_counters import UnreadCounters
+
 admin_router = APIRouter(prefix="/api/admin", tags=["Admin Portal"])
 
 
@@ -188,6 +192,7 @@ ALL_PERMISSIONS = {
 
 def create_admin_portal_endpoints(db, get_current_user):
     """Create admin portal endpoints with database and auth dependency"""
+    unread_counters = UnreadCounters(db)
     
     def require_hospital_admin(user: dict) -> dict:
         """Verify user has hospital admin role"""
@@ -406,6 +411,7 @@ def create_admin_portal_endpoints(db, get_current_user):
             update_data["custom_permissions"] = assignment.custom_permissions
         
         await db.users.update_one({"id": user_id}, {"$set": update_data})
+        principal_cache.invalidate_user(user_id)
         
         # Log the role change
         audit_log = {
@@ -418,7 +424,7 @@ def create_admin_portal_endpoints(db, get_current_user):
             "organization_id": org_id,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
-        await db.audit_logs.insert_one(audit_log)
+        await audit_pipeline.emit(db.audit_logs, audit_log)
         
         return {"message": "User role updated successfully"}
     
@@ -460,6 +466,7 @@ def create_admin_portal_endpoints(db, get_current_user):
                     await db.user_sessions.delete_many({"user_id": user_id})
                 
                 await db.users.update_one({"id": user_id}, {"$set": update_data})
+                principal_cache.invalidate_user(user_id)
                 results["success"] += 1
                 
             except Exception as e:
@@ -574,7 +581,7 @@ def create_admin_portal_endpoints(db, get_current_user):
             "message": f"Your data sharing request with {policy['target_organization_name']} has been approved",
             "created_at": now.isoformat()
         }
-        await db.notifications.insert_one(notification)
+        await unread_counters.insert_one(notification)
         
         return {"message": "Sharing policy approved"}
     
@@ -10,6 +10,8 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from enum import Enum
 
+from audit_pipeline import audit_pipeline
+
 ambulance_router = APIRouter(prefix="/api/ambulance", tags=["Ambulance"])
 
 
@@ -259,7 +261,7 @@ def create_ambulance_endpoints(db, get_current_user):
         request_doc.pop("_id", None)
         
         # Audit log
-        await db.audit_logs.insert_one({
+        await audit_pipeline.emit(db.audit_logs, {
             "id": str(uuid.uuid4()),
             "action": "ambulance_requested",
             "resource_type": "ambulance_request",
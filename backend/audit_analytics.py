@@ -0,0 +1,328 @@
+"""
+Audit Analytics for Yacco Health
+================================
+Hourly and daily rollups of audit_logs per organization, kept in the
+`audit_rollups` collection, so audit and security statistics add up one
+small document per bucket instead of scanning millions of log rows.
+
+Every audit entry gets a BSON date `ts` (parsed from its ISO timestamp)
+when it is emitted, so time windows on raw logs are range predicates on an
+indexed date field. Once the audit pipeline has stored a batch, the
+batch's counts are added to its buckets with one bulk_write of $inc
+upserts:
+
+- day buckets ("2024-05-01"): total plus counts per action, resource type,
+  severity and user, and failed logins per IP address and per user
+- hour buckets ("2024-05-01T13"): total plus counts per action and severity
+
+rebuild() backfills `ts` on entries written before this module existed and
+recomputes the rollups from the raw logs (see
+scripts/rebuild_audit_rollups.py). It only replaces buckets that ended
+before it started; the hour and day in progress stay with the live $inc
+updates, so a rebuild never overwrites or double counts entries written
+while it runs. backfill() runs one rebuild per database in the background
+at startup (server.py): a lease in `audit_rollup_backfills` keeps every
+other worker from repeating it, and reads never rebuild.
+
+Usage:
+    from audit_analytics import AuditAnalytics
+
+    analytics = AuditAnalytics(db)
+    org_filter = {"organization_id": org_id}   # {} for every organization
+    week = await analytics.summarize(org_filter, "day", "2024-05-01", "2024-05-07", ["actions", "users"])
+    week["actions"]["login"], week["total"]
+    pattern = await analytics.hourly_pattern(org_filter, since)   # {hour of day: count}
+    analytics.start_backfill()   # app startup: rebuild history once, in the background
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+from audit_pipeline import audit_pipeline
+from db_indexes import register_indexes, IndexSpec
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "audit_rollups"
+BACKFILL_COLLECTION = "audit_rollup_backfills"
+BACKFILL_MARKER = {"_id": "audit_rollups"}
+BACKFILL_LEASE_SECONDS = int(os.environ.get("AUDIT_BACKFILL_LEASE_SECONDS", "3600"))
+GRANULARITIES = {"hour": "%Y-%m-%dT%H", "day": "%Y-%m-%d"}
+
+# Running backfill tasks; referenced so they are not garbage collected
+_background_tasks = set()
+
+register_indexes(ROLLUP_COLLECTION, IndexSpec([("organization_id", 1), ("granularity", 1), ("bucket", 1)], unique=True))
+register_indexes(
+    "audit_logs",
+    IndexSpec([("organization_id", 1), ("action", 1), ("ts", -1)]),
+    IndexSpec([("action", 1), ("ts", -1)]),
+    IndexSpec([("severity", 1), ("ts", -1)]),
+)
+
+
+def _key(value) -> str:
+    """Map a value to a field name MongoDB accepts (no dots, no leading $)"""
+    value = getattr(value, "value", value)
+    text = str(value) if value not in (None, "") else "unknown"
+    text = text.replace(".", "．")
+    return "＄" + text[1:] if text.startswith("$") else text
+
+
+def _unkey(field: str) -> str:
+    field = field.replace("．", ".")
+    return "$" + field[1:] if field.startswith("＄") else field
+
+
+def parse_timestamp(value) -> datetime:
+    """UTC datetime of an audit timestamp (ISO string or datetime); now when unparseable"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value))
+        except (TypeError, ValueError):
+            return datetime.now(timezone.utc)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def bucket(moment: datetime, granularity: str) -> str:
+    return moment.strftime(GRANULARITIES[granularity])
+
+
+def add_timestamp_field(document: Dict[str, Any]):
+    """Audit pipeline prepare hook: the BSON date twin of the ISO timestamp"""
+    if not isinstance(document.get("ts"), datetime):
+        document["ts"] = parse_timestamp(document.get("timestamp"))
+
+
+def _counters(document: Dict[str, Any]) -> Iterable[Tuple[tuple, Dict[str, int], Dict[str, str]]]:
+    """(bucket key, $inc, $set) for the day and hour buckets of one entry"""
+    moment = parse_timestamp(document.get("ts") or document.get("timestamp"))
+    org_id = document.get("organization_id")
+    action = _key(document.get("action"))
+    severity = _key(document.get("severity"))
+
+    day = {
+        "total": 1,
+        f"actions.{action}": 1,
+        f"resources.{_key(document.get('resource_type'))}": 1,
+        f"severities.{severity}": 1,
+        f"users.{_key(document.get('user_id'))}": 1,
+    }
+    names = {}
+    if document.get("user_name"):
+        names[f"user_names.{_key(document.get('user_id'))}"] = document["user_name"]
+    if action == "failed_login":
+        day[f"failed_login_ips.{_key(document.get('ip_address'))}"] = 1
+        day[f"failed_login_users.{_key(document.get('user_id'))}"] = 1
+    yield (org_id, "day", bucket(moment, "day")), day, names
+
+    hour = {"total": 1, f"actions.{action}": 1, f"severities.{severity}": 1}
+    yield (org_id, "hour", bucket(moment, "hour")), hour, {}
+
+
+def _accumulate(buckets: Dict[tuple, tuple], documents: Iterable[Dict[str, Any]]):
+    for document in documents:
+        for key, inc, names in _counters(document):
+            counts, labels = buckets.setdefault(key, ({}, {}))
+            for field, n in inc.items():
+                counts[field] = counts.get(field, 0) + n
+            labels.update(names)
+
+
+async def update_rollups(collection, documents: List[Dict[str, Any]]):
+    """Audit pipeline written hook: add a stored batch to its buckets"""
+    buckets: Dict[tuple, tuple] = {}
+    _accumulate(buckets, documents)
+    if not buckets:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    operations = [
+        UpdateOne(
+            {"organization_id": org_id, "granularity": granularity, "bucket": name},
+            {"$inc": counts, "$set": {**labels, "updated_at": now}},
+            upsert=True
+        )
+        for (org_id, granularity, name), (counts, labels) in buckets.items()
+    ]
+    await collection.database[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+
+
+audit_pipeline.add_hook("audit_logs", prepare=add_timestamp_field, written=update_rollups)
+
+
+def _merge(into: Dict[str, Any], counts: Dict[str, Any]):
+    for name, n in counts.items():
+        into[name] = into.get(name, 0) + n
+
+
+class AuditAnalytics:
+    """Reads and rebuilds the audit rollups"""
+
+    def __init__(self, db):
+        self.db = db
+        self.logs = db.audit_logs
+        self.rollups = db[ROLLUP_COLLECTION]
+        self.backfills = db[BACKFILL_COLLECTION]
+
+    # ============== Reads ==============
+
+    def _query(self, org_filter: Dict[str, Any], granularity: str, start: Optional[str], end: Optional[str]) -> Dict[str, Any]:
+        query: Dict[str, Any] = {**org_filter, "granularity": granularity}
+        if start or end:
+            query["bucket"] = {}
+            if start:
+                query["bucket"]["$gte"] = start
+            if end:
+                query["bucket"]["$lte"] = end
+        return query
+
+    async def summarize(
+        self,
+        org_filter: Dict[str, Any],
+        granularity: str = "day",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        fields: Iterable[str] = ()
+    ) -> Dict[str, Any]:
+        """
+        Summed total and counter maps (e.g. "actions", "users") over the
+        buckets from start to end (inclusive bucket names; open when None).
+        org_filter is {} for every organization or {"organization_id": ...}.
+        """
+        fields = list(fields)
+        projection = {"_id": 0, "total": 1, **{field: 1 for field in fields}}
+        if "users" in fields:
+            projection["user_names"] = 1
+        summary: Dict[str, Any] = {"total": 0, **{field: {} for field in fields}}
+        names: Dict[str, str] = {}
+        async for rollup in self.rollups.find(self._query(org_filter, granularity, start, end), projection):
+            summary["total"] += rollup.get("total", 0)
+            for field in fields:
+                _merge(summary[field], rollup.get(field) or {})
+            names.update(rollup.get("user_names") or {})
+        for field in fields:
+            summary[field] = {_unkey(name): n for name, n in summary[field].items()}
+        if "users" in fields:
+            summary["user_names"] = {_unkey(user_id): name for user_id, name in names.items()}
+        return summary
+
+    async def hourly_pattern(self, org_filter: Dict[str, Any], since: datetime) -> Dict[int, int]:
+        """Entries per hour of day (UTC) from since onwards"""
+        pattern: Dict[int, int] = {}
+        cursor = self.rollups.find(self._query(org_filter, "hour", bucket(since, "hour"), None), {"_id": 0, "bucket": 1, "total": 1})
+        async for rollup in cursor:
+            hour = int(rollup["bucket"][11:13])
+            pattern[hour] = pattern.get(hour, 0) + rollup.get("total", 0)
+        return pattern
+
+    # ============== Rebuild ==============
+
+    async def rebuild(self, org_id: Optional[str] = None, batch_size: int = 1000,
+                      cutoff: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Backfill ts, then replace the rollups of one organization (every
+        organization when None) with counts recomputed from audit_logs.
+        Only buckets that ended before cutoff (default: now) are replaced;
+        the current hour and day are left to the live updates.
+        """
+        cutoff = cutoff or datetime.now(timezone.utc)
+        limits = {granularity: bucket(cutoff, granularity) for granularity in GRANULARITIES}
+        query = {} if org_id is None else {"organization_id": org_id}
+        projection = {"ts": 1, "timestamp": 1, "organization_id": 1, "action": 1, "resource_type": 1,
+                      "severity": 1, "user_id": 1, "user_name": 1, "ip_address": 1}
+        buckets: Dict[tuple, tuple] = {}
+        entries = backfilled = 0
+        batch, backfill = [], []
+        async for document in self.logs.find(query, projection).batch_size(batch_size):
+            if not isinstance(document.get("ts"), datetime):
+                add_timestamp_field(document)
+                backfill.append(UpdateOne({"_id": document["_id"]}, {"$set": {"ts": document["ts"]}}))
+            batch.append(document)
+            entries += 1
+            if len(batch) >= batch_size:
+                _accumulate(buckets, batch)
+                batch = []
+            if len(backfill) >= batch_size:
+                await self.logs.bulk_write(backfill, ordered=False)
+                backfilled += len(backfill)
+                backfill = []
+        _accumulate(buckets, batch)
+        if backfill:
+            await self.logs.bulk_write(backfill, ordered=False)
+            backfilled += len(backfill)
+
+        buckets = {key: value for key, value in buckets.items() if key[2] < limits[key[1]]}
+        now = datetime.now(timezone.utc).isoformat()
+        operations = [DeleteMany({
+            **query,
+            "$or": [{"granularity": granularity, "bucket": {"$lt": limit}} for granularity, limit in limits.items()]
+        })]
+        for (org, granularity, name), (counts, labels) in buckets.items():
+            document: Dict[str, Any] = {"organization_id": org, "granularity": granularity, "bucket": name, "updated_at": now}
+            for field, n in counts.items():
+                parent, _, child = field.partition(".")
+                if child:
+                    document.setdefault(parent, {})[child] = n
+                else:
+                    document[parent] = n
+            for field, label in labels.items():
+                parent, _, child = field.partition(".")
+                document.setdefault(parent, {})[child] = label
+            operations.append(ReplaceOne(
+                {"organization_id": org, "granularity": granularity, "bucket": name}, document, upsert=True
+            ))
+            if len(operations) >= batch_size:
+                await self.rollups.bulk_write(operations, ordered=True)
+                operations = []
+        if operations:
+            await self.rollups.bulk_write(operations, ordered=True)
+        logger.info(f"Audit rollups rebuilt: {entries} entries, {len(buckets)} buckets, {backfilled} timestamps backfilled")
+        return {"entries": entries, "buckets": len(buckets), "timestamps_backfilled": backfilled}
+
+    # ============== Startup backfill ==============
+
+    def start_backfill(self) -> asyncio.Task:
+        """Run backfill() as a background task"""
+        task = asyncio.create_task(self.backfill())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return task
+
+    async def backfill(self) -> Optional[Dict[str, int]]:
+        """
+        Rebuild every organization once per database. The worker that takes
+        the lease runs it; others (and later starts) return None. A lease
+        left by a worker that died expires after BACKFILL_LEASE_SECONDS.
+        """
+        await self.backfills.update_one(
+            BACKFILL_MARKER, {"$setOnInsert": {"completed_at": None, "locked_until": None}}, upsert=True
+        )
+        now = datetime.now(timezone.utc)
+        claimed = await self.backfills.find_one_and_update(
+            {**BACKFILL_MARKER, "completed_at": None,
+             "$or": [{"locked_until": None}, {"locked_until": {"$lt": now.isoformat()}}]},
+            {"$set": {"locked_until": (now + timedelta(seconds=BACKFILL_LEASE_SECONDS)).isoformat()}}
+        )
+        if not claimed:
+            return None
+        try:
+            result = await self.rebuild(cutoff=now)
+        except Exception as e:
+            logger.error(f"Audit rollup backfill failed: {e}")
+            await self.backfills.update_one(BACKFILL_MARKER, {"$set": {"locked_until": None}})
+            return None
+        await self.backfills.update_one(
+            BACKFILL_MARKER,
+            {"$set": {"completed_at": datetime.now(timezone.utc).isoformat(), "locked_until": None,
+                      "cutoff": now.isoformat(), **result}}
+        )
+        return result
@@ -5,18 +5,36 @@ Enhanced with comprehensive reporting and analytics
 """
 
 from fastapi import APIRouter, Depends, Query, Request, HTTPException
-from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 from enum import Enum
 import uuid
-import csv
-import io
-import json
+
+from db_indexes import register_indexes, register_query_probe, IndexSpec
+from audit_pipeline import audit_pipeline
+from audit_analytics import AuditAnalytics
+from export_stream import export_cursor, export_response
 
 audit_router = APIRouter(prefix="/api/audit", tags=["HIPAA Audit"])
 
+register_indexes(
+    "audit_logs",
+    IndexSpec([("organization_id", 1), ("timestamp", -1)]),
+    IndexSpec([("user_id", 1), ("timestamp", -1)]),
+    IndexSpec([("patient_id", 1), ("timestamp", -1)], sparse=True),
+    IndexSpec([("action", 1), ("timestamp", -1)]),
+    IndexSpec([("timestamp", -1)]),
+)
+register_query_probe("audit_logs", {"organization_id": "probe"}, sort=[("timestamp", -1)])
+
+AUDIT_EXPORT_FIELDS = [
+    "timestamp", "user_name", "user_role", "action", "resource_type",
+    "resource_id", "patient_id", "patient_name", "ip_address", "success",
+    "severity", "details"
+]
+
+
 class AuditAction(str, Enum):
     VIEW = "view"
     CREATE = "create"
@@ -113,6 +131,7 @@ class AuditStatsResponse(BaseModel):
 
 def create_audit_endpoints(db, get_current_user):
     """Create audit log endpoints with database access"""
+    analytics = AuditAnalytics(db)
     
     async def log_audit_event(
         user: dict,
@@ -148,7 +167,7 @@ def create_audit_endpoints(db, get_current_user):
         )
         entry_dict = entry.model_dump()
         entry_dict["timestamp"] = entry_dict["timestamp"].isoformat()
-        await db.audit_logs.insert_one(entry_dict)
+        await audit_pipeline.emit(db.audit_logs, entry_dict)
         return entry
     
     @audit_router.get("/logs", response_model=List[AuditLogResponse])
@@ -291,72 +310,34 @@ def create_audit_endpoints(db, get_current_user):
         if current_user["role"] == "hospital_admin":
             org_filter["organization_id"] = current_user.get("organization_id")
         
-        total_logs = await db.audit_logs.count_documents(org_filter)
+        now = datetime.now(timezone.utc)
         
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        today_filter = {**org_filter, "timestamp": {"$regex": f"^{today}"}}
-        today_logs = await db.audit_logs.count_documents(today_filter)
-        
-        # Get action breakdown
-        action_pipeline = [
-            {"$match": org_filter},
-            {"$group": {"_id": "$action", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]
-        action_stats = await db.audit_logs.aggregate(action_pipeline).to_list(50)
-        
-        # Get resource breakdown
-        resource_pipeline = [
-            {"$match": org_filter},
-            {"$group": {"_id": "$resource_type", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]
-        resource_stats = await db.audit_logs.aggregate(resource_pipeline).to_list(50)
-        
-        # Get failed logins
-        failed_login_filter = {**org_filter, "action": "failed_login"}
-        failed_logins = await db.audit_logs.count_documents(failed_login_filter)
-        
-        # Get permission denied count
-        perm_denied_filter = {**org_filter, "action": "permission_denied"}
-        permission_denied_count = await db.audit_logs.count_documents(perm_denied_filter)
-        
-        # Get critical events
-        critical_filter = {**org_filter, "severity": "critical"}
-        critical_events = await db.audit_logs.count_documents(critical_filter)
+        # All-time totals and breakdowns, one rollup per day
+        all_time = await analytics.summarize(org_filter, "day", fields=["actions", "resources", "severities"])
+        today = now.strftime("%Y-%m-%d")
+        today_logs = (await analytics.summarize(org_filter, "day", today, today))["total"]
         
         # Get top users by activity (last N days)
-        start_date = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
-        user_pipeline = [
-            {"$match": {**org_filter, "timestamp": {"$gte": start_date}}},
-            {"$group": {"_id": {"user_id": "$user_id", "user_name": "$user_name"}, "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        user_stats = await db.audit_logs.aggregate(user_pipeline).to_list(10)
+        since = now - timedelta(days=days)
+        period = await analytics.summarize(org_filter, "day", since.strftime("%Y-%m-%d"), fields=["users"])
+        top_users = sorted(period["users"].items(), key=lambda item: -item[1])[:10]
         user_activity = [
-            {"user_id": item["_id"]["user_id"], "user_name": item["_id"]["user_name"], "count": item["count"]}
-            for item in user_stats
+            {"user_id": user_id, "user_name": period["user_names"].get(user_id), "count": count}
+            for user_id, count in top_users
         ]
         
-        # Get hourly activity pattern (last 24 hours)
-        hourly_pipeline = [
-            {"$match": {**org_filter, "timestamp": {"$gte": start_date}}},
-            {"$addFields": {"hour": {"$substr": ["$timestamp", 11, 2]}}},
-            {"$group": {"_id": "$hour", "count": {"$sum": 1}}},
-            {"$sort": {"_id": 1}}
-        ]
-        hourly_stats = await db.audit_logs.aggregate(hourly_pipeline).to_list(24)
-        hourly_activity = [{"hour": int(item["_id"]), "count": item["count"]} for item in hourly_stats]
+        # Get hourly activity pattern over the period, from hour rollups
+        pattern = await analytics.hourly_pattern(org_filter, since)
+        hourly_activity = [{"hour": hour, "count": pattern[hour]} for hour in sorted(pattern)]
         
         return {
-            "total_logs": total_logs,
+            "total_logs": all_time["total"],
             "today_logs": today_logs,
-            "failed_logins": failed_logins,
-            "permission_denied_count": permission_denied_count,
-            "critical_events": critical_events,
-            "action_breakdown": {item["_id"]: item["count"] for item in action_stats},
-            "resource_breakdown": {item["_id"]: item["count"] for item in resource_stats},
+            "failed_logins": all_time["actions"].get("failed_login", 0),
+            "permission_denied_count": all_time["actions"].get("permission_denied", 0),
+            "critical_events": all_time["severities"].get("critical", 0),
+            "action_breakdown": dict(sorted(all_time["actions"].items(), key=lambda item: -item[1])),
+            "resource_breakdown": dict(sorted(all_time["resources"].items(), key=lambda item: -item[1])),
             "user_activity": user_activity,
             "hourly_activity": hourly_activity,
             "period_days": days
@@ -371,39 +352,29 @@ def create_audit_endpoints(db, get_current_user):
         if current_user["role"] not in ["admin", "hospital_admin", "super_admin"]:
             raise HTTPException(status_code=403, detail="Admin access required")
         
-        start_date = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+        start_date = datetime.now(timezone.utc) - timedelta(days=days)
         org_filter = {}
         if current_user["role"] == "hospital_admin":
             org_filter["organization_id"] = current_user.get("organization_id")
         
-        base_filter = {**org_filter, "timestamp": {"$gte": start_date}}
+        period = await analytics.summarize(
+            org_filter, "day", start_date.strftime("%Y-%m-%d"),
+            fields=["actions", "failed_login_ips", "failed_login_users"]
+        )
         
         # Security-related actions
         security_actions = ["failed_login", "permission_denied", "2fa_setup", "2fa_verify", 
                           "2fa_disable", "password_change", "password_reset"]
-        
-        security_stats = {}
-        for action in security_actions:
-            count = await db.audit_logs.count_documents({**base_filter, "action": action})
-            security_stats[action] = count
+        security_stats = {action: period["actions"].get(action, 0) for action in security_actions}
         
         # Failed login by IP
-        failed_ip_pipeline = [
-            {"$match": {**base_filter, "action": "failed_login"}},
-            {"$group": {"_id": "$ip_address", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        failed_by_ip = await db.audit_logs.aggregate(failed_ip_pipeline).to_list(10)
+        failed_by_ip = sorted(period["failed_login_ips"].items(), key=lambda item: -item[1])[:10]
         
         # Suspicious activity (multiple failed logins)
-        suspicious_users_pipeline = [
-            {"$match": {**base_filter, "action": "failed_login"}},
-            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
-            {"$match": {"count": {"$gte": 3}}},
-            {"$sort": {"count": -1}}
-        ]
-        suspicious_users = await db.audit_logs.aggregate(suspicious_users_pipeline).to_list(20)
+        suspicious_users = sorted(
+            ((user_id, count) for user_id, count in period["failed_login_users"].items() if count >= 3),
+            key=lambda item: -item[1]
+        )[:20]
         
         # 2FA adoption
         users_with_2fa = await db.users.count_documents({**org_filter, "two_factor_enabled": True})
@@ -412,8 +383,8 @@ def create_audit_endpoints(db, get_current_user):
         return {
             "period_days": days,
             "security_events": security_stats,
-            "failed_logins_by_ip": [{"ip": item["_id"], "count": item["count"]} for item in failed_by_ip],
-            "suspicious_users": [{"user_id": item["_id"], "failed_attempts": item["count"]} for item in suspicious_users],
+            "failed_logins_by_ip": [{"ip": ip, "count": count} for ip, count in failed_by_ip],
+            "suspicious_users": [{"user_id": user_id, "failed_attempts": count} for user_id, count in suspicious_users],
             "two_factor_adoption": {
                 "enabled": users_with_2fa,
                 "total": total_users,
@@ -423,15 +394,16 @@ def create_audit_endpoints(db, get_current_user):
     
     @audit_router.get("/export")
     async def export_audit_logs(
-        format: str = Query("csv", regex="^(csv|json)$"),
+        format: str = Query("csv", regex="^(csv|json|ndjson)$"),
         start_date: Optional[str] = Query(None),
         end_date: Optional[str] = Query(None),
         action: Optional[str] = Query(None),
         resource_type: Optional[str] = Query(None),
-        limit: int = Query(10000, le=50000),
+        limit: Optional[int] = Query(None, ge=1),
+        gzip: bool = Query(False),
         current_user: dict = Depends(get_current_user)
     ):
-        """Export audit logs as CSV or JSON"""
+        """Export audit logs as CSV, JSON or NDJSON, streamed (optionally gzipped)"""
         if current_user["role"] not in ["admin", "hospital_admin", "super_admin"]:
             raise HTTPException(status_code=403, detail="Admin access required")
         
@@ -451,43 +423,29 @@ def create_audit_endpoints(db, get_current_user):
         if resource_type:
             query["resource_type"] = resource_type
         
-        logs = await db.audit_logs.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list(limit)
-        
-        # Log the export action
-        await log_audit_event(
-            user=current_user,
-            action=AuditAction.EXPORT,
-            resource_type=AuditResourceType.REPORT,
-            details=f"Exported {len(logs)} audit logs in {format} format",
-            severity=AuditSeverity.INFO
-        )
+        async def record_export(count: int):
+            # Log the export action once the stream has ended
+            await log_audit_event(
+                user=current_user,
+                action=AuditAction.EXPORT,
+                resource_type=AuditResourceType.REPORT,
+                details=f"Exported {count} audit logs in {format} format",
+                severity=AuditSeverity.INFO
+            )
         
-        if format == "json":
-            return {
+        rows = export_cursor(db.audit_logs, query, {"_id": 0, "ts": 0}, sort=[("timestamp", -1)], limit=limit)
+        return export_response(
+            rows, format,
+            f"audit_logs_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}",
+            fieldnames=AUDIT_EXPORT_FIELDS,
+            compress=gzip,
+            envelope={
                 "export_date": datetime.now(timezone.utc).isoformat(),
-                "exported_by": f"{current_user['first_name']} {current_user['last_name']}",
-                "record_count": len(logs),
-                "logs": logs
-            }
-        else:
-            # CSV export
-            output = io.StringIO()
-            if logs:
-                fieldnames = ["timestamp", "user_name", "user_role", "action", "resource_type", 
-                            "resource_id", "patient_id", "patient_name", "ip_address", "success", 
-                            "severity", "details"]
-                writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction='ignore')
-                writer.writeheader()
-                writer.writerows(logs)
-            
-            output.seek(0)
-            filename = f"audit_logs_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.csv"
-            
-            return StreamingResponse(
-                iter([output.getvalue()]),
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename={filename}"}
-            )
+                "exported_by": f"{current_user['first_name']} {current_user['last_name']}"
+            },
+            rows_key="logs",
+            on_complete=record_export
+        )
     
     @audit_router.get("/alerts")
     async def get_security_alerts(
@@ -498,7 +456,7 @@ def create_audit_endpoints(db, get_current_user):
         if current_user["role"] not in ["admin", "hospital_admin", "super_admin"]:
             raise HTTPException(status_code=403, detail="Admin access required")
         
-        start_time = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+        start_time = datetime.now(timezone.utc) - timedelta(hours=hours)
         org_filter = {}
         if current_user["role"] == "hospital_admin":
             org_filter["organization_id"] = current_user.get("organization_id")
@@ -507,7 +465,7 @@ def create_audit_endpoints(db, get_current_user):
         
         # Check for multiple failed logins
         failed_pipeline = [
-            {"$match": {**org_filter, "timestamp": {"$gte": start_time}, "action": "failed_login"}},
+            {"$match": {**org_filter, "action": "failed_login", "ts": {"$gte": start_time}}},
             {"$group": {"_id": "$user_id", "count": {"$sum": 1}, "last_attempt": {"$max": "$timestamp"}}},
             {"$match": {"count": {"$gte": 3}}}
         ]
@@ -525,8 +483,8 @@ def create_audit_endpoints(db, get_current_user):
         # Check for permission denied events
         perm_denied = await db.audit_logs.count_documents({
             **org_filter, 
-            "timestamp": {"$gte": start_time}, 
-            "action": "permission_denied"
+            "action": "permission_denied",
+            "ts": {"$gte": start_time}
         })
         if perm_denied > 0:
             alerts.append({
@@ -539,9 +497,9 @@ def create_audit_endpoints(db, get_current_user):
         # Check for critical events
         critical_events = await db.audit_logs.find({
             **org_filter,
-            "timestamp": {"$gte": start_time},
-            "severity": "critical"
-        }, {"_id": 0}).limit(20).to_list(20)
+            "severity": "critical",
+            "ts": {"$gte": start_time}
+        }, {"_id": 0, "ts": 0}).sort("ts", -1).limit(20).to_list(20)
         
         for event in critical_events:
             alerts.append({
@@ -573,4 +531,11 @@ def create_audit_endpoints(db, get_current_user):
         """Get list of all resource types"""
         return [{"value": r.value, "name": r.name} for r in AuditResourceType]
     
+    @audit_router.get("/pipeline-stats")
+    async def get_audit_pipeline_stats(current_user: dict = Depends(get_current_user)):
+        """Queue depth and flush latency of the audit writer in this worker process"""
+        if current_user["role"] not in ["admin", "super_admin"]:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        return audit_pipeline.stats()
+    
     return audit_router, log_audit_event
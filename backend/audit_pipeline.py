@@ -0,0 +1,274 @@
+"""
+Audit Pipeline for Yacco Health
+===============================
+Takes audit writes off the request path. Routers hand documents to
+audit_pipeline.emit(); a background task drains the queue and writes them
+with insert_many, one batch per collection, whenever batch_size entries are
+waiting or flush_interval seconds have passed.
+
+The queue is bounded. When it is full the overflow policy decides:
+- "block" (default): emit() waits up to block_timeout seconds for space,
+  which slows callers down instead of losing entries; after that the
+  entry is dropped and counted.
+- "drop_oldest": the oldest queued entry is discarded to make room.
+- "drop_newest": the new entry is discarded.
+
+If the writer is not running (scripts, tests, before startup) emit() falls
+back to a direct insert_one, so no caller has to care. stop() flushes
+everything that is queued before returning.
+
+Modules can hook into the writes for a collection with add_hook(): prepare
+adjusts each document as it is emitted, written is awaited with every
+batch once it has been stored (see audit_analytics.py).
+
+Configure with AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_MS,
+AUDIT_OVERFLOW and AUDIT_BLOCK_TIMEOUT_MS.
+
+Usage:
+    from audit_pipeline import audit_pipeline
+
+    await audit_pipeline.start()                       # app startup
+    await audit_pipeline.emit(db["audit_logs"], entry) # in a route
+    await audit_pipeline.stop()                        # app shutdown
+    audit_pipeline.stats()  # {"queue_depth": ..., "flush_ms_avg": ..., ...}
+    audit_pipeline.add_hook("audit_logs", prepare=add_fields, written=update_rollups)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+_STOP = object()
+
+
+class AuditPipeline:
+    """Bounded queue of (collection, document) pairs written in batches"""
+
+    WRITE_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 0.25,
+        overflow: str = "block",
+        block_timeout: float = 2.0
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # collection name -> [(prepare, written)]
+        self._hooks: Dict[str, List[tuple]] = {}
+        # Metrics
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.direct_writes = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.last_flush_size = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._batch_ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="audit-pipeline")
+        logger.info(f"Audit pipeline started (queue={self.max_queue}, batch={self.batch_size}, "
+                    f"interval={self.flush_interval}s, overflow={self.overflow})")
+
+    async def stop(self, timeout: float = 10.0):
+        """Flush everything queued, then stop the writer"""
+        if not self.running:
+            return
+        task, queue = self._task, self._queue
+        await queue.put(_STOP)
+        self._batch_ready.set()
+        try:
+            await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            task.cancel()
+            logger.error(f"Audit pipeline stop timed out; {queue.qsize()} entries not written")
+        self._task = None
+        self._queue = None
+
+    def add_hook(
+        self,
+        collection_name: str,
+        prepare: Optional[Callable[[Dict[str, Any]], None]] = None,
+        written: Optional[Callable[[Any, List[Dict[str, Any]]], Awaitable[Any]]] = None
+    ):
+        """
+        prepare(document) runs in emit() on the copy about to be queued;
+        written(collection, documents) is awaited after each stored batch.
+        """
+        self._hooks.setdefault(collection_name, []).append((prepare, written))
+
+    async def _written(self, collection, documents: List[Dict[str, Any]]):
+        for _, written in self._hooks.get(getattr(collection, "name", None), []):
+            if written is None:
+                continue
+            try:
+                await written(collection, documents)
+            except Exception as e:
+                logger.error(f"Audit write hook failed for {getattr(collection, 'name', collection)}: {e}")
+
+    async def emit(self, collection, document: Dict[str, Any]):
+        """Queue document for insertion into collection (a Motor collection)"""
+        document = dict(document)  # insert_many adds _id; keep the caller's dict clean
+        for prepare, _ in self._hooks.get(getattr(collection, "name", None), []):
+            if prepare is not None:
+                prepare(document)
+        if not self.running:
+            self.direct_writes += 1
+            await collection.insert_one(document)
+            await self._written(collection, [document])
+            return
+
+        queue = self._queue
+        item = (collection, document)
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.overflow == "drop_newest":
+                self._drop(1)
+                return
+            if self.overflow == "drop_oldest":
+                queue.get_nowait()
+                queue.put_nowait(item)
+                self._drop(1)
+            else:
+                try:
+                    await asyncio.wait_for(queue.put(item), self.block_timeout)
+                except asyncio.TimeoutError:
+                    self._drop(1)
+                    return
+
+        self.enqueued += 1
+        depth = queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if depth >= self.batch_size:
+            self._batch_ready.set()
+
+    def _drop(self, count: int):
+        if self.dropped % 1000 == 0:
+            logger.warning(f"Audit queue full ({self.max_queue}); dropping entries (overflow={self.overflow})")
+        self.dropped += count
+
+    async def _run(self):
+        queue = self._queue
+        stopping = False
+        while not stopping:
+            first = await queue.get()
+            if first is _STOP:
+                break
+            if queue.qsize() + 1 < self.batch_size:
+                self._batch_ready.clear()
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    continue
+                batch.append(item)
+            await self._write(batch)
+
+            if stopping:
+                # Drain whatever is left behind the stop marker
+                rest = []
+                while not queue.empty():
+                    item = queue.get_nowait()
+                    if item is not _STOP:
+                        rest.append(item)
+                for i in range(0, len(rest), self.batch_size):
+                    await self._write(rest[i:i + self.batch_size])
+
+    async def _write(self, batch: List[tuple]):
+        by_collection: Dict[int, tuple] = {}
+        for collection, document in batch:
+            by_collection.setdefault(id(collection), (collection, []))[1].append(document)
+
+        started = time.perf_counter()
+        for collection, documents in by_collection.values():
+            for attempt in range(1, self.WRITE_ATTEMPTS + 1):
+                try:
+                    await collection.insert_many(documents, ordered=False)
+                    self.written += len(documents)
+                    await self._written(collection, documents)
+                    break
+                except Exception as e:
+                    if attempt == self.WRITE_ATTEMPTS:
+                        self.failed += len(documents)
+                        logger.error(f"Failed to write {len(documents)} audit entries to "
+                                     f"{getattr(collection, 'name', collection)}: {e}")
+                    else:
+                        await asyncio.sleep(0.1 * attempt)
+
+        elapsed = time.perf_counter() - started
+        self.batches += 1
+        self.last_flush_size = len(batch)
+        self.flush_seconds_total += elapsed
+        self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "overflow": self.overflow,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "max_depth": self.max_depth,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": round(self.flush_interval * 1000),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "direct_writes": self.direct_writes,
+            "batches": self.batches,
+            "last_flush_size": self.last_flush_size,
+            "flush_ms_avg": round(self.flush_seconds_total / self.batches * 1000, 3) if self.batches else 0.0,
+            "flush_ms_max": round(self.flush_seconds_max * 1000, 3)
+        }
+
+
+def create_pipeline_from_env() -> AuditPipeline:
+    return AuditPipeline(
+        max_queue=int(os.environ.get("AUDIT_QUEUE_SIZE", "10000")),
+        batch_size=int(os.environ.get("AUDIT_BATCH_SIZE", "500")),
+        flush_interval=int(os.environ.get("AUDIT_FLUSH_INTERVAL_MS", "250")) / 1000,
+        overflow=os.environ.get("AUDIT_OVERFLOW", "block").lower(),
+        block_timeout=int(os.environ.get("AUDIT_BLOCK_TIMEOUT_MS", "2000")) / 1000
+    )
+
+
+# Global audit pipeline instance
+audit_pipeline = create_pipeline_from_env()
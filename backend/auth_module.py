@@ -26,6 +26,9 @@ import secrets
 import hashlib
 import os
 
+from audit_pipeline import audit_pipeline
+from principal_cache import principal_cache
+
 auth_router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer()
 
@@ -478,7 +481,7 @@ def create_auth_endpoints(db, get_current_user_func):
         details: str = None
     ):
         """Log authentication events for audit"""
-        await db.audit_logs.insert_one({
+        await audit_pipeline.emit(db.audit_logs, {
             "id": str(uuid.uuid4()),
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "user_id": user_id,
@@ -571,6 +574,7 @@ def create_auth_endpoints(db, get_current_user_func):
                     {"id": user["id"]},
                     {"$set": {"locked_until": None, "failed_login_attempts": 0}}
                 )
+                principal_cache.invalidate_user(user["id"])
         
         # Verify password
         if not verify_password(credentials.password, user.get("password", "")):
@@ -587,6 +591,7 @@ def create_auth_endpoints(db, get_current_user_func):
                 )
             
             await db.users.update_one({"id": user["id"]}, {"$set": update_data})
+            principal_cache.invalidate_user(user["id"])
             await log_auth_event(
                 user["id"], "failed_login", False, ip_address, user_agent,
                 "Invalid password"
@@ -663,6 +668,7 @@ def create_auth_endpoints(db, get_current_user_func):
                 "last_login": datetime.now(timezone.utc).isoformat()
             }}
         )
+        principal_cache.invalidate_user(user["id"])
         
         # Create session
         session_id = await create_session(
@@ -947,6 +953,7 @@ def create_auth_endpoints(db, get_current_user_func):
                 "is_temp_password": False
             }}
         )
+        principal_cache.invalidate_user(current_user["id"])
         
         # Invalidate all other sessions
         auth_header = request.headers.get("authorization", "")
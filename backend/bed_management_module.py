@@ -10,8 +10,26 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from enum import Enum
 
+from db_indexes import register_indexes, IndexSpec
+from audit_pipeline import audit_pipeline
+from ward_census import WardCensus
+
 bed_management_router = APIRouter(prefix="/api/beds", tags=["Bed Management"])
 
+register_indexes(
+    "beds",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("organization_id", 1), ("is_active", 1), ("ward_id", 1)]),
+)
+register_indexes("wards", IndexSpec([("id", 1)]), IndexSpec([("organization_id", 1), ("is_active", 1)]))
+register_indexes("rooms", IndexSpec([("id", 1)]), IndexSpec([("ward_id", 1)]))
+register_indexes(
+    "admissions",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("patient_id", 1), ("status", 1)]),
+    IndexSpec([("organization_id", 1), ("status", 1)]),
+)
+
 
 # ============== Enums ==============
 
@@ -58,6 +76,13 @@ class BedGender(str, Enum):
     ANY = "any"
 
 
+CRITICAL_CARE_WARD_TYPES = {"icu", "ccu", "micu", "sicu", "nicu", "picu"}
+
+
+def _status_value(value) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
 # ============== Pydantic Models ==============
 
 class WardCreate(BaseModel):
@@ -195,6 +220,7 @@ def generate_auto_ward_name(hospital_prefix: str, ward_type: str) -> str:
 
 def create_bed_management_endpoints(db, get_current_user):
     """Create bed management API endpoints"""
+    census = WardCensus(db)
     
     # ============== Ward Management ==============
     
@@ -423,6 +449,7 @@ def create_bed_management_endpoints(db, get_current_user):
             {"id": room.get("ward_id")},
             {"$inc": {"total_beds": 1, "available_beds": 1}}
         )
+        await census.add_beds(user.get("organization_id"), room.get("ward_id"), 1)
         
         return {"message": "Bed created", "bed": bed_doc}
     
@@ -513,6 +540,7 @@ def create_bed_management_endpoints(db, get_current_user):
             {"id": ward_id},
             {"$inc": {"total_beds": beds_created, "available_beds": beds_created}}
         )
+        await census.add_beds(org_id, ward_id, beds_created)
         
         return {
             "message": f"Created {rooms_created} rooms with {beds_created} beds",
@@ -547,21 +575,15 @@ def create_bed_management_endpoints(db, get_current_user):
         user: dict = Depends(get_current_user)
     ):
         """Update bed status"""
-        bed = await db["beds"].find_one({"id": bed_id})
+        bed = await census.set_bed_status(bed_id, status, {
+            "notes": notes,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
         if not bed:
             raise HTTPException(status_code=404, detail="Bed not found")
         
         old_status = bed.get("status")
         
-        await db["beds"].update_one(
-            {"id": bed_id},
-            {"$set": {
-                "status": status,
-                "notes": notes,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        
         # Update ward counts if needed
         if old_status == BedStatus.AVAILABLE and status != BedStatus.AVAILABLE:
             await db["wards"].update_one({"id": bed.get("ward_id")}, {"$inc": {"available_beds": -1}})
@@ -632,23 +654,26 @@ def create_bed_management_endpoints(db, get_current_user):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        await db["admissions"].insert_one(admission_doc)
+        # Claim the bed first; only one of two concurrent admissions can win it
+        bed_status = BedStatus.ISOLATION if data.isolation_required else BedStatus.OCCUPIED
+        claimed = await census.claim_bed(data.bed_id, bed_status, {
+            "current_patient_id": data.patient_id,
+            "current_admission_id": admission_id,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+        if not claimed:
+            raise HTTPException(status_code=409, detail="Bed was taken by another admission")
+        
+        try:
+            await db["admissions"].insert_one(admission_doc)
+        except Exception:
+            # Don't leave the bed held by an admission that was never stored
+            await census.release_claim(data.bed_id, admission_id)
+            raise
         
         # Remove _id before returning
         admission_doc.pop("_id", None)
         
-        # Update bed status
-        bed_status = BedStatus.ISOLATION if data.isolation_required else BedStatus.OCCUPIED
-        await db["beds"].update_one(
-            {"id": data.bed_id},
-            {"$set": {
-                "status": bed_status,
-                "current_patient_id": data.patient_id,
-                "current_admission_id": admission_id,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        
         # Update ward counts
         await db["wards"].update_one(
             {"id": bed.get("ward_id")},
@@ -656,7 +681,7 @@ def create_bed_management_endpoints(db, get_current_user):
         )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "patient_admitted",
             "resource_type": "admission",
@@ -715,42 +740,41 @@ def create_bed_management_endpoints(db, get_current_user):
             "transferred_by": f"{user.get('first_name', '')} {user.get('last_name', '')}"
         }
         
+        # Occupy new bed
+        claimed = await census.claim_bed(data.to_bed_id, BedStatus.OCCUPIED, {
+            "current_patient_id": admission.get("patient_id"),
+            "current_admission_id": admission_id
+        })
+        if not claimed:
+            raise HTTPException(status_code=409, detail="Destination bed was taken by another admission")
+        
         # Update admission
-        await db["admissions"].update_one(
-            {"id": admission_id},
-            {
-                "$set": {
-                    "bed_id": data.to_bed_id,
-                    "bed_number": new_bed.get("bed_number"),
-                    "ward_id": new_bed.get("ward_id"),
-                    "ward_name": new_bed.get("ward_name"),
-                    "room_id": new_bed.get("room_id"),
-                    "room_number": new_bed.get("room_number"),
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                },
-                "$push": {"transfer_history": transfer_record}
-            }
-        )
+        try:
+            await db["admissions"].update_one(
+                {"id": admission_id},
+                {
+                    "$set": {
+                        "bed_id": data.to_bed_id,
+                        "bed_number": new_bed.get("bed_number"),
+                        "ward_id": new_bed.get("ward_id"),
+                        "ward_name": new_bed.get("ward_name"),
+                        "room_id": new_bed.get("room_id"),
+                        "room_number": new_bed.get("room_number"),
+                        "updated_at": datetime.now(timezone.utc).isoformat()
+                    },
+                    "$push": {"transfer_history": transfer_record}
+                }
+            )
+        except Exception:
+            # The patient stays in the old bed; give the destination back
+            await census.release_claim(data.to_bed_id, admission_id)
+            raise
         
         # Free old bed
-        await db["beds"].update_one(
-            {"id": old_bed_id},
-            {"$set": {
-                "status": BedStatus.CLEANING,
-                "current_patient_id": None,
-                "current_admission_id": None
-            }}
-        )
-        
-        # Occupy new bed
-        await db["beds"].update_one(
-            {"id": data.to_bed_id},
-            {"$set": {
-                "status": BedStatus.OCCUPIED,
-                "current_patient_id": admission.get("patient_id"),
-                "current_admission_id": admission_id
-            }}
-        )
+        await census.set_bed_status(old_bed_id, BedStatus.CLEANING, {
+            "current_patient_id": None,
+            "current_admission_id": None
+        })
         
         # Update ward counts if transferring between wards
         if old_bed and old_bed.get("ward_id") != new_bed.get("ward_id"):
@@ -764,7 +788,7 @@ def create_bed_management_endpoints(db, get_current_user):
             )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "patient_transferred",
             "resource_type": "admission",
@@ -811,15 +835,11 @@ def create_bed_management_endpoints(db, get_current_user):
         
         # Free bed
         bed_id = admission.get("bed_id")
-        await db["beds"].update_one(
-            {"id": bed_id},
-            {"$set": {
-                "status": BedStatus.CLEANING,
-                "current_patient_id": None,
-                "current_admission_id": None,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
+        await census.set_bed_status(bed_id, BedStatus.CLEANING, {
+            "current_patient_id": None,
+            "current_admission_id": None,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
         
         # Update ward counts
         await db["wards"].update_one(
@@ -828,7 +848,7 @@ def create_bed_management_endpoints(db, get_current_user):
         )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "patient_discharged",
             "resource_type": "admission",
@@ -879,60 +899,77 @@ def create_bed_management_endpoints(db, get_current_user):
     async def get_ward_census(
         user: dict = Depends(get_current_user)
     ):
-        """Get real-time ward census"""
+        """Get real-time ward census from the per-ward counters"""
         org_id = user.get("organization_id")
         
-        wards = await db["wards"].find({"organization_id": org_id, "is_active": True}).to_list(50)
-        beds = await db["beds"].find({"organization_id": org_id, "is_active": True}).to_list(1000)
+        wards = await db["wards"].find(
+            {"organization_id": org_id, "is_active": True},
+            {"_id": 0, "id": 1, "name": 1, "ward_type": 1, "floor": 1}
+        ).to_list(None)
+        counters = await census.read(org_id)
+        
+        def count(ward_counts, *statuses):
+            return sum(ward_counts.get(_status_value(s), 0) for s in statuses)
         
-        # Calculate overall stats
-        total_beds = len(beds)
-        occupied = len([b for b in beds if b.get("status") == BedStatus.OCCUPIED])
-        available = len([b for b in beds if b.get("status") == BedStatus.AVAILABLE])
-        reserved = len([b for b in beds if b.get("status") == BedStatus.RESERVED])
-        cleaning = len([b for b in beds if b.get("status") == BedStatus.CLEANING])
-        maintenance = len([b for b in beds if b.get("status") == BedStatus.MAINTENANCE])
-        isolation = len([b for b in beds if b.get("status") == BedStatus.ISOLATION])
+        # Overall stats cover every active bed, including beds outside listed wards
+        totals = {}
+        total_beds = 0
+        for ward_counter in counters.values():
+            total_beds += ward_counter["total"]
+            for status, n in ward_counter["counts"].items():
+                totals[status] = totals.get(status, 0) + n
+        occupied = count(totals, BedStatus.OCCUPIED)
         
         # Calculate per-ward stats
         ward_census = []
+        critical = {"total": 0, "occupied": 0, "available": 0}
         for ward in wards:
-            ward_beds = [b for b in beds if b.get("ward_id") == ward.get("id")]
+            ward_counter = counters.get(ward.get("id"), {"total": 0, "counts": {}})
+            ward_total, ward_counts = ward_counter["total"], ward_counter["counts"]
             ward_census.append({
                 "ward_id": ward.get("id"),
                 "ward_name": ward.get("name"),
                 "ward_type": ward.get("ward_type"),
                 "floor": ward.get("floor"),
-                "total_beds": len(ward_beds),
-                "occupied": len([b for b in ward_beds if b.get("status") == BedStatus.OCCUPIED]),
-                "available": len([b for b in ward_beds if b.get("status") == BedStatus.AVAILABLE]),
-                "reserved": len([b for b in ward_beds if b.get("status") == BedStatus.RESERVED]),
-                "isolation": len([b for b in ward_beds if b.get("status") == BedStatus.ISOLATION]),
-                "occupancy_rate": round(len([b for b in ward_beds if b.get("status") in [BedStatus.OCCUPIED, BedStatus.ISOLATION]]) / len(ward_beds) * 100, 1) if ward_beds else 0
+                "total_beds": ward_total,
+                "occupied": count(ward_counts, BedStatus.OCCUPIED),
+                "available": count(ward_counts, BedStatus.AVAILABLE),
+                "reserved": count(ward_counts, BedStatus.RESERVED),
+                "isolation": count(ward_counts, BedStatus.ISOLATION),
+                "occupancy_rate": round(count(ward_counts, BedStatus.OCCUPIED, BedStatus.ISOLATION) / ward_total * 100, 1) if ward_total else 0
             })
-        
-        # Critical care capacity
-        critical_wards = ["icu", "ccu", "micu", "sicu", "nicu", "picu"]
-        critical_beds = [b for b in beds if any(w.get("ward_type") in critical_wards for w in wards if w.get("id") == b.get("ward_id"))]
+            
+            # Critical care capacity
+            if _status_value(ward.get("ward_type")) in CRITICAL_CARE_WARD_TYPES:
+                critical["total"] += ward_total
+                critical["occupied"] += count(ward_counts, BedStatus.OCCUPIED)
+                critical["available"] += count(ward_counts, BedStatus.AVAILABLE)
         
         return {
             "summary": {
                 "total_beds": total_beds,
                 "occupied": occupied,
-                "available": available,
-                "reserved": reserved,
-                "cleaning": cleaning,
-                "maintenance": maintenance,
-                "isolation": isolation,
+                "available": count(totals, BedStatus.AVAILABLE),
+                "reserved": count(totals, BedStatus.RESERVED),
+                "cleaning": count(totals, BedStatus.CLEANING),
+                "maintenance": count(totals, BedStatus.MAINTENANCE),
+                "isolation": count(totals, BedStatus.ISOLATION),
                 "overall_occupancy": round(occupied / total_beds * 100, 1) if total_beds > 0 else 0
             },
-            "critical_care": {
-                "total": len(critical_beds),
-                "occupied": len([b for b in critical_beds if b.get("status") == BedStatus.OCCUPIED]),
-                "available": len([b for b in critical_beds if b.get("status") == BedStatus.AVAILABLE])
-            },
+            "critical_care": critical,
             "wards": ward_census,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
     
+    @bed_management_router.post("/census/reconcile")
+    async def reconcile_ward_census(
+        user: dict = Depends(get_current_user)
+    ):
+        """Rebuild this organization's census counters from the beds and report drift"""
+        allowed_roles = ["bed_manager", "hospital_admin", "super_admin"]
+        if user.get("role") not in allowed_roles:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        
+        return await census.reconcile(user.get("organization_id"))
+    
     return bed_management_router
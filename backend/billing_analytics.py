@@ -0,0 +1,335 @@
+"""
+Billing Analytics for Yacco Health
+==================================
+Daily per-organization rollups of invoices, insurance claims and NHIS
+claims, kept in the `billing_rollups` collection (one document per source
+collection + organization + day the record was created). Each document
+holds, per status, the record count and the sums of that source's amount
+fields, so billing dashboards and date-range reports add up at most one
+small document per day instead of scanning every invoice.
+
+Writes to the source collections go through insert_one()/update_one(),
+which apply the exact before -> after change to the rollup for the
+record's day with $inc. rebuild() recomputes the rollups from the raw
+collections with one $group pipeline per source and reports drift. It
+only replaces days before the one it starts on; today stays with the live
+$inc updates, so a rebuild never overwrites an invoice or claim change
+made while it runs. backfill() runs one rebuild per database in the
+background at startup (server.py), under a lease in
+`billing_rollup_backfills` so only one worker does it; reads never rebuild.
+
+Usage:
+    from billing_analytics import ALL_ORGANIZATIONS, BillingAnalytics
+
+    analytics = BillingAnalytics(db)
+    await analytics.insert_one("invoices", invoice_doc)
+    await analytics.update_one("invoices", {"id": invoice_id}, {"$set": {...}})
+    stats = await analytics.summarize(org_id, ["invoices"], "2024-01-01", "2024-01-31")
+    everything = await analytics.summarize(ALL_ORGANIZATIONS, ["invoices"])
+    analytics.start_backfill()   # app startup: rebuild history once, in the background
+    stats["invoices"]["paid"]  # {"count": ..., "total": ..., "amount_paid": ..., "balance_due": ...}
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument
+
+from db_indexes import register_indexes, IndexSpec
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "billing_rollups"
+BACKFILL_COLLECTION = "billing_rollup_backfills"
+BACKFILL_MARKER = {"_id": "billing_rollups"}
+BACKFILL_LEASE_SECONDS = int(os.environ.get("BILLING_BACKFILL_LEASE_SECONDS", "3600"))
+
+# org_id for reads and rebuilds covering every organization; None is records without one
+ALL_ORGANIZATIONS: Any = object()
+
+# Amount fields summed per source; each amount is the first of its fields that is set
+SOURCES: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "invoices": {
+        "total": ("total",),
+        "amount_paid": ("amount_paid",),
+        "balance_due": ("balance_due",),
+    },
+    "insurance_claims": {
+        "total_charges": ("total_charges",),
+    },
+    "nhis_claims": {
+        "total_claimed": ("total_claimed",),
+        "approved_amount": ("approved_amount", "total_nhis_approved"),
+    },
+}
+
+register_indexes(ROLLUP_COLLECTION, IndexSpec([("source", 1), ("organization_id", 1), ("day", 1)], unique=True))
+
+# Running backfill tasks; referenced so they are not garbage collected
+_background_tasks = set()
+
+
+def _day(created_at) -> str:
+    """YYYY-MM-DD bucket of a created_at value ("" when missing)"""
+    return str(created_at)[:10] if created_at else ""
+
+
+def _status(value) -> str:
+    value = getattr(value, "value", value)
+    return value if value else "unknown"
+
+
+def _amount(doc: Dict[str, Any], fields: Tuple[str, ...]) -> float:
+    for field in fields:
+        if doc.get(field) is not None:
+            return doc[field]
+    return 0
+
+
+def _contribution(source: str, doc: Dict[str, Any]) -> Tuple[tuple, Dict[str, float]]:
+    """(rollup key, counters) that one record adds to its day's rollup"""
+    prefix = f"statuses.{_status(doc.get('status'))}"
+    counters = {f"{prefix}.count": 1}
+    for name, fields in SOURCES[source].items():
+        counters[f"{prefix}.{name}"] = _amount(doc, fields)
+    return (doc.get("organization_id"), _day(doc.get("created_at"))), counters
+
+
+def _updated(before: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """The document after a $set/$inc/$unset update (other operators don't touch rollup fields)"""
+    after = dict(before)
+    after.update(update.get("$set", {}))
+    for field, delta in update.get("$inc", {}).items():
+        after[field] = (after.get(field) or 0) + delta
+    for field in update.get("$unset", {}):
+        after.pop(field, None)
+    return after
+
+
+class BillingAnalytics:
+    """Writes to billing collections plus the daily rollups they maintain"""
+
+    def __init__(self, db):
+        self.db = db
+        self.rollups = db[ROLLUP_COLLECTION]
+        self.backfills = db[BACKFILL_COLLECTION]
+
+    # ============== Rollup updates ==============
+
+    async def _apply(self, source: str, key: tuple, inc: Dict[str, float]):
+        inc = {field: delta for field, delta in inc.items() if delta}
+        if not inc:
+            return
+        org_id, day = key
+        await self.rollups.update_one(
+            {"source": source, "organization_id": org_id, "day": day},
+            {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+
+    async def record(self, source: str, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply one record's before -> after change (either may be None) to the rollups"""
+        deltas: Dict[tuple, Dict[str, float]] = {}
+        for doc, sign in ((before, -1), (after, 1)):
+            if doc is None:
+                continue
+            key, counters = _contribution(source, doc)
+            bucket = deltas.setdefault(key, {})
+            for field, value in counters.items():
+                bucket[field] = bucket.get(field, 0) + sign * value
+        for key, inc in deltas.items():
+            await self._apply(source, key, inc)
+
+    # ============== Source writes ==============
+
+    async def insert_one(self, source: str, document: Dict[str, Any]):
+        result = await self.db[source].insert_one(document)
+        await self.record(source, None, document)
+        return result
+
+    async def update_one(self, source: str, query: Dict[str, Any], update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update one record; returns it as it was before, or None if nothing matched"""
+        before = await self.db[source].find_one_and_update(
+            query, update, projection={"_id": 0}, return_document=ReturnDocument.BEFORE
+        )
+        if before:
+            await self.record(source, before, _updated(before, update))
+        return before
+
+    # ============== Reads ==============
+
+    async def summarize(
+        self,
+        org_id: Any,
+        sources: Iterable[str],
+        from_day: Optional[str] = None,
+        to_day: Optional[str] = None
+    ) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Per-source, per-status counts and amount sums for records created
+        between from_day and to_day (inclusive, YYYY-MM-DD; open when None).
+        org_id ALL_ORGANIZATIONS covers every organization.
+        """
+        sources = list(sources)
+        match: Dict[str, Any] = {"source": {"$in": sources}}
+        if org_id is not ALL_ORGANIZATIONS:
+            match["organization_id"] = org_id
+        if from_day or to_day:
+            match["day"] = {}
+            if from_day:
+                match["day"]["$gte"] = from_day
+            if to_day:
+                match["day"]["$lte"] = to_day
+
+        facets = {}
+        for source in sources:
+            group: Dict[str, Any] = {"_id": "$status", "count": {"$sum": "$counters.count"}}
+            for name in SOURCES[source]:
+                group[name] = {"$sum": f"$counters.{name}"}
+            facets[source] = [
+                {"$match": {"source": source}},
+                {"$project": {"statuses": {"$objectToArray": "$statuses"}}},
+                {"$unwind": "$statuses"},
+                {"$project": {"status": "$statuses.k", "counters": "$statuses.v"}},
+                {"$group": group},
+            ]
+
+        summary: Dict[str, Dict[str, Dict[str, float]]] = {source: {} for source in sources}
+        async for result in self.rollups.aggregate([{"$match": match}, {"$facet": facets}]):
+            for source in sources:
+                for row in result.get(source, []):
+                    status = row.pop("_id")
+                    if row.get("count"):
+                        summary[source][status] = row
+        return summary
+
+    # ============== Rebuild ==============
+
+    async def _expected(self, source: str, org_id: Any) -> Dict[tuple, Dict[str, Any]]:
+        group: Dict[str, Any] = {
+            "_id": {
+                "org": "$organization_id",
+                "day": {"$substrCP": [{"$toString": "$created_at"}, 0, 10]},
+                "status": "$status"
+            },
+            "count": {"$sum": 1}
+        }
+        for name, fields in SOURCES[source].items():
+            value: Any = 0
+            for field in reversed(fields):
+                value = {"$ifNull": [f"${field}", value]}
+            group[name] = {"$sum": value}
+        pipeline = [{"$match": {} if org_id is ALL_ORGANIZATIONS else {"organization_id": org_id}}, {"$group": group}]
+
+        expected: Dict[tuple, Dict[str, Any]] = {}
+        async for row in self.db[source].aggregate(pipeline, allowDiskUse=True):
+            key = (row["_id"].get("org"), row["_id"].get("day") or "")
+            counters = {"count": row["count"], **{name: row[name] for name in SOURCES[source]}}
+            expected.setdefault(key, {})[_status(row["_id"].get("status"))] = counters
+        return expected
+
+    async def rebuild(self, source: Optional[str] = None, org_id: Any = ALL_ORGANIZATIONS,
+                      cutoff: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Recompute rollups from the raw collections (one source, or all when
+        source is None; one organization, or all by default) and report the
+        days whose rollups had drifted. Only days before cutoff's day
+        (default: today) are replaced; the current day is left to the live
+        updates.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        before_day = (cutoff or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+        drift: List[Dict[str, Any]] = []
+        days_checked = 0
+        for name in ([source] if source else list(SOURCES)):
+            expected = {key: value for key, value in (await self._expected(name, org_id)).items() if key[1] < before_day}
+            query = {"source": name, "day": {"$lt": before_day}}
+            if org_id is not ALL_ORGANIZATIONS:
+                query["organization_id"] = org_id
+            stored = {
+                (doc.get("organization_id"), doc.get("day")): doc
+                async for doc in self.rollups.find(query, {"_id": 0})
+            }
+
+            operations = []
+            for key in expected.keys() | stored.keys():
+                want = expected.get(key, {})
+                have = {
+                    status: counters for status, counters in (stored.get(key, {}).get("statuses") or {}).items()
+                    if counters.get("count")
+                }
+                if _same(have, want):
+                    continue
+                drift.append({"source": name, "organization_id": key[0], "day": key[1], "expected": want, "counted": have})
+                selector = {"source": name, "organization_id": key[0], "day": key[1]}
+                if want:
+                    operations.append(ReplaceOne(selector, {**selector, "statuses": want, "updated_at": now}, upsert=True))
+                else:
+                    operations.append(DeleteOne(selector))
+            if operations:
+                await self.rollups.bulk_write(operations, ordered=False)
+            days_checked += len(expected)
+
+        if drift:
+            logger.info(f"Billing rollups rebuilt for {len(drift)} day(s)")
+        return {"days_checked": days_checked, "drifted": drift, "rebuilt_at": now}
+
+    # ============== Startup backfill ==============
+
+    def start_backfill(self) -> asyncio.Task:
+        """Run backfill() as a background task"""
+        task = asyncio.create_task(self.backfill())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return task
+
+    async def backfill(self) -> Optional[Dict[str, Any]]:
+        """
+        Rebuild every source and organization once per database. The worker
+        that takes the lease runs it; others (and later starts) return None.
+        A lease left by a worker that died expires after BACKFILL_LEASE_SECONDS.
+        """
+        await self.backfills.update_one(
+            BACKFILL_MARKER, {"$setOnInsert": {"completed_at": None, "locked_until": None}}, upsert=True
+        )
+        now = datetime.now(timezone.utc)
+        claimed = await self.backfills.find_one_and_update(
+            {**BACKFILL_MARKER, "completed_at": None,
+             "$or": [{"locked_until": None}, {"locked_until": {"$lt": now.isoformat()}}]},
+            {"$set": {"locked_until": (now + timedelta(seconds=BACKFILL_LEASE_SECONDS)).isoformat()}}
+        )
+        if not claimed:
+            return None
+        try:
+            result = await self.rebuild(cutoff=now)
+        except Exception as e:
+            logger.error(f"Billing rollup backfill failed: {e}")
+            await self.backfills.update_one(BACKFILL_MARKER, {"$set": {"locked_until": None}})
+            return None
+        await self.backfills.update_one(
+            BACKFILL_MARKER,
+            {"$set": {"completed_at": datetime.now(timezone.utc).isoformat(), "locked_until": None,
+                      "cutoff": now.isoformat(), "days_checked": result["days_checked"],
+                      "days_drifted": len(result["drifted"])}}
+        )
+        return result
+
+
+def _same(have: Dict[str, Dict[str, float]], want: Dict[str, Dict[str, float]]) -> bool:
+    """Compare rollups, allowing for float rounding in the running sums"""
+    if have.keys() != want.keys():
+        return False
+    for status, counters in want.items():
+        for field, value in counters.items():
+            if abs((have[status].get(field) or 0) - (value or 0)) > 0.005:
+                return False
+    return True
+
+
+def status_total(statuses: Dict[str, Dict[str, float]], field: str, only: Optional[Iterable[str]] = None) -> float:
+    """Sum one counter over every status (or just the given ones) of a summarize() result"""
+    wanted = None if only is None else {_status(s) for s in only}
+    return sum(counters.get(field, 0) for status, counters in statuses.items() if wanted is None or status in wanted)
@@ -13,8 +13,37 @@ import hashlib
 import os
 import requests
 
+from db_indexes import register_indexes, IndexSpec
+from audit_pipeline import audit_pipeline
+from billing_analytics import ALL_ORGANIZATIONS, BillingAnalytics, status_total
+from export_stream import export_cursor, export_response
+
 router = APIRouter(prefix="/api/billing", tags=["Billing"])
 
+register_indexes(
+    "invoices",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("organization_id", 1), ("status", 1), ("created_at", -1)]),
+    IndexSpec([("patient_id", 1), ("created_at", -1)]),
+)
+register_indexes("insurance_claims", IndexSpec([("id", 1)]), IndexSpec([("organization_id", 1), ("status", 1)]))
+register_indexes("payments", IndexSpec([("invoice_id", 1)]))
+register_indexes("paystack_transactions", IndexSpec([("reference", 1)]))
+
+CLAIM_EXPORT_FIELDS = [
+    "claim_number", "id", "invoice_id", "patient_id", "insurance_provider", "insurance_id",
+    "subscriber_name", "subscriber_id", "diagnosis_codes", "procedure_codes", "total_charges",
+    "status", "created_at", "submitted_at", "organization_id"
+]
+
+
+def _flatten_claim(claim: dict) -> dict:
+    """Code lists as ';'-separated cells for CSV"""
+    for field in ("diagnosis_codes", "procedure_codes"):
+        if isinstance(claim.get(field), list):
+            claim[field] = ";".join(str(code) for code in claim[field])
+    return claim
+
 # ============ ENUMS ============
 class InvoiceStatus(str, Enum):
     DRAFT = "draft"
@@ -194,6 +223,7 @@ SERVICE_CODES = {
 
 def setup_routes(db, get_current_user):
     """Setup billing routes with database and auth dependency"""
+    analytics = BillingAnalytics(db)
     
     PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY', '')
     PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY', '')
@@ -263,7 +293,7 @@ def setup_routes(db, get_current_user):
             "payments": []
         }
         
-        await db.invoices.insert_one(invoice_doc)
+        await analytics.insert_one("invoices", invoice_doc)
         invoice_doc.pop("_id", None)
         
         # Update biller's active shift if exists
@@ -330,12 +360,13 @@ def setup_routes(db, get_current_user):
     @router.put("/invoices/{invoice_id}/send")
     async def send_invoice(invoice_id: str, current_user: dict = Depends(get_current_user)):
         """Mark invoice as sent to patient"""
-        result = await db.invoices.update_one(
+        invoice = await analytics.update_one(
+            "invoices",
             {"id": invoice_id},
             {"$set": {"status": InvoiceStatus.SENT}}
         )
         
-        if result.matched_count == 0:
+        if not invoice:
             raise HTTPException(status_code=404, detail="Invoice not found")
         
         return {"message": "Invoice sent"}
@@ -352,7 +383,8 @@ def setup_routes(db, get_current_user):
             raise HTTPException(status_code=400, detail="Can only reverse sent or pending insurance invoices")
         
         # Update invoice status
-        await db.invoices.update_one(
+        await analytics.update_one(
+            "invoices",
             {"id": invoice_id},
             {"$set": {
                 "status": InvoiceStatus.REVERSED,
@@ -364,7 +396,7 @@ def setup_routes(db, get_current_user):
         )
         
         # Audit log
-        await db.billing_audit_logs.insert_one({
+        await audit_pipeline.emit(db.billing_audit_logs, {
             "id": str(uuid.uuid4()),
             "action": "invoice_reversed",
             "resource_type": "invoice",
@@ -390,7 +422,8 @@ def setup_routes(db, get_current_user):
         if invoice["status"] in [InvoiceStatus.PAID, InvoiceStatus.PARTIALLY_PAID]:
             raise HTTPException(status_code=400, detail="Cannot void paid or partially paid invoices")
         
-        await db.invoices.update_one(
+        await analytics.update_one(
+            "invoices",
             {"id": invoice_id},
             {"$set": {
                 "status": InvoiceStatus.VOIDED,
@@ -402,7 +435,7 @@ def setup_routes(db, get_current_user):
         )
         
         # Audit log
-        await db.billing_audit_logs.insert_one({
+        await audit_pipeline.emit(db.billing_audit_logs, {
             "id": str(uuid.uuid4()),
             "action": "invoice_voided",
             "resource_type": "invoice",
@@ -447,10 +480,10 @@ def setup_routes(db, get_current_user):
         elif new_method == PaymentMethod.NHIS_INSURANCE:
             update_data["status"] = InvoiceStatus.PENDING_INSURANCE
         
-        await db.invoices.update_one({"id": invoice_id}, {"$set": update_data})
+        await analytics.update_one("invoices", {"id": invoice_id}, {"$set": update_data})
         
         # Audit log
-        await db.billing_audit_logs.insert_one({
+        await audit_pipeline.emit(db.billing_audit_logs, {
             "id": str(uuid.uuid4()),
             "action": "payment_method_changed",
             "resource_type": "invoice",
@@ -478,7 +511,8 @@ def setup_routes(db, get_current_user):
         if invoice["status"] == InvoiceStatus.PAID:
             raise HTTPException(status_code=400, detail="Cannot cancel a paid invoice")
         
-        await db.invoices.update_one(
+        await analytics.update_one(
+            "invoices",
             {"id": invoice_id},
             {"$set": {"status": InvoiceStatus.CANCELLED}}
         )
@@ -534,7 +568,8 @@ def setup_routes(db, get_current_user):
         if new_status == InvoiceStatus.PAID:
             update_data["paid_at"] = datetime.now(timezone.utc).isoformat()
         
-        await db.invoices.update_one(
+        await analytics.update_one(
+            "invoices",
             {"id": payment_data.invoice_id},
             {
                 "$set": update_data,
@@ -727,7 +762,8 @@ def setup_routes(db, get_current_user):
                         
                         new_status = InvoiceStatus.PAID if new_balance <= 0 else InvoiceStatus.PARTIALLY_PAID
                         
-                        await db.invoices.update_one(
+                        await analytics.update_one(
+                            "invoices",
                             {"id": stored_tx["invoice_id"]},
                             {
                                 "$set": {
@@ -845,7 +881,7 @@ def setup_routes(db, get_current_user):
             "organization_id": current_user.get("organization_id")
         }
         
-        await db.insurance_claims.insert_one(claim_doc)
+        await analytics.insert_one("insurance_claims", claim_doc)
         
         return {
             "message": "Insurance claim created",
@@ -873,6 +909,32 @@ def setup_routes(db, get_current_user):
         
         return {"claims": claims, "count": len(claims)}
     
+    @router.get("/claims/export")
+    async def export_claims(
+        format: str = "csv",
+        status: Optional[str] = None,
+        gzip: bool = False,
+        current_user: dict = Depends(get_current_user)
+    ):
+        """Stream insurance claims as CSV or NDJSON (EDI content excluded)"""
+        if format not in ("csv", "ndjson"):
+            raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+        query = {}
+        org_id = current_user.get("organization_id")
+        
+        if org_id and current_user.get("role") != "super_admin":
+            query["organization_id"] = org_id
+        
+        if status:
+            query["status"] = status
+        
+        rows = export_cursor(db.insurance_claims, query, {"_id": 0, "edi_content": 0}, sort=[("created_at", -1)])
+        return export_response(
+            rows, format, f"claims_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}",
+            fieldnames=CLAIM_EXPORT_FIELDS, compress=gzip,
+            transform=_flatten_claim if format == "csv" else None
+        )
+    
     @router.get("/claims/{claim_id}")
     async def get_claim(claim_id: str, current_user: dict = Depends(get_current_user)):
         """Get claim details including EDI content"""
@@ -895,7 +957,8 @@ def setup_routes(db, get_current_user):
             raise HTTPException(status_code=400, detail="Claim already submitted")
         
         # Simulate submission
-        await db.insurance_claims.update_one(
+        await analytics.update_one(
+            "insurance_claims",
             {"id": claim_id},
             {"$set": {
                 "status": ClaimStatus.SUBMITTED,
@@ -912,29 +975,22 @@ def setup_routes(db, get_current_user):
     
     # ============ DASHBOARD STATS ============
     @router.get("/stats")
-    async def get_billing_stats(current_user: dict = Depends(get_current_user)):
-        """Get billing statistics"""
-        query = {}
+    async def get_billing_stats(
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        current_user: dict = Depends(get_current_user)
+    ):
+        """Get billing statistics, optionally for invoices/claims created between from_date and to_date (YYYY-MM-DD)"""
         org_id = current_user.get("organization_id")
+        if not org_id or current_user.get("role") == "super_admin":
+            org_id = ALL_ORGANIZATIONS
         
-        if org_id and current_user.get("role") != "super_admin":
-            query["organization_id"] = org_id
-        
-        # Get all invoices
-        invoices = await db.invoices.find(query, {"_id": 0}).to_list(10000)
+        stats = await analytics.summarize(org_id, ["invoices", "insurance_claims"], from_date, to_date)
+        invoices, claims = stats["invoices"], stats["insurance_claims"]
         
-        total_billed = sum(inv["total"] for inv in invoices)
-        total_collected = sum(inv["amount_paid"] for inv in invoices)
-        total_outstanding = sum(inv["balance_due"] for inv in invoices)
-        
-        paid_count = len([inv for inv in invoices if inv["status"] == InvoiceStatus.PAID])
-        pending_count = len([inv for inv in invoices if inv["status"] in [InvoiceStatus.DRAFT, InvoiceStatus.SENT]])
-        overdue_count = len([inv for inv in invoices if inv["status"] == InvoiceStatus.OVERDUE])
-        
-        # Claims stats
-        claims = await db.insurance_claims.find(query, {"_id": 0}).to_list(10000)
-        claims_submitted = len([c for c in claims if c["status"] == ClaimStatus.SUBMITTED])
-        claims_approved = len([c for c in claims if c["status"] == ClaimStatus.APPROVED])
+        total_billed = status_total(invoices, "total")
+        total_collected = status_total(invoices, "amount_paid")
+        total_outstanding = status_total(invoices, "balance_due")
         
         return {
             "total_billed": total_billed,
@@ -942,18 +998,27 @@ def setup_routes(db, get_current_user):
             "total_outstanding": total_outstanding,
             "collection_rate": (total_collected / total_billed * 100) if total_billed > 0 else 0,
             "invoices": {
-                "total": len(invoices),
-                "paid": paid_count,
-                "pending": pending_count,
-                "overdue": overdue_count
+                "total": status_total(invoices, "count"),
+                "paid": status_total(invoices, "count", [InvoiceStatus.PAID]),
+                "pending": status_total(invoices, "count", [InvoiceStatus.DRAFT, InvoiceStatus.SENT]),
+                "overdue": status_total(invoices, "count", [InvoiceStatus.OVERDUE])
             },
             "claims": {
-                "total": len(claims),
-                "submitted": claims_submitted,
-                "approved": claims_approved
+                "total": status_total(claims, "count"),
+                "submitted": status_total(claims, "count", [ClaimStatus.SUBMITTED]),
+                "approved": status_total(claims, "count", [ClaimStatus.APPROVED])
             }
         }
     
+    @router.post("/stats/rebuild")
+    async def rebuild_billing_rollups(current_user: dict = Depends(get_current_user)):
+        """Recompute the daily billing rollups (days before today) from invoices and claims and report drift"""
+        if current_user.get("role") not in ["hospital_admin", "super_admin"]:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        org_id = ALL_ORGANIZATIONS if current_user.get("role") == "super_admin" else current_user.get("organization_id")
+        return await analytics.rebuild(org_id=org_id)
+    
     return router
 
 
@@ -9,6 +9,8 @@ from datetime import datetime, timezone, timedelta
 from enum import Enum
 import uuid
 
+from audit_pipeline import audit_pipeline
+
 router = APIRouter(prefix="/api/billing-shifts", tags=["Billing Shifts"])
 
 # ============ ENUMS ============
@@ -153,7 +155,7 @@ def create_billing_shifts_router(db, get_current_user):
         await db.billing_shifts.insert_one(shift)
         
         # Log audit
-        await db.billing_audit_logs.insert_one({
+        await audit_pipeline.emit(db.billing_audit_logs, {
             "id": str(uuid.uuid4()),
             "action": "shift_clock_in",
             "user_id": current_user['id'],
@@ -212,7 +214,7 @@ def create_billing_shifts_router(db, get_current_user):
         )
         
         # Log audit
-        await db.billing_audit_logs.insert_one({
+        await audit_pipeline.emit(db.billing_audit_logs, {
             "id": str(uuid.uuid4()),
             "action": "shift_clock_out",
             "user_id": current_user['id'],
@@ -625,7 +627,7 @@ def create_billing_shifts_router(db, get_current_user):
         )
         
         # Log audit
-        await db.billing_audit_logs.insert_one({
+        await audit_pipeline.emit(db.billing_audit_logs, {
             "id": str(uuid.uuid4()),
             "action": "shift_reconciliation",
             "user_id": current_user['id'],
@@ -785,7 +787,7 @@ async def update_shift_on_payment(db, user_id: str, amount: float, payment_metho
 
 async def log_billing_action(db, action: str, user: dict, details: dict):
     """Log a billing action for audit"""
-    await db.billing_audit_logs.insert_one({
+    await audit_pipeline.emit(db.billing_audit_logs, {
         "id": str(uuid.uuid4()),
         "action": action,
         "user_id": user.get('id'),
@@ -1,10 +1,16 @@
 """
 Clinical Decision Support Module for Yacco EMR
 Handles drug interactions, allergy alerts, and clinical warnings
+
+Interaction checks go through CDS_KNOWLEDGE_BASE, compiled once at import
+from the tables below: name -> canonical drug, drug -> class, and a
+symmetric (drug or class, drug or class) -> interaction table.
 """
+import re
+from functools import lru_cache
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 from enum import Enum
 
@@ -30,6 +36,9 @@ class DrugInteractionCheck(BaseModel):
     medications: List[str]
     new_medication: str
 
+class MedicationListCheck(BaseModel):
+    medications: List[str]
+
 class AllergyCheck(BaseModel):
     patient_allergies: List[str]
     medication: str
@@ -143,43 +152,148 @@ ALLERGY_CROSS_REACTIVITY = {
 }
 
 
+# ============ COMPILED KNOWLEDGE BASE ============
+_NAME_TOKEN = re.compile(r"[a-z0-9]+")
+_MIN_PARTIAL_NAME = 4
+
+
+def normalize_drug_name(name: str) -> str:
+    """Normalize drug name for comparison"""
+    return name.lower().strip().replace("-", "").replace(" ", "").replace("_", "")
+
+
+class CDSKnowledgeBase:
+    """
+    Hash tables compiled from DRUG_INTERACTIONS and DRUG_CLASSES.
+
+    A medication string (e.g. "Warfarin 5mg tablet") resolves once to its
+    terms: the canonical drug and/or its class. A pair check is then at
+    most four dictionary lookups, drug-level entries before class-level.
+    Names that match no known name or word run fall back to substring
+    matching ("Esomeprazole 40mg" -> omeprazole), as the original checker did.
+    """
+
+    def __init__(self, interactions: dict, drug_classes: Dict[str, List[str]]):
+        self.drug_classes = drug_classes
+        self._names: Dict[str, str] = {}        # normalized name -> canonical term
+        self._class_of: Dict[str, str] = {}     # canonical drug -> class
+        self._is_class = set(drug_classes)
+        self._pairs: Dict[Tuple[str, str], dict] = {}
+        self._max_words = 1
+
+        for drug_class, members in drug_classes.items():
+            self._add_name(drug_class, drug_class)
+            self._add_name(drug_class.rstrip("s"), drug_class)
+            for member in members:
+                canonical = normalize_drug_name(member)
+                self._add_name(member, canonical)
+                self._class_of.setdefault(canonical, drug_class)
+
+        for (first, second), interaction in interactions.items():
+            a, b = self._register_term(first), self._register_term(second)
+            self._pairs.setdefault((a, b), interaction)
+            self._pairs.setdefault((b, a), interaction)
+
+        # Longest names first, so substring matches prefer the most specific name
+        self._by_length = sorted(self._names, key=len, reverse=True)
+        self.resolve = lru_cache(maxsize=4096)(self._resolve)
+
+    def _add_name(self, name: str, canonical: str):
+        self._names.setdefault(normalize_drug_name(name), canonical)
+        self._max_words = max(self._max_words, len(_NAME_TOKEN.findall(name.lower())))
+
+    def _register_term(self, name: str) -> str:
+        key = normalize_drug_name(name)
+        if key not in self._names:
+            self._add_name(name, key)
+        return self._names[key]
+
+    def _partial_match(self, joined: str) -> Optional[str]:
+        """Longest known name inside joined, else the shortest one containing it"""
+        for name in self._by_length:
+            if len(name) >= _MIN_PARTIAL_NAME and name in joined:
+                return self._names[name]
+        if len(joined) >= _MIN_PARTIAL_NAME:
+            for name in reversed(self._by_length):
+                if joined in name:
+                    return self._names[name]
+        return None
+
+    def _resolve(self, medication: str) -> Tuple[str, ...]:
+        """(canonical drug?, class?) terms for a free-text medication name"""
+        words = _NAME_TOKEN.findall(medication.lower())
+        joined = "".join(words)
+        term = self._names.get(joined)
+        if term is None:
+            # Longest run of consecutive words naming a known drug/class ("iv contrast")
+            for size in range(min(self._max_words, len(words)), 0, -1):
+                for start in range(len(words) - size + 1):
+                    term = self._names.get("".join(words[start:start + size]))
+                    if term is not None:
+                        break
+                if term is not None:
+                    break
+        if term is None and joined:
+            term = self._partial_match(joined)
+        if term is None:
+            return ()
+        if term in self._is_class:
+            return (term,)
+        drug_class = self._class_of.get(term)
+        return (term, drug_class) if drug_class else (term,)
+
+    def get_drug_class(self, medication: str) -> Optional[str]:
+        terms = self.resolve(medication)
+        if not terms:
+            return None
+        return terms[-1] if terms[-1] in self._is_class else None
+
+    def interaction_between(self, terms1: Tuple[str, ...], terms2: Tuple[str, ...]) -> Optional[dict]:
+        for a in terms1:
+            for b in terms2:
+                interaction = self._pairs.get((a, b))
+                if interaction is not None:
+                    return interaction
+        return None
+
+    def check_interaction(self, drug1: str, drug2: str) -> Optional[dict]:
+        """Check for interaction between two drugs"""
+        interaction = self.interaction_between(self.resolve(drug1), self.resolve(drug2))
+        return {"drugs": (drug1, drug2), **interaction} if interaction else None
+
+    def check_medication_list(self, medications: List[str]) -> List[dict]:
+        """
+        Every interacting or same-class pair in a medication list, as
+        {"drugs", "kind", ...} with kind "interaction" or "duplicate_therapy".
+        """
+        resolved = [self.resolve(m) for m in medications]
+        findings = []
+        for i in range(len(medications)):
+            terms_i = resolved[i]
+            if not terms_i:
+                continue
+            class_i = terms_i[-1] if terms_i[-1] in self._is_class else None
+            for j in range(i + 1, len(medications)):
+                terms_j = resolved[j]
+                if not terms_j:
+                    continue
+                interaction = self.interaction_between(terms_i, terms_j)
+                if interaction:
+                    findings.append({"drugs": (medications[i], medications[j]), "kind": "interaction", **interaction})
+                if class_i and terms_j[-1] == class_i and terms_i[0] != terms_j[0]:
+                    findings.append({"drugs": (medications[i], medications[j]), "kind": "duplicate_therapy",
+                                     "drug_class": class_i})
+        return findings
+
+
+CDS_KNOWLEDGE_BASE = CDSKnowledgeBase(DRUG_INTERACTIONS, DRUG_CLASSES)
+
+
 def setup_routes(db, get_current_user):
     """Setup CDS routes with database and auth dependency"""
     
-    def normalize_drug_name(name: str) -> str:
-        """Normalize drug name for comparison"""
-        return name.lower().strip().replace("-", "").replace(" ", "")
-    
-    def get_drug_class(drug_name: str) -> Optional[str]:
-        """Get the drug class for a medication"""
-        normalized = normalize_drug_name(drug_name)
-        for drug_class, members in DRUG_CLASSES.items():
-            if any(normalize_drug_name(m) in normalized or normalized in normalize_drug_name(m) for m in members):
-                return drug_class
-        return None
-    
-    def check_interaction(drug1: str, drug2: str) -> Optional[dict]:
-        """Check for interaction between two drugs"""
-        d1_norm = normalize_drug_name(drug1)
-        d2_norm = normalize_drug_name(drug2)
-        
-        # Direct match
-        for (med1, med2), interaction in DRUG_INTERACTIONS.items():
-            if (d1_norm in med1 or med1 in d1_norm) and (d2_norm in med2 or med2 in d2_norm):
-                return {"drugs": (drug1, drug2), **interaction}
-            if (d2_norm in med1 or med1 in d2_norm) and (d1_norm in med2 or med2 in d1_norm):
-                return {"drugs": (drug1, drug2), **interaction}
-        
-        # Class-based check
-        d1_class = get_drug_class(drug1)
-        d2_class = get_drug_class(drug2)
-        
-        for (med1, med2), interaction in DRUG_INTERACTIONS.items():
-            if d1_class and d2_class:
-                if (d1_class == med1 or d1_class in med1) and (d2_class == med2 or d2_class in med2):
-                    return {"drugs": (drug1, drug2), **interaction}
-        
-        return None
+    get_drug_class = CDS_KNOWLEDGE_BASE.get_drug_class
+    check_interaction = CDS_KNOWLEDGE_BASE.check_interaction
     
     # ============ DRUG INTERACTION CHECKING ============
     @router.post("/check-interactions")
@@ -227,6 +341,48 @@ def setup_routes(db, get_current_user):
             "alerts": alerts
         }
     
+    @router.post("/check-medication-list")
+    async def check_medication_list(request: MedicationListCheck):
+        """Check every pair in a medication list for interactions and duplicate therapy"""
+        alerts = []
+
+        for finding in CDS_KNOWLEDGE_BASE.check_medication_list(request.medications):
+            med1, med2 = finding["drugs"]
+            if finding["kind"] == "interaction":
+                alert = ClinicalAlert(
+                    alert_type=AlertType.DRUG_INTERACTION,
+                    severity=finding["severity"],
+                    title=f"Drug Interaction: {med1} + {med2}",
+                    description=finding["description"],
+                    recommendations=finding["recommendations"],
+                    medication_involved=med2,
+                    interacting_medication=med1
+                )
+            else:
+                drug_class = finding["drug_class"]
+                alert = ClinicalAlert(
+                    alert_type=AlertType.DUPLICATE_THERAPY,
+                    severity=AlertSeverity.WARNING,
+                    title=f"Duplicate Therapy: {drug_class.replace('_', ' ').title()}",
+                    description=f"{med1} and {med2} are both {drug_class}. Combined use may result in duplicate therapy.",
+                    recommendations=["Review necessity of both medications", "Consider discontinuing one", "Monitor for additive effects"],
+                    medication_involved=med2,
+                    interacting_medication=med1
+                )
+            alerts.append(alert.model_dump())
+
+        severity_order = {AlertSeverity.CRITICAL: 0, AlertSeverity.WARNING: 1, AlertSeverity.INFO: 2}
+        alerts.sort(key=lambda x: severity_order.get(x["severity"], 3))
+
+        return {
+            "medication_count": len(request.medications),
+            "pairs_checked": len(request.medications) * (len(request.medications) - 1) // 2,
+            "has_alerts": len(alerts) > 0,
+            "alert_count": len(alerts),
+            "critical_count": len([a for a in alerts if a["severity"] == AlertSeverity.CRITICAL]),
+            "alerts": alerts
+        }
+
     # ============ ALLERGY CHECKING ============
     @router.post("/check-allergy")
     async def check_allergy_interaction(request: AllergyCheck):
@@ -0,0 +1,144 @@
+"""
+Chat Read State for Yacco Health
+================================
+Read receipts for staff chat as one watermark per participant instead of a
+read_by array on every message.
+
+Each conversation holds `read_watermarks: {user_id: sent_at of the latest
+message the user has read}` next to the existing `unread_counts`. Opening
+a conversation moves the reader's watermark to the conversation's
+last_message_at and zeroes their unread count in a single update_one, no
+matter how long the history is. Sending a message increments the other
+participants' unread counts and moves the sender's watermark.
+
+A message counts as read by every participant whose watermark is at or
+after its sent_at; read_by() derives that list for API responses.
+migrate() converts existing read_by arrays into watermarks and recounts
+unread messages (see scripts/migrate_chat_read_watermarks.py).
+
+Usage:
+    from chat_read_state import ChatReadState
+
+    read_state = ChatReadState(db)
+    await read_state.record_sent(conversation, message, {"last_message": ..., "last_message_at": ...})
+    watermarks = await read_state.mark_read(conversation, user_id)
+    message["read_by"] = read_by(message, watermarks)
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+def read_by(message: Dict[str, Any], watermarks: Dict[str, str]) -> List[str]:
+    """Sender first, then every participant whose watermark has reached the message"""
+    readers = [message.get("sender_id")] if message.get("sender_id") else []
+    sent_at = message.get("sent_at") or ""
+    for user_id, watermark in (watermarks or {}).items():
+        if watermark and watermark >= sent_at and user_id not in readers:
+            readers.append(user_id)
+    # Receipts stored before the migration ran
+    for user_id in message.get("read_by") or []:
+        if user_id not in readers:
+            readers.append(user_id)
+    return readers
+
+
+class ChatReadState:
+    """Per-participant read watermarks and unread counts on chat_conversations"""
+
+    def __init__(self, db):
+        self.db = db
+        self.conversations = db.chat_conversations
+        self.messages = db.chat_messages
+
+    # ============== Writes ==============
+
+    async def record_sent(self, conversation: Dict[str, Any], message: Dict[str, Any], last_message: Dict[str, Any]):
+        """Store last_message fields, count the message as unread for everyone but the sender"""
+        sender_id = message["sender_id"]
+        update: Dict[str, Any] = {
+            "$set": last_message,
+            "$max": {f"read_watermarks.{sender_id}": message["sent_at"]}
+        }
+        others = {f"unread_counts.{pid}": 1 for pid in conversation.get("participant_ids", []) if pid != sender_id}
+        if others:
+            update["$inc"] = others
+        await self.conversations.update_one({"id": conversation["id"]}, update)
+
+    async def mark_read(self, conversation: Dict[str, Any], user_id: str) -> Dict[str, str]:
+        """Move the user's watermark to the latest message; returns the conversation's watermarks"""
+        update: Dict[str, Any] = {"$set": {f"unread_counts.{user_id}": 0}}
+        if conversation.get("last_message_at"):
+            update["$max"] = {f"read_watermarks.{user_id}": conversation["last_message_at"]}
+        updated = await self.conversations.find_one_and_update(
+            {"id": conversation["id"]}, update,
+            projection={"_id": 0, "read_watermarks": 1}, return_document=ReturnDocument.AFTER
+        )
+        return (updated or {}).get("read_watermarks") or {}
+
+    # ============== Migration ==============
+
+    async def migrate(self, drop_read_by: bool = False, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Turn read_by arrays into watermarks (the latest message each
+        participant read or sent), recount unread messages from them and
+        optionally remove read_by from every message.
+        """
+        pipeline = [
+            {"$project": {
+                "conversation_id": 1,
+                "sent_at": 1,
+                "readers": {"$setUnion": [{"$ifNull": ["$read_by", []]}, [{"$ifNull": ["$sender_id", None]}]]}
+            }},
+            {"$unwind": "$readers"},
+            {"$match": {"readers": {"$ne": None}}},
+            {"$group": {"_id": {"conversation": "$conversation_id", "user": "$readers"}, "watermark": {"$max": "$sent_at"}}}
+        ]
+        operations = []
+        watermarks = 0
+        async for row in self.messages.aggregate(pipeline, allowDiskUse=True):
+            operations.append(UpdateOne(
+                {"id": row["_id"]["conversation"]},
+                {"$max": {f"read_watermarks.{row['_id']['user']}": row["watermark"]}}
+            ))
+            watermarks += 1
+            if len(operations) >= batch_size:
+                await self.conversations.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await self.conversations.bulk_write(operations, ordered=False)
+
+        conversations = await self.recount_unread(batch_size=batch_size)
+        if drop_read_by:
+            await self.messages.update_many({"read_by": {"$exists": True}}, {"$unset": {"read_by": ""}})
+        logger.info(f"Chat read watermarks migrated: {watermarks} watermarks, {conversations} conversations recounted")
+        return {"watermarks": watermarks, "conversations": conversations}
+
+    async def recount_unread(self, conversation_id: Optional[str] = None, batch_size: int = 1000) -> int:
+        """Recompute unread_counts from the watermarks (messages after it, not sent by the reader)"""
+        query = {} if conversation_id is None else {"id": conversation_id}
+        operations = []
+        recounted = 0
+        async for conversation in self.conversations.find(
+            query, {"_id": 0, "id": 1, "participant_ids": 1, "read_watermarks": 1}
+        ):
+            watermarks = conversation.get("read_watermarks") or {}
+            counts = {}
+            for user_id in conversation.get("participant_ids") or []:
+                counts[user_id] = await self.messages.count_documents({
+                    "conversation_id": conversation["id"],
+                    "sent_at": {"$gt": watermarks.get(user_id) or ""},
+                    "sender_id": {"$ne": user_id}
+                })
+            operations.append(UpdateOne({"id": conversation["id"]}, {"$set": {"unread_counts": counts}}))
+            recounted += 1
+            if len(operations) >= batch_size:
+                await self.conversations.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await self.conversations.bulk_write(operations, ordered=False)
+        return recounted
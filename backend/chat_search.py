@@ -0,0 +1,199 @@
+"""
+Staff Chat Search for Yacco Health
+==================================
+Token index over chat message text, kept in `chat_search_tokens`: one
+entry per distinct word of a message (token, conversation_id, message_id,
+sent_at), written when the message is sent.
+
+A search looks up the user's conversation ids (indexed on
+participant_ids), then matches each query word as a token prefix within
+those conversations, newest first, one query per word run concurrently, so
+the cost follows the number of matching words rather than the size of the
+chat history. Each word contributes at most its MAX_CANDIDATES most recent
+matches. Messages are ranked by how many query words they contain, then by
+recency, and come back with a highlighted snippet.
+
+Very common words (STOPWORDS) are not indexed. rebuild() indexes messages
+written before the token index existed (see
+scripts/build_chat_search_index.py).
+
+Usage:
+    from chat_search import ChatSearchIndex
+
+    search = ChatSearchIndex(db)
+    await search.index(message)
+    results = await search.search(user_id, "potassium result", limit=20)
+    results[0]["snippet"], results[0]["highlights"]   # "...", [[start, end], ...]
+"""
+
+import asyncio
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import DeleteMany, InsertOne
+
+from db_indexes import register_indexes, IndexSpec
+
+logger = logging.getLogger(__name__)
+
+TOKENS_COLLECTION = "chat_search_tokens"
+MIN_TOKEN_LENGTH = 2
+MAX_TOKENS_PER_MESSAGE = 200
+MAX_QUERY_TERMS = 8
+# Most recent token entries considered per query word; bounds the work for very broad words
+MAX_CANDIDATES = 5000
+SNIPPET_CHARS = 160
+
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from has have he her his i if in is it its
+    me my no not of on or our she so that the their them then there they this to
+    up us was we were what when which who will with you your
+""".split())
+
+register_indexes(
+    TOKENS_COLLECTION,
+    IndexSpec([("token", 1), ("conversation_id", 1), ("sent_at", -1)]),
+    IndexSpec([("token", 1), ("sent_at", -1)]),
+    IndexSpec([("message_id", 1)]),
+)
+register_indexes("chat_messages", IndexSpec([("id", 1)]))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Distinct lowercased words worth indexing, in order of first appearance"""
+    tokens = dict.fromkeys(
+        word for word in _WORD.findall((text or "").lower())
+        if len(word) >= MIN_TOKEN_LENGTH and word not in STOPWORDS
+    )
+    return list(tokens)[:MAX_TOKENS_PER_MESSAGE]
+
+
+def highlight(text: str, terms: Iterable[str], width: int = SNIPPET_CHARS) -> Dict[str, Any]:
+    """
+    Snippet of text around the first matching word, with [start, end]
+    offsets (into the snippet) of every word that starts with a term.
+    """
+    terms = tuple(terms)
+    spans = [
+        (m.start(), m.end()) for m in _WORD.finditer(text)
+        if m.group().lower().startswith(terms)
+    ] if terms else []
+    start = 0
+    if spans and len(text) > width:
+        start = max(0, min(spans[0][0] - width // 4, len(text) - width))
+    end = min(len(text), start + width)
+    prefix = "…" if start > 0 else ""
+    snippet = prefix + text[start:end] + ("…" if end < len(text) else "")
+    offset = len(prefix) - start
+    highlights = [[s + offset, e + offset] for s, e in spans if s >= start and e <= end]
+    return {"snippet": snippet, "highlights": highlights}
+
+
+class ChatSearchIndex:
+    """Maintains and queries the chat message token index"""
+
+    def __init__(self, db):
+        self.db = db
+        self.tokens = db[TOKENS_COLLECTION]
+
+    # ============== Indexing ==============
+
+    @staticmethod
+    def _entries(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "token": token,
+                "conversation_id": message["conversation_id"],
+                "message_id": message["id"],
+                "sent_at": message.get("sent_at")
+            }
+            for token in tokenize(message.get("content"))
+        ]
+
+    async def index(self, message: Dict[str, Any]):
+        """Add one message's words to the index"""
+        entries = self._entries(message)
+        if entries:
+            await self.tokens.insert_many(entries, ordered=False)
+
+    async def rebuild(self, conversation_id: Optional[str] = None, batch_size: int = 1000) -> Dict[str, int]:
+        """Re-index every message (or one conversation's) from chat_messages"""
+        query = {} if conversation_id is None else {"conversation_id": conversation_id}
+        messages = entries = 0
+        operations = [DeleteMany(query)]
+        cursor = self.db.chat_messages.find(
+            query, {"_id": 0, "id": 1, "conversation_id": 1, "content": 1, "sent_at": 1}
+        ).batch_size(batch_size)
+        async for message in cursor:
+            messages += 1
+            for entry in self._entries(message):
+                operations.append(InsertOne(entry))
+                entries += 1
+            if len(operations) >= batch_size:
+                await self.tokens.bulk_write(operations, ordered=True)
+                operations = []
+        if operations:
+            await self.tokens.bulk_write(operations, ordered=True)
+        logger.info(f"Chat search index rebuilt: {messages} messages, {entries} tokens")
+        return {"messages": messages, "tokens": entries}
+
+    # ============== Search ==============
+
+    async def conversation_ids(self, user_id: str) -> List[str]:
+        cursor = self.db.chat_conversations.find({"participant_ids": user_id}, {"_id": 0, "id": 1})
+        return [conversation["id"] async for conversation in cursor]
+
+    async def _recent_matches(self, term: str, conversation_ids: List[str]) -> List[Dict[str, Any]]:
+        """The MAX_CANDIDATES newest token entries starting with term"""
+        cursor = self.tokens.find(
+            {"token": {"$gte": term, "$lt": term + "\uffff"}, "conversation_id": {"$in": conversation_ids}},
+            {"_id": 0, "message_id": 1, "sent_at": 1}
+        ).sort("sent_at", -1).limit(MAX_CANDIDATES)
+        return await cursor.to_list(MAX_CANDIDATES)
+
+    async def search(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 20,
+        conversation_ids: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Messages from the user's conversations containing words that start
+        with the query's words, best matches first. Each result is the
+        message plus score (query words matched), snippet and highlights.
+        """
+        terms = tokenize(query)[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        if conversation_ids is None:
+            conversation_ids = await self.conversation_ids(user_id)
+        if not conversation_ids:
+            return []
+
+        matches = await asyncio.gather(*(self._recent_matches(term, conversation_ids) for term in terms))
+        found: Dict[str, Dict[str, Any]] = {}
+        for term, entries in zip(terms, matches):
+            for entry in entries:
+                row = found.setdefault(entry["message_id"], {"_id": entry["message_id"], "sent_at": entry.get("sent_at"), "terms": set()})
+                row["terms"].add(term)
+        ranked = sorted(found.values(), key=lambda row: str(row["sent_at"] or ""), reverse=True)
+        ranked.sort(key=lambda row: len(row["terms"]), reverse=True)
+        ranked = [{"_id": row["_id"], "score": len(row["terms"])} for row in ranked[:limit]]
+        if not ranked:
+            return []
+
+        messages = {
+            message["id"]: message
+            async for message in self.db.chat_messages.find({"id": {"$in": [row["_id"] for row in ranked]}}, {"_id": 0})
+        }
+        results = []
+        for row in ranked:
+            message = messages.get(row["_id"])
+            if message is None:
+                continue
+            results.append({**message, "score": row["score"], **highlight(message.get("content") or "", terms)})
+        return results
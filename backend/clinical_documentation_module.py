@@ -15,6 +15,8 @@ from datetime import datetime, timezone, timedelta
 from enum import Enum
 import uuid
 
+from audit_pipeline import audit_pipeline
+
 clinical_docs_router = APIRouter(prefix="/api/clinical-docs", tags=["Clinical Documentation"])
 
 
@@ -250,7 +252,7 @@ def create_clinical_documentation_endpoints(db, get_current_user):
         )
         
         log_dict = log_entry.model_dump(mode='json')
-        await db.chart_audit_logs.insert_one(log_dict)
+        await audit_pipeline.emit(db.chart_audit_logs, log_dict)
         
         # Remove MongoDB _id if present
         log_dict.pop('_id', None)
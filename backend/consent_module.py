@@ -28,8 +28,18 @@ import hashlib
 import base64
 import os
 
+from db_indexes import register_indexes, IndexSpec
+from audit_pipeline import audit_pipeline
+
 consent_router = APIRouter(prefix="/api/consents", tags=["Consent Forms"])
 
+register_indexes(
+    "consent_forms",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("patient_id", 1), ("created_at", -1)]),
+    IndexSpec([("organization_id", 1), ("created_at", -1)]),
+)
+
 
 # ============ Enums ============
 
@@ -288,7 +298,7 @@ def create_consent_endpoints(db, get_current_user):
                 **(metadata or {})
             }
         }
-        await db.audit_logs.insert_one(audit_entry)
+        await audit_pipeline.emit(db.audit_logs, audit_entry)
         return audit_entry
     
     # ============ CONSENT USAGE TRACKING ============
@@ -554,7 +564,7 @@ def create_consent_endpoints(db, get_current_user):
         
         # Log audit event
         patient = await db.patients.find_one({"id": consent["patient_id"]})
-        await db.audit_logs.insert_one({
+        await audit_pipeline.emit(db.audit_logs, {
             "id": str(uuid.uuid4()),
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "user_id": current_user.get("id"),
@@ -602,7 +612,7 @@ def create_consent_endpoints(db, get_current_user):
         
         # Log audit event
         patient = await db.patients.find_one({"id": consent["patient_id"]})
-        await db.audit_logs.insert_one({
+        await audit_pipeline.emit(db.audit_logs, {
             "id": str(uuid.uuid4()),
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "user_id": current_user.get("id"),
@@ -0,0 +1,217 @@
+"""
+MongoDB Index Registry for Yacco Health EMR
+============================================
+Declarative index definitions for the collections the routers query.
+Each module registers the indexes its hot queries need at import time;
+server.py reconciles the registry against MongoDB on startup.
+
+Usage:
+    from db_indexes import register_indexes, register_query_probe, IndexSpec
+
+    register_indexes(
+        "pharmacy_drugs",
+        IndexSpec([("id", 1)], unique=True),
+        IndexSpec([("pharmacy_id", 1), ("is_active", 1)]),
+    )
+    register_query_probe("pharmacy_drugs", {"id": "x", "pharmacy_id": "y"})
+
+    # On startup (idempotent - existing indexes are left untouched)
+    await ensure_indexes(db)
+
+    # Maintenance report (see scripts/index_report.py)
+    report = await report_indexes(db)
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec:
+    """A single index definition: ordered key list plus pymongo index options."""
+
+    def __init__(self, keys: List[Tuple[str, Any]], name: Optional[str] = None, **options):
+        self.keys = [(field, direction) for field, direction in keys]
+        self.name = name or "_".join(f"{field}_{direction}" for field, direction in self.keys)
+        self.options = options
+
+    def to_index_model(self) -> IndexModel:
+        return IndexModel(self.keys, name=self.name, **self.options)
+
+    def matches(self, index_info: Dict[str, Any]) -> bool:
+        """True if an existing index (index_information() or $indexStats entry) has the same key pattern"""
+        key = index_info.get("key", [])
+        if isinstance(key, dict):
+            key = key.items()
+        return [(field, int(direction)) if isinstance(direction, (int, float)) else (field, direction)
+                for field, direction in key] == self.keys
+
+    def __repr__(self) -> str:
+        return f"IndexSpec({self.name})"
+
+
+class QueryProbe:
+    """Representative query shape used to check plans with explain()"""
+
+    def __init__(self, filter: Dict[str, Any], sort: Optional[List[Tuple[str, int]]] = None):
+        self.filter = filter
+        self.sort = sort
+
+
+# collection name -> index name -> spec
+INDEX_REGISTRY: Dict[str, Dict[str, IndexSpec]] = {}
+
+# collection name -> query probes
+QUERY_PROBES: Dict[str, List[QueryProbe]] = {}
+
+
+def register_indexes(collection: str, *specs: IndexSpec):
+    """Declare indexes required by a module. Re-registering the same name is a no-op."""
+    registered = INDEX_REGISTRY.setdefault(collection, {})
+    for spec in specs:
+        existing = registered.get(spec.name)
+        if existing and existing.keys != spec.keys:
+            raise ValueError(f"Conflicting index '{spec.name}' registered for {collection}")
+        registered[spec.name] = spec
+
+
+def register_query_probe(collection: str, filter: Dict[str, Any], sort: Optional[List[Tuple[str, int]]] = None):
+    """Declare a hot query shape so the index report can explain() it"""
+    QUERY_PROBES.setdefault(collection, []).append(QueryProbe(filter, sort))
+
+
+# ============== Reconciliation ==============
+
+async def ensure_indexes(db) -> Dict[str, Any]:
+    """
+    Create any registered index that does not exist yet.
+    Never drops indexes; conflicts are logged and reported, not fatal.
+    """
+    summary = {"created": [], "existing": 0, "conflicts": []}
+
+    for collection, specs in INDEX_REGISTRY.items():
+        try:
+            existing = await db[collection].index_information()
+        except OperationFailure as e:
+            logger.error(f"Could not read indexes for {collection}: {e}")
+            continue
+
+        missing = []
+        for spec in specs.values():
+            current = existing.get(spec.name)
+            if current is None:
+                # Same key pattern under a different name counts as present
+                if any(spec.matches(info) for info in existing.values()):
+                    summary["existing"] += 1
+                else:
+                    missing.append(spec)
+            elif spec.matches(current):
+                summary["existing"] += 1
+            else:
+                summary["conflicts"].append(f"{collection}.{spec.name}")
+                logger.warning(f"Index {collection}.{spec.name} exists with a different key pattern")
+
+        if not missing:
+            continue
+
+        for spec in missing:
+            try:
+                await db[collection].create_indexes([spec.to_index_model()])
+                summary["created"].append(f"{collection}.{spec.name}")
+            except OperationFailure as e:
+                summary["conflicts"].append(f"{collection}.{spec.name}")
+                logger.error(f"Failed to create index {collection}.{spec.name}: {e}")
+
+    logger.info(
+        f"Index provisioning: {len(summary['created'])} created, "
+        f"{summary['existing']} already present, {len(summary['conflicts'])} conflicts"
+    )
+    return summary
+
+
+# ============== Reporting ==============
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of an explain() winning plan"""
+    stages = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "inputStage" in node:
+            stack.append(node["inputStage"])
+        stack.extend(node.get("inputStages", []))
+        if "queryPlan" in node:
+            stack.append(node["queryPlan"])
+    return stages
+
+
+async def report_indexes(db, include_unregistered_collections: bool = False) -> Dict[str, Any]:
+    """
+    Compare registered indexes with what MongoDB has and how it is used.
+
+    - missing: registered but not present
+    - unused: present but $indexStats shows zero accesses since server start
+    - unregistered: present on a registered collection but not declared by any module
+    - collscans: registered query probes whose winning plan is a COLLSCAN
+    """
+    report = {"missing": [], "unused": [], "unregistered": [], "collscans": []}
+
+    collections = list(INDEX_REGISTRY.keys())
+    if include_unregistered_collections:
+        for name in await db.list_collection_names():
+            if name not in INDEX_REGISTRY and not name.startswith("system."):
+                collections.append(name)
+
+    for collection in collections:
+        specs = INDEX_REGISTRY.get(collection, {})
+        try:
+            stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+        except OperationFailure as e:
+            logger.error(f"$indexStats failed for {collection}: {e}")
+            continue
+
+        present = {s["name"]: s for s in stats}
+        for spec in specs.values():
+            if spec.name not in present and not any(spec.matches(s) for s in stats):
+                report["missing"].append({"collection": collection, "index": spec.name, "keys": spec.keys})
+
+        for name, stat in present.items():
+            if name == "_id_":
+                continue
+            ops = stat.get("accesses", {}).get("ops", 0)
+            if ops == 0:
+                report["unused"].append({
+                    "collection": collection,
+                    "index": name,
+                    "since": str(stat.get("accesses", {}).get("since"))
+                })
+            if name not in specs and not any(spec.matches(stat) for spec in specs.values()):
+                report["unregistered"].append({"collection": collection, "index": name})
+
+        for probe in QUERY_PROBES.get(collection, []):
+            cursor = db[collection].find(probe.filter)
+            if probe.sort:
+                cursor = cursor.sort(probe.sort)
+            try:
+                plan = await cursor.explain()
+            except OperationFailure as e:
+                logger.error(f"explain() failed for {collection} {probe.filter}: {e}")
+                continue
+            stages = _plan_stages(plan.get("queryPlanner", {}).get("winningPlan", {}))
+            if "COLLSCAN" in stages:
+                report["collscans"].append({
+                    "collection": collection,
+                    "filter": list(probe.filter.keys()),
+                    "sort": probe.sort,
+                    "stages": stages
+                })
+
+    return report
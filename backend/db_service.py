@@ -25,6 +25,8 @@ from database import (
     departments as pg_departments,
     to_dict, to_dict_list
 )
+from audit_pipeline import audit_pipeline
+from principal_cache import principal_cache
 
 logger = logging.getLogger(__name__)
 
@@ -214,6 +216,7 @@ class DatabaseService:
             result = await self.mongo_db["users"].update_one(
                 {"id": user_id}, {"$set": data}
             )
+            principal_cache.invalidate_user(user_id)
             return result.modified_count > 0
     
     async def user_exists(self, email: str) -> bool:
@@ -341,7 +344,7 @@ class DatabaseService:
             await pg_audit_logs.create(data)
         else:
             data['timestamp'] = data['timestamp'].isoformat()
-            await self.mongo_db["audit_logs"].insert_one(data)
+            await audit_pipeline.emit(self.mongo_db["audit_logs"], data)
     
     # ============ Generic Operations ============
     
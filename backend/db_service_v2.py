@@ -26,6 +26,8 @@ from datetime import datetime, timezone
 import uuid
 import logging
 
+from audit_pipeline import audit_pipeline
+
 logger = logging.getLogger(__name__)
 
 # Configuration
@@ -326,7 +328,7 @@ class DatabaseServiceV2:
         if details:
             log_entry['details'] = details
         
-        await self.insert("audit_logs", log_entry, generate_id=False)
+        await audit_pipeline.emit(self.mongo_db["audit_logs"], log_entry)
     
     # ==================== Direct MongoDB Access ====================
     
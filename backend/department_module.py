@@ -10,6 +10,8 @@ from datetime import datetime, timezone
 from enum import Enum
 import uuid
 
+from principal_cache import principal_cache
+
 department_router = APIRouter(prefix="/api/departments", tags=["Departments"])
 
 
@@ -472,6 +474,7 @@ def create_department_endpoints(db, get_current_user):
                 "updated_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        principal_cache.invalidate_user(user_id)
         
         return {"message": f"User assigned to {department['name']} department"}
     
@@ -0,0 +1,192 @@
+"""
+DICOM File Streaming for Yacco Health
+=====================================
+Binary transfer of DICOM instances without holding them in memory:
+
+- save_upload() copies an upload to disk CHUNK_SIZE bytes at a time
+  (hashing as it goes) and moves it into place when complete.
+- file_response() serves one instance with ETag, If-None-Match (304) and
+  single-range HTTP Range / If-Range support (206). Full downloads go
+  through FileResponse, which uses the server's sendfile path when it has
+  one.
+- multipart_response() streams a series as multipart/related
+  (type="application/dicom"), the WADO-RS instance retrieval format, one
+  file after another with a precomputed Content-Length.
+
+Memory per request is one chunk, whatever the size of the study.
+
+Usage:
+    from dicom_storage import save_upload, file_response, multipart_response
+
+    size, sha256 = await save_upload(upload, file_path)
+    return file_response(request, image["file_path"], content_hash=image.get("sha256"), filename=image["filename"])
+    return multipart_response([(image["file_path"], f"/api/imaging/images/{image['id']}/file") for image in images])
+"""
+
+import hashlib
+import logging
+import os
+import uuid
+from typing import AsyncIterator, List, Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+DICOM_MEDIA_TYPE = "application/dicom"
+
+
+# ============== Upload ==============
+
+async def save_upload(upload: UploadFile, path: str) -> Tuple[int, str]:
+    """Write the upload to path in chunks; returns (size in bytes, sha256 hex)"""
+    partial = f"{path}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(partial, 'wb') as f:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                await f.write(chunk)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return size, digest.hexdigest()
+
+
+# ============== Single instance ==============
+
+def _etag(stat_result: os.stat_result, content_hash: Optional[str]) -> str:
+    if content_hash:
+        return f'"{content_hash[:32]}"'
+    # Same validator FileResponse derives for files stored before hashes were recorded
+    base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return f'"{hashlib.md5(base.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte offsets of a single "bytes=" range, or None to send
+    the whole file (no header, several ranges, other units). Raises 416 when
+    the range lies outside the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+async def _read_range(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    remaining = end - start + 1
+    async with aiofiles.open(path, 'rb') as f:
+        await f.seek(start)
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(
+    request: Request,
+    path: str,
+    content_hash: Optional[str] = None,
+    filename: Optional[str] = None,
+    media_type: str = DICOM_MEDIA_TYPE
+) -> Response:
+    """Serve path with conditional and range request handling (ETag from content_hash when stored)"""
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image file not found")
+    size = stat_result.st_size
+    tag = _etag(stat_result, content_hash)
+    headers = {"ETag": tag, "Accept-Ranges": "bytes", "Cache-Control": "private, max-age=86400"}
+
+    if _etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == tag:
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        return FileResponse(
+            path, headers=headers, media_type=media_type, filename=filename,
+            stat_result=stat_result, content_disposition_type="inline"
+        )
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(_read_range(path, start, end), status_code=206, headers=headers, media_type=media_type)
+
+
+# ============== Series (multipart/related) ==============
+
+def _part_header(boundary: str, media_type: str, location: str) -> bytes:
+    return (
+        f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Location: {location}\r\n\r\n"
+    ).encode()
+
+
+def multipart_response(
+    paths: List[Tuple[str, str]],
+    media_type: str = DICOM_MEDIA_TYPE
+) -> StreamingResponse:
+    """
+    Stream (path, content location) pairs as one multipart/related body.
+    Missing files are skipped (and logged); 404 when none exist.
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for path, location in paths:
+        try:
+            parts.append((path, os.stat(path).st_size, _part_header(boundary, media_type, location)))
+        except FileNotFoundError:
+            logger.warning(f"DICOM instance file missing: {path}")
+    if not parts:
+        raise HTTPException(status_code=404, detail="No image files found")
+    closing = f"--{boundary}--\r\n".encode()
+    length = sum(len(header) + size + 2 for _, size, header in parts) + len(closing)
+
+    async def body():
+        for path, size, header in parts:
+            yield header
+            async for chunk in _read_range(path, 0, size - 1):
+                yield chunk
+            yield b"\r\n"
+        yield closing
+
+    return StreamingResponse(
+        body(),
+        media_type=f'multipart/related; type="{media_type}"; boundary={boundary}',
+        headers={"Content-Length": str(length)}
+    )
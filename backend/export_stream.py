@@ -0,0 +1,193 @@
+"""
+Streaming Exports for Yacco Health
+==================================
+Encodes rows from a MongoDB cursor (or any async iterator) as CSV, NDJSON
+or a JSON document chunk by chunk, optionally gzip-compressed, and streams
+them to the client.
+
+Rows are read from the cursor in batches of EXPORT_BATCH_SIZE and encoded
+EXPORT_CHUNK_ROWS at a time, so memory stays flat whatever the export
+size. Starlette awaits each chunk's send before asking for the next, so a
+slow client slows the cursor down instead of buffering the export on the
+server (back-pressure).
+
+Usage:
+    from export_stream import export_cursor, export_response
+
+    rows = export_cursor(db.audit_logs, query, {"_id": 0}, sort=[("timestamp", -1)])
+    return export_response(
+        rows, "csv", "audit_logs_20240501", fieldnames=AUDIT_EXPORT_FIELDS,
+        compress=True, on_complete=record_export
+    )
+"""
+
+import csv
+import io
+import json
+import logging
+import zlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_ROWS = 500
+EXPORT_FORMATS = ("csv", "json", "ndjson")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_cursor(
+    collection,
+    query: Dict[str, Any],
+    projection: Optional[Dict[str, Any]] = None,
+    sort: Optional[List[Tuple[str, int]]] = None,
+    limit: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Server-side cursor fetching EXPORT_BATCH_SIZE rows per round trip"""
+    cursor = collection.find(query, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor.batch_size(EXPORT_BATCH_SIZE)
+
+
+# ============== Encoders ==============
+
+async def csv_chunks(
+    rows: AsyncIterator[Dict[str, Any]],
+    fieldnames: List[str],
+    counter: Optional[List[int]] = None
+) -> AsyncIterator[str]:
+    """Header line, then EXPORT_CHUNK_ROWS rows per chunk; columns beyond fieldnames are dropped"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    pending = 0
+    async for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if counter is not None:
+            counter[0] += 1
+        if pending >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+async def ndjson_chunks(
+    rows: AsyncIterator[Dict[str, Any]],
+    counter: Optional[List[int]] = None
+) -> AsyncIterator[str]:
+    chunk = []
+    async for row in rows:
+        chunk.append(json.dumps(row, default=str))
+        if counter is not None:
+            counter[0] += 1
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+async def json_chunks(
+    rows: AsyncIterator[Dict[str, Any]],
+    envelope: Dict[str, Any],
+    rows_key: str,
+    counter: Optional[List[int]] = None
+) -> AsyncIterator[str]:
+    """
+    One JSON object: the envelope fields, rows_key holding every row, then
+    record_count (written last, once the rows have been counted).
+    """
+    head = json.dumps(envelope, default=str)[:-1]
+    yield f"{head}{', ' if envelope else ''}{json.dumps(rows_key)}: ["
+    count = 0
+    chunk = []
+    async for row in rows:
+        chunk.append(json.dumps(row, default=str))
+        count += 1
+        if counter is not None:
+            counter[0] += 1
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield ("" if count == len(chunk) else ", ") + ", ".join(chunk)
+            chunk = []
+    if chunk:
+        yield ("" if count == len(chunk) else ", ") + ", ".join(chunk)
+    yield f'], "record_count": {count}}}'
+
+
+async def gzip_chunks(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """gzip stream of the encoded chunks (one gzip member for the whole export)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ============== Response ==============
+
+def export_response(
+    rows: AsyncIterator[Dict[str, Any]],
+    format: str,
+    filename: str,
+    fieldnames: Optional[List[str]] = None,
+    compress: bool = False,
+    envelope: Optional[Dict[str, Any]] = None,
+    rows_key: str = "rows",
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    on_complete: Optional[Callable[[int], Awaitable[Any]]] = None
+) -> StreamingResponse:
+    """
+    Stream rows as an attachment named filename + extension. csv needs
+    fieldnames; json wraps the rows in envelope under rows_key. on_complete
+    is awaited with the number of rows sent when the stream ends, including
+    when the client disconnects part way through.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {format}")
+    if format == "csv" and not fieldnames:
+        raise ValueError("CSV exports need fieldnames")
+
+    async def transformed():
+        async for row in rows:
+            yield transform(row)
+
+    source = transformed() if transform else rows
+    counter = [0]
+    if format == "csv":
+        chunks = csv_chunks(source, fieldnames, counter)
+    elif format == "ndjson":
+        chunks = ndjson_chunks(source, counter)
+    else:
+        chunks = json_chunks(source, envelope or {}, rows_key, counter)
+
+    async def body():
+        try:
+            async for chunk in (gzip_chunks(chunks) if compress else chunks):
+                yield chunk
+        finally:
+            if on_complete:
+                try:
+                    await on_complete(counter[0])
+                except Exception as e:
+                    logger.error(f"Export completion hook failed for {filename}: {e}")
+
+    name = f"{filename}.{format}" + (".gz" if compress else "")
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if compress else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={name}"}
+    )
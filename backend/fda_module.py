@@ -1,11 +1,15 @@
 """
 Ghana Food and Drugs Authority (FDA) Integration Module
 Provides drug verification, registration lookup, and regulatory compliance
+
+Lookups go through FDA_REGISTRY, built once at import: JSON-ready rows,
+hash indexes on registration number and barcode, and bitmap filter sets
+per category, schedule, status and manufacturer.
 """
 
 import uuid
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Any, Dict, Iterator, Optional, List
 from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from enum import Enum
@@ -684,6 +688,256 @@ FDA_REGISTERED_DRUGS = [
 ]
 
 
+# ============== Barcode / GTIN Products ==============
+# Mock GS1 lookup data. In production, connect to the real FDA or GS1 database.
+
+FDA_BARCODE_PRODUCTS = {
+    "5000456123456": {
+        "found": True,
+        "drug": {
+            "name": "Paracetamol 500mg Tablets",
+            "generic_name": "Acetaminophen",
+            "registration_number": "FDA/DRD-2023-0001",
+            "manufacturer": "Ernest Chemist Ltd",
+            "category": "Analgesics & NSAIDs",
+            "dosage_form": "Tablet",
+            "strength": "500mg",
+            "pack_size": "100 tablets",
+            "schedule": "OTC"
+        }
+    },
+    "5000789456123": {
+        "found": True,
+        "drug": {
+            "name": "Amoxicillin 500mg Capsules",
+            "generic_name": "Amoxicillin Trihydrate",
+            "registration_number": "FDA/DRD-2023-0025",
+            "manufacturer": "Kinapharma Ltd",
+            "category": "Antibiotics",
+            "dosage_form": "Capsule",
+            "strength": "500mg",
+            "pack_size": "21 capsules",
+            "schedule": "POM"
+        }
+    },
+    "5001234567890": {
+        "found": True,
+        "drug": {
+            "name": "Artemether-Lumefantrine Tablets",
+            "generic_name": "Artemether/Lumefantrine",
+            "registration_number": "FDA/DRD-2022-0156",
+            "manufacturer": "mPharma Ghana",
+            "category": "Antimalarials",
+            "dosage_form": "Tablet",
+            "strength": "20mg/120mg",
+            "pack_size": "24 tablets",
+            "schedule": "POM"
+        }
+    },
+    "5009876543210": {
+        "found": True,
+        "drug": {
+            "name": "Metformin 500mg Tablets",
+            "generic_name": "Metformin Hydrochloride",
+            "registration_number": "FDA/DRD-2021-0089",
+            "manufacturer": "Tobinco Pharmaceuticals",
+            "category": "Antidiabetics",
+            "dosage_form": "Tablet",
+            "strength": "500mg",
+            "pack_size": "100 tablets",
+            "schedule": "POM"
+        }
+    },
+    "5005551234567": {
+        "found": True,
+        "drug": {
+            "name": "Omeprazole 20mg Capsules",
+            "generic_name": "Omeprazole",
+            "registration_number": "FDA/DRD-2022-0045",
+            "manufacturer": "Atlantic Lifesciences",
+            "category": "Antacids & PPIs",
+            "dosage_form": "Capsule",
+            "strength": "20mg",
+            "pack_size": "28 capsules",
+            "schedule": "POM"
+        }
+    }
+}
+
+
+# ============== Registry ==============
+
+def _serialize(drug: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-ready copy of a registry entry with enum members replaced by their values"""
+    return {k: v.value if isinstance(v, Enum) else v for k, v in drug.items()}
+
+
+def _iter_bits(mask: int) -> Iterator[int]:
+    """Positions of the set bits in mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class FDARegistry:
+    """
+    Read-only query engine over the FDA drug list.
+
+    Rows are serialized once; filters are int bitmaps (bit i = row i) so
+    combining category/schedule/status/manufacturer filters is a bitwise AND
+    and pagination walks set bits in registry order.
+    """
+
+    def __init__(self, drugs: List[Dict[str, Any]], barcodes: Dict[str, Dict[str, Any]]):
+        self.rows: List[Dict[str, Any]] = [_serialize(d) for d in drugs]
+        self.all_mask = (1 << len(self.rows)) - 1
+
+        self._by_registration: Dict[str, int] = {}
+        self._search_text: List[tuple] = []
+        self._trade_names: List[str] = []
+        self._category_masks: Dict[str, int] = {}
+        self._schedule_masks: Dict[str, int] = {}
+        self._status_masks: Dict[str, int] = {}
+        self._manufacturer_masks: Dict[str, int] = {}
+
+        for i, row in enumerate(self.rows):
+            bit = 1 << i
+            self._by_registration.setdefault(row["registration_number"], i)
+            self._trade_names.append(row["trade_name"].lower())
+            self._search_text.append(
+                (row["trade_name"].lower(), row["generic_name"].lower())
+                + tuple(ing.lower() for ing in row["active_ingredients"])
+            )
+            for masks, key in (
+                (self._category_masks, row["category"]),
+                (self._schedule_masks, row["schedule"]),
+                (self._status_masks, row["status"]),
+                (self._manufacturer_masks, row["manufacturer"].lower()),
+            ):
+                masks[key] = masks.get(key, 0) | bit
+
+        self._barcodes = barcodes
+        # Partial matches compare the last 8 digits; keep the first product per suffix
+        self._barcode_suffixes: Dict[str, Dict[str, Any]] = {}
+        for code, product in barcodes.items():
+            for n in range(1, 9):
+                self._barcode_suffixes.setdefault(code[-n:], product)
+
+        self.stats = self._build_stats()
+        self.manufacturers = self._build_manufacturers()
+
+    # ============== Lookups ==============
+
+    def get(self, registration_number: str) -> Optional[Dict[str, Any]]:
+        i = self._by_registration.get(registration_number)
+        return self.rows[i] if i is not None else None
+
+    def find_by_trade_name(self, trade_name: str) -> Optional[Dict[str, Any]]:
+        """First row whose trade name contains trade_name (case-insensitive)"""
+        needle = trade_name.lower()
+        for i, name in enumerate(self._trade_names):
+            if needle in name:
+                return self.rows[i]
+        return None
+
+    def lookup_barcode(self, barcode: str) -> Optional[Dict[str, Any]]:
+        """Exact barcode/GTIN match, then a match on the last 8 digits"""
+        product = self._barcodes.get(barcode)
+        if product is None:
+            product = self._barcode_suffixes.get(barcode[-8:])
+        return product
+
+    # ============== Filtering ==============
+
+    def text_mask(self, query: str) -> int:
+        """Rows whose trade name, generic name or an active ingredient contains query"""
+        needle = query.lower()
+        mask = 0
+        for i, texts in enumerate(self._search_text):
+            if any(needle in t for t in texts):
+                mask |= 1 << i
+        return mask
+
+    def manufacturer_mask(self, manufacturer: str) -> int:
+        """Rows whose manufacturer contains manufacturer (case-insensitive)"""
+        needle = manufacturer.lower()
+        mask = 0
+        for name, bits in self._manufacturer_masks.items():
+            if needle in name:
+                mask |= bits
+        return mask
+
+    def filter_mask(
+        self,
+        query: Optional[str] = None,
+        category: Optional[str] = None,
+        schedule: Optional[str] = None,
+        status: Optional[str] = None,
+        manufacturer: Optional[str] = None,
+    ) -> int:
+        mask = self.all_mask
+        if category:
+            mask &= self._category_masks.get(category, 0)
+        if schedule:
+            mask &= self._schedule_masks.get(schedule, 0)
+        if status:
+            mask &= self._status_masks.get(status, 0)
+        if manufacturer and mask:
+            mask &= self.manufacturer_mask(manufacturer)
+        if query and mask:
+            mask &= self.text_mask(query)
+        return mask
+
+    def page(self, mask: int, offset: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """Rows for the set bits of mask, skipping offset and returning at most limit"""
+        result = []
+        for n, i in enumerate(_iter_bits(mask)):
+            if n < offset:
+                continue
+            if len(result) >= limit:
+                break
+            result.append(self.rows[i])
+        return result
+
+    @staticmethod
+    def count(mask: int) -> int:
+        return bin(mask).count("1")
+
+    # ============== Aggregates ==============
+
+    def _build_stats(self) -> Dict[str, Any]:
+        stats = {
+            "total_registered": len(self.rows),
+            "by_schedule": {k: self.count(m) for k, m in self._schedule_masks.items()},
+            "by_category": {k: self.count(m) for k, m in self._category_masks.items()},
+            "by_status": {k: self.count(m) for k, m in self._status_masks.items()},
+            "by_country": {},
+            "controlled_drugs": self.count(self._schedule_masks.get(DrugSchedule.CD.value, 0)),
+            "active_registrations": self.count(self._status_masks.get(RegistrationStatus.ACTIVE.value, 0))
+        }
+        for row in self.rows:
+            country = row["country_of_origin"]
+            stats["by_country"][country] = stats["by_country"].get(country, 0) + 1
+        return stats
+
+    def _build_manufacturers(self) -> List[Dict[str, Any]]:
+        manufacturers: Dict[str, Dict[str, Any]] = {}
+        for row in self.rows:
+            mfr = row["manufacturer"]
+            if mfr not in manufacturers:
+                manufacturers[mfr] = {
+                    "name": mfr,
+                    "country": row["country_of_origin"],
+                    "product_count": 0
+                }
+            manufacturers[mfr]["product_count"] += 1
+        return list(manufacturers.values())
+
+
+FDA_REGISTRY = FDARegistry(FDA_REGISTERED_DRUGS, FDA_BARCODE_PRODUCTS)
+
+
 def create_fda_endpoints(db, get_current_user):
     """Create FDA API endpoints"""
     
@@ -698,39 +952,11 @@ def create_fda_endpoints(db, get_current_user):
         offset: int = Query(0, ge=0)
     ):
         """List all FDA registered drugs with filtering"""
-        filtered = FDA_REGISTERED_DRUGS.copy()
-        
-        if query:
-            query_lower = query.lower()
-            filtered = [d for d in filtered if 
-                query_lower in d["trade_name"].lower() or 
-                query_lower in d["generic_name"].lower() or
-                any(query_lower in ing.lower() for ing in d["active_ingredients"])]
-        
-        if category:
-            filtered = [d for d in filtered if d["category"].value == category]
-        
-        if schedule:
-            filtered = [d for d in filtered if d["schedule"].value == schedule]
-        
-        if status:
-            filtered = [d for d in filtered if d["status"].value == status]
-        
-        if manufacturer:
-            filtered = [d for d in filtered if manufacturer.lower() in d["manufacturer"].lower()]
-        
-        # Convert enums to values
-        result = []
-        for d in filtered[offset:offset + limit]:
-            drug_dict = {**d}
-            drug_dict["schedule"] = drug_dict["schedule"].value
-            drug_dict["category"] = drug_dict["category"].value
-            drug_dict["status"] = drug_dict["status"].value
-            result.append(drug_dict)
+        mask = FDA_REGISTRY.filter_mask(query, category, schedule, status, manufacturer)
         
         return {
-            "drugs": result,
-            "total": len(filtered),
+            "drugs": FDA_REGISTRY.page(mask, offset, limit),
+            "total": FDA_REGISTRY.count(mask),
             "limit": limit,
             "offset": offset
         }
@@ -741,52 +967,37 @@ def create_fda_endpoints(db, get_current_user):
         limit: int = Query(20, ge=1, le=100)
     ):
         """Search FDA registered drugs by name or active ingredient"""
-        q_lower = q.lower()
-        results = []
-        
-        for d in FDA_REGISTERED_DRUGS:
-            if (q_lower in d["trade_name"].lower() or 
-                q_lower in d["generic_name"].lower() or
-                any(q_lower in ing.lower() for ing in d["active_ingredients"])):
-                
-                drug_dict = {**d}
-                drug_dict["schedule"] = drug_dict["schedule"].value
-                drug_dict["category"] = drug_dict["category"].value
-                drug_dict["status"] = drug_dict["status"].value
-                results.append(drug_dict)
-                
-                if len(results) >= limit:
-                    break
+        results = FDA_REGISTRY.page(FDA_REGISTRY.text_mask(q), 0, limit)
         
         return {"drugs": results, "total": len(results), "query": q}
     
     @fda_router.get("/drugs/{registration_number:path}")
     async def get_drug_details(registration_number: str):
         """Get detailed information about a registered drug"""
-        for d in FDA_REGISTERED_DRUGS:
-            if d["registration_number"] == registration_number:
-                drug_dict = {**d}
-                drug_dict["schedule"] = drug_dict["schedule"].value
-                drug_dict["category"] = drug_dict["category"].value
-                drug_dict["status"] = drug_dict["status"].value
-                return drug_dict
+        drug = FDA_REGISTRY.get(registration_number)
+        if drug:
+            return drug
         
         raise HTTPException(status_code=404, detail="Drug not found in FDA registry")
     
     @fda_router.post("/verify")
     async def verify_drug(request: DrugVerificationRequest):
         """Verify if a drug is registered with Ghana FDA"""
+        def verification(d):
+            active = d["status"] == RegistrationStatus.ACTIVE.value
+            return {
+                "verified": active,
+                "registration_number": d["registration_number"],
+                "trade_name": d["trade_name"],
+                "manufacturer": d["manufacturer"],
+                "status": d["status"],
+                "message": "Drug is registered and active" if active else f"Drug registration is {d['status']}"
+            }
+        
         if request.registration_number:
-            for d in FDA_REGISTERED_DRUGS:
-                if d["registration_number"] == request.registration_number:
-                    return {
-                        "verified": d["status"] == RegistrationStatus.ACTIVE,
-                        "registration_number": d["registration_number"],
-                        "trade_name": d["trade_name"],
-                        "manufacturer": d["manufacturer"],
-                        "status": d["status"].value,
-                        "message": "Drug is registered and active" if d["status"] == RegistrationStatus.ACTIVE else f"Drug registration is {d['status'].value}"
-                    }
+            d = FDA_REGISTRY.get(request.registration_number)
+            if d:
+                return verification(d)
             return {
                 "verified": False,
                 "registration_number": request.registration_number,
@@ -797,16 +1008,9 @@ def create_fda_endpoints(db, get_current_user):
             }
         
         if request.trade_name:
-            for d in FDA_REGISTERED_DRUGS:
-                if request.trade_name.lower() in d["trade_name"].lower():
-                    return {
-                        "verified": d["status"] == RegistrationStatus.ACTIVE,
-                        "registration_number": d["registration_number"],
-                        "trade_name": d["trade_name"],
-                        "manufacturer": d["manufacturer"],
-                        "status": d["status"].value,
-                        "message": "Drug is registered and active" if d["status"] == RegistrationStatus.ACTIVE else f"Drug registration is {d['status'].value}"
-                    }
+            d = FDA_REGISTRY.find_by_trade_name(request.trade_name)
+            if d:
+                return verification(d)
         
         return {
             "verified": False,
@@ -846,58 +1050,12 @@ def create_fda_endpoints(db, get_current_user):
     @fda_router.get("/stats")
     async def get_fda_stats():
         """Get statistics about registered drugs"""
-        stats = {
-            "total_registered": len(FDA_REGISTERED_DRUGS),
-            "by_schedule": {},
-            "by_category": {},
-            "by_status": {},
-            "by_country": {},
-            "controlled_drugs": 0,
-            "active_registrations": 0
-        }
-        
-        for d in FDA_REGISTERED_DRUGS:
-            # By schedule
-            schedule = d["schedule"].value
-            stats["by_schedule"][schedule] = stats["by_schedule"].get(schedule, 0) + 1
-            
-            # By category
-            category = d["category"].value
-            stats["by_category"][category] = stats["by_category"].get(category, 0) + 1
-            
-            # By status
-            status = d["status"].value
-            stats["by_status"][status] = stats["by_status"].get(status, 0) + 1
-            
-            # By country
-            country = d["country_of_origin"]
-            stats["by_country"][country] = stats["by_country"].get(country, 0) + 1
-            
-            # Controlled drugs
-            if d["schedule"] == DrugSchedule.CD:
-                stats["controlled_drugs"] += 1
-            
-            # Active
-            if d["status"] == RegistrationStatus.ACTIVE:
-                stats["active_registrations"] += 1
-        
-        return stats
+        return FDA_REGISTRY.stats
     
     @fda_router.get("/manufacturers")
     async def get_manufacturers():
         """Get list of all manufacturers"""
-        manufacturers = {}
-        for d in FDA_REGISTERED_DRUGS:
-            mfr = d["manufacturer"]
-            if mfr not in manufacturers:
-                manufacturers[mfr] = {
-                    "name": mfr,
-                    "country": d["country_of_origin"],
-                    "product_count": 0
-                }
-            manufacturers[mfr]["product_count"] += 1
-        
-        return {"manufacturers": list(manufacturers.values())}
+        return {"manufacturers": FDA_REGISTRY.manufacturers}
     
     @fda_router.get("/alerts")
     async def get_safety_alerts():
@@ -935,88 +1093,9 @@ def create_fda_endpoints(db, get_current_user):
         Lookup drug information by barcode/GTIN.
         This is a MOCK implementation - in production, connect to real FDA or GS1 database.
         """
-        # Mock drug database by barcode
-        MOCK_BARCODE_DB = {
-            "5000456123456": {
-                "found": True,
-                "drug": {
-                    "name": "Paracetamol 500mg Tablets",
-                    "generic_name": "Acetaminophen",
-                    "registration_number": "FDA/DRD-2023-0001",
-                    "manufacturer": "Ernest Chemist Ltd",
-                    "category": "Analgesics & NSAIDs",
-                    "dosage_form": "Tablet",
-                    "strength": "500mg",
-                    "pack_size": "100 tablets",
-                    "schedule": "OTC"
-                }
-            },
-            "5000789456123": {
-                "found": True,
-                "drug": {
-                    "name": "Amoxicillin 500mg Capsules",
-                    "generic_name": "Amoxicillin Trihydrate",
-                    "registration_number": "FDA/DRD-2023-0025",
-                    "manufacturer": "Kinapharma Ltd",
-                    "category": "Antibiotics",
-                    "dosage_form": "Capsule",
-                    "strength": "500mg",
-                    "pack_size": "21 capsules",
-                    "schedule": "POM"
-                }
-            },
-            "5001234567890": {
-                "found": True,
-                "drug": {
-                    "name": "Artemether-Lumefantrine Tablets",
-                    "generic_name": "Artemether/Lumefantrine",
-                    "registration_number": "FDA/DRD-2022-0156",
-                    "manufacturer": "mPharma Ghana",
-                    "category": "Antimalarials",
-                    "dosage_form": "Tablet",
-                    "strength": "20mg/120mg",
-                    "pack_size": "24 tablets",
-                    "schedule": "POM"
-                }
-            },
-            "5009876543210": {
-                "found": True,
-                "drug": {
-                    "name": "Metformin 500mg Tablets",
-                    "generic_name": "Metformin Hydrochloride",
-                    "registration_number": "FDA/DRD-2021-0089",
-                    "manufacturer": "Tobinco Pharmaceuticals",
-                    "category": "Antidiabetics",
-                    "dosage_form": "Tablet",
-                    "strength": "500mg",
-                    "pack_size": "100 tablets",
-                    "schedule": "POM"
-                }
-            },
-            "5005551234567": {
-                "found": True,
-                "drug": {
-                    "name": "Omeprazole 20mg Capsules",
-                    "generic_name": "Omeprazole",
-                    "registration_number": "FDA/DRD-2022-0045",
-                    "manufacturer": "Atlantic Lifesciences",
-                    "category": "Antacids & PPIs",
-                    "dosage_form": "Capsule",
-                    "strength": "20mg",
-                    "pack_size": "28 capsules",
-                    "schedule": "POM"
-                }
-            }
-        }
-        
-        # Check if barcode exists in mock database
-        if barcode in MOCK_BARCODE_DB:
-            return MOCK_BARCODE_DB[barcode]
-        
-        # Try partial match (last 8 digits)
-        for key, value in MOCK_BARCODE_DB.items():
-            if barcode.endswith(key[-8:]) or key.endswith(barcode[-8:]):
-                return value
+        product = FDA_REGISTRY.lookup_barcode(barcode)
+        if product:
+            return product
         
         # Not found
         return {
@@ -9,8 +9,21 @@ from datetime import datetime, timezone
 from pydantic import BaseModel
 import uuid
 
+from patient_bundle import BundleSection, PatientBundleLoader
+
 fhir_router = APIRouter(prefix="/api/fhir", tags=["FHIR R4"])
 
+# Sections of the Patient/$everything compartment
+EVERYTHING_BUNDLE = {
+    "patient": BundleSection("patients", key="id", one=True),
+    "vitals": BundleSection("vitals", sort=[("recorded_at", -1)], limit=100),
+    "problems": BundleSection("problems", limit=100),
+    "medications": BundleSection("medications", limit=100),
+    "allergies": BundleSection("allergies", limit=100),
+    "orders": BundleSection("orders", sort=[("created_at", -1)], limit=100),
+    "appointments": BundleSection("appointments", sort=[("date", -1)], limit=100),
+}
+
 # ============ FHIR Resource Models ============
 
 class FHIRIdentifier(BaseModel):
@@ -362,7 +375,8 @@ async def get_capability_statement():
         "rest": [{
             "mode": "server",
             "resource": [
-                {"type": "Patient", "interaction": [{"code": "read"}, {"code": "search-type"}]},
+                {"type": "Patient", "interaction": [{"code": "read"}, {"code": "search-type"}],
+                 "operation": [{"name": "everything", "definition": "http://hl7.org/fhir/OperationDefinition/Patient-everything"}]},
                 {"type": "Observation", "interaction": [{"code": "read"}, {"code": "search-type"}]},
                 {"type": "Condition", "interaction": [{"code": "read"}, {"code": "search-type"}]},
                 {"type": "MedicationRequest", "interaction": [{"code": "read"}, {"code": "search-type"}]},
@@ -375,6 +389,7 @@ async def get_capability_statement():
 
 def create_fhir_endpoints(db):
     """Create FHIR endpoints with database access"""
+    everything_loader = PatientBundleLoader(db, EVERYTHING_BUNDLE)
     
     # ============ Patient Endpoints ============
     
@@ -418,6 +433,41 @@ def create_fhir_endpoints(db):
             raise HTTPException(status_code=404, detail="Patient not found")
         return patient_to_fhir(patient)
     
+    @fhir_router.get("/Patient/{patient_id}/$everything", response_model=FHIRBundle)
+    async def patient_everything(
+        patient_id: str,
+        _count: int = Query(100, ge=1, le=1000, alias="_count")
+    ):
+        """Patient $everything: the Patient plus every resource in its compartment, loaded concurrently"""
+        sections = await everything_loader.load(
+            patient_id, limits={name: _count for name in EVERYTHING_BUNDLE if name != "patient"}
+        )
+        patient = sections["patient"]
+        if not patient:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        
+        entries = [{"resource": patient_to_fhir(patient).model_dump(), "fullUrl": f"Patient/{patient_id}"}]
+        converters = [
+            ("vitals", "Observation", lambda v: vitals_to_fhir_observation(v, patient_id)),
+            ("problems", "Condition", lambda p: problem_to_fhir_condition(p, patient_id)),
+            ("medications", "MedicationRequest", lambda m: medication_to_fhir(m, patient_id)),
+            ("allergies", "AllergyIntolerance", lambda a: allergy_to_fhir(a, patient_id)),
+            ("orders", "ServiceRequest", order_to_fhir_service_request),
+            ("appointments", "Appointment", appointment_to_fhir),
+        ]
+        for section, resource_type, convert in converters:
+            for doc in sections[section]:
+                entries.append({
+                    "resource": convert(doc).model_dump(),
+                    "fullUrl": f"{resource_type}/{doc['id']}"
+                })
+        
+        return FHIRBundle(
+            id=str(uuid.uuid4()),
+            total=len(entries),
+            entry=entries
+        )
+    
     # ============ Observation Endpoints ============
     
     @fhir_router.get("/Observation", response_model=FHIRBundle)
@@ -9,6 +9,8 @@ from typing import Optional
 from datetime import datetime, timezone
 import uuid
 
+from audit_pipeline import audit_pipeline
+
 router = APIRouter(prefix="/api/finance", tags=["Finance Settings"])
 
 # ============ MODELS ============
@@ -138,7 +140,7 @@ def create_finance_endpoints(db, get_current_user):
         account_doc.pop("_id", None)
         
         # Audit log
-        await db.audit_logs.insert_one({
+        await audit_pipeline.emit(db.audit_logs, {
             "id": str(uuid.uuid4()),
             "action": "bank_account_added",
             "resource_type": "bank_account",
@@ -19,6 +19,9 @@ import secrets
 import bcrypt
 import os
 
+from audit_pipeline import audit_pipeline
+from principal_cache import principal_cache
+
 hospital_admin_router = APIRouter(prefix="/api/hospital", tags=["Hospital Admin"])
 
 # ============ Enums ============
@@ -116,7 +119,7 @@ def create_hospital_admin_endpoints(db, get_current_user, hash_password):
     async def log_admin_action(user: dict, hospital_id: str, action: str, resource_type: str, 
                                resource_id: str, details: dict = None):
         """Log administrative action for audit"""
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": action,
             "user_id": user["id"],
@@ -396,6 +399,7 @@ def create_hospital_admin_endpoints(db, get_current_user, hash_password):
         await db["users"].update_one(
             {"id": user_id}, {"$set": update_data}
         )
+        principal_cache.invalidate_user(user_id)
         
         # Log action
         await log_admin_action(
@@ -433,6 +437,7 @@ def create_hospital_admin_endpoints(db, get_current_user, hash_password):
                 "deactivated_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(user_id)
         
         # Log action
         await log_admin_action(
@@ -466,6 +471,7 @@ def create_hospital_admin_endpoints(db, get_current_user, hash_password):
                 "reactivated_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(user_id)
         
         await log_admin_action(
             user, hospital_id, "reactivate_user", "user", user_id,
@@ -502,6 +508,7 @@ def create_hospital_admin_endpoints(db, get_current_user, hash_password):
                 "password_reset_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(user_id)
         
         await log_admin_action(
             user, hospital_id, "reset_password", "user", user_id,
@@ -534,6 +541,7 @@ def create_hospital_admin_endpoints(db, get_current_user, hash_password):
             {"id": user_id},
             {"$set": {"mfa_required": require_mfa}}
         )
+        principal_cache.invalidate_user(user_id)
         
         await log_admin_action(
             user, hospital_id, "configure_mfa", "user", user_id,
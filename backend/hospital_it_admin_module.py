@@ -16,6 +16,9 @@ import uuid
 import secrets
 import os
 
+from audit_pipeline import audit_pipeline
+from principal_cache import principal_cache
+
 hospital_it_admin_router = APIRouter(prefix="/api/hospital", tags=["Hospital IT Admin"])
 
 # ============ Enums ============
@@ -84,7 +87,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
     async def log_it_action(user: dict, hospital_id: str, action: str, 
                             resource_type: str, resource_id: str, details: dict = None):
         """Log IT administrative action"""
-        await db["it_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["it_audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": action,
             "admin_id": user["id"],
@@ -470,6 +473,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
             {"id": staff_id},
             {"$set": update_data}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "update_staff", "user", staff_id,
@@ -504,6 +508,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "activated_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "activate_account", "user", staff_id,
@@ -542,6 +547,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "deactivation_reason": reason
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "deactivate_account", "user", staff_id,
@@ -576,6 +582,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "suspension_reason": reason
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "suspend_account", "user", staff_id,
@@ -612,6 +619,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "password_reset_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "reset_password", "user", staff_id,
@@ -651,6 +659,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "unlocked_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "unlock_account", "user", staff_id,
@@ -687,6 +696,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "role_changed_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "change_role", "user", staff_id,
@@ -726,6 +736,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "department_assigned_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "assign_department", "user", staff_id,
@@ -765,6 +776,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "location_assigned_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "assign_location", "user", staff_id,
@@ -841,6 +853,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
         
         # Delete the user
         await db["users"].delete_one({"id": staff_id})
+        principal_cache.invalidate_user(staff_id)
         
         # Log IT action
         await log_it_action(
@@ -1055,6 +1068,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "permissions_updated_by": user["id"]
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "update_permissions", "user", staff_id,
@@ -1094,6 +1108,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "permissions_updated_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "grant_permission", "user", staff_id,
@@ -1129,6 +1144,7 @@ def create_hospital_it_admin_endpoints(db, get_current_user, hash_password):
                 "permissions_updated_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         await log_it_action(
             user, hospital_id, "revoke_permission", "user", staff_id,
@@ -2,7 +2,7 @@
 Imaging Module for Yacco EMR
 Handles DICOM image upload, storage, and retrieval
 """
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime, timezone
@@ -12,12 +12,31 @@ import os
 import base64
 import aiofiles
 
+from db_indexes import register_indexes, IndexSpec
+from dicom_storage import save_upload, file_response, multipart_response
+
 router = APIRouter(prefix="/api/imaging", tags=["Imaging"])
 
+register_indexes(
+    "imaging_studies",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("patient_id", 1), ("study_date", -1)]),
+    IndexSpec([("organization_id", 1), ("study_date", -1)]),
+)
+register_indexes(
+    "dicom_images",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("study_id", 1), ("instance_number", 1)]),
+    IndexSpec([("study_id", 1), ("series_instance_uid", 1), ("instance_number", 1)]),
+)
+
 # Create uploads directory
 UPLOAD_DIR = "/app/backend/uploads/dicom"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Largest file /images/{id}/data still returns as base64 JSON
+INLINE_IMAGE_MAX_BYTES = int(os.environ.get("DICOM_INLINE_MAX_BYTES", str(10 * 1024 * 1024)))
+
 # ============ ENUMS ============
 class ModalityType(str, Enum):
     CR = "CR"  # Computed Radiography
@@ -222,9 +241,7 @@ def setup_routes(db, get_current_user):
         filename = f"{sop_uid}.{file_extension}"
         file_path = os.path.join(UPLOAD_DIR, filename)
         
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        file_size, sha256 = await save_upload(file, file_path)
         
         # Create image record
         image_doc = {
@@ -235,7 +252,8 @@ def setup_routes(db, get_current_user):
             "instance_number": instance_number,
             "filename": filename,
             "file_path": file_path,
-            "file_size": len(content),
+            "file_size": file_size,
+            "sha256": sha256,
             "uploaded_at": datetime.now(timezone.utc).isoformat(),
             "uploaded_by": current_user["id"]
         }
@@ -264,14 +282,45 @@ def setup_routes(db, get_current_user):
         
         return {"images": images, "count": len(images)}
     
+    @router.get("/studies/{study_id}/series/{series_uid}")
+    async def retrieve_series(study_id: str, series_uid: str, current_user: dict = Depends(get_current_user)):
+        """Stream every instance of a series as multipart/related (WADO-RS style)"""
+        images = await db.dicom_images.find(
+            {"study_id": study_id, "series_instance_uid": series_uid},
+            {"_id": 0, "id": 1, "file_path": 1}
+        ).sort("instance_number", 1).to_list(None)
+        
+        if not images:
+            raise HTTPException(status_code=404, detail="Series not found")
+        
+        return multipart_response([
+            (image["file_path"], f"/api/imaging/images/{image['id']}/file") for image in images
+        ])
+    
+    @router.get("/images/{image_id}/file")
+    async def get_image_file(image_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+        """Download the DICOM file (supports Range, ETag / If-None-Match)"""
+        image = await db.dicom_images.find_one({"id": image_id}, {"_id": 0})
+        
+        if not image:
+            raise HTTPException(status_code=404, detail="Image not found")
+        
+        return file_response(request, image["file_path"], content_hash=image.get("sha256"), filename=image.get("filename"))
+    
     @router.get("/images/{image_id}/data")
     async def get_image_data(image_id: str, current_user: dict = Depends(get_current_user)):
-        """Get image data for viewing"""
+        """Get image data for viewing as base64 JSON (small images; use /file for anything larger)"""
         image = await db.dicom_images.find_one({"id": image_id}, {"_id": 0})
         
         if not image:
             raise HTTPException(status_code=404, detail="Image not found")
         
+        if (image.get("file_size") or 0) > INLINE_IMAGE_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Image is too large for inline transfer; download /api/imaging/images/{image_id}/file"
+            )
+        
         # Read file and return as base64
         try:
             async with aiofiles.open(image["file_path"], 'rb') as f:
@@ -17,6 +17,8 @@ import uuid
 from datetime import datetime, timezone
 from enum import Enum
 
+from audit_pipeline import audit_pipeline
+
 
 class IRProcedureType(str, Enum):
     ANGIOGRAPHY = "angiography"
@@ -273,7 +275,7 @@ def create_ir_module_router(db, get_current_user) -> APIRouter:
         )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": f"ir_procedure_status_changed_to_{status}",
             "resource_type": "ir_procedure",
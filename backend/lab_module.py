@@ -15,8 +15,13 @@ import uuid
 import random
 import re
 
+from db_indexes import register_indexes, IndexSpec
+
 lab_router = APIRouter(prefix="/api/lab", tags=["Lab Results"])
 
+register_indexes("lab_orders", IndexSpec([("id", 1)]), IndexSpec([("patient_id", 1), ("created_at", -1)]))
+register_indexes("lab_results", IndexSpec([("order_id", 1)]), IndexSpec([("patient_id", 1), ("created_at", -1)]))
+
 # ============ Lab Test Definitions ============
 
 # Reference ranges for common lab tests
@@ -0,0 +1,202 @@
+"""
+MAR Schedule Generator for Yacco Health
+=======================================
+Builds medication administration record (MAR) entries from active
+medications and writes them as upserts keyed on (patient_id,
+medication_id, scheduled_time).
+
+All entries for a run are generated in memory and written with unordered
+bulk_write batches of $setOnInsert upserts, so an existing entry (scheduled,
+given, held...) is never touched and a run costs one medications query plus
+one write per batch, however many medications x administration times it
+covers. The unique (patient_id, medication_id, scheduled_time) index keeps
+concurrent runs from creating duplicates; remove_duplicates() clears any
+left by the previous check-then-insert generator so the index can build
+(see scripts/dedupe_mar_entries.py).
+
+schedule_admitted() schedules every admitted patient of an organization
+(optionally one ward) for a date range in one job.
+
+Usage:
+    from mar_schedule import MARScheduler
+
+    scheduler = MARScheduler(db)
+    created = await scheduler.schedule_patients([patient_id], ["2024-05-01"], org_id)
+    summary = await scheduler.schedule_admitted(org_id, "2024-05-01", "2024-05-03", ward_id=ward_id)
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import DeleteMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from db_indexes import register_indexes, IndexSpec
+
+logger = logging.getLogger(__name__)
+
+MAR_KEY = ("patient_id", "medication_id", "scheduled_time")
+MAX_SCHEDULE_DAYS = 14
+DUPLICATE_KEY = 11000
+
+# Frequency to administration times (UTC)
+FREQUENCY_TIMES = {
+    "daily": ["09:00"],
+    "bid": ["09:00", "21:00"],
+    "tid": ["08:00", "14:00", "20:00"],
+    "qid": ["08:00", "12:00", "16:00", "20:00"],
+    "q4h": ["00:00", "04:00", "08:00", "12:00", "16:00", "20:00"],
+    "q6h": ["00:00", "06:00", "12:00", "18:00"],
+    "q8h": ["00:00", "08:00", "16:00"],
+    "q12h": ["08:00", "20:00"],
+    "prn": [],  # As needed - no scheduled times
+    "once": ["09:00"],
+    "weekly": ["09:00"],  # Only on specific days
+    "monthly": ["09:00"]  # Only on specific days
+}
+
+register_indexes("mar_entries", IndexSpec([(field, 1) for field in MAR_KEY], unique=True))
+
+
+def administration_times(frequency: Optional[str]) -> List[str]:
+    freq = (frequency or "daily").lower().replace(" ", "").replace("-", "")
+    return FREQUENCY_TIMES.get(freq, ["09:00"])
+
+
+def date_range(start: str, end: Optional[str] = None) -> List[str]:
+    """Inclusive list of YYYY-MM-DD dates; ValueError if malformed, reversed or too long"""
+    first = date.fromisoformat(start)
+    last = date.fromisoformat(end) if end else first
+    days = (last - first).days + 1
+    if days < 1:
+        raise ValueError("end_date is before start_date")
+    if days > MAX_SCHEDULE_DAYS:
+        raise ValueError(f"Schedules cover at most {MAX_SCHEDULE_DAYS} days")
+    return [(first + timedelta(days=n)).isoformat() for n in range(days)]
+
+
+class MARScheduler:
+    """Generates MAR entries for one or many patients with bulk upserts"""
+
+    def __init__(self, db, batch_size: int = 1000):
+        self.db = db
+        self.entries = db.mar_entries
+        self.batch_size = batch_size
+
+    # ============== Generation ==============
+
+    @staticmethod
+    def build_entries(
+        medications: Iterable[Dict[str, Any]],
+        dates: Iterable[str],
+        org_id: Optional[str],
+        created_at: str
+    ) -> List[Dict[str, Any]]:
+        """One scheduled entry per medication x date x administration time"""
+        # nurse_portal_module imports this module at load time
+        from nurse_portal_module import MAREntry
+
+        dates = list(dates)
+        entries = []
+        for med in medications:
+            for day in dates:
+                for time_str in administration_times(med.get("frequency")):
+                    entries.append(MAREntry(
+                        patient_id=med["patient_id"],
+                        medication_id=med["id"],
+                        medication_name=med["name"],
+                        dosage=med.get("dosage", ""),
+                        route=med.get("route", "oral"),
+                        frequency=med.get("frequency", "daily"),
+                        scheduled_time=f"{day}T{time_str}:00+00:00",
+                        organization_id=org_id or "",
+                        created_at=created_at
+                    ).model_dump(mode="json"))
+        return entries
+
+    async def write(self, entries: List[Dict[str, Any]]) -> int:
+        """Upsert entries that do not exist yet; returns how many were created"""
+        created = 0
+        for start in range(0, len(entries), self.batch_size):
+            operations = [
+                UpdateOne({field: entry[field] for field in MAR_KEY}, {"$setOnInsert": entry}, upsert=True)
+                for entry in entries[start:start + self.batch_size]
+            ]
+            try:
+                result = await self.entries.bulk_write(operations, ordered=False)
+                created += result.upserted_count
+            except BulkWriteError as e:
+                # A concurrent run inserted the same key first; that entry stands
+                errors = e.details.get("writeErrors", [])
+                if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                    raise
+                created += e.details.get("nUpserted", 0)
+        return created
+
+    async def schedule_patients(
+        self,
+        patient_ids: Iterable[str],
+        dates: Iterable[str],
+        org_id: Optional[str] = None
+    ) -> int:
+        """Schedule every active medication of the patients on the given dates"""
+        patient_ids = list(dict.fromkeys(patient_ids))
+        if not patient_ids:
+            return 0
+        medications = await self.db.medications.find(
+            {"patient_id": {"$in": patient_ids}, "status": "active"},
+            {"_id": 0, "id": 1, "patient_id": 1, "name": 1, "dosage": 1, "route": 1, "frequency": 1}
+        ).to_list(None)
+        entries = self.build_entries(medications, dates, org_id, datetime.now(timezone.utc).isoformat())
+        return await self.write(entries)
+
+    async def schedule_admitted(
+        self,
+        org_id: Optional[str],
+        start_date: str,
+        end_date: Optional[str] = None,
+        ward_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Schedule every currently admitted patient of the organization (or ward) for a date range"""
+        dates = date_range(start_date, end_date)
+        query: Dict[str, Any] = {"organization_id": org_id, "status": "admitted"}
+        if ward_id:
+            query["ward_id"] = ward_id
+        patient_ids = await self.db.admissions.distinct("patient_id", query)
+        created = await self.schedule_patients(patient_ids, dates, org_id)
+        logger.info(f"MAR schedule for {len(patient_ids)} admitted patients, {dates[0]}..{dates[-1]}: {created} entries created")
+        return {"patients": len(patient_ids), "dates": dates, "entries_created": created}
+
+    # ============== Maintenance ==============
+
+    async def remove_duplicates(self) -> int:
+        """
+        Delete duplicate entries per (patient, medication, scheduled_time),
+        keeping an administered/held/refused one over a scheduled one, then
+        the oldest. Returns how many were deleted.
+        """
+        pipeline = [
+            {"$sort": {"created_at": 1}},
+            {"$group": {
+                "_id": {field: f"${field}" for field in MAR_KEY},
+                "entries": {"$push": {"id": "$id", "status": "$status"}},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        operations = []
+        removed = 0
+        async for group in self.entries.aggregate(pipeline, allowDiskUse=True):
+            entries = group["entries"]
+            keep = next((e for e in entries if e.get("status") != "scheduled"), entries[0])
+            duplicates = [e["id"] for e in entries if e is not keep]
+            operations.append(DeleteMany({"id": {"$in": duplicates}}))
+            removed += len(duplicates)
+            if len(operations) >= self.batch_size:
+                await self.entries.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await self.entries.bulk_write(operations, ordered=False)
+        logger.info(f"Removed {removed} duplicate MAR entries")
+        return removed
@@ -3,8 +3,14 @@ Global Medication Database
 ==========================
 Comprehensive database of medications available in Ghana and worldwide.
 Includes generic names, brand names, manufacturers, dosage forms, and classifications.
+Searches go through MEDICATION_INDEX, a token/trigram index built once at import.
 """
 
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
 # Common medications available in Ghana and globally
 GLOBAL_MEDICATIONS = [
     # ==========================================
@@ -365,43 +371,223 @@ GLOBAL_MEDICATIONS = [
     {"generic_name": "RH (Fixed-Dose Combination)", "brand_names": ["Rifinah", "Rimactazid"], "category": "antitubercular_fdc", "dosage_forms": ["tablet"], "strengths": ["150/75mg", "300/150mg"]},
 ]
 
+# ==========================================
+# SEARCH INDEX
+# ==========================================
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+
+def _tokenize(name: str) -> List[str]:
+    return [t for t in _TOKEN_SPLIT.split(name) if t]
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance, giving up (returning max_distance + 1) once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class MedicationIndex:
+    """
+    Immutable search index over a medication list, built once at import.
+
+    - sorted (name, id) tables for generic and brand names (prefix lookups)
+    - token postings with a sorted vocabulary (word-prefix lookups)
+    - trigram postings over full lowercased names (substring lookups)
+    - trigram postings over the token vocabulary (typo-tolerant lookups)
+    - category -> medication ids
+
+    Results are gathered bucket by bucket in rank order and collection stops
+    as soon as `limit` results are found, so common prefixes stay cheap on
+    large catalogs.
+    """
+
+    def __init__(self, medications: List[Dict[str, Any]]):
+        self.medications = tuple(medications)
+
+        names = []
+        generic_names: List[Tuple[str, int]] = []
+        brand_names: List[Tuple[str, int]] = []
+        token_postings: Dict[str, Set[int]] = defaultdict(set)
+        trigram_postings: Dict[str, Set[int]] = defaultdict(set)
+        category_ids: Dict[str, List[int]] = defaultdict(list)
+
+        for med_id, med in enumerate(self.medications):
+            generic = med["generic_name"].lower()
+            brands = tuple(b.lower() for b in med.get("brand_names", []))
+            names.append((generic,) + brands)
+            generic_names.append((generic, med_id))
+            brand_names.extend((brand, med_id) for brand in brands)
+            for name in names[-1]:
+                for token in _tokenize(name):
+                    token_postings[token].add(med_id)
+                for gram in _trigrams(name):
+                    trigram_postings[gram].add(med_id)
+            category_ids[med.get("category", "uncategorized")].append(med_id)
+
+        vocab_trigrams: Dict[str, Set[str]] = defaultdict(set)
+        for token in token_postings:
+            for gram in _trigrams(token):
+                vocab_trigrams[gram].add(token)
+
+        self._names = tuple(names)
+        self._generic_names = tuple(sorted(generic_names))
+        self._brand_names = tuple(sorted(brand_names))
+        self._token_postings = {t: tuple(sorted(ids)) for t, ids in token_postings.items()}
+        self._vocabulary = tuple(sorted(self._token_postings))
+        self._trigram_postings = {g: tuple(sorted(ids)) for g, ids in trigram_postings.items()}
+        self._vocab_trigrams = {g: frozenset(tokens) for g, tokens in vocab_trigrams.items()}
+        self._category_ids = {c: tuple(ids) for c, ids in category_ids.items()}
+        self.categories = tuple(sorted(self._category_ids))
+
+    # ============== Lookups ==============
+
+    def by_category(self, category: str) -> List[Dict[str, Any]]:
+        return [self.medications[i] for i in self._category_ids.get(category, ())]
+
+    @staticmethod
+    def _prefix_range(table: Tuple[Tuple[str, int], ...], prefix: str) -> Iterator[Tuple[str, int]]:
+        """(name, id) entries of a sorted table whose name starts with prefix, in name order"""
+        for i in range(bisect_left(table, (prefix,)), len(table)):
+            entry = table[i]
+            if not entry[0].startswith(prefix):
+                return
+            yield entry
+
+    def exact_ids(self, query: str) -> Iterator[int]:
+        for table in (self._generic_names, self._brand_names):
+            for name, med_id in self._prefix_range(table, query):
+                if name != query:
+                    break
+                yield med_id
+
+    def generic_prefix_ids(self, prefix: str) -> Iterator[int]:
+        return (med_id for _, med_id in self._prefix_range(self._generic_names, prefix))
+
+    def brand_prefix_ids(self, prefix: str) -> Iterator[int]:
+        return (med_id for _, med_id in self._prefix_range(self._brand_names, prefix))
+
+    def word_prefix_ids(self, prefix: str) -> Iterator[int]:
+        """Medications with any name word starting with prefix, by vocabulary order"""
+        vocabulary = self._vocabulary
+        for i in range(bisect_left(vocabulary, prefix), len(vocabulary)):
+            if not vocabulary[i].startswith(prefix):
+                return
+            yield from self._token_postings[vocabulary[i]]
+
+    def substring_ids(self, text: str) -> Iterator[int]:
+        """Medications with a name containing text, scanning only the rarest trigram's postings"""
+        grams = _trigrams(text)
+        if not grams:
+            return
+        rarest = min(grams, key=lambda g: len(self._trigram_postings.get(g, ())))
+        for med_id in self._trigram_postings.get(rarest, ()):
+            if any(text in name for name in self._names[med_id]):
+                yield med_id
+
+    def fuzzy_ids(self, word: str) -> Dict[int, int]:
+        """Medication id -> edit distance for name words within 1-2 edits of word (or of its prefix)"""
+        max_distance = 1 if len(word) <= 7 else 2
+        grams = _trigrams(word)
+        # Each edit destroys at most 3 trigrams; also require a third of them
+        # so long queries don't edit-distance the whole vocabulary
+        min_shared = max(1, len(grams) - 3 * max_distance, -(-len(grams) // 3))
+
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for token in self._vocab_trigrams.get(gram, ()):
+                shared[token] += 1
+
+        matches: Dict[int, int] = {}
+        for token, count in shared.items():
+            if count < min_shared:
+                continue
+            distance = min(
+                _edit_distance(word, candidate, max_distance)
+                for candidate in {token, token[:len(word)], token[:len(word) + 1]}
+            )
+            if distance > max_distance:
+                continue
+            for med_id in self._token_postings[token]:
+                if distance < matches.get(med_id, max_distance + 1):
+                    matches[med_id] = distance
+        return matches
+
+    def search(self, query: str, category: str = None, limit: int = 50, fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """
+        Ranked lookup: exact name, generic prefix, brand prefix, word prefix,
+        substring, then (if still short of limit) typo-tolerant matches.
+        Queries under 3 characters match prefixes only.
+        """
+        query = query.strip().lower() if query else ""
+        if not query:
+            ids = self._category_ids.get(category, ()) if category else range(len(self.medications))
+            return [self.medications[i] for i in ids[:limit]]
+
+        buckets = [
+            self.exact_ids(query),
+            self.generic_prefix_ids(query),
+            self.brand_prefix_ids(query),
+            self.word_prefix_ids(query),
+        ]
+        if len(query) >= 3:
+            buckets.append(self.substring_ids(query))
+
+        seen: Set[int] = set()
+        results: List[Dict[str, Any]] = []
+
+        def collect(ids) -> bool:
+            for med_id in ids:
+                if med_id in seen:
+                    continue
+                seen.add(med_id)
+                med = self.medications[med_id]
+                if category and med.get("category") != category:
+                    continue
+                results.append(med)
+                if len(results) >= limit:
+                    return True
+            return False
+
+        for bucket in buckets:
+            if collect(bucket):
+                return results
+
+        if fuzzy and len(query) >= 4 and " " not in query:
+            matches = self.fuzzy_ids(query)
+            collect(sorted(matches, key=lambda i: (matches[i], i)))
+
+        return results
+
+
+MEDICATION_INDEX = MedicationIndex(GLOBAL_MEDICATIONS)
+
+
 def get_all_medications():
     """Return all medications in the database"""
     return GLOBAL_MEDICATIONS
 
 def search_medications(query: str, category: str = None, limit: int = 50):
-    """Search medications by name or category"""
-    results = []
-    query_lower = query.lower() if query else ""
-    
-    for med in GLOBAL_MEDICATIONS:
-        match = False
-        
-        if query_lower:
-            if query_lower in med["generic_name"].lower():
-                match = True
-            elif any(query_lower in brand.lower() for brand in med.get("brand_names", [])):
-                match = True
-        else:
-            match = True
-        
-        if category and med.get("category") != category:
-            match = False
-        
-        if match:
-            results.append(med)
-            if len(results) >= limit:
-                break
-    
-    return results
+    """Search medications by name or category (ranked, typo-tolerant)"""
+    return MEDICATION_INDEX.search(query, category, limit)
 
 def get_medication_categories():
     """Get all unique medication categories"""
-    categories = set()
-    for med in GLOBAL_MEDICATIONS:
-        categories.add(med.get("category", "uncategorized"))
-    return sorted(list(categories))
+    return list(MEDICATION_INDEX.categories)
 
 def get_medications_by_category(category: str):
     """Get all medications in a specific category"""
-    return [med for med in GLOBAL_MEDICATIONS if med.get("category") == category]
+    return MEDICATION_INDEX.by_category(category)
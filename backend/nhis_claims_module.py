@@ -10,8 +10,19 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from enum import Enum
 
+from db_indexes import register_indexes, IndexSpec
+from audit_pipeline import audit_pipeline
+from billing_analytics import BillingAnalytics, status_total
+
 nhis_router = APIRouter(prefix="/api/nhis", tags=["NHIS Claims"])
 
+register_indexes(
+    "nhis_claims",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("organization_id", 1), ("status", 1), ("created_at", -1)]),
+    IndexSpec([("organization_id", 1), ("created_at", -1)]),
+)
+
 
 # ============== Enums ==============
 
@@ -198,6 +209,7 @@ SAMPLE_NHIS_MEMBERS = {
 
 def create_nhis_endpoints(db, get_current_user):
     """Create NHIS claims API endpoints"""
+    analytics = BillingAnalytics(db)
     
     # ============== Member Verification ==============
     
@@ -355,7 +367,7 @@ def create_nhis_endpoints(db, get_current_user):
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         
-        await db["nhis_claims"].insert_one(claim_doc)
+        await analytics.insert_one("nhis_claims", claim_doc)
         
         # Remove _id
         if "_id" in claim_doc:
@@ -426,7 +438,8 @@ def create_nhis_endpoints(db, get_current_user):
         # Generate NHIS reference (in production, this would come from NHIS API)
         nhis_ref = f"NHIA-{datetime.now().strftime('%Y%m%d%H%M%S')}-{claim_id[:6].upper()}"
         
-        await db["nhis_claims"].update_one(
+        await analytics.update_one(
+            "nhis_claims",
             {"id": claim_id},
             {"$set": {
                 "status": ClaimStatus.SUBMITTED.value,
@@ -437,7 +450,7 @@ def create_nhis_endpoints(db, get_current_user):
         )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "nhis_claim_submitted",
             "resource_type": "nhis_claim",
@@ -481,7 +494,7 @@ def create_nhis_endpoints(db, get_current_user):
         elif data.status == ClaimStatus.PAID:
             update_data["payment_date"] = datetime.now(timezone.utc).isoformat()
         
-        await db["nhis_claims"].update_one({"id": claim_id}, {"$set": update_data})
+        await analytics.update_one("nhis_claims", {"id": claim_id}, {"$set": update_data})
         
         return {"message": f"Claim status updated to {data.status}"}
     
@@ -492,45 +505,39 @@ def create_nhis_endpoints(db, get_current_user):
         """Get NHIS claims dashboard"""
         org_id = user.get("organization_id")
         
-        # Get all claims for organization
-        all_claims = await db["nhis_claims"].find({"organization_id": org_id}, {"_id": 0}).to_list(1000)
+        all_claims = (await analytics.summarize(org_id, ["nhis_claims"]))["nhis_claims"]
         
         # Calculate stats
-        total_claims = len(all_claims)
-        draft_claims = len([c for c in all_claims if c["status"] == ClaimStatus.DRAFT.value])
-        submitted_claims = len([c for c in all_claims if c["status"] == ClaimStatus.SUBMITTED.value])
-        approved_claims = len([c for c in all_claims if c["status"] == ClaimStatus.APPROVED.value])
-        rejected_claims = len([c for c in all_claims if c["status"] == ClaimStatus.REJECTED.value])
-        paid_claims = len([c for c in all_claims if c["status"] == ClaimStatus.PAID.value])
-        
-        total_claimed = sum(c.get("total_claimed", 0) for c in all_claims)
-        total_approved = sum(c.get("approved_amount", c.get("total_nhis_approved", 0)) for c in all_claims if c["status"] in [ClaimStatus.APPROVED.value, ClaimStatus.PAID.value])
-        total_paid = sum(c.get("approved_amount", c.get("total_nhis_approved", 0)) for c in all_claims if c["status"] == ClaimStatus.PAID.value)
+        approved_or_paid = [ClaimStatus.APPROVED, ClaimStatus.PAID]
+        total_approved = status_total(all_claims, "approved_amount", approved_or_paid)
+        total_paid = status_total(all_claims, "approved_amount", [ClaimStatus.PAID])
         
         # Monthly breakdown (current month)
         current_month = datetime.now().strftime("%Y-%m")
-        monthly_claims = [c for c in all_claims if c.get("created_at", "").startswith(current_month)]
+        monthly_claims = (await analytics.summarize(
+            org_id, ["nhis_claims"], f"{current_month}-01", f"{current_month}-31"
+        ))["nhis_claims"]
         
         return {
             "summary": {
-                "total_claims": total_claims,
+                "total_claims": status_total(all_claims, "count"),
                 "by_status": {
-                    "draft": draft_claims,
-                    "submitted": submitted_claims,
-                    "approved": approved_claims,
-                    "rejected": rejected_claims,
-                    "paid": paid_claims
+                    "draft": status_total(all_claims, "count", [ClaimStatus.DRAFT]),
+                    "submitted": status_total(all_claims, "count", [ClaimStatus.SUBMITTED]),
+                    "approved": status_total(all_claims, "count", [ClaimStatus.APPROVED]),
+                    "rejected": status_total(all_claims, "count", [ClaimStatus.REJECTED]),
+                    "paid": status_total(all_claims, "count", [ClaimStatus.PAID])
                 }
             },
             "financials": {
-                "total_claimed": round(total_claimed, 2),
+                "total_claimed": round(status_total(all_claims, "total_claimed"), 2),
                 "total_approved": round(total_approved, 2),
                 "total_paid": round(total_paid, 2),
                 "pending_payment": round(total_approved - total_paid, 2)
             },
             "current_month": {
-                "claims_submitted": len(monthly_claims),
-                "amount_claimed": round(sum(c.get("total_claimed", 0) for c in monthly_claims), 2)
+                "claims_submitted": status_total(monthly_claims, "count"),
+                "amount_claimed": round(status_total(monthly_claims, "total_claimed"), 2)
             },
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
@@ -542,26 +549,20 @@ def create_nhis_endpoints(db, get_current_user):
         user: dict = Depends(get_current_user)
     ):
         """Generate claims summary report"""
-        query = {
-            "organization_id": user.get("organization_id"),
-            "created_at": {"$gte": from_date, "$lte": to_date + "T23:59:59"}
-        }
-        
-        claims = await db["nhis_claims"].find(query, {"_id": 0}).to_list(1000)
+        claims = (await analytics.summarize(
+            user.get("organization_id"), ["nhis_claims"], from_date, to_date
+        ))["nhis_claims"]
         
         # Group by status
-        by_status = {}
-        for claim in claims:
-            status = claim.get("status", "unknown")
-            if status not in by_status:
-                by_status[status] = {"count": 0, "amount": 0}
-            by_status[status]["count"] += 1
-            by_status[status]["amount"] += claim.get("total_claimed", 0)
+        by_status = {
+            status: {"count": counters["count"], "amount": counters["total_claimed"]}
+            for status, counters in claims.items()
+        }
         
         return {
             "period": {"from": from_date, "to": to_date},
-            "total_claims": len(claims),
-            "total_amount": round(sum(c.get("total_claimed", 0) for c in claims), 2),
+            "total_claims": status_total(claims, "count"),
+            "total_amount": round(status_total(claims, "total_claimed"), 2),
             "by_status": by_status,
             "generated_at": datetime.now(timezone.utc).isoformat()
         }
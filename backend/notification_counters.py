@@ -0,0 +1,154 @@
+"""
+Unread Notification Counters for Yacco Health
+=============================================
+One `notification_counters` document per user holding that user's unread,
+unexpired notification counts by priority, so the notification badge is a
+single indexed document read instead of a count per priority.
+
+Notification writes go through insert_one()/update_one()/delete_one()
+(or record_created() after a bulk insert), which apply the exact before -> after
+change with $inc.
+Bulk changes (mark all read, clear all) and expiry are handled by
+reconcile_user(), one $group over the user's unread notifications: the
+counter document remembers the earliest expires_at it counted
+(next_expiry), and the first read after that moment recomputes it.
+reconcile_user() also sets `reconciled: true`; a counter document without
+it (one upserted by an $inc before the user's first read) is recomputed on
+read, so notifications from before the counters existed are included.
+
+Usage:
+    from notification_counters import UnreadCounters
+
+    counters = UnreadCounters(db)
+    await counters.insert_one(notification)
+    before = await counters.update_one({"id": nid, "user_id": uid}, {"$set": {"is_read": True}})
+    await counters.read(user_id)   # {"unread_count": 3, "by_priority": {"high": 1, "normal": 2}}
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+from db_indexes import register_indexes, IndexSpec
+
+COUNTERS_COLLECTION = "notification_counters"
+
+register_indexes(COUNTERS_COLLECTION, IndexSpec([("user_id", 1)], unique=True))
+
+
+def _counted(doc: Optional[Dict[str, Any]], now: str) -> bool:
+    """Whether a notification counts towards its user's unread badge"""
+    if not doc or not doc.get("user_id") or doc.get("is_read") is not False:
+        return False
+    return not doc.get("expires_at") or doc["expires_at"] > now
+
+
+def _updated(before: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """The document after a $set/$unset update (other operators don't touch counted fields)"""
+    after = dict(before)
+    after.update(update.get("$set", {}))
+    for field in update.get("$unset", {}):
+        after.pop(field, None)
+    return after
+
+
+class UnreadCounters:
+    """Notification writes plus the per-user unread counters they maintain"""
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db[COUNTERS_COLLECTION]
+
+    # ============== Counter updates ==============
+
+    def _change(self, doc: Dict[str, Any], delta: int) -> UpdateOne:
+        update: Dict[str, Any] = {
+            "$inc": {f"unread.{doc.get('priority') or 'normal'}": delta},
+            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+        }
+        if delta > 0 and doc.get("expires_at"):
+            update["$min"] = {"next_expiry": doc["expires_at"]}
+        return UpdateOne({"user_id": doc["user_id"]}, update, upsert=True)
+
+    async def record(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply one notification's before -> after change (either may be None)"""
+        now = datetime.now(timezone.utc).isoformat()
+        was, now_counted = _counted(before, now), _counted(after, now)
+        operations = []
+        if was and not (now_counted and before.get("priority") == after.get("priority")):
+            operations.append(self._change(before, -1))
+        if now_counted and not (was and before.get("priority") == after.get("priority")):
+            operations.append(self._change(after, 1))
+        if operations:
+            await self.collection.bulk_write(operations, ordered=True)
+
+    async def record_created(self, documents: Iterable[Dict[str, Any]]):
+        """Count newly inserted notifications with one bulk write"""
+        now = datetime.now(timezone.utc).isoformat()
+        operations = [self._change(doc, 1) for doc in documents if _counted(doc, now)]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    # ============== Notification writes ==============
+
+    async def insert_one(self, notification: Dict[str, Any]):
+        result = await self.db.notifications.insert_one(notification)
+        await self.record(None, notification)
+        return result
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update one notification; returns it as it was before, or None if nothing matched"""
+        before = await self.db.notifications.find_one_and_update(
+            query, update, projection={"_id": 0}, return_document=ReturnDocument.BEFORE
+        )
+        if before:
+            await self.record(before, _updated(before, update))
+        return before
+
+    async def delete_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Delete one notification; returns it, or None if nothing matched"""
+        deleted = await self.db.notifications.find_one_and_delete(query, projection={"_id": 0})
+        if deleted:
+            await self.record(deleted, None)
+        return deleted
+
+    # ============== Reads ==============
+
+    async def read(self, user_id: str) -> Dict[str, Any]:
+        """Unread total and non-zero counts by priority"""
+        counters = await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+        now = datetime.now(timezone.utc).isoformat()
+        if not (counters and counters.get("reconciled")) or (counters.get("next_expiry") and counters["next_expiry"] <= now):
+            counters = await self.reconcile_user(user_id)
+        by_priority = {priority: n for priority, n in (counters.get("unread") or {}).items() if n > 0}
+        return {"unread_count": sum(by_priority.values()), "by_priority": by_priority}
+
+    async def reconcile_user(self, user_id: str) -> Dict[str, Any]:
+        """Recompute a user's counters from their notifications with one $group"""
+        now = datetime.now(timezone.utc).isoformat()
+        pipeline = [
+            {"$match": {
+                "user_id": user_id,
+                "is_read": False,
+                "$or": [{"expires_at": None}, {"expires_at": {"$gt": now}}]
+            }},
+            {"$group": {
+                "_id": {"$ifNull": ["$priority", "normal"]},
+                "count": {"$sum": 1},
+                "next_expiry": {"$min": "$expires_at"}
+            }}
+        ]
+        unread: Dict[str, int] = {}
+        expiries = []
+        async for row in self.db.notifications.aggregate(pipeline):
+            unread[row["_id"]] = row["count"]
+            if row.get("next_expiry"):
+                expiries.append(row["next_expiry"])
+
+        counters = {"user_id": user_id, "unread": unread, "reconciled": True, "updated_at": now}
+        if expiries:
+            # Left unset rather than null: $min treats null as smaller than any date
+            counters["next_expiry"] = min(expiries)
+        await self.collection.replace_one({"user_id": user_id}, counters, upsert=True)
+        return counters
@@ -0,0 +1,193 @@
+"""
+Bulk Notification Fan-out for Yacco Health
+==========================================
+Delivers one notification to many users: the per-user documents are built
+from a shared template in one pass, written with unordered insert_many in
+chunks, recorded with a single audit entry for the whole batch, and pushed
+over WebSocket with one bus publish per chunk (see ws_bus), which reaches
+recipients connected to any worker.
+
+Large audiences can run as a background job instead: start_job() returns a
+job id at once and progress is kept in the `notification_jobs` collection,
+so any worker can report it. A running job refreshes updated_at after every
+chunk; get_job() marks one that has not done so for JOB_STALE_SECONDS as
+failed, since the worker running it has stopped (restart, crash) and
+nothing will finish it.
+
+Usage:
+    from notification_fanout import NotificationFanout
+
+    fanout = NotificationFanout(db, connections=chat_manager)
+    result = await fanout.send(user_ids, template)   # {"batch_id": ..., "sent": n, ...}
+    job_id = await fanout.start_job(user_ids, template)
+    job = await fanout.get_job(job_id)
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from audit_pipeline import audit_pipeline
+from db_indexes import register_indexes, IndexSpec
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "notification_jobs"
+CHUNK_SIZE = int(os.environ.get("NOTIFICATION_FANOUT_CHUNK", "1000"))
+JOB_STALE_SECONDS = int(os.environ.get("NOTIFICATION_JOB_STALE_SECONDS", "600"))
+
+register_indexes(JOBS_COLLECTION, IndexSpec([("id", 1)]))
+
+
+class NotificationFanout:
+    """Chunked bulk insert + batch audit + WebSocket push"""
+
+    def __init__(self, db, connections=None, counters=None, chunk_size: int = CHUNK_SIZE):
+        self.db = db
+        # Anything with async send_to_users({user_id: message})
+        self.connections = connections
+        # UnreadCounters to keep in step with the inserted notifications
+        self.counters = counters
+        self.chunk_size = max(1, chunk_size)
+        # Running background jobs; referenced so they are not garbage collected
+        self._jobs = set()
+
+    # ============== Delivery ==============
+
+    async def send(
+        self,
+        user_ids: Iterable[str],
+        template: Dict[str, Any],
+        actor: Optional[Dict[str, Any]] = None,
+        job_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Store template as a notification for every user (duplicates dropped)
+        and push it to those connected. Returns the batch summary.
+        """
+        recipients = list(dict.fromkeys(user_ids))
+        batch_id = str(uuid.uuid4())
+        sent = failed = pushed = 0
+
+        for start in range(0, len(recipients), self.chunk_size):
+            chunk = recipients[start:start + self.chunk_size]
+            documents = [{**template, "id": str(uuid.uuid4()), "user_id": user_id, "batch_id": batch_id} for user_id in chunk]
+            try:
+                await self.db.notifications.insert_many(documents, ordered=False)
+                delivered = documents
+            except BulkWriteError as e:
+                failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+                delivered = [doc for i, doc in enumerate(documents) if i not in failed_indexes]
+                logger.warning(f"Notification batch {batch_id}: {len(failed_indexes)} of {len(documents)} inserts failed")
+            if self.counters is not None:
+                await self.counters.record_created(delivered)
+            sent += len(delivered)
+            failed += len(documents) - len(delivered)
+            pushed += await self._push(delivered)
+
+            if job_id:
+                await self.db[JOBS_COLLECTION].update_one(
+                    {"id": job_id},
+                    {"$set": {"sent": sent, "failed": failed, "pushed": pushed,
+                              "updated_at": datetime.now(timezone.utc).isoformat()}}
+                )
+
+        await audit_pipeline.emit(self.db.audit_logs, {
+            "id": str(uuid.uuid4()),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "user_id": actor.get("id") if actor else "system",
+            "user_name": f"{actor.get('first_name', '')} {actor.get('last_name', '')}".strip() if actor else "System",
+            "user_role": actor.get("role") if actor else "system",
+            "action": "notification_batch_created",
+            "resource_type": "notification_batch",
+            "resource_id": batch_id,
+            "details": f"Notification sent to {sent} of {len(recipients)} users: {template.get('title')}",
+            "success": failed == 0,
+            "severity": "info"
+        })
+
+        return {"batch_id": batch_id, "recipients": len(recipients), "sent": sent, "failed": failed, "pushed": pushed}
+
+    async def _push(self, documents: List[Dict[str, Any]]) -> int:
+        """Publish one chunk's notifications to their recipients; returns how many were published"""
+        if self.connections is None or not documents:
+            return 0
+        await self.connections.send_to_users({
+            doc["user_id"]: {"type": "notification", "notification": {k: v for k, v in doc.items() if k != "_id"}}
+            for doc in documents
+        })
+        return len(documents)
+
+    # ============== Background jobs ==============
+
+    async def start_job(
+        self,
+        user_ids: Iterable[str],
+        template: Dict[str, Any],
+        actor: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Record a job, run send() in the background and return the job id"""
+        recipients = list(dict.fromkeys(user_ids))
+        job_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc).isoformat()
+        await self.db[JOBS_COLLECTION].insert_one({
+            "id": job_id,
+            "status": "running",
+            "title": template.get("title"),
+            "recipients": len(recipients),
+            "sent": 0,
+            "failed": 0,
+            "pushed": 0,
+            "batch_id": None,
+            "error": None,
+            "created_by": actor.get("id") if actor else "system",
+            "organization_id": actor.get("organization_id") if actor else None,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None
+        })
+        task = asyncio.create_task(self._run_job(job_id, recipients, template, actor))
+        self._jobs.add(task)
+        task.add_done_callback(self._jobs.discard)
+        return job_id
+
+    async def _run_job(self, job_id: str, recipients: List[str], template: Dict[str, Any], actor):
+        try:
+            result = await self.send(recipients, template, actor, job_id=job_id)
+            update = {"status": "completed", "batch_id": result["batch_id"], "sent": result["sent"],
+                      "failed": result["failed"], "pushed": result["pushed"]}
+        except Exception as e:
+            logger.error(f"Notification job {job_id} failed: {e}")
+            update = {"status": "failed", "error": str(e)}
+        update["completed_at"] = update["updated_at"] = datetime.now(timezone.utc).isoformat()
+        await self.db[JOBS_COLLECTION].update_one({"id": job_id}, {"$set": update})
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job, marked failed first if it is running but stopped reporting progress"""
+        job = await self.db[JOBS_COLLECTION].find_one({"id": job_id}, {"_id": 0})
+        if not job or job.get("status") != "running":
+            return job
+        now = datetime.now(timezone.utc)
+        last_seen = job.get("updated_at") or job.get("created_at") or ""
+        if last_seen > (now - timedelta(seconds=JOB_STALE_SECONDS)).isoformat():
+            return job
+        update = {
+            "status": "failed",
+            "error": f"No progress for {JOB_STALE_SECONDS} seconds; the worker running the job stopped",
+            "completed_at": now.isoformat(),
+            "updated_at": now.isoformat()
+        }
+        # Only if it is still the same stale run (it may have just reported progress)
+        result = await self.db[JOBS_COLLECTION].update_one(
+            {"id": job_id, "status": "running", "updated_at": job.get("updated_at")}, {"$set": update}
+        )
+        if result.modified_count:
+            logger.warning(f"Notification job {job_id} marked failed: no progress since {last_seen}")
+            job.update(update)
+            return job
+        return await self.db[JOBS_COLLECTION].find_one({"id": job_id}, {"_id": 0})
@@ -26,8 +26,24 @@ from enum import Enum
 import uuid
 import os
 
+from db_indexes import register_indexes, register_query_probe, IndexSpec
+from audit_pipeline import audit_pipeline
+from notification_fanout import NotificationFanout
+from notification_counters import UnreadCounters
+
 notification_router = APIRouter(prefix="/api/notifications", tags=["Notifications"])
 
+register_indexes(
+    "notifications",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("user_id", 1), ("is_read", 1), ("priority", 1)]),
+    IndexSpec([("user_id", 1), ("created_at", -1)]),
+    IndexSpec([("organization_id", 1), ("created_at", -1)]),
+)
+register_indexes("access_grants", IndexSpec([("active", 1), ("expires_at", 1)]))
+register_indexes("consent_forms", IndexSpec([("status", 1), ("expiration_date", 1)]))
+register_query_probe("notifications", {"user_id": "probe", "is_read": False})
+
 
 # ============================================================================
 # ENUMERATIONS
@@ -327,8 +343,65 @@ def generate_email_html(notification: dict) -> str:
 # NOTIFICATION SERVICE
 # ============================================================================
 
+def notification_template(
+    notification_type: NotificationType,
+    title: str,
+    message: str,
+    priority: NotificationPriority = NotificationPriority.NORMAL,
+    related_type: str = None,
+    related_id: str = None,
+    action_url: str = None,
+    action_label: str = None,
+    channels: List[NotificationChannel] = None,
+    expires_in_hours: int = None,
+    metadata: dict = None
+) -> dict:
+    """Notification document fields shared by every recipient (no id/user_id)"""
+    if channels is None:
+        channels = [NotificationChannel.IN_APP]
+    
+    now = datetime.now(timezone.utc)
+    expires_at = None
+    if expires_in_hours:
+        expires_at = (now + timedelta(hours=expires_in_hours)).isoformat()
+    
+    return {
+        "notification_type": notification_type.value if isinstance(notification_type, NotificationType) else notification_type,
+        "title": title,
+        "message": message,
+        "priority": priority.value if isinstance(priority, NotificationPriority) else priority,
+        "status": NotificationStatus.DELIVERED.value,
+        
+        "related_type": related_type,
+        "related_id": related_id,
+        "action_url": action_url,
+        "action_label": action_label,
+        
+        "channels": [c.value if isinstance(c, NotificationChannel) else c for c in channels],
+        
+        "is_read": False,
+        "read_at": None,
+        "is_dismissed": False,
+        "dismissed_at": None,
+        
+        "created_at": now.isoformat(),
+        "expires_at": expires_at,
+        
+        "in_app_delivered": NotificationChannel.IN_APP in channels or NotificationChannel.IN_APP.value in channels,
+        "email_sent": False,
+        "email_sent_at": None,
+        "sms_sent": False,
+        "push_sent": False,
+        
+        "metadata": metadata
+    }
+
+
 def create_notification_endpoints(db, get_current_user):
     """Create notification system endpoints"""
+    from staff_chat_module import chat_manager
+    unread_counters = UnreadCounters(db)
+    fanout = NotificationFanout(db, connections=chat_manager, counters=unread_counters)
     
     # ============ HELPER FUNCTIONS ============
     
@@ -348,53 +421,21 @@ def create_notification_endpoints(db, get_current_user):
         send_email: bool = False
     ) -> dict:
         """Create and store a notification"""
-        if channels is None:
-            channels = [NotificationChannel.IN_APP]
-        
-        now = datetime.now(timezone.utc)
-        expires_at = None
-        if expires_in_hours:
-            expires_at = (now + timedelta(hours=expires_in_hours)).isoformat()
-        
         notification = {
             "id": str(uuid.uuid4()),
             "user_id": user_id,
-            "notification_type": notification_type.value if isinstance(notification_type, NotificationType) else notification_type,
-            "title": title,
-            "message": message,
-            "priority": priority.value if isinstance(priority, NotificationPriority) else priority,
-            "status": NotificationStatus.DELIVERED.value,
-            
-            "related_type": related_type,
-            "related_id": related_id,
-            "action_url": action_url,
-            "action_label": action_label,
-            
-            "channels": [c.value if isinstance(c, NotificationChannel) else c for c in channels],
-            
-            "is_read": False,
-            "read_at": None,
-            "is_dismissed": False,
-            "dismissed_at": None,
-            
-            "created_at": now.isoformat(),
-            "expires_at": expires_at,
-            
-            "in_app_delivered": NotificationChannel.IN_APP in channels or NotificationChannel.IN_APP.value in channels,
-            "email_sent": False,
-            "email_sent_at": None,
-            "sms_sent": False,
-            "push_sent": False,
-            
-            "metadata": metadata
+            **notification_template(
+                notification_type, title, message, priority, related_type, related_id,
+                action_url, action_label, channels, expires_in_hours, metadata
+            )
         }
         
-        await db.notifications.insert_one(notification)
+        await unread_counters.insert_one(notification)
         
         # Log notification creation for audit
-        await db.audit_logs.insert_one({
+        await audit_pipeline.emit(db.audit_logs, {
             "id": str(uuid.uuid4()),
-            "timestamp": now.isoformat(),
+            "timestamp": notification["created_at"],
             "user_id": "system",
             "user_name": "System",
             "user_role": "system",
@@ -449,20 +490,15 @@ def create_notification_endpoints(db, get_current_user):
         notification_type: NotificationType,
         title: str,
         message: str,
-        priority: NotificationPriority = NotificationPriority.NORMAL
+        priority: NotificationPriority = NotificationPriority.NORMAL,
+        channels: List[NotificationChannel] = None,
+        actor: dict = None
     ) -> int:
-        """Send notification to multiple users"""
-        count = 0
-        for user_id in user_ids:
-            await create_notification(
-                user_id=user_id,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                priority=priority
-            )
-            count += 1
-        return count
+        """Send notification to multiple users with one bulk insert per chunk and one audit entry"""
+        result = await fanout.send(
+            user_ids, notification_template(notification_type, title, message, priority, channels=channels), actor
+        )
+        return result["sent"]
     
     async def check_expiring_access():
         """Check for expiring access grants and send notifications"""
@@ -605,11 +641,7 @@ def create_notification_endpoints(db, get_current_user):
         ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
         
         total = await db.notifications.count_documents(query)
-        unread_count = await db.notifications.count_documents({
-            "user_id": current_user["id"],
-            "is_read": False,
-            "$or": [{"expires_at": None}, {"expires_at": {"$gt": now}}]
-        })
+        unread_count = (await unread_counters.read(current_user["id"]))["unread_count"]
         
         return {
             "notifications": [NotificationResponse(**n) for n in notifications],
@@ -623,30 +655,8 @@ def create_notification_endpoints(db, get_current_user):
     async def get_unread_count(
         current_user: dict = Depends(get_current_user)
     ):
-        """Get count of unread notifications"""
-        now = datetime.now(timezone.utc).isoformat()
-        count = await db.notifications.count_documents({
-            "user_id": current_user["id"],
-            "is_read": False,
-            "$or": [{"expires_at": None}, {"expires_at": {"$gt": now}}]
-        })
-        
-        # Count by priority
-        priority_counts = {}
-        for p in NotificationPriority:
-            p_count = await db.notifications.count_documents({
-                "user_id": current_user["id"],
-                "is_read": False,
-                "priority": p.value,
-                "$or": [{"expires_at": None}, {"expires_at": {"$gt": now}}]
-            })
-            if p_count > 0:
-                priority_counts[p.value] = p_count
-        
-        return {
-            "unread_count": count,
-            "by_priority": priority_counts
-        }
+        """Get count of unread notifications (one counter document read)"""
+        return await unread_counters.read(current_user["id"])
     
     @notification_router.get("/{notification_id}")
     async def get_notification(
@@ -670,7 +680,7 @@ def create_notification_endpoints(db, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Mark a notification as read"""
-        result = await db.notifications.update_one(
+        notification = await unread_counters.update_one(
             {"id": notification_id, "user_id": current_user["id"]},
             {"$set": {
                 "is_read": True,
@@ -679,7 +689,7 @@ def create_notification_endpoints(db, get_current_user):
             }}
         )
         
-        if result.modified_count == 0:
+        if not notification:
             raise HTTPException(status_code=404, detail="Notification not found")
         
         return {"message": "Notification marked as read"}
@@ -690,7 +700,7 @@ def create_notification_endpoints(db, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Mark a notification as unread"""
-        result = await db.notifications.update_one(
+        notification = await unread_counters.update_one(
             {"id": notification_id, "user_id": current_user["id"]},
             {"$set": {
                 "is_read": False,
@@ -699,7 +709,7 @@ def create_notification_endpoints(db, get_current_user):
             }}
         )
         
-        if result.modified_count == 0:
+        if not notification:
             raise HTTPException(status_code=404, detail="Notification not found")
         
         return {"message": "Notification marked as unread"}
@@ -710,7 +720,7 @@ def create_notification_endpoints(db, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Dismiss a notification"""
-        result = await db.notifications.update_one(
+        notification = await unread_counters.update_one(
             {"id": notification_id, "user_id": current_user["id"]},
             {"$set": {
                 "is_dismissed": True,
@@ -719,7 +729,7 @@ def create_notification_endpoints(db, get_current_user):
             }}
         )
         
-        if result.modified_count == 0:
+        if not notification:
             raise HTTPException(status_code=404, detail="Notification not found")
         
         return {"message": "Notification dismissed"}
@@ -737,6 +747,7 @@ def create_notification_endpoints(db, get_current_user):
                 "status": NotificationStatus.READ.value
             }}
         )
+        await unread_counters.reconcile_user(current_user["id"])
         
         return {"message": f"Marked {result.modified_count} notifications as read"}
     
@@ -746,12 +757,12 @@ def create_notification_endpoints(db, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Delete a notification"""
-        result = await db.notifications.delete_one({
+        deleted = await unread_counters.delete_one({
             "id": notification_id,
             "user_id": current_user["id"]
         })
         
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Notification not found")
         
         return {"message": "Notification deleted"}
@@ -767,6 +778,8 @@ def create_notification_endpoints(db, get_current_user):
             query["is_read"] = True
         
         result = await db.notifications.delete_many(query)
+        if not read_only:
+            await unread_counters.reconcile_user(current_user["id"])
         
         return {"message": f"Deleted {result.deleted_count} notifications"}
     
@@ -837,22 +850,50 @@ def create_notification_endpoints(db, get_current_user):
     @notification_router.post("/send-bulk")
     async def send_bulk_notifications(
         bulk: BulkNotificationCreate,
+        background: bool = False,
         current_user: dict = Depends(get_current_user)
     ):
-        """Send notification to multiple users (Admin only)"""
+        """Send notification to multiple users (Admin only); background=true returns a job id at once"""
         if current_user.get("role") not in ["admin", "hospital_admin", "super_admin"]:
             raise HTTPException(status_code=403, detail="Admin access required")
         
+        if background:
+            template = notification_template(
+                bulk.notification_type, bulk.title, bulk.message, bulk.priority, channels=bulk.channels
+            )
+            job_id = await fanout.start_job(bulk.user_ids, template, current_user)
+            return {"message": "Bulk notification queued", "job_id": job_id}
+        
         count = await send_bulk_notification(
             user_ids=bulk.user_ids,
             notification_type=bulk.notification_type,
             title=bulk.title,
             message=bulk.message,
-            priority=bulk.priority
+            priority=bulk.priority,
+            channels=bulk.channels,
+            actor=current_user
         )
         
         return {"message": f"Sent {count} notifications"}
     
+    @notification_router.get("/jobs/{job_id}")
+    async def get_bulk_notification_job(
+        job_id: str,
+        current_user: dict = Depends(get_current_user)
+    ):
+        """Progress of a background bulk notification job"""
+        if current_user.get("role") not in ["admin", "hospital_admin", "super_admin"]:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        job = await fanout.get_job(job_id)
+        if not job or (
+            current_user.get("role") != "super_admin"
+            and job.get("organization_id") != current_user.get("organization_id")
+        ):
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        return job
+    
     @notification_router.post("/check-expirations")
     async def run_expiration_checks(
         current_user: dict = Depends(get_current_user)
@@ -970,7 +1011,7 @@ def create_notification_endpoints(db, get_current_user):
             )
         
         # Also log to audit
-        await db.audit_logs.insert_one({
+        await audit_pipeline.emit(db.audit_logs, {
             "id": str(uuid.uuid4()),
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "user_id": current_user.get("id"),
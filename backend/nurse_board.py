@@ -0,0 +1,117 @@
+"""
+Nurse Patient Board for Yacco Health
+====================================
+Builds the nurse's assigned-patient board with one aggregation over
+`nurse_assignments`: each assignment is joined to its patient, latest
+vitals, open task count and active medication count through $lookup
+sub-pipelines, so the board costs one round trip whatever the number of
+assigned patients (previously four queries per patient).
+
+Every lookup matches on patient_id / id and runs on the existing indexes:
+patients(id), vitals(patient_id, recorded_at), nurse_tasks(patient_id,
+status) and medications(patient_id, status).
+
+Usage:
+    from nurse_board import NurseBoard
+
+    board = NurseBoard(db)
+    patients = await board.assigned_patients(nurse_id, org_id)
+    last_seen = await board.latest_vitals_times(patient_ids)   # {patient_id: recorded_at}
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+OPEN_TASK_STATUSES = ["pending", "in_progress"]
+
+
+def _joined(field: str, collection: str, match: Dict[str, Any], tail: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """$lookup of collection rows whose patient_id equals the assignment's"""
+    return {"$lookup": {
+        "from": collection,
+        "let": {"patient_id": "$patient_id"},
+        "pipeline": [{"$match": {"$expr": {"$eq": ["$patient_id", "$$patient_id"]}, **match}}, *tail],
+        "as": field
+    }}
+
+
+class NurseBoard:
+    """Single-round-trip reads for the nurse portal"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def pipeline(
+        self,
+        nurse_id: str,
+        org_id: Optional[str] = None,
+        include_vitals: bool = True,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"nurse_id": nurse_id, "is_active": True}
+        if org_id:
+            query["organization_id"] = org_id
+        stages: List[Dict[str, Any]] = [
+            {"$match": query},
+            {"$limit": limit},
+            {"$lookup": {
+                "from": "patients",
+                "let": {"patient_id": "$patient_id"},
+                "pipeline": [{"$match": {"$expr": {"$eq": ["$id", "$$patient_id"]}}}, {"$limit": 1}, {"$project": {"_id": 0}}],
+                "as": "patient"
+            }},
+            {"$unwind": "$patient"},
+        ]
+        if include_vitals:
+            stages.append(_joined("latest_vitals", "vitals", {}, [
+                {"$sort": {"recorded_at": -1}}, {"$limit": 1}, {"$project": {"_id": 0}}
+            ]))
+        stages += [
+            _joined("pending_tasks", "nurse_tasks", {"nurse_id": nurse_id, "status": {"$in": OPEN_TASK_STATUSES}}, [
+                {"$count": "n"}
+            ]),
+            _joined("active_medications", "medications", {"status": "active"}, [{"$count": "n"}]),
+            {"$project": {"_id": 0}},
+        ]
+        return stages
+
+    async def assigned_patients(
+        self,
+        nurse_id: str,
+        org_id: Optional[str] = None,
+        include_vitals: bool = True,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Board rows for the nurse's active assignments (assignments whose
+        patient no longer exists are skipped), highest acuity first, then
+        by last name.
+        """
+        rows = []
+        async for row in self.db.nurse_assignments.aggregate(self.pipeline(nurse_id, org_id, include_vitals, limit)):
+            patient = row.pop("patient")
+            latest_vitals = row.pop("latest_vitals", [])
+            pending_tasks = row.pop("pending_tasks", [])
+            active_medications = row.pop("active_medications", [])
+            rows.append({
+                "assignment": row,
+                "patient": patient,
+                "latest_vitals": latest_vitals[0] if latest_vitals else None,
+                "pending_tasks_count": pending_tasks[0]["n"] if pending_tasks else 0,
+                "active_medications_count": active_medications[0]["n"] if active_medications else 0,
+                "acuity_level": row.get("acuity_level", 2)
+            })
+        rows.sort(key=lambda x: (-x.get("acuity_level", 2), x["patient"].get("last_name", "")))
+        return rows
+
+    async def latest_vitals_times(self, patient_ids: Iterable[str]) -> Dict[str, str]:
+        """Most recent vitals recorded_at per patient (patients without vitals are absent)"""
+        patient_ids = list(patient_ids)
+        if not patient_ids:
+            return {}
+        pipeline = [
+            {"$match": {"patient_id": {"$in": patient_ids}}},
+            # Same order as the (patient_id, recorded_at) index, so $first reads one entry per patient
+            {"$sort": {"patient_id": 1, "recorded_at": -1}},
+            {"$group": {"_id": "$patient_id", "recorded_at": {"$first": "$recorded_at"}}}
+        ]
+        return {row["_id"]: row["recorded_at"] async for row in self.db.vitals.aggregate(pipeline)}
@@ -15,8 +15,34 @@ from datetime import datetime, timezone, timedelta, time
 from enum import Enum
 import uuid
 
+from db_indexes import register_indexes, register_query_probe, IndexSpec
+from notification_counters import UnreadCounters
+from nurse_board import NurseBoard, OPEN_TASK_STATUSES
+from mar_schedule import MARScheduler
+
 nurse_router = APIRouter(prefix="/api/nurse", tags=["Nurse Portal"])
 
+register_indexes(
+    "nurse_assignments",
+    IndexSpec([("nurse_id", 1), ("is_active", 1)]),
+    IndexSpec([("patient_id", 1), ("is_active", 1)]),
+)
+register_indexes(
+    "nurse_tasks",
+    IndexSpec([("nurse_id", 1), ("status", 1), ("due_time", 1)]),
+    IndexSpec([("patient_id", 1), ("status", 1)]),
+)
+register_indexes(
+    "mar_entries",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("patient_id", 1), ("scheduled_time", 1)]),
+    IndexSpec([("status", 1), ("scheduled_time", 1)]),
+)
+register_indexes("nurse_shifts", IndexSpec([("nurse_id", 1), ("is_active", 1)]))
+register_indexes("nurse_reports", IndexSpec([("id", 1)]), IndexSpec([("nurse_id", 1), ("created_at", -1)]))
+register_query_probe("nurse_assignments", {"nurse_id": "probe", "is_active": True})
+register_query_probe("mar_entries", {"patient_id": "probe", "scheduled_time": {"$gte": "2024-01-01"}}, sort=[("scheduled_time", 1)])
+
 
 # ============ Enums ============
 
@@ -362,6 +388,9 @@ def is_within_shift(shift_type: ShiftType, check_time: datetime = None) -> bool:
 
 def create_nurse_portal_endpoints(db, get_current_user):
     """Create nurse portal endpoints with database and auth dependency"""
+    unread_counters = UnreadCounters(db)
+    board = NurseBoard(db)
+    mar_scheduler = MARScheduler(db)
     
     def require_nurse_role(user: dict) -> dict:
         """Verify user has nurse role"""
@@ -548,61 +577,10 @@ def create_nurse_portal_endpoints(db, get_current_user):
         
         org_id = current_user.get("organization_id")
         
-        # Get assignments for this nurse
-        query = {
-            "nurse_id": current_user["id"],
-            "is_active": True
-        }
-        if org_id:
-            query["organization_id"] = org_id
-        
-        assignments = await db.nurse_assignments.find(
-            query,
-            {"_id": 0}
-        ).to_list(100)
-        
-        # Enrich with latest patient data and vitals
-        enriched_patients = []
-        for assignment in assignments:
-            patient = await db.patients.find_one(
-                {"id": assignment["patient_id"]},
-                {"_id": 0}
-            )
-            if patient:
-                # Get latest vitals if requested
-                latest_vitals = None
-                if include_vitals:
-                    vitals = await db.vitals.find(
-                        {"patient_id": assignment["patient_id"]}
-                    ).sort("recorded_at", -1).limit(1).to_list(1)
-                    if vitals:
-                        latest_vitals = vitals[0]
-                        if "_id" in latest_vitals: del latest_vitals["_id"]
-                
-                # Get pending tasks count
-                pending_tasks = await db.nurse_tasks.count_documents({
-                    "patient_id": assignment["patient_id"],
-                    "nurse_id": current_user["id"],
-                    "status": {"$in": ["pending", "in_progress"]}
-                })
-                
-                # Get pending medications count
-                pending_meds = await db.medications.count_documents({
-                    "patient_id": assignment["patient_id"],
-                    "status": "active"
-                })
-                
-                enriched_patients.append({
-                    "assignment": assignment,
-                    "patient": patient,
-                    "latest_vitals": latest_vitals,
-                    "pending_tasks_count": pending_tasks,
-                    "active_medications_count": pending_meds,
-                    "acuity_level": assignment.get("acuity_level", 2)
-                })
-        
-        # Sort by acuity (higher first) then by name
-        enriched_patients.sort(key=lambda x: (-x.get("acuity_level", 2), x["patient"]["last_name"]))
+        # Assignments joined to patient, latest vitals and counts in one aggregation
+        enriched_patients = await board.assigned_patients(
+            current_user["id"], org_id, include_vitals=include_vitals
+        )
         
         return {
             "patients": enriched_patients,
@@ -674,7 +652,7 @@ def create_nurse_portal_endpoints(db, get_current_user):
             "is_read": False,
             "created_at": now.isoformat()
         }
-        await db.notifications.insert_one(notification)
+        await unread_counters.insert_one(notification)
         
         return {
             "message": "Patient assigned successfully",
@@ -1102,69 +1080,39 @@ def create_nurse_portal_endpoints(db, get_current_user):
         org_id = current_user.get("organization_id")
         target_date = date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
         
-        # Get active medications
-        medications = await db.medications.find({
-            "patient_id": patient_id,
-            "status": "active"
-        }, {"_id": 0}).to_list(50)
-        
-        if not medications:
+        if not await db.medications.count_documents({"patient_id": patient_id, "status": "active"}, limit=1):
             return {"message": "No active medications found", "entries_created": 0}
         
-        # Frequency to times mapping
-        frequency_times = {
-            "daily": ["09:00"],
-            "bid": ["09:00", "21:00"],
-            "tid": ["08:00", "14:00", "20:00"],
-            "qid": ["08:00", "12:00", "16:00", "20:00"],
-            "q4h": ["00:00", "04:00", "08:00", "12:00", "16:00", "20:00"],
-            "q6h": ["00:00", "06:00", "12:00", "18:00"],
-            "q8h": ["00:00", "08:00", "16:00"],
-            "q12h": ["08:00", "20:00"],
-            "prn": [],  # As needed - no scheduled times
-            "once": ["09:00"],
-            "weekly": ["09:00"],  # Only on specific days
-            "monthly": ["09:00"]  # Only on specific days
-        }
-        
-        entries_created = 0
-        now = datetime.now(timezone.utc)
-        
-        for med in medications:
-            freq = med.get("frequency", "daily").lower().replace(" ", "").replace("-", "")
-            times = frequency_times.get(freq, ["09:00"])
-            
-            for time_str in times:
-                scheduled_time = f"{target_date}T{time_str}:00+00:00"
-                
-                # Check if entry already exists
-                existing = await db.mar_entries.find_one({
-                    "patient_id": patient_id,
-                    "medication_id": med["id"],
-                    "scheduled_time": scheduled_time
-                })
-                
-                if not existing:
-                    entry = MAREntry(
-                        patient_id=patient_id,
-                        medication_id=med["id"],
-                        medication_name=med["name"],
-                        dosage=med.get("dosage", ""),
-                        route=med.get("route", "oral"),
-                        frequency=med.get("frequency", "daily"),
-                        scheduled_time=scheduled_time,
-                        organization_id=org_id or "",
-                        created_at=now.isoformat()
-                    )
-                    entry_dict = entry.model_dump(mode='json')
-                    await db.mar_entries.insert_one(entry_dict)
-                    entries_created += 1
+        entries_created = await mar_scheduler.schedule_patients([patient_id], [target_date], org_id)
         
         return {
             "message": f"MAR schedule generated for {target_date}",
             "entries_created": entries_created
         }
     
+    @nurse_router.post("/mar/generate-schedule/batch")
+    async def generate_mar_schedule_batch(
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        ward_id: Optional[str] = None,
+        current_user: dict = Depends(get_current_user)
+    ):
+        """Generate MAR schedules for every admitted patient of the organization (or ward) over a date range"""
+        require_charge_nurse_or_admin(current_user)
+        
+        start_date = start_date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        try:
+            summary = await mar_scheduler.schedule_admitted(
+                current_user.get("organization_id"), start_date, end_date, ward_id=ward_id
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {
+            "message": f"MAR schedule generated for {summary['patients']} patients, {summary['dates'][0]} to {summary['dates'][-1]}",
+            **summary
+        }
+    
     # ============ Permission Check Endpoints ============
     
     @nurse_router.get("/permissions")
@@ -1221,24 +1169,17 @@ def create_nurse_portal_endpoints(db, get_current_user):
             "is_active": True
         })
         
-        # Pending tasks
-        pending_tasks = await db.nurse_tasks.count_documents({
-            "nurse_id": nurse_id,
-            "status": {"$in": ["pending", "in_progress"]}
-        })
-        
-        # Tasks by priority
-        stat_tasks = await db.nurse_tasks.count_documents({
-            "nurse_id": nurse_id,
-            "status": {"$in": ["pending", "in_progress"]},
-            "priority": "stat"
-        })
-        
-        urgent_tasks = await db.nurse_tasks.count_documents({
-            "nurse_id": nurse_id,
-            "status": {"$in": ["pending", "in_progress"]},
-            "priority": "urgent"
-        })
+        # Pending tasks, by priority in one pass
+        tasks_by_priority = {
+            row["_id"]: row["count"]
+            async for row in db.nurse_tasks.aggregate([
+                {"$match": {"nurse_id": nurse_id, "status": {"$in": OPEN_TASK_STATUSES}}},
+                {"$group": {"_id": "$priority", "count": {"$sum": 1}}}
+            ])
+        }
+        pending_tasks = sum(tasks_by_priority.values())
+        stat_tasks = tasks_by_priority.get("stat", 0)
+        urgent_tasks = tasks_by_priority.get("urgent", 0)
         
         # Get assigned patients for medication count
         assignments = await db.nurse_assignments.find({
@@ -1262,16 +1203,13 @@ def create_nurse_portal_endpoints(db, get_current_user):
         
         # Vitals due (simplified - based on last vitals time)
         vitals_due = 0
+        last_vitals_times = await board.latest_vitals_times(patient_ids)
         for pid in patient_ids:
-            last_vitals = await db.vitals.find_one(
-                {"patient_id": pid},
-                {"recorded_at": 1}
-            )
-            if not last_vitals:
+            if pid not in last_vitals_times:
                 vitals_due += 1
             else:
                 # If last vitals > 4 hours ago, count as due
-                last_time = last_vitals.get("recorded_at", "")
+                last_time = last_vitals_times[pid]
                 if isinstance(last_time, str) and last_time:
                     try:
                         last_dt = datetime.fromisoformat(last_time.replace("Z", "+00:00"))
@@ -12,6 +12,8 @@ from datetime import datetime, timezone, timedelta
 from enum import Enum
 import uuid
 
+from notification_counters import UnreadCounters
+
 nursing_supervisor_router = APIRouter(prefix="/api/nursing-supervisor", tags=["nursing-supervisor"])
 
 
@@ -48,6 +50,7 @@ class ReportReview(BaseModel):
 
 def create_nursing_supervisor_endpoints(db, get_current_user):
     """Create nursing supervisor endpoints"""
+    unread_counters = UnreadCounters(db)
     
     def require_supervisor_role(user: dict) -> dict:
         """Verify user has supervisor role"""
@@ -286,7 +289,7 @@ def create_nursing_supervisor_endpoints(db, get_current_user):
             "is_read": False,
             "created_at": now.isoformat()
         }
-        await db.notifications.insert_one(notification)
+        await unread_counters.insert_one(notification)
         
         return {
             "message": "Patient assigned successfully",
@@ -404,7 +407,7 @@ def create_nursing_supervisor_endpoints(db, get_current_user):
             "is_read": False,
             "created_at": now.isoformat()
         }
-        await db.notifications.insert_one(notification)
+        await unread_counters.insert_one(notification)
         
         return {
             "message": "Task assigned",
@@ -509,7 +512,7 @@ def create_nursing_supervisor_endpoints(db, get_current_user):
             "is_read": False,
             "created_at": datetime.now(timezone.utc).isoformat()
         }
-        await db.notifications.insert_one(notification)
+        await unread_counters.insert_one(notification)
         
         return {"message": "Report marked as reviewed"}
     
@@ -627,7 +630,7 @@ def create_nursing_supervisor_endpoints(db, get_current_user):
             "is_read": False,
             "created_at": now.isoformat()
         }
-        await db.notifications.insert_one(notification)
+        await unread_counters.insert_one(notification)
         
         return {"message": "Nurse clocked out successfully"}
     
@@ -17,6 +17,8 @@ import secrets
 import string
 import os
 
+from principal_cache import principal_cache
+
 organization_router = APIRouter(prefix="/api/organizations", tags=["Organizations"])
 
 # ============ Enums ============
@@ -766,6 +768,7 @@ def create_organization_endpoints(db, get_current_user, hash_password):
             {"id": user_id, "organization_id": user.get("organization_id")},
             {"$set": {"is_active": False}}
         )
+        principal_cache.invalidate_user(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Staff member not found")
@@ -782,6 +785,7 @@ def create_organization_endpoints(db, get_current_user, hash_password):
             {"id": user_id, "organization_id": user.get("organization_id")},
             {"$set": {"is_active": True}}
         )
+        principal_cache.invalidate_user(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Staff member not found")
@@ -802,6 +806,7 @@ def create_organization_endpoints(db, get_current_user, hash_password):
             {"id": user_id, "organization_id": user.get("organization_id")},
             {"$set": {"role": new_role}}
         )
+        principal_cache.invalidate_user(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Staff member not found")
@@ -907,6 +912,7 @@ def create_organization_endpoints(db, get_current_user, hash_password):
             {"id": staff_id},
             {"$set": update_data}
         )
+        principal_cache.invalidate_user(staff_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Staff member not found")
@@ -932,6 +938,7 @@ def create_organization_endpoints(db, get_current_user, hash_password):
                 "password_reset_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         return {
             "message": "Password reset successfully",
@@ -955,6 +962,7 @@ def create_organization_endpoints(db, get_current_user, hash_password):
                 "suspended_by": "platform_owner"
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Staff member not found")
@@ -976,6 +984,7 @@ def create_organization_endpoints(db, get_current_user, hash_password):
                 "activated_at": now
             }}
         )
+        principal_cache.invalidate_user(staff_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Staff member not found")
@@ -994,6 +1003,7 @@ def create_organization_endpoints(db, get_current_user, hash_password):
         
         # Delete the staff member
         await db["users"].delete_one({"id": staff_id})
+        principal_cache.invalidate_user(staff_id)
         
         # Update organization user count
         if org_id:
@@ -24,6 +24,8 @@ from datetime import datetime, timezone
 from enum import Enum
 from dotenv import load_dotenv
 
+from audit_pipeline import audit_pipeline
+
 load_dotenv()
 
 
@@ -315,7 +317,7 @@ def create_pacs_integration_router(db, get_current_user) -> APIRouter:
             full_url = f"{VIEWER_URL}?study={study_uid}"
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "pacs_viewer_access",
             "resource_type": "dicom_study",
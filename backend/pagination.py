@@ -0,0 +1,165 @@
+"""
+Keyset Pagination for Yacco Health
+==================================
+Pages through a MongoDB query ordered by (sort_key, id) using an opaque
+cursor that holds the last row's sort value and id. Each page is a range
+scan from where the previous one stopped, so page 1000 costs the same as
+page 1 (with an index on the filter fields + sort_key + id), unlike
+skip(), which walks every earlier row.
+
+Also provides NDJSON streaming for exports: rows are read from the Mongo
+cursor in batches and written to the response as they arrive, so the full
+result set is never held in memory.
+
+Usage:
+    from pagination import KeysetPaginator, ndjson_response
+
+    PATIENT_PAGES = KeysetPaginator("last_name")
+
+    items, next_cursor = await PATIENT_PAGES.page(db.patients, query, {"_id": 0}, limit, cursor)
+    return ndjson_response(PATIENT_PAGES.stream(db.patients, query, {"_id": 0}), "patients.ndjson")
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class KeysetPaginator:
+    """Cursor pagination over (sort_key, tiebreaker) in one direction"""
+
+    def __init__(self, sort_key: str, direction: int = 1, tiebreaker: str = "id"):
+        self.sort_key = sort_key
+        self.direction = direction
+        self.tiebreaker = tiebreaker
+
+    @property
+    def sort(self) -> List[Tuple[str, int]]:
+        return [(self.sort_key, self.direction), (self.tiebreaker, self.direction)]
+
+    # ============== Cursors ==============
+
+    def encode_cursor(self, document: Dict[str, Any]) -> str:
+        payload = [self.sort_key, document.get(self.sort_key), document.get(self.tiebreaker)]
+        raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> Tuple[Any, Any]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            sort_key, value, last_id = json.loads(raw)
+        except (binascii.Error, ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        if sort_key != self.sort_key:
+            raise HTTPException(status_code=400, detail="Pagination cursor belongs to a different listing")
+        return value, last_id
+
+    def after(self, query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+        """query restricted to rows that sort after the cursor"""
+        if not cursor:
+            return query
+        value, last_id = self.decode_cursor(cursor)
+        key, tie = self.sort_key, self.tiebreaker
+        beyond = "$gt" if self.direction == 1 else "$lt"
+
+        # MongoDB sorts null/missing before every other value
+        if value is None:
+            conditions = [{key: None, tie: {beyond: last_id}}]
+            if self.direction == 1:
+                conditions.append({key: {"$ne": None}})
+        else:
+            conditions = [{key: {beyond: value}}, {key: value, tie: {beyond: last_id}}]
+            if self.direction == -1:
+                conditions.append({key: None})
+
+        keyset = {"$or": conditions}
+        return {"$and": [query, keyset]} if query else keyset
+
+    # ============== Reading ==============
+
+    async def page(
+        self,
+        collection,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return (rows, next_cursor); next_cursor is None on the last page"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        rows = await collection.find(self.after(query, cursor), projection).sort(self.sort).limit(limit + 1).to_list(limit + 1)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, self.encode_cursor(rows[-1])
+        return rows, None
+
+    def stream(
+        self,
+        collection,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Every matching row in order, fetched STREAM_BATCH_SIZE at a time.
+        The cursor is validated here, before any response has started.
+        """
+        return collection.find(self.after(query, cursor), projection).sort(self.sort).batch_size(STREAM_BATCH_SIZE)
+
+
+def ndjson_response(
+    rows: AsyncIterator[Dict[str, Any]],
+    filename: Optional[str] = None,
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+) -> StreamingResponse:
+    """Stream rows as newline-delimited JSON, one object per line"""
+
+    async def lines():
+        chunk = []
+        async for row in rows:
+            if transform:
+                row = transform(row)
+            chunk.append(json.dumps(row, default=str))
+            if len(chunk) >= 100:
+                yield "\n".join(chunk) + "\n"
+                chunk = []
+        if chunk:
+            yield "\n".join(chunk) + "\n"
+
+    headers = {"Content-Disposition": f"attachment; filename={filename}"} if filename else None
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+
+async def paginated_listing(
+    paginator: KeysetPaginator,
+    collection,
+    query: Dict[str, Any],
+    projection: Optional[Dict[str, Any]],
+    response,
+    limit: int = MAX_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
+    filename: Optional[str] = None,
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+):
+    """
+    Shared body of list routes: one page of rows with the next cursor in the
+    X-Next-Cursor header, or with format=ndjson every row from the cursor on.
+    """
+    if format == "ndjson":
+        return ndjson_response(paginator.stream(collection, query, projection, cursor), filename, transform)
+    if format not in (None, "json"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    rows, next_cursor = await paginator.page(collection, query, projection, limit, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [transform(row) for row in rows] if transform else rows
@@ -0,0 +1,107 @@
+"""
+Patient Bundle Loader for Yacco Health
+======================================
+Loads a patient's record bundle (demographics plus vitals, problems,
+medications, notes, orders, results ...) by issuing the per-collection
+queries concurrently instead of one after another, so a bundle costs
+roughly the slowest section rather than the sum of all of them. A
+semaphore caps how many of one bundle's queries are in flight at once so
+a single bundle cannot take over the connection pool.
+
+Each caller declares its sections once (collection, sort, limit,
+projection); individual loads pick a subset and may override the limit or
+projection per section.
+
+Configure the default cap with PATIENT_BUNDLE_CONCURRENCY (default 8).
+
+Usage:
+    from patient_bundle import BundleSection, PatientBundleLoader
+
+    REPORT_BUNDLE = {
+        "patient": BundleSection("patients", key="id", one=True),
+        "vitals": BundleSection("vitals", sort=[("recorded_at", -1)], limit=10),
+        "problems": BundleSection("problems", limit=50),
+    }
+
+    loader = PatientBundleLoader(db, REPORT_BUNDLE)
+    bundle = await loader.load(patient_id, include=["patient", "vitals"], limits={"vitals": 5})
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CONCURRENCY = int(os.environ.get("PATIENT_BUNDLE_CONCURRENCY", "8"))
+
+
+class BundleSection:
+    """One collection in a patient bundle, matched on key == patient id"""
+
+    def __init__(
+        self,
+        collection: str,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 100,
+        projection: Optional[Dict[str, Any]] = None,
+        key: str = "patient_id",
+        one: bool = False
+    ):
+        self.collection = collection
+        self.sort = sort
+        self.limit = limit
+        self.projection = projection or {"_id": 0}
+        self.key = key
+        self.one = one
+
+    async def fetch(
+        self,
+        db,
+        patient_id: str,
+        extra: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ):
+        query = {self.key: patient_id, **(extra or {})}
+        projection = projection or self.projection
+        if self.one:
+            return await db[self.collection].find_one(query, projection)
+        limit = limit or self.limit
+        cursor = db[self.collection].find(query, projection)
+        if self.sort:
+            cursor = cursor.sort(self.sort)
+        return await cursor.limit(limit).to_list(limit)
+
+
+class PatientBundleLoader:
+    """Concurrent loader for a fixed set of bundle sections"""
+
+    def __init__(self, db, sections: Dict[str, BundleSection], max_concurrency: int = DEFAULT_CONCURRENCY):
+        self.db = db
+        self.sections = sections
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def load(
+        self,
+        patient_id: str,
+        include: Optional[Iterable[str]] = None,
+        filters: Optional[Dict[str, Dict[str, Any]]] = None,
+        limits: Optional[Dict[str, int]] = None,
+        projections: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        {section name: rows (or one document for one=True sections)} for the
+        included sections (all by default). filters adds per-section query
+        conditions; limits and projections override the section defaults.
+        """
+        names = list(self.sections) if include is None else [name for name in include if name in self.sections]
+        filters, limits, projections = filters or {}, limits or {}, projections or {}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(name: str):
+            async with semaphore:
+                return await self.sections[name].fetch(
+                    self.db, patient_id, filters.get(name), limits.get(name), projections.get(name)
+                )
+
+        results = await asyncio.gather(*(fetch(name) for name in names))
+        return dict(zip(names, results))
@@ -0,0 +1,352 @@
+"""
+Pharmacy Directory Engine for Yacco Health
+==========================================
+In-memory query engine over the national pharmacy list.
+
+- Rows are serialized once (enum members -> values, status filled in).
+- Filter indexes: id, region, ownership type, tier, city and the
+  has_nhis / has_24hr_service / has_delivery flags, as sets of row numbers.
+- Nearest-pharmacy search uses a KD-tree over unit-sphere (x, y, z) vectors,
+  so chord distance orders results exactly like great-circle distance.
+  Filtered k-nearest queries use a KD-tree built (once, lazily) over just the
+  matching pharmacies, or brute-force when only a few match.
+
+Usage:
+    from pharmacy_directory import PharmacyDirectory
+
+    directory = PharmacyDirectory(SEED_PHARMACIES)
+    rows = directory.nearest(5.6037, -0.1870, k=5, has_24hr_service=True, has_nhis=True)
+"""
+
+import heapq
+import math
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Filtered nearest queries with at most this many candidates skip the tree
+BRUTE_FORCE_CANDIDATES = 256
+
+# Per-filter-combination search trees kept for nearest queries
+MAX_CACHED_FILTERS = 64
+
+FLAG_FIELDS = ("has_nhis", "has_24hr_service", "has_delivery")
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _unit_vector(lat: float, lng: float) -> Tuple[float, float, float]:
+    phi, lmb = math.radians(lat), math.radians(lng)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lmb), cos_phi * math.sin(lmb), math.sin(phi))
+
+
+def _chord_for_km(km: float) -> float:
+    """Squared chord length on the unit sphere matching a great-circle distance"""
+    angle = min(math.pi, km / EARTH_RADIUS_KM)
+    return (2 * math.sin(angle / 2)) ** 2
+
+
+def _serialize(pharmacy: Dict[str, Any]) -> Dict[str, Any]:
+    row = {k: v.value if isinstance(v, Enum) else v for k, v in pharmacy.items()}
+    row.setdefault("status", "active")
+    return row
+
+
+# ============== Spatial Index ==============
+
+class KDTree:
+    """
+    Static 3-d tree over (x, y, z) points with leaf buckets.
+
+    Nodes live in flat lists: a node is either a leaf (axis == -1) holding
+    point ids, or a split on axis at value with left/right children.
+    """
+
+    LEAF_SIZE = 16
+
+    def __init__(self, points: List[Tuple[float, float, float]], ids: Iterable[int]):
+        self.points = points
+        self._axis: List[int] = []
+        self._split: List[float] = []
+        self._left: List[int] = []
+        self._right: List[int] = []
+        self._bucket: List[Tuple[int, ...]] = []
+        ids = list(ids)
+        self.root = self._build(ids) if ids else -1
+
+    def _new_node(self) -> int:
+        self._axis.append(-1)
+        self._split.append(0.0)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._bucket.append(())
+        return len(self._axis) - 1
+
+    def _build(self, ids: List[int]) -> int:
+        node = self._new_node()
+        if len(ids) <= self.LEAF_SIZE:
+            self._bucket[node] = tuple(ids)
+            return node
+
+        points = self.points
+        spreads = [
+            max(points[i][a] for i in ids) - min(points[i][a] for i in ids)
+            for a in range(3)
+        ]
+        axis = spreads.index(max(spreads))
+        if spreads[axis] == 0:
+            # All points coincide; splitting further cannot separate them
+            self._bucket[node] = tuple(ids)
+            return node
+
+        ids.sort(key=lambda i: points[i][axis])
+        mid = len(ids) // 2
+        self._axis[node] = axis
+        self._split[node] = points[ids[mid]][axis]
+        self._left[node] = self._build(ids[:mid])
+        self._right[node] = self._build(ids[mid:])
+        return node
+
+    def nearest(self, target: Tuple[float, float, float], k: int,
+                max_sq: float = float("inf")) -> List[Tuple[float, int]]:
+        """Up to k (squared chord, id) pairs nearest target within max_sq"""
+        if self.root < 0 or k <= 0:
+            return []
+        tx, ty, tz = target
+        points = self.points
+        axes, splits, lefts, rights, buckets = self._axis, self._split, self._left, self._right, self._bucket
+        best: List[Tuple[float, int]] = []  # max-heap via negated distance
+        bound = max_sq
+
+        # (min possible squared distance to the subtree, node)
+        stack = [(0.0, self.root)]
+        while stack:
+            lower, node = stack.pop()
+            if lower > bound:
+                continue
+            axis = axes[node]
+            if axis < 0:
+                for i in buckets[node]:
+                    px, py, pz = points[i]
+                    d = (px - tx) ** 2 + (py - ty) ** 2 + (pz - tz) ** 2
+                    if d > bound:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, -i))
+                        if len(best) == k:
+                            bound = min(bound, -best[0][0])
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, -i))
+                        bound = min(max_sq, -best[0][0])
+                continue
+
+            diff = target[axis] - splits[node]
+            near, far = (lefts[node], rights[node]) if diff < 0 else (rights[node], lefts[node])
+            gap = diff * diff
+            # Push far first so the near side is explored first
+            if gap <= bound:
+                stack.append((max(lower, gap), far))
+            stack.append((lower, near))
+
+        return sorted((-d, -i) for d, i in best)
+
+
+# ============== Directory ==============
+
+class PharmacyDirectory:
+    """Read-only pharmacy directory with filter indexes, aggregates and nearest search"""
+
+    def __init__(self, pharmacies: List[Dict[str, Any]]):
+        self.rows: List[Dict[str, Any]] = [_serialize(p) for p in pharmacies]
+        self._all: Set[int] = set(range(len(self.rows)))
+
+        self._by_id: Dict[str, int] = {}
+        self._region: Dict[str, Set[int]] = {}
+        self._ownership: Dict[str, Set[int]] = {}
+        self._tier: Dict[str, Set[int]] = {}
+        self._city: Dict[str, Set[int]] = {}
+        self._flags: Dict[str, Set[int]] = {flag: set() for flag in FLAG_FIELDS}
+        self._search_text: List[Tuple[str, str, str]] = []
+
+        points: List[Tuple[float, float, float]] = []
+        located: List[int] = []
+        for i, row in enumerate(self.rows):
+            self._by_id.setdefault(row.get("id"), i)
+            for index, key in (
+                (self._region, row.get("region")),
+                (self._ownership, row.get("ownership_type")),
+                (self._tier, row.get("tier")),
+                (self._city, row.get("city", "").lower()),
+            ):
+                if key is not None:
+                    index.setdefault(key, set()).add(i)
+            for flag in FLAG_FIELDS:
+                if row.get(flag):
+                    self._flags[flag].add(i)
+            self._search_text.append((
+                row.get("name", "").lower(), row.get("city", "").lower(), row.get("address", "").lower()
+            ))
+
+            coords = row.get("coordinates")
+            if coords and coords.get("lat") is not None and coords.get("lng") is not None:
+                points.append(_unit_vector(coords["lat"], coords["lng"]))
+                located.append(i)
+            else:
+                points.append((0.0, 0.0, 0.0))
+
+        self.tree = KDTree(points, located)
+        self._located: Set[int] = set(located)
+        self._filtered: Dict[Tuple[Tuple[str, Any], ...], Any] = {}
+
+        self.stats = self._build_stats()
+        self.chains = self._build_chains()
+
+    # ============== Lookups ==============
+
+    def get(self, pharmacy_id: str) -> Optional[Dict[str, Any]]:
+        i = self._by_id.get(pharmacy_id)
+        return self.rows[i] if i is not None else None
+
+    def filter_ids(
+        self,
+        region: Optional[str] = None,
+        city: Optional[str] = None,
+        ownership_type: Optional[str] = None,
+        tier: Optional[str] = None,
+        has_nhis: Optional[bool] = None,
+        has_24hr_service: Optional[bool] = None,
+        has_delivery: Optional[bool] = None,
+    ) -> Set[int]:
+        """Row numbers matching every given filter; city matches as a substring"""
+        include: List[Set[int]] = []
+        exclude: List[Set[int]] = []
+        if region:
+            include.append(self._region.get(region, set()))
+        if ownership_type:
+            include.append(self._ownership.get(ownership_type, set()))
+        if tier:
+            include.append(self._tier.get(tier, set()))
+        if city:
+            needle = city.lower()
+            include.append(set().union(*(ids for name, ids in self._city.items() if needle in name)))
+        for flag, wanted in (("has_nhis", has_nhis), ("has_24hr_service", has_24hr_service),
+                             ("has_delivery", has_delivery)):
+            if wanted is True:
+                include.append(self._flags[flag])
+            elif wanted is False:
+                exclude.append(self._flags[flag])
+
+        if include:
+            include.sort(key=len)
+            ids = set(include[0])
+            for other in include[1:]:
+                ids &= other
+        else:
+            ids = set(self._all)
+        for other in exclude:
+            ids -= other
+        return ids
+
+    def text_ids(self, query: str, ids: Optional[Set[int]] = None) -> List[int]:
+        """Row numbers (in directory order) whose name, city or address contains query"""
+        needle = query.lower()
+        candidates = range(len(self.rows)) if ids is None else sorted(ids)
+        return [i for i in candidates if any(needle in t for t in self._search_text[i])]
+
+    def page(self, ids: Iterable[int], offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Rows for ids in directory order"""
+        ordered = ids if isinstance(ids, list) else sorted(ids)
+        return [self.rows[i] for i in ordered[offset:offset + limit]]
+
+    # ============== Nearest ==============
+
+    def nearest(self, lat: float, lng: float, k: int = 10,
+                radius_km: Optional[float] = None, **filters) -> List[Dict[str, Any]]:
+        """
+        k pharmacies closest to (lat, lng) matching filter_ids(**filters),
+        nearest first, each with distance_km. Pharmacies without coordinates
+        are never returned.
+        """
+        active = {name: value for name, value in filters.items() if value is not None and value != ""}
+        max_sq = _chord_for_km(radius_km) if radius_km is not None else float("inf")
+        target = _unit_vector(lat, lng)
+
+        candidates = self._nearest_candidates(tuple(sorted(active.items())))
+        if isinstance(candidates, KDTree):
+            hits = candidates.nearest(target, k, max_sq=max_sq)
+        else:
+            tx, ty, tz = target
+            points = self.tree.points
+            scored = []
+            for i in candidates:
+                px, py, pz = points[i]
+                d = (px - tx) ** 2 + (py - ty) ** 2 + (pz - tz) ** 2
+                if d <= max_sq:
+                    scored.append((d, i))
+            hits = heapq.nsmallest(k, scored)
+
+        results = []
+        for _, i in hits:
+            row = self.rows[i]
+            coords = row["coordinates"]
+            results.append({
+                **row,
+                "distance_km": round(haversine_km(lat, lng, coords["lat"], coords["lng"]), 2)
+            })
+        return results
+
+    def _nearest_candidates(self, key: Tuple[Tuple[str, Any], ...]):
+        """
+        Search structure for one filter combination: the full tree, a KD-tree
+        over just the matching pharmacies, or a small id set to brute-force.
+        Built on first use and kept (bounded) since the directory never changes.
+        """
+        if not key:
+            return self.tree
+        cached = self._filtered.get(key)
+        if cached is None:
+            accept = self.filter_ids(**dict(key)) & self._located
+            cached = accept if len(accept) <= BRUTE_FORCE_CANDIDATES else KDTree(self.tree.points, accept)
+            if len(self._filtered) >= MAX_CACHED_FILTERS:
+                self._filtered.pop(next(iter(self._filtered)))
+            self._filtered[key] = cached
+        return cached
+
+    # ============== Aggregates ==============
+
+    def _build_stats(self) -> Dict[str, Any]:
+        return {
+            "total_pharmacies": len(self.rows),
+            "by_region": {region: len(ids) for region, ids in self._region.items()},
+            "by_ownership": {ownership: len(ids) for ownership, ids in self._ownership.items()},
+            "nhis_accredited": len(self._flags["has_nhis"]),
+            "24hr_service": len(self._flags["has_24hr_service"]),
+            "with_delivery": len(self._flags["has_delivery"])
+        }
+
+    def _build_chains(self) -> List[Dict[str, Any]]:
+        chains: Dict[str, Dict[str, Any]] = {}
+        for i in sorted(self._ownership.get("chain", ())):
+            row = self.rows[i]
+            # Extract chain name from pharmacy name
+            name = row.get("name", "")
+            chain_name = name.split(" - ")[0] if " - " in name else name
+            if chain_name not in chains:
+                chains[chain_name] = {"name": chain_name, "locations": [], "count": 0}
+            chains[chain_name]["locations"].append({
+                "id": row.get("id"),
+                "name": row.get("name"),
+                "city": row.get("city"),
+                "region": row.get("region")
+            })
+            chains[chain_name]["count"] += 1
+        return list(chains.values())
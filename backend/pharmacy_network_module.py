@@ -5,6 +5,9 @@ Comprehensive database of pharmacies across Ghana including:
 - Private Hospital Pharmacies
 - Retail/Community Pharmacies
 - Wholesale/Distribution Pharmacies
+
+Queries go through PHARMACY_DIRECTORY (see pharmacy_directory.py); seed
+pharmacies get lat/lng from the locality gazetteer below.
 """
 
 import uuid
@@ -14,6 +17,8 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from enum import Enum
 
+from pharmacy_directory import PharmacyDirectory
+
 pharmacy_network_router = APIRouter(prefix="/api/pharmacy-network", tags=["Pharmacy Network"])
 
 
@@ -2126,6 +2131,79 @@ SEED_PHARMACIES = [
 ]
 
 
+# ============== Locality Gazetteer ==============
+# Approximate town centres, plus neighbourhoods for the larger cities, used to
+# place seed pharmacies that have no explicit coordinates.
+
+CITY_COORDINATES = {
+    "Accra": (5.6037, -0.1870), "Kumasi": (6.6885, -1.6244), "Tema": (5.6698, -0.0166),
+    "Tamale": (9.4008, -0.8393), "Takoradi": (4.8845, -1.7554), "Sekondi": (4.9340, -1.7137),
+    "Sunyani": (7.3349, -2.3123), "Koforidua": (6.0941, -0.2591), "Cape Coast": (5.1053, -1.2466),
+    "Wa": (10.0601, -2.5099), "Techiman": (7.5862, -1.9384), "Ho": (6.6008, 0.4713),
+    "Tarkwa": (5.3018, -1.9930), "Obuasi": (6.2024, -1.6673), "Goaso": (6.8036, -2.5172),
+    "Bolgatanga": (10.7856, -0.8514), "Ashaiman": (5.6946, -0.0334), "Yendi": (9.4427, -0.0099),
+    "Winneba": (5.3511, -0.6231), "Sefwi Wiawso": (6.2058, -2.4894), "Saltpond": (5.2091, -1.0602),
+    "Nsawam": (5.8089, -0.3503), "Navrongo": (10.8956, -1.0921), "Nalerigu": (10.5271, -0.3698),
+    "Mampong": (7.0627, -1.4001), "Keta": (5.9179, 0.9879), "Kasoa": (5.5345, -0.4168),
+    "Jirapa": (10.5377, -2.6985), "Jasikan": (7.4042, 0.4736), "Hohoe": (7.1519, 0.4736),
+    "Gambaga": (10.5307, -0.4421), "Ejisu": (6.7196, -1.4815), "Damongo": (9.0833, -1.8167),
+    "Dambai": (8.0667, 0.1833), "Bole": (9.0333, -2.4833), "Bibiani": (6.4634, -2.3194),
+    "Berekum": (7.4534, -2.5840), "Bawku": (11.0616, -0.2417), "Axim": (4.8699, -2.2405),
+    "Akropong": (5.9744, -0.0871),
+}
+
+LOCALITY_COORDINATES = {
+    "Accra": {
+        "korle bu": (5.5364, -0.2276), "north ridge": (5.5680, -0.2010), "ridge": (5.5605, -0.1990),
+        "achimota": (5.6153, -0.2286), "mamprobi": (5.5350, -0.2450), "kaneshie": (5.5640, -0.2350),
+        "dansoman": (5.5450, -0.2650), "madina": (5.6690, -0.1660), "liberation road": (5.5869, -0.1836),
+        "cantonments": (5.5750, -0.1700), "ring road east": (5.5700, -0.1800),
+        "ring road central": (5.5670, -0.2020), "ring road": (5.5670, -0.2000),
+        "east legon": (5.6350, -0.1600), "legon": (5.6508, -0.1870),
+        "airport residential": (5.6030, -0.1780), "airport road": (5.5950, -0.1800),
+        "osu": (5.5560, -0.1830), "haatso": (5.6700, -0.2100), "tetteh quarshie": (5.6220, -0.1740),
+        "spintex": (5.6300, -0.1100), "lapaz": (5.6080, -0.2500), "dzorwulu": (5.6070, -0.2010),
+        "circle": (5.5700, -0.2170), "nungua": (5.6010, -0.0770),
+        "north industrial area": (5.5900, -0.2350), "tema industrial area": (5.6550, -0.0100),
+        "la, accra": (5.5614, -0.1667),
+    },
+    "Tema": {
+        "community 11": (5.6600, -0.0050), "community 25": (5.7000, -0.0400),
+        "community 1": (5.6350, -0.0150), "community 2": (5.6450, -0.0050),
+        "community 8": (5.6500, -0.0150),
+    },
+    "Kumasi": {
+        "bantama": (6.7050, -1.6310), "adum": (6.6900, -1.6240), "manhyia": (6.7100, -1.6130),
+        "tafo": (6.7300, -1.6100), "atonsu": (6.6500, -1.5950), "ahodwo": (6.6700, -1.6200),
+        "santasi": (6.6650, -1.6450), "asafo": (6.6850, -1.6150), "knust": (6.6745, -1.5716),
+        "kejetia": (6.6950, -1.6250), "suame": (6.7200, -1.6300),
+    },
+}
+
+
+def _locate(pharmacy: dict) -> Optional[dict]:
+    """Coordinates for a seed pharmacy from its address locality, else its city centre"""
+    city = pharmacy.get("city", "")
+    address = pharmacy.get("address", "").lower()
+    localities = LOCALITY_COORDINATES.get(city, {})
+    # Longest locality name first so "east legon" wins over "legon"
+    for locality in sorted(localities, key=len, reverse=True):
+        if locality in address:
+            lat, lng = localities[locality]
+            return {"lat": lat, "lng": lng}
+    if city in CITY_COORDINATES:
+        lat, lng = CITY_COORDINATES[city]
+        return {"lat": lat, "lng": lng}
+    return None
+
+
+for _pharmacy in SEED_PHARMACIES:
+    if not _pharmacy.get("coordinates"):
+        _pharmacy["coordinates"] = _locate(_pharmacy)
+
+PHARMACY_DIRECTORY = PharmacyDirectory(SEED_PHARMACIES)
+
+
 def create_pharmacy_network_endpoints(db, get_current_user):
     """Create pharmacy network API endpoints with database injection"""
     
@@ -2142,39 +2220,14 @@ def create_pharmacy_network_endpoints(db, get_current_user):
         offset: int = Query(0, ge=0)
     ):
         """List all pharmacies in the national database with filtering"""
-        filtered = SEED_PHARMACIES.copy()
-        
-        if region:
-            filtered = [p for p in filtered if p.get("region") and p["region"].value == region]
-        if city:
-            filtered = [p for p in filtered if city.lower() in p.get("city", "").lower()]
-        if ownership_type:
-            filtered = [p for p in filtered if p.get("ownership_type") and p["ownership_type"].value == ownership_type]
-        if has_nhis is not None:
-            filtered = [p for p in filtered if p.get("has_nhis") == has_nhis]
-        if has_24hr_service is not None:
-            filtered = [p for p in filtered if p.get("has_24hr_service") == has_24hr_service]
-        if has_delivery is not None:
-            filtered = [p for p in filtered if p.get("has_delivery") == has_delivery]
-        if tier:
-            filtered = [p for p in filtered if p.get("tier") and p["tier"].value == tier]
-        
-        # Convert enums to values for JSON response
-        result = []
-        for p in filtered[offset:offset + limit]:
-            pharmacy_dict = {**p}
-            if "ownership_type" in pharmacy_dict and hasattr(pharmacy_dict["ownership_type"], "value"):
-                pharmacy_dict["ownership_type"] = pharmacy_dict["ownership_type"].value
-            if "region" in pharmacy_dict and hasattr(pharmacy_dict["region"], "value"):
-                pharmacy_dict["region"] = pharmacy_dict["region"].value
-            if "tier" in pharmacy_dict and hasattr(pharmacy_dict["tier"], "value"):
-                pharmacy_dict["tier"] = pharmacy_dict["tier"].value
-            pharmacy_dict["status"] = "active"
-            result.append(pharmacy_dict)
+        ids = PHARMACY_DIRECTORY.filter_ids(
+            region=region, city=city, ownership_type=ownership_type, tier=tier,
+            has_nhis=has_nhis, has_24hr_service=has_24hr_service, has_delivery=has_delivery
+        )
         
         return {
-            "pharmacies": result,
-            "total": len(filtered),
+            "pharmacies": PHARMACY_DIRECTORY.page(ids, offset, limit),
+            "total": len(ids),
             "limit": limit,
             "offset": offset
         }
@@ -2186,49 +2239,17 @@ def create_pharmacy_network_endpoints(db, get_current_user):
         limit: int = Query(20, ge=1, le=100)
     ):
         """Search pharmacies by name, city, or address"""
-        q_lower = q.lower()
-        results = []
-        
-        for p in SEED_PHARMACIES:
-            # Search in name, city, address
-            if (q_lower in p.get("name", "").lower() or
-                q_lower in p.get("city", "").lower() or
-                q_lower in p.get("address", "").lower()):
-                
-                # Apply region filter if provided
-                if region and p.get("region"):
-                    if p["region"].value != region:
-                        continue
-                
-                pharmacy_dict = {**p}
-                if "ownership_type" in pharmacy_dict and hasattr(pharmacy_dict["ownership_type"], "value"):
-                    pharmacy_dict["ownership_type"] = pharmacy_dict["ownership_type"].value
-                if "region" in pharmacy_dict and hasattr(pharmacy_dict["region"], "value"):
-                    pharmacy_dict["region"] = pharmacy_dict["region"].value
-                if "tier" in pharmacy_dict and hasattr(pharmacy_dict["tier"], "value"):
-                    pharmacy_dict["tier"] = pharmacy_dict["tier"].value
-                pharmacy_dict["status"] = "active"
-                results.append(pharmacy_dict)
-                
-                if len(results) >= limit:
-                    break
+        ids = PHARMACY_DIRECTORY.filter_ids(region=region) if region else None
+        results = PHARMACY_DIRECTORY.page(PHARMACY_DIRECTORY.text_ids(q, ids), 0, limit)
         
         return {"pharmacies": results, "total": len(results), "query": q}
     
     @pharmacy_network_router.get("/pharmacies/{pharmacy_id}")
     async def get_pharmacy_details(pharmacy_id: str):
         """Get details of a specific pharmacy"""
-        for p in SEED_PHARMACIES:
-            if p.get("id") == pharmacy_id:
-                pharmacy_dict = {**p}
-                if "ownership_type" in pharmacy_dict and hasattr(pharmacy_dict["ownership_type"], "value"):
-                    pharmacy_dict["ownership_type"] = pharmacy_dict["ownership_type"].value
-                if "region" in pharmacy_dict and hasattr(pharmacy_dict["region"], "value"):
-                    pharmacy_dict["region"] = pharmacy_dict["region"].value
-                if "tier" in pharmacy_dict and hasattr(pharmacy_dict["tier"], "value"):
-                    pharmacy_dict["tier"] = pharmacy_dict["tier"].value
-                pharmacy_dict["status"] = "active"
-                return pharmacy_dict
+        pharmacy = PHARMACY_DIRECTORY.get(pharmacy_id)
+        if pharmacy:
+            return pharmacy
         
         raise HTTPException(status_code=404, detail="Pharmacy not found")
     
@@ -2249,26 +2270,8 @@ def create_pharmacy_network_endpoints(db, get_current_user):
         limit: int = Query(50, ge=1, le=200)
     ):
         """Get all pharmacies in a specific region"""
-        results = []
-        
-        for p in SEED_PHARMACIES:
-            if p.get("region") and p["region"].value == region:
-                if ownership_type and p.get("ownership_type"):
-                    if p["ownership_type"].value != ownership_type:
-                        continue
-                
-                pharmacy_dict = {**p}
-                if "ownership_type" in pharmacy_dict and hasattr(pharmacy_dict["ownership_type"], "value"):
-                    pharmacy_dict["ownership_type"] = pharmacy_dict["ownership_type"].value
-                if "region" in pharmacy_dict and hasattr(pharmacy_dict["region"], "value"):
-                    pharmacy_dict["region"] = pharmacy_dict["region"].value
-                if "tier" in pharmacy_dict and hasattr(pharmacy_dict["tier"], "value"):
-                    pharmacy_dict["tier"] = pharmacy_dict["tier"].value
-                pharmacy_dict["status"] = "active"
-                results.append(pharmacy_dict)
-                
-                if len(results) >= limit:
-                    break
+        ids = PHARMACY_DIRECTORY.filter_ids(region=region, ownership_type=ownership_type)
+        results = PHARMACY_DIRECTORY.page(ids, 0, limit)
         
         return {"pharmacies": results, "total": len(results), "region": region}
     
@@ -2285,97 +2288,45 @@ def create_pharmacy_network_endpoints(db, get_current_user):
     @pharmacy_network_router.get("/stats")
     async def get_pharmacy_stats():
         """Get statistics about the pharmacy network"""
-        stats = {
-            "total_pharmacies": len(SEED_PHARMACIES),
-            "by_region": {},
-            "by_ownership": {},
-            "nhis_accredited": 0,
-            "24hr_service": 0,
-            "with_delivery": 0
-        }
-        
-        for p in SEED_PHARMACIES:
-            # By region
-            region = p.get("region")
-            if region:
-                region_name = region.value if hasattr(region, "value") else region
-                stats["by_region"][region_name] = stats["by_region"].get(region_name, 0) + 1
-            
-            # By ownership
-            ownership = p.get("ownership_type")
-            if ownership:
-                ownership_name = ownership.value if hasattr(ownership, "value") else ownership
-                stats["by_ownership"][ownership_name] = stats["by_ownership"].get(ownership_name, 0) + 1
-            
-            # Services
-            if p.get("has_nhis"):
-                stats["nhis_accredited"] += 1
-            if p.get("has_24hr_service"):
-                stats["24hr_service"] += 1
-            if p.get("has_delivery"):
-                stats["with_delivery"] += 1
-        
-        return stats
+        return PHARMACY_DIRECTORY.stats
     
     @pharmacy_network_router.get("/nearby")
     async def find_nearby_pharmacies(
-        region: str = Query(..., description="Region to search in"),
+        lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude of the patient"),
+        lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude of the patient"),
+        radius_km: Optional[float] = Query(None, gt=0, description="Only pharmacies within this distance"),
+        region: Optional[str] = Query(None, description="Region to search in"),
         city: Optional[str] = Query(None, description="City to search in"),
         has_24hr_service: Optional[bool] = Query(None, description="Only show 24-hour pharmacies"),
+        has_nhis: Optional[bool] = Query(None, description="Only show NHIS accredited pharmacies"),
         limit: int = Query(10, ge=1, le=50)
     ):
-        """Find pharmacies near a location (simplified - by region/city)"""
-        results = []
+        """
+        Find pharmacies near a location.
+        With lat/lng, returns the closest matches first with distance_km;
+        otherwise falls back to matching by region/city.
+        """
+        if lat is not None and lng is not None:
+            results = PHARMACY_DIRECTORY.nearest(
+                lat, lng, k=limit, radius_km=radius_km, region=region, city=city,
+                has_24hr_service=has_24hr_service, has_nhis=has_nhis
+            )
+            return {"pharmacies": results, "total": len(results)}
+        
+        if not region:
+            raise HTTPException(status_code=400, detail="Provide lat and lng, or a region")
         
-        for p in SEED_PHARMACIES:
-            if p.get("region") and p["region"].value == region:
-                if city and city.lower() not in p.get("city", "").lower():
-                    continue
-                if has_24hr_service is not None and p.get("has_24hr_service") != has_24hr_service:
-                    continue
-                
-                pharmacy_dict = {**p}
-                if "ownership_type" in pharmacy_dict and hasattr(pharmacy_dict["ownership_type"], "value"):
-                    pharmacy_dict["ownership_type"] = pharmacy_dict["ownership_type"].value
-                if "region" in pharmacy_dict and hasattr(pharmacy_dict["region"], "value"):
-                    pharmacy_dict["region"] = pharmacy_dict["region"].value
-                if "tier" in pharmacy_dict and hasattr(pharmacy_dict["tier"], "value"):
-                    pharmacy_dict["tier"] = pharmacy_dict["tier"].value
-                pharmacy_dict["status"] = "active"
-                results.append(pharmacy_dict)
-                
-                if len(results) >= limit:
-                    break
+        ids = PHARMACY_DIRECTORY.filter_ids(
+            region=region, city=city, has_24hr_service=has_24hr_service, has_nhis=has_nhis
+        )
+        results = PHARMACY_DIRECTORY.page(ids, 0, limit)
         
         return {"pharmacies": results, "total": len(results)}
     
     @pharmacy_network_router.get("/chains")
     async def get_pharmacy_chains():
         """Get list of major pharmacy chains in Ghana"""
-        chains = {}
-        
-        for p in SEED_PHARMACIES:
-            if p.get("ownership_type") == OwnershipType.CHAIN:
-                # Extract chain name from pharmacy name
-                name = p.get("name", "")
-                chain_name = name.split(" - ")[0] if " - " in name else name
-                
-                if chain_name not in chains:
-                    chains[chain_name] = {
-                        "name": chain_name,
-                        "locations": [],
-                        "count": 0
-                    }
-                
-                chains[chain_name]["locations"].append({
-                    "id": p.get("id"),
-                    "name": p.get("name"),
-                    "city": p.get("city"),
-                    "region": p.get("region").value if hasattr(p.get("region"), "value") else p.get("region")
-                })
-                chains[chain_name]["count"] += 1
-        
-        return {"chains": list(chains.values())}
+        return {"chains": PHARMACY_DIRECTORY.chains}
     
     return pharmacy_network_router
 
@@ -14,6 +14,7 @@ Features:
 - Automated stock reorder system
 """
 
+import asyncio
 import uuid
 import os
 from datetime import datetime, timezone, timedelta
@@ -26,6 +27,12 @@ import jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
 
+from db_indexes import register_indexes, register_query_probe, IndexSpec
+from stock_ledger import StockLedger, DrugNotFoundError, InsufficientStockError
+from ttl_cache import TTLCache
+from audit_pipeline import audit_pipeline
+from pagination import KeysetPaginator
+
 load_dotenv()
 
 pharmacy_portal_router = APIRouter(prefix="/api/pharmacy-portal", tags=["Pharmacy Portal"])
@@ -36,6 +43,75 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 JWT_SECRET = os.getenv("JWT_SECRET", "pharmacy-portal-secret-key")
 JWT_ALGORITHM = "HS256"
 
+# Dashboard figures are polled by every open pharmacist browser; writes that
+# change them invalidate the pharmacy's entry, the TTL bounds staleness for
+# writes made elsewhere (e.g. prescriptions routed in from hospitals)
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("PHARMACY_DASHBOARD_CACHE_TTL", "15"))
+
+# Public pharmacy search pages by name (see pagination.py)
+PHARMACY_PAGES = KeysetPaginator("name")
+
+
+# ============== Indexes ==============
+
+register_indexes(
+    "pharmacy_staff",
+    IndexSpec([("id", 1)], unique=True),
+    IndexSpec([("email", 1)]),
+    IndexSpec([("pharmacy_id", 1), ("role", 1)]),
+)
+register_indexes(
+    "pharmacies",
+    IndexSpec([("id", 1)], unique=True),
+    IndexSpec([("status", 1), ("name", 1), ("id", 1)]),
+    IndexSpec([("region", 1)]),
+)
+register_indexes(
+    "pharmacy_drugs",
+    IndexSpec([("id", 1), ("pharmacy_id", 1)], unique=True),
+    IndexSpec([("pharmacy_id", 1), ("is_active", 1)]),
+    IndexSpec([("pharmacy_id", 1), ("generic_name", 1)]),
+)
+register_indexes(
+    "pharmacy_inventory",
+    IndexSpec([("pharmacy_id", 1), ("drug_id", 1), ("expiry_date", 1)]),
+    IndexSpec([("pharmacy_id", 1), ("expiry_date", 1)]),
+    IndexSpec([("id", 1)]),
+)
+register_indexes("pharmacy_sales", IndexSpec([("pharmacy_id", 1), ("created_at", -1)]))
+register_indexes(
+    "pharmacy_audit_logs",
+    IndexSpec([("pharmacy_id", 1), ("timestamp", -1)]),
+    IndexSpec([("pharmacy_id", 1), ("action", 1), ("timestamp", -1)]),
+)
+register_indexes(
+    "prescription_routing",
+    IndexSpec([("pharmacy_id", 1), ("status", 1), ("created_at", -1)]),
+    IndexSpec([("id", 1)]),
+)
+register_indexes(
+    "pharmacy_prescriptions",
+    IndexSpec([("id", 1), ("pharmacy_id", 1)]),
+    IndexSpec([("prescription_id", 1), ("pharmacy_id", 1)]),
+    IndexSpec([("rx_number", 1)]),
+    IndexSpec([("tracking_code", 1)], sparse=True),
+)
+register_indexes("pharmacy_insurance_claims", IndexSpec([("pharmacy_id", 1), ("status", 1), ("submitted_at", -1)]))
+register_indexes(
+    "pharmacy_supply_requests",
+    IndexSpec([("requesting_pharmacy_id", 1), ("created_at", -1)]),
+    IndexSpec([("target_pharmacy_id", 1), ("status", 1), ("created_at", -1)]),
+)
+
+register_query_probe("pharmacy_drugs", {"id": "probe", "pharmacy_id": "probe"})
+register_query_probe(
+    "pharmacy_inventory",
+    {"pharmacy_id": "probe", "drug_id": "probe", "quantity_remaining": {"$gt": 0}},
+    sort=[("expiry_date", 1)]
+)
+register_query_probe("prescription_routing", {"pharmacy_id": "probe", "status": "sent"})
+register_query_probe("pharmacy_sales", {"pharmacy_id": "probe", "created_at": {"$gte": "2024-01-01"}})
+
 
 # ============== Enums ==============
 
@@ -234,6 +310,8 @@ def create_pharmacy_portal_router(db) -> APIRouter:
     # Initialize SMS Notifier
     from sms_notification_module import SMSNotifier
     sms_notifier = SMSNotifier(db)
+    stock_ledger = StockLedger(db)
+    dashboard_cache = TTLCache("pharmacy_dashboard", ttl_seconds=DASHBOARD_CACHE_TTL_SECONDS)
     
     # ============== Authentication Dependency ==============
     
@@ -305,9 +383,13 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         has_24hr: Optional[bool] = None,
         ownership_type: Optional[str] = None,
         limit: int = 50,
-        skip: int = 0
+        skip: int = 0,
+        cursor: Optional[str] = None
     ):
-        """Search pharmacies - PUBLIC endpoint"""
+        """
+        Search pharmacies - PUBLIC endpoint.
+        Page with next_cursor; skip is still accepted but slows down with depth.
+        """
         query = {"status": {"$in": ["active", "approved"]}}
         
         if region:
@@ -330,10 +412,15 @@ def create_pharmacy_portal_router(db) -> APIRouter:
                 {"address": {"$regex": search, "$options": "i"}}
             ]
         
-        pharmacies = await db["pharmacies"].find(
-            query, 
-            {"_id": 0, "password": 0}
-        ).sort("name", 1).skip(skip).limit(limit).to_list(limit)
+        projection = {"_id": 0, "password": 0}
+        if skip and not cursor:
+            pharmacies = await db["pharmacies"].find(query, projection).sort(
+                PHARMACY_PAGES.sort
+            ).skip(skip).limit(limit + 1).to_list(limit + 1)
+            next_cursor = PHARMACY_PAGES.encode_cursor(pharmacies[limit - 1]) if len(pharmacies) > limit else None
+            pharmacies = pharmacies[:limit]
+        else:
+            pharmacies, next_cursor = await PHARMACY_PAGES.page(db["pharmacies"], query, projection, limit, cursor)
         
         total = await db["pharmacies"].count_documents(query)
         
@@ -341,7 +428,8 @@ def create_pharmacy_portal_router(db) -> APIRouter:
             "pharmacies": pharmacies,
             "total": total,
             "limit": limit,
-            "skip": skip
+            "skip": skip,
+            "next_cursor": next_cursor
         }
     
     @router.get("/public/pharmacies/{pharmacy_id}")
@@ -440,7 +528,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         await db["pharmacy_staff"].insert_one(superintendent)
         
         # Create audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "pharmacy_registration",
@@ -756,7 +844,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         await db["pharmacy_staff"].insert_one(new_staff)
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "staff_created",
@@ -876,7 +964,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         )
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "password_reset",
@@ -918,7 +1006,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
             raise HTTPException(status_code=404, detail="Staff member not found")
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "staff_suspended",
@@ -1066,7 +1154,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         await db["pharmacy_staff"].delete_one({"id": staff_id, "pharmacy_id": pharmacy_id})
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "staff_deleted",
@@ -1132,6 +1220,8 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         
         await db["pharmacy_drugs"].insert_one(drug_record)
         
+        dashboard_cache.invalidate(pharmacy_id)
+        
         return {"message": "Drug added to catalog", "drug_id": drug_id}
     
     @router.get("/drugs")
@@ -1211,9 +1301,10 @@ def create_pharmacy_portal_router(db) -> APIRouter:
             {"id": item.drug_id},
             {"$inc": {"current_stock": item.quantity}}
         )
+        dashboard_cache.invalidate(pharmacy_id)
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "inventory_received",
@@ -1318,65 +1409,22 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         sale_id = str(uuid.uuid4())
         now = datetime.now(timezone.utc).isoformat()
         
-        total_amount = 0
-        sale_items = []
+        if any(int(item.get("quantity", 0)) <= 0 for item in sale.items):
+            raise HTTPException(status_code=400, detail="Item quantities must be positive")
         
-        for item in sale.items:
-            drug = await db["pharmacy_drugs"].find_one({
-                "id": item["drug_id"],
-                "pharmacy_id": pharmacy_id
-            })
-            
-            if not drug:
-                raise HTTPException(status_code=404, detail=f"Drug {item['drug_id']} not found")
-            
-            if drug.get("current_stock", 0) < item["quantity"]:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Insufficient stock for {drug.get('generic_name')}"
-                )
-            
-            item_total = item["quantity"] * item.get("unit_price", drug.get("unit_price", 0))
-            discount = item.get("discount", 0)
-            item_total -= discount
-            total_amount += item_total
-            
-            sale_items.append({
-                "drug_id": item["drug_id"],
-                "drug_name": drug.get("generic_name"),
-                "brand_name": drug.get("brand_name"),
-                "quantity": item["quantity"],
-                "unit_price": item.get("unit_price", drug.get("unit_price", 0)),
-                "discount": discount,
-                "total": item_total
-            })
-            
-            # Deduct from inventory (FIFO - oldest batch first)
-            remaining_qty = item["quantity"]
-            inventory_batches = await db["pharmacy_inventory"].find(
-                {
-                    "pharmacy_id": pharmacy_id,
-                    "drug_id": item["drug_id"],
-                    "quantity_remaining": {"$gt": 0}
-                }
-            ).sort("expiry_date", 1).to_list(10)
-            
-            for batch in inventory_batches:
-                if remaining_qty <= 0:
-                    break
-                deduct = min(remaining_qty, batch["quantity_remaining"])
-                await db["pharmacy_inventory"].update_one(
-                    {"id": batch["id"]},
-                    {"$inc": {"quantity_remaining": -deduct}}
-                )
-                remaining_qty -= deduct
-            
-            # Update drug stock
-            await db["pharmacy_drugs"].update_one(
-                {"id": item["drug_id"]},
-                {"$inc": {"current_stock": -item["quantity"]}}
+        # Guarded FIFO deduction: all-or-nothing across line items
+        try:
+            sale_items = await stock_ledger.deduct(pharmacy_id, sale.items)
+        except DrugNotFoundError as e:
+            raise HTTPException(status_code=404, detail=f"Drug {e.drug_id} not found")
+        except InsufficientStockError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Insufficient stock for {e.drug.get('generic_name')}"
             )
         
+        total_amount = sum(line["total"] for line in sale_items)
+        
         # Create sale record
         sale_record = {
             "id": sale_id,
@@ -1398,9 +1446,10 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         }
         
         await db["pharmacy_sales"].insert_one(sale_record)
+        dashboard_cache.invalidate(pharmacy_id)
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "sale_created",
@@ -1491,6 +1540,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
                 }
             }
         )
+        dashboard_cache.invalidate(pharmacy_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Prescription not found")
@@ -1519,6 +1569,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
                 }
             }
         )
+        dashboard_cache.invalidate(pharmacy_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Prescription not found")
@@ -1559,6 +1610,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         }
         
         await db["pharmacy_insurance_claims"].insert_one(claim_record)
+        dashboard_cache.invalidate(pharmacy_id)
         
         return {
             "message": "Insurance claim submitted",
@@ -1589,61 +1641,75 @@ def create_pharmacy_portal_router(db) -> APIRouter:
     
     # ============== DASHBOARD & ANALYTICS ==============
     
-    @router.get("/dashboard")
-    async def get_pharmacy_dashboard(user: dict = Depends(get_current_pharmacy_user)):
-        """Get pharmacy dashboard data"""
-        pharmacy_id = user.get("pharmacy_id")
-        today = datetime.now(timezone.utc).isoformat()[:10]
-        
-        # Today's sales
-        today_sales = await db["pharmacy_sales"].find(
-            {"pharmacy_id": pharmacy_id, "created_at": {"$gte": today}}
-        ).to_list(100)
+    async def compute_dashboard(pharmacy_id: str) -> dict:
+        """One aggregation per collection, run concurrently"""
+        now = datetime.now(timezone.utc)
+        today = now.isoformat()[:10]
+        thirty_days = (now + timedelta(days=30)).isoformat()[:10]
         
-        today_revenue = sum(s.get("total_amount", 0) for s in today_sales)
-        
-        # Pending prescriptions
-        pending_rx = await db["prescription_routing"].count_documents({
-            "pharmacy_id": pharmacy_id,
-            "status": "sent"
-        })
-        
-        # Low stock count
-        low_stock = await db["pharmacy_drugs"].count_documents({
-            "pharmacy_id": pharmacy_id,
-            "$expr": {"$lte": ["$current_stock", "$reorder_level"]}
-        })
+        # Today's sales: count and revenue summed server-side
+        sales_pipeline = [
+            {"$match": {"pharmacy_id": pharmacy_id, "created_at": {"$gte": today}}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "revenue": {"$sum": "$total_amount"}}}
+        ]
+        # Low stock and active catalog size in a single pass over the pharmacy's drugs
+        drugs_pipeline = [
+            {"$match": {"pharmacy_id": pharmacy_id}},
+            {"$facet": {
+                "low_stock": [
+                    {"$match": {"$expr": {"$lte": ["$current_stock", "$reorder_level"]}}},
+                    {"$count": "n"}
+                ],
+                "active": [{"$match": {"is_active": True}}, {"$count": "n"}]
+            }}
+        ]
         
-        # Expiring soon (30 days)
-        thirty_days = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()[:10]
-        expiring = await db["pharmacy_inventory"].count_documents({
-            "pharmacy_id": pharmacy_id,
-            "quantity_remaining": {"$gt": 0},
-            "expiry_date": {"$lte": thirty_days}
-        })
+        sales, drugs, pending_rx, expiring, pending_claims = await asyncio.gather(
+            db["pharmacy_sales"].aggregate(sales_pipeline).to_list(1),
+            db["pharmacy_drugs"].aggregate(drugs_pipeline).to_list(1),
+            db["prescription_routing"].count_documents({"pharmacy_id": pharmacy_id, "status": "sent"}),
+            db["pharmacy_inventory"].count_documents({
+                "pharmacy_id": pharmacy_id,
+                "quantity_remaining": {"$gt": 0},
+                "expiry_date": {"$lte": thirty_days}
+            }),
+            db["pharmacy_insurance_claims"].count_documents({"pharmacy_id": pharmacy_id, "status": "submitted"})
+        )
         
-        # Total drugs in catalog
-        total_drugs = await db["pharmacy_drugs"].count_documents({
-            "pharmacy_id": pharmacy_id,
-            "is_active": True
-        })
+        sales = sales[0] if sales else {}
+        facets = drugs[0] if drugs else {}
         
-        # Pending insurance claims
-        pending_claims = await db["pharmacy_insurance_claims"].count_documents({
-            "pharmacy_id": pharmacy_id,
-            "status": "submitted"
-        })
+        def facet_count(name):
+            bucket = facets.get(name) or [{}]
+            return bucket[0].get("n", 0)
         
         return {
-            "today_sales_count": len(today_sales),
-            "today_revenue": today_revenue,
+            "today_sales_count": sales.get("count", 0),
+            "today_revenue": sales.get("revenue", 0),
             "pending_prescriptions": pending_rx,
-            "low_stock_count": low_stock,
+            "low_stock_count": facet_count("low_stock"),
             "expiring_soon_count": expiring,
-            "total_drugs": total_drugs,
+            "total_drugs": facet_count("active"),
             "pending_insurance_claims": pending_claims
         }
     
+    @router.get("/dashboard")
+    async def get_pharmacy_dashboard(user: dict = Depends(get_current_pharmacy_user)):
+        """Get pharmacy dashboard data"""
+        pharmacy_id = user.get("pharmacy_id")
+        return await dashboard_cache.get_or_compute(pharmacy_id, lambda: compute_dashboard(pharmacy_id))
+    
+    @router.get("/dashboard/cache-stats")
+    async def get_dashboard_cache_stats(
+        user: dict = Depends(require_roles(
+            PharmacyStaffRole.PHARMACY_IT_ADMIN,
+            PharmacyStaffRole.PHARMACY_OWNER,
+            PharmacyStaffRole.SUPERINTENDENT_PHARMACIST
+        ))
+    ):
+        """Dashboard cache hit rate for this worker process"""
+        return dashboard_cache.stats()
+    
     # ============== AUDIT LOGS ==============
     
     @router.get("/audit-logs")
@@ -1884,8 +1950,10 @@ def create_pharmacy_portal_router(db) -> APIRouter:
             await db["pharmacy_drugs"].insert_one(drug_record)
             added_count += 1
         
+        dashboard_cache.invalidate(pharmacy_id)
+        
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "drugs_seeded",
@@ -1934,6 +2002,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
             {"id": drug_id, "pharmacy_id": pharmacy_id},
             {"$set": update_data}
         )
+        dashboard_cache.invalidate(pharmacy_id)
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Drug not found")
@@ -2137,7 +2206,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
             raise HTTPException(status_code=404, detail="Staff member not found")
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "platform_owner_staff_update",
             "entity_type": "staff",
@@ -2261,7 +2330,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         )
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "platform_owner_password_reset",
             "entity_type": "staff",
@@ -2285,7 +2354,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         await db["pharmacy_staff"].delete_one({"id": staff_id})
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "platform_owner_staff_deleted",
             "entity_type": "staff",
@@ -2360,7 +2429,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         await db["pharmacy_prescriptions"].insert_one(prescription_record)
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "prescription_received",
@@ -2410,7 +2479,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
             raise HTTPException(status_code=404, detail="Prescription not found or already processed")
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "prescription_accepted",
@@ -2557,8 +2626,10 @@ def create_pharmacy_portal_router(db) -> APIRouter:
                     {"$inc": {"current_stock": -quantity}}
                 )
         
+        dashboard_cache.invalidate(pharmacy_id)
+        
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "prescription_dispensed",
@@ -2624,7 +2695,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         await db["pharmacy_supply_requests"].insert_one(supply_request)
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": requesting_pharmacy_id,
             "action": "supply_request_created",
@@ -2733,7 +2804,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         )
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": f"supply_request_{response}",
@@ -2790,7 +2861,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         )
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": "supply_request_fulfilled",
@@ -3091,6 +3162,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
             {"id": rx_id},
             {"$set": update_data}
         )
+        dashboard_cache.invalidate(pharmacy_id)
         
         if result.modified_count == 0:
             # Try updating by matching different ID fields
@@ -3103,7 +3175,7 @@ def create_pharmacy_portal_router(db) -> APIRouter:
         # (Future: SMS/push notification integration)
         
         # Audit log
-        await db["pharmacy_audit_logs"].insert_one({
+        await audit_pipeline.emit(db["pharmacy_audit_logs"], {
             "id": str(uuid.uuid4()),
             "pharmacy_id": pharmacy_id,
             "action": f"prescription_status_updated_{status}",
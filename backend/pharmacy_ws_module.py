@@ -10,6 +10,8 @@ from typing import Dict, Set, Optional, List
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from enum import Enum
 
+from ws_bus import ws_bus, WebSocketBus, QueuedSocket
+
 pharmacy_ws_router = APIRouter(prefix="/api/pharmacy-ws", tags=["Pharmacy WebSocket"])
 
 
@@ -31,13 +33,21 @@ class PharmacyNotificationManager:
     """
     Manages WebSocket connections for pharmacy real-time notifications.
     Enables instant alerts when prescriptions are sent from hospitals.
+    
+    Notifications are published on the WebSocket bus, so a prescription
+    routed in one worker reaches a pharmacy connected to another; each worker
+    queues it on the QueuedSocket of every local connection for the pharmacy.
     """
     
-    def __init__(self):
+    CHANNEL = "pharmacy"
+    
+    def __init__(self, bus: WebSocketBus = ws_bus):
         # pharmacy_id -> Set of WebSocket connections
         self.connections: Dict[str, Set[WebSocket]] = {}
-        # All connections for stats
-        self._all_connections: Set[WebSocket] = set()
+        # All connections, with their outgoing queues
+        self._all_connections: Dict[WebSocket, QueuedSocket] = {}
+        self.bus = bus
+        bus.subscribe(self.CHANNEL, self.deliver)
     
     async def connect(self, websocket: WebSocket, pharmacy_id: str):
         """Connect a pharmacy client to receive real-time notifications"""
@@ -47,10 +57,12 @@ class PharmacyNotificationManager:
             self.connections[pharmacy_id] = set()
         
         self.connections[pharmacy_id].add(websocket)
-        self._all_connections.add(websocket)
+        self._all_connections[websocket] = QueuedSocket(
+            websocket, on_close=lambda sender: self.disconnect(websocket, pharmacy_id)
+        )
         
         # Send connection confirmation
-        await websocket.send_json({
+        self._all_connections[websocket].send({
             "type": "connected",
             "message": "Connected to pharmacy notification service",
             "pharmacy_id": pharmacy_id,
@@ -66,43 +78,54 @@ class PharmacyNotificationManager:
             if not self.connections[pharmacy_id]:
                 del self.connections[pharmacy_id]
         
-        self._all_connections.discard(websocket)
+        sender = self._all_connections.pop(websocket, None)
+        if sender is None:
+            return
+        sender.close()
         print(f"[WS] Pharmacy {pharmacy_id} disconnected. Total: {len(self._all_connections)} connections")
     
+    def reply(self, websocket: WebSocket, message: dict):
+        """Queue a direct reply on one connection (kept in order with its notifications)"""
+        sender = self._all_connections.get(websocket)
+        if sender is not None:
+            sender.send(message)
+    
+    def _send_local(self, pharmacy_id: str, notification: dict) -> bool:
+        """Queue a notification for this worker's clients of a pharmacy"""
+        sent = False
+        for ws in list(self.connections.get(pharmacy_id, ())):
+            sender = self._all_connections.get(ws)
+            if sender is not None and sender.send(notification):
+                sent = True
+        return sent
+    
+    def deliver(self, envelope: dict):
+        """Bus handler: queue a published notification for the clients connected to this worker"""
+        if envelope.get("op") == "pharmacy":
+            self._send_local(envelope.get("pharmacy_id"), envelope["notification"])
+        elif envelope.get("op") == "all":
+            for pharmacy_id in list(self.connections.keys()):
+                self._send_local(pharmacy_id, envelope["notification"])
+    
     async def send_notification(self, pharmacy_id: str, notification: dict):
         """
         Send a notification to all connected clients for a specific pharmacy.
-        Returns True if at least one client received the notification.
+        Returns True if at least one client on this worker had it queued;
+        clients on other workers receive it through the bus.
         """
-        if pharmacy_id not in self.connections:
-            print(f"[WS] No connections for pharmacy {pharmacy_id}")
-            return False
-        
-        disconnected = set()
-        sent = False
-        
-        for ws in self.connections[pharmacy_id]:
-            try:
-                await ws.send_json(notification)
-                sent = True
-            except Exception as e:
-                print(f"[WS] Failed to send to {pharmacy_id}: {e}")
-                disconnected.add(ws)
-        
-        # Clean up disconnected clients
-        for ws in disconnected:
-            self.connections[pharmacy_id].discard(ws)
-            self._all_connections.discard(ws)
-        
-        if not self.connections[pharmacy_id]:
-            del self.connections[pharmacy_id]
-        
+        sent = self._send_local(pharmacy_id, notification)
+        await self.bus.publish_remote(self.CHANNEL, {
+            "op": "pharmacy",
+            "pharmacy_id": pharmacy_id,
+            "notification": notification
+        })
+        if not sent:
+            print(f"[WS] No connections for pharmacy {pharmacy_id} on this worker")
         return sent
     
     async def broadcast_to_all(self, notification: dict):
         """Broadcast notification to all connected pharmacies"""
-        for pharmacy_id in list(self.connections.keys()):
-            await self.send_notification(pharmacy_id, notification)
+        await self.bus.publish(self.CHANNEL, {"op": "all", "notification": notification})
     
     def is_pharmacy_connected(self, pharmacy_id: str) -> bool:
         """Check if a pharmacy has any active connections"""
@@ -149,7 +172,7 @@ def create_pharmacy_ws_endpoints(db):
                 
                 if data.get("type") == "ping":
                     # Respond to keep-alive ping
-                    await websocket.send_json({
+                    pharmacy_notification_manager.reply(websocket, {
                         "type": "pong",
                         "timestamp": datetime.now(timezone.utc).isoformat()
                     })
@@ -177,7 +200,7 @@ def create_pharmacy_ws_endpoints(db):
                                 "read_at": datetime.now(timezone.utc).isoformat()
                             }}
                         )
-                        await websocket.send_json({
+                        pharmacy_notification_manager.reply(websocket, {
                             "type": "read_confirmed",
                             "notification_ids": notification_ids
                         })
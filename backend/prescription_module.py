@@ -10,8 +10,24 @@ from fastapi import APIRouter, HTTPException, Depends, Body
 from pydantic import BaseModel
 from enum import Enum
 
+from db_indexes import register_indexes, IndexSpec
+from audit_pipeline import audit_pipeline
+
 prescription_router = APIRouter(prefix="/api/prescriptions", tags=["e-Prescribing"])
 
+register_indexes(
+    "prescriptions",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("patient_id", 1), ("created_at", -1)]),
+    IndexSpec([("organization_id", 1), ("status", 1), ("created_at", -1)]),
+)
+register_indexes(
+    "prescription_routings",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("patient_id", 1), ("sent_at", -1)]),
+    IndexSpec([("pharmacy_id", 1), ("status", 1)]),
+)
+
 
 # ============== Enums ==============
 
@@ -272,7 +288,7 @@ def create_prescription_endpoints(db, get_current_user):
         )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "prescription_sent_to_pharmacy",
             "resource_type": "prescription",
@@ -417,7 +433,7 @@ def create_prescription_endpoints(db, get_current_user):
             del prescription_doc["_id"]
         
         # Create audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "prescription_created",
             "resource_type": "prescription",
@@ -511,7 +527,7 @@ def create_prescription_endpoints(db, get_current_user):
         )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": f"prescription_{data.status}" if data.status else "prescription_updated",
             "resource_type": "prescription",
@@ -660,7 +676,7 @@ def create_prescription_endpoints(db, get_current_user):
         )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "prescription_routed",
             "resource_type": "prescription",
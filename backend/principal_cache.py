@@ -0,0 +1,85 @@
+"""
+Principal Cache for Yacco Health
+================================
+Caches the user document that get_current_user loads for every
+authenticated request, keyed by (user id, token iat), so a burst of API
+calls from one session costs one users lookup instead of one per request.
+
+Any code that changes a user (role, password, activation, suspension,
+permissions, deletion) must call principal_cache.invalidate_user(user_id)
+afterwards; that drops the entries for every token of that user. Entries
+are per worker process, so the TTL bounds how long another worker can
+serve the old document.
+
+Configure with PRINCIPAL_CACHE_TTL (seconds, default 30; 0 disables) and
+PRINCIPAL_CACHE_SIZE.
+
+Usage:
+    from principal_cache import principal_cache
+
+    user = await principal_cache.get_or_load(user_id, payload.get("iat"), load_user)
+    principal_cache.invalidate_user(user_id)
+    principal_cache.stats()  # {"hits": ..., "misses": ..., "hit_rate": ...}
+"""
+
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from ttl_cache import TTLCache
+
+# Stale keys per user are pruned once a user has this many cached tokens
+MAX_KEYS_PER_USER = 8
+
+
+class PrincipalCache:
+    """TTLCache of user documents with per-user invalidation"""
+
+    def __init__(self, ttl_seconds: float = 30, maxsize: int = 10_000):
+        self.enabled = ttl_seconds > 0
+        self._cache = TTLCache("principals", ttl_seconds, maxsize)
+        self._keys_by_user: Dict[str, Set[Hashable]] = {}
+
+    async def get_or_load(
+        self,
+        user_id: str,
+        issued_at: Any,
+        load: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Cached user document for this token, or load() on a miss.
+        load() returning None (unknown user) is not cached.
+        Returns a copy, so callers may modify it.
+        """
+        if not self.enabled:
+            return await load()
+
+        key = (user_id, issued_at)
+        keys = self._keys_by_user.setdefault(user_id, set())
+        if key not in keys:
+            if len(keys) >= MAX_KEYS_PER_USER:
+                keys.intersection_update(k for k in keys if k in self._cache)
+            keys.add(key)
+
+        user = await self._cache.get_or_compute(key, load)
+        if user is None:
+            self._cache.invalidate(key)
+            return None
+        return dict(user)
+
+    def invalidate_user(self, user_id: Optional[str]):
+        for key in self._keys_by_user.pop(user_id, ()):
+            self._cache.invalidate(key)
+
+    def clear(self):
+        self._cache.clear()
+        self._keys_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "enabled": self.enabled, "users": len(self._keys_by_user)}
+
+
+# Global principal cache instance
+principal_cache = PrincipalCache(
+    ttl_seconds=float(os.environ.get("PRINCIPAL_CACHE_TTL", "30")),
+    maxsize=int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000"))
+)
@@ -10,6 +10,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from enum import Enum
 
+from audit_pipeline import audit_pipeline
+
 radiology_router = APIRouter(prefix="/api/radiology", tags=["Radiology"])
 
 
@@ -242,7 +244,7 @@ def create_radiology_endpoints(db, get_current_user):
         order_doc.pop("_id", None)
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "radiology_order_created",
             "resource_type": "radiology_order",
@@ -347,7 +349,7 @@ def create_radiology_endpoints(db, get_current_user):
         await db["radiology_orders"].update_one({"id": order_id}, {"$set": update_data})
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": f"radiology_order_{data.status}" if data.status else "radiology_order_updated",
             "resource_type": "radiology_order",
@@ -431,7 +433,7 @@ def create_radiology_endpoints(db, get_current_user):
         })
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "radiology_result_created",
             "resource_type": "radiology_result",
@@ -575,7 +577,7 @@ def create_radiology_endpoints(db, get_current_user):
         )
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "radiology_order_assigned",
             "resource_type": "radiology_order",
@@ -686,7 +688,7 @@ def create_radiology_endpoints(db, get_current_user):
             })
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": f"radiology_report_{data.status}",
             "resource_type": "radiology_report",
@@ -757,7 +759,7 @@ def create_radiology_endpoints(db, get_current_user):
         await db["radiology_reports"].update_one({"id": report_id}, {"$set": update_data})
         
         # Audit log
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "radiology_report_updated",
             "resource_type": "radiology_report",
@@ -951,7 +953,7 @@ def create_radiology_endpoints(db, get_current_user):
         )
         
         # Audit log for compliance
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "critical_finding_communicated",
             "resource_type": "radiology_report",
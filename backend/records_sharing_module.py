@@ -42,8 +42,50 @@ import os
 import aiofiles
 import base64
 
+from db_indexes import register_indexes, IndexSpec
+from audit_pipeline import audit_pipeline
+from patient_bundle import BundleSection, PatientBundleLoader
+from notification_counters import UnreadCounters
+
 router = APIRouter(prefix="/api/records-sharing", tags=["Records Sharing"])
 
+# Sections of a shared-records bundle, keyed by response field
+SHARED_RECORDS_BUNDLE = {
+    "patient": BundleSection("patients", key="id", one=True),
+    "vitals": BundleSection("vitals", sort=[("recorded_at", -1)], limit=50),
+    "problems": BundleSection("problems", limit=100),
+    "medications": BundleSection("medications", limit=100),
+    "allergies": BundleSection("allergies", limit=100),
+    "notes": BundleSection("clinical_notes", sort=[("created_at", -1)], limit=50),
+    "lab_results": BundleSection("lab_results", sort=[("resulted_at", -1)], limit=50),
+    "imaging_studies": BundleSection("imaging_studies", sort=[("study_date", -1)], limit=50),
+    "encounters": BundleSection("encounters", sort=[("created_at", -1)], limit=50),
+}
+
+# Grantable record types -> bundle sections
+SHARED_RECORD_TYPES = {
+    "vitals": "vitals",
+    "problems": "problems",
+    "medications": "medications",
+    "allergies": "allergies",
+    "notes": "notes",
+    "labs": "lab_results",
+    "imaging": "imaging_studies",
+}
+
+register_indexes(
+    "records_requests",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("requesting_physician_id", 1), ("status", 1), ("created_at", -1)]),
+    IndexSpec([("target_physician_id", 1), ("status", 1), ("created_at", -1)]),
+)
+register_indexes(
+    "access_grants",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("granted_physician_id", 1), ("active", 1)]),
+    IndexSpec([("patient_id", 1), ("granted_physician_id", 1), ("active", 1)]),
+)
+
 # Create uploads directory for consent forms
 CONSENT_UPLOAD_DIR = "/app/backend/uploads/consent_forms"
 os.makedirs(CONSENT_UPLOAD_DIR, exist_ok=True)
@@ -124,6 +166,8 @@ class NotificationResponse(BaseModel):
 
 def setup_routes(db, get_current_user):
     """Setup records sharing routes with database and auth dependency"""
+    unread_counters = UnreadCounters(db)
+    shared_records_loader = PatientBundleLoader(db, SHARED_RECORDS_BUNDLE)
     
     # Audit logging helper
     async def log_records_sharing_audit(
@@ -157,7 +201,7 @@ def setup_routes(db, get_current_user):
             "phi_accessed": patient_id is not None,
             "metadata": metadata
         }
-        await db.audit_logs.insert_one(audit_entry)
+        await audit_pipeline.emit(db.audit_logs, audit_entry)
         return audit_entry
     
     # ============ PHYSICIAN DIRECTORY ============
@@ -385,7 +429,7 @@ def setup_routes(db, get_current_user):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        await db.notifications.insert_one(notification_doc)
+        await unread_counters.insert_one(notification_doc)
         
         return {
             "message": "Records request submitted successfully",
@@ -584,7 +628,7 @@ def setup_routes(db, get_current_user):
                 "created_at": datetime.now(timezone.utc).isoformat()
             }
         
-        await db.notifications.insert_one(notification_doc)
+        await unread_counters.insert_one(notification_doc)
         
         # If approved, create access grant record
         if response.approved:
@@ -661,11 +705,15 @@ def setup_routes(db, get_current_user):
         # Not in the granting organization
         patient_org_id = original_request.get("requesting_organization_id") if original_request else None
         
-        # First try to find patient with the patient_id directly (might be from requesting org)
-        patient = await db.patients.find_one(
-            {"id": patient_id},
-            {"_id": 0}
-        )
+        records_types = access_grant.get("records_types", ["all"])
+        if "all" in records_types:
+            sections = list(SHARED_RECORDS_BUNDLE)
+        else:
+            sections = ["patient", *(SHARED_RECORD_TYPES[t] for t in records_types if t in SHARED_RECORD_TYPES), "encounters"]
+        
+        # Patient plus the granted record types, fetched concurrently
+        records = await shared_records_loader.load(patient_id, include=sections)
+        patient = records["patient"]
         
         if not patient:
             raise HTTPException(status_code=404, detail="Patient records not found")
@@ -673,58 +721,6 @@ def setup_routes(db, get_current_user):
         # Use the patient's actual organization_id for fetching records
         patient_org = patient.get("organization_id")
         
-        records = {"patient": patient}
-        records_types = access_grant.get("records_types", ["all"])
-        
-        # Fetch requested record types from patient's actual organization
-        if "all" in records_types or "vitals" in records_types:
-            records["vitals"] = await db.vitals.find(
-                {"patient_id": patient_id},
-                {"_id": 0}
-            ).sort("recorded_at", -1).to_list(50)
-        
-        if "all" in records_types or "problems" in records_types:
-            records["problems"] = await db.problems.find(
-                {"patient_id": patient_id},
-                {"_id": 0}
-            ).to_list(100)
-        
-        if "all" in records_types or "medications" in records_types:
-            records["medications"] = await db.medications.find(
-                {"patient_id": patient_id},
-                {"_id": 0}
-            ).to_list(100)
-        
-        if "all" in records_types or "allergies" in records_types:
-            records["allergies"] = await db.allergies.find(
-                {"patient_id": patient_id},
-                {"_id": 0}
-            ).to_list(100)
-        
-        if "all" in records_types or "notes" in records_types:
-            records["notes"] = await db.clinical_notes.find(
-                {"patient_id": patient_id},
-                {"_id": 0}
-            ).sort("created_at", -1).to_list(50)
-        
-        if "all" in records_types or "labs" in records_types:
-            records["lab_results"] = await db.lab_results.find(
-                {"patient_id": patient_id},
-                {"_id": 0}
-            ).sort("resulted_at", -1).to_list(50)
-        
-        if "all" in records_types or "imaging" in records_types:
-            records["imaging_studies"] = await db.imaging_studies.find(
-                {"patient_id": patient_id},
-                {"_id": 0}
-            ).sort("study_date", -1).to_list(50)
-        
-        # Get encounter/visit records
-        records["encounters"] = await db.encounters.find(
-            {"patient_id": patient_id},
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(50)
-        
         # Add access info
         records["access_info"] = {
             "granted_at": access_grant["granted_at"],
@@ -852,7 +848,7 @@ def setup_routes(db, get_current_user):
             "read": False,
             "created_at": datetime.now(timezone.utc).isoformat()
         }
-        await db.notifications.insert_one(notification_doc)
+        await unread_counters.insert_one(notification_doc)
         
         # AUDIT: Log the revocation
         await log_records_sharing_audit(
@@ -1196,7 +1192,7 @@ def setup_routes(db, get_current_user):
                 "read": False,
                 "created_at": datetime.now(timezone.utc).isoformat()
             }
-            await db.notifications.insert_one(notification_doc)
+            await unread_counters.insert_one(notification_doc)
         
         return {"message": "Access grant revoked successfully"}
     
@@ -23,6 +23,8 @@ import jwt
 # Import OTP module
 from otp_module import create_otp_session, verify_otp, mask_phone_number
 from db_service_v2 import get_db_service
+from audit_pipeline import audit_pipeline
+from principal_cache import principal_cache
 
 region_router = APIRouter(prefix="/api/regions", tags=["Regions & Discovery"])
 
@@ -103,6 +105,13 @@ async def seed_hospital_departments(hospital_id: str) -> int:
     return departments_created
 
 
+async def invalidate_hospital_principals(hospital_id: str):
+    """Drop the cached principal of every user of a hospital after a bulk users update"""
+    db_svc = get_db_service()
+    for user_id in await db_svc.collection("users").distinct("id", {"organization_id": hospital_id}):
+        principal_cache.invalidate_user(user_id)
+
+
 # ============ Enums ============
 
 class LocationType(str, Enum):
@@ -720,7 +729,8 @@ def create_region_endpoints(db, get_current_user, hash_password):
         role = user.get("role", "physician")
         redirect_to = ROLE_PORTAL_MAP.get(role, "/dashboard")
         
-        await db_svc.insert("audit_logs", {
+        await audit_pipeline.emit(db_svc.collection("audit_logs"), {
+            "id": str(uuid.uuid4()),
             "action": "login",
             "user_id": user["id"],
             "user_email": user["email"],
@@ -1086,7 +1096,8 @@ def create_region_endpoints(db, get_current_user, hash_password):
             {"$inc": {"user_count": 1}}
         )
         
-        await db_svc.insert("audit_logs", {
+        await audit_pipeline.emit(db_svc.collection("audit_logs"), {
+            "id": str(uuid.uuid4()),
             "event_type": "staff_created_by_super_admin",
             "user_id": user["id"],
             "target_user_id": staff_id,
@@ -1178,8 +1189,10 @@ def create_region_endpoints(db, get_current_user, hash_password):
             "is_active": False,
             "deactivated_reason": "hospital_deleted"
         })
+        await invalidate_hospital_principals(hospital_id)
         
-        await db_svc.insert("audit_logs", {
+        await audit_pipeline.emit(db_svc.collection("audit_logs"), {
+            "id": str(uuid.uuid4()),
             "event_type": "hospital_deleted",
             "user_id": user["id"],
             "hospital_id": hospital_id,
@@ -1242,8 +1255,10 @@ def create_region_endpoints(db, get_current_user, hash_password):
                 {"organization_id": hospital_id, "login_disabled_reason": {"$regex": "^hospital_"}},
                 {"$set": {"login_disabled": False}, "$unset": {"login_disabled_reason": ""}}
             )
+        await invalidate_hospital_principals(hospital_id)
         
-        await db_svc.insert("audit_logs", {
+        await audit_pipeline.emit(db_svc.collection("audit_logs"), {
+            "id": str(uuid.uuid4()),
             "event_type": "hospital_status_changed",
             "user_id": user["id"],
             "hospital_id": hospital_id,
@@ -1484,6 +1499,7 @@ def create_region_endpoints(db, get_current_user, hash_password):
             "location_id": location_id,
             "updated_at": datetime.now(timezone.utc).isoformat()
         })
+        principal_cache.invalidate_user(user_id)
         
         if old_location_id != location_id:
             await db_svc.collection("hospital_locations").update_one(
@@ -1602,7 +1618,8 @@ def create_region_endpoints(db, get_current_user, hash_password):
         }
         token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
         
-        await db_svc.insert("audit_logs", {
+        await audit_pipeline.emit(db_svc.collection("audit_logs"), {
+            "id": str(uuid.uuid4()),
             "action": "impersonate_hospital",
             "user_id": user["id"],
             "user_email": user.get("email"),
@@ -11,8 +11,22 @@ from enum import Enum
 import uuid
 import os
 
+from patient_bundle import BundleSection, PatientBundleLoader
+
 router = APIRouter(prefix="/api/reports", tags=["Reports"])
 
+# Patient data gathered for report generation
+REPORT_BUNDLE = {
+    "patient": BundleSection("patients", key="id", one=True),
+    "vitals": BundleSection("vitals", sort=[("recorded_at", -1)], limit=10),
+    "problems": BundleSection("problems", limit=50),
+    "medications": BundleSection("medications", limit=50),
+    "allergies": BundleSection("allergies", limit=50),
+    "notes": BundleSection("notes", sort=[("created_at", -1)], limit=10),
+    "orders": BundleSection("orders", sort=[("created_at", -1)], limit=20),
+    "lab_results": BundleSection("lab_results", sort=[("resulted_at", -1)], limit=10),
+}
+
 # ============ MODELS ============
 class ReportType(str, Enum):
     VISIT_SUMMARY = "visit_summary"
@@ -62,36 +76,18 @@ def setup_routes(db, get_current_user):
     """Setup report routes with database and auth dependency"""
     
     EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
+    report_loader = PatientBundleLoader(db, REPORT_BUNDLE)
     
     async def get_patient_data(patient_id: str, org_id: str = None):
         """Gather all patient data for report generation"""
-        query = {"id": patient_id}
-        if org_id:
-            query["organization_id"] = org_id
+        filters = {"patient": {"organization_id": org_id}} if org_id else None
         
-        patient = await db.patients.find_one(query, {"_id": 0})
-        if not patient:
+        # Patient and related data, fetched concurrently
+        data = await report_loader.load(patient_id, filters=filters)
+        if not data["patient"]:
             return None
         
-        # Get related data
-        vitals = await db.vitals.find({"patient_id": patient_id}, {"_id": 0}).sort("recorded_at", -1).to_list(10)
-        problems = await db.problems.find({"patient_id": patient_id}, {"_id": 0}).to_list(50)
-        medications = await db.medications.find({"patient_id": patient_id}, {"_id": 0}).to_list(50)
-        allergies = await db.allergies.find({"patient_id": patient_id}, {"_id": 0}).to_list(50)
-        notes = await db.notes.find({"patient_id": patient_id}, {"_id": 0}).sort("created_at", -1).to_list(10)
-        orders = await db.orders.find({"patient_id": patient_id}, {"_id": 0}).sort("created_at", -1).to_list(20)
-        lab_results = await db.lab_results.find({"patient_id": patient_id}, {"_id": 0}).sort("resulted_at", -1).to_list(10)
-        
-        return {
-            "patient": patient,
-            "vitals": vitals,
-            "problems": problems,
-            "medications": medications,
-            "allergies": allergies,
-            "notes": notes,
-            "orders": orders,
-            "lab_results": lab_results
-        }
+        return data
     
     def format_patient_data_for_report(data: dict, config: ReportCreate) -> str:
         """Format patient data into structured text for report"""
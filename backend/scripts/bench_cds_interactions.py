@@ -0,0 +1,99 @@
+"""
+CDS Interaction Benchmark
+Checks every pair in 20-drug polypharmacy medication lists with the previous
+string-scanning check_interaction and with CDS_KNOWLEDGE_BASE, and reports
+per-patient latency and how many findings each produced.
+
+Usage:
+    python scripts/bench_cds_interactions.py [--patients 500] [--meds 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cds_module import CDS_KNOWLEDGE_BASE, DRUG_CLASSES, DRUG_INTERACTIONS, normalize_drug_name
+
+EXTRA_DRUGS = [
+    "Metformin 500mg", "Amlodipine 10mg", "Digoxin", "Amiodarone", "Clopidogrel 75mg", "Omeprazole 20mg",
+    "Theophylline", "Methotrexate", "Potassium Chloride", "Paracetamol 1g", "Furosemide 40mg",
+    "Insulin Glargine", "Levothyroxine", "Prednisolone", "Salbutamol inhaler", "Aspirin 75mg",
+]
+
+
+def legacy_get_drug_class(drug_name: str):
+    normalized = normalize_drug_name(drug_name)
+    for drug_class, members in DRUG_CLASSES.items():
+        if any(normalize_drug_name(m) in normalized or normalized in normalize_drug_name(m) for m in members):
+            return drug_class
+    return None
+
+
+def legacy_check_interaction(drug1: str, drug2: str):
+    """The pre-compilation implementation: two passes over DRUG_INTERACTIONS per pair"""
+    d1_norm = normalize_drug_name(drug1)
+    d2_norm = normalize_drug_name(drug2)
+    for (med1, med2), interaction in DRUG_INTERACTIONS.items():
+        if (d1_norm in med1 or med1 in d1_norm) and (d2_norm in med2 or med2 in d2_norm):
+            return {"drugs": (drug1, drug2), **interaction}
+        if (d2_norm in med1 or med1 in d2_norm) and (d1_norm in med2 or med2 in d1_norm):
+            return {"drugs": (drug1, drug2), **interaction}
+    d1_class = legacy_get_drug_class(drug1)
+    d2_class = legacy_get_drug_class(drug2)
+    for (med1, med2), interaction in DRUG_INTERACTIONS.items():
+        if d1_class and d2_class:
+            if (d1_class == med1 or d1_class in med1) and (d2_class == med2 or d2_class in med2):
+                return {"drugs": (drug1, drug2), **interaction}
+    return None
+
+
+def legacy_check_list(medications):
+    findings = []
+    for i in range(len(medications)):
+        for j in range(i + 1, len(medications)):
+            interaction = legacy_check_interaction(medications[i], medications[j])
+            if interaction:
+                findings.append(interaction)
+            class_i = legacy_get_drug_class(medications[i])
+            if class_i and class_i == legacy_get_drug_class(medications[j]) and \
+                    normalize_drug_name(medications[i]) != normalize_drug_name(medications[j]):
+                findings.append({"drugs": (medications[i], medications[j])})
+    return findings
+
+
+def patients(count: int, meds: int, seed: int = 3):
+    rng = random.Random(seed)
+    pool = [m.title() for members in DRUG_CLASSES.values() for m in members] + EXTRA_DRUGS
+    return [rng.sample(pool, meds) for _ in range(count)]
+
+
+def main(count: int, meds: int):
+    cohort = patients(count, meds)
+
+    started = time.perf_counter()
+    legacy_findings = sum(len(legacy_check_list(p)) for p in cohort)
+    legacy_us = (time.perf_counter() - started) / count * 1e6
+
+    CDS_KNOWLEDGE_BASE.resolve.cache_clear()
+    started = time.perf_counter()
+    compiled_findings = sum(len(CDS_KNOWLEDGE_BASE.check_medication_list(p)) for p in cohort)
+    compiled_us = (time.perf_counter() - started) / count * 1e6
+
+    pairs = meds * (meds - 1) // 2
+    print(f"{count} patients x {meds} meds ({pairs} pairs each)")
+    print(f"  legacy   {legacy_us:9.1f} us/patient  findings={legacy_findings}")
+    print(f"  compiled {compiled_us:9.1f} us/patient  findings={compiled_findings}  "
+          f"({legacy_us / compiled_us:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--meds", type=int, default=20)
+    args = parser.parse_args()
+    main(args.patients, args.meds)
@@ -0,0 +1,132 @@
+"""
+Chat Search Benchmark
+Seeds a throwaway database with synthetic staff chat history (one million
+messages by default) and times the previous search_messages query (user's
+conversation ids, then an unanchored case-insensitive $regex over
+chat_messages) against ChatSearchIndex on the token index. The database is
+dropped afterwards.
+
+Needs a MongoDB server.
+
+Usage:
+    python scripts/bench_chat_search.py [--messages 1000000] [--conversations 5000] [--runs 20]
+    python scripts/bench_chat_search.py --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from chat_search import ChatSearchIndex, TOKENS_COLLECTION
+from db_indexes import INDEX_REGISTRY
+
+DB_NAME = "bench_chat_search"
+WORDS = (
+    "patient bed ward transfer discharge admitted review labs potassium sodium creatinine result "
+    "pending urgent please call theatre consult antibiotics dose insulin glucose chart vitals stable "
+    "febrile pain morning handover night shift pharmacy stock prescription xray scan ct mri report "
+    "family meeting consent surgery recovery icu nurse doctor registrar cover leave rota meeting"
+).split()
+QUERIES = ["potassium", "pota", "urgent consult", "mri report pending", "handover night", "zzzz"]
+
+
+async def legacy_search(db, user_id: str, query: str, limit: int = 20):
+    """The previous staff_chat_module.search_messages"""
+    conversations = await db.chat_conversations.find(
+        {"participant_ids": user_id}, {"_id": 0, "id": 1}
+    ).to_list(1000)
+    conversation_ids = [c["id"] for c in conversations]
+    return await db.chat_messages.find(
+        {"conversation_id": {"$in": conversation_ids}, "content": {"$regex": query, "$options": "i"}},
+        {"_id": 0}
+    ).sort("sent_at", -1).to_list(limit)
+
+
+async def seed(db, messages: int, conversations: int, users: int, batch: int = 10000):
+    rng = random.Random(3)
+    user_ids = [f"user-{i}" for i in range(users)]
+    conversation_ids = []
+    docs = []
+    for i in range(conversations):
+        conversation_id = str(uuid.uuid4())
+        conversation_ids.append(conversation_id)
+        docs.append({"id": conversation_id, "participant_ids": rng.sample(user_ids, rng.randint(2, 8)),
+                     "last_message_at": None})
+    await db.chat_conversations.insert_many(docs)
+
+    search = ChatSearchIndex(db)
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    written = 0
+    while written < messages:
+        chunk, entries = [], []
+        for n in range(written, min(messages, written + batch)):
+            message = {
+                "id": str(uuid.uuid4()),
+                "conversation_id": rng.choice(conversation_ids),
+                "sender_id": rng.choice(user_ids),
+                "content": " ".join(rng.choices(WORDS, k=rng.randint(4, 20))).capitalize(),
+                "sent_at": (started + timedelta(seconds=n * 30)).isoformat(),
+            }
+            chunk.append(message)
+            entries.extend(search._entries(message))
+        await db.chat_messages.insert_many(chunk, ordered=False)
+        await db[TOKENS_COLLECTION].insert_many(entries, ordered=False)
+        written += len(chunk)
+        print(f"  seeded {written}/{messages} messages", end="\r", flush=True)
+    print()
+
+    for collection in (TOKENS_COLLECTION, "chat_messages", "chat_conversations"):
+        for spec in INDEX_REGISTRY.get(collection, []):
+            await db[collection].create_indexes([spec.to_index_model()])
+    await db.chat_messages.create_index([("conversation_id", 1), ("sent_at", -1)])
+    await db.chat_conversations.create_index([("participant_ids", 1), ("last_message_at", -1)])
+    return user_ids
+
+
+async def timed(label: str, search, user_ids, runs: int):
+    rng = random.Random(9)
+    print(f"  {label}")
+    for query in QUERIES:
+        latencies = []
+        found = 0
+        for _ in range(runs):
+            started = time.perf_counter()
+            found = len(await search(rng.choice(user_ids), query))
+            latencies.append((time.perf_counter() - started) * 1000)
+        print(f"    {query!r:<22} median {statistics.median(latencies):8.2f} ms  max {max(latencies):8.2f} ms  ({found} hits)")
+
+
+async def main(args):
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[DB_NAME]
+    await client.drop_database(DB_NAME)
+    try:
+        print(f"{args.messages} messages | {args.conversations} conversations | {args.users} users | {args.mongo_url}")
+        user_ids = await seed(db, args.messages, args.conversations, args.users)
+        search = ChatSearchIndex(db)
+        await timed("$regex over $in (previous)", lambda uid, q: legacy_search(db, uid, q), user_ids, args.runs)
+        await timed("ChatSearchIndex", lambda uid, q: search.search(uid, q), user_ids, args.runs)
+    finally:
+        await client.drop_database(DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--conversations", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=20, help="searches per query")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,139 @@
+"""
+Export Memory Benchmark
+Measures peak RSS while exporting synthetic audit log rows (one million by
+default) with the previous export (to_list, then csv into a StringIO, then
+one string in the response) and with export_stream, which encodes the
+cursor chunk by chunk. Each case runs in its own process so peak RSS is
+not shared between them; the response body is consumed and discarded, as
+a client socket would.
+
+Rows come from an in-process cursor stand-in that yields batches of
+EXPORT_BATCH_SIZE like a Motor cursor, so no MongoDB server is needed.
+
+Usage:
+    python scripts/bench_export_memory.py [--rows 1000000] [--formats csv ndjson json]
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audit_module import AUDIT_EXPORT_FIELDS
+from export_stream import EXPORT_BATCH_SIZE, export_response
+
+
+class SyntheticCursor:
+    """Async iterator over generated audit rows, fetched a batch at a time"""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.position = 0
+        self.batch = []
+
+    def _row(self, n: int):
+        return {
+            "id": f"log-{n:08d}",
+            "timestamp": f"2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}T{n % 24:02d}:{n % 60:02d}:00+00:00",
+            "user_id": f"user-{n % 500}",
+            "user_name": f"Staff Member {n % 500}",
+            "user_role": ("nurse", "physician", "hospital_admin")[n % 3],
+            "action": ("view", "create", "update", "export")[n % 4],
+            "resource_type": "patient",
+            "resource_id": f"patient-{n % 20000}",
+            "patient_id": f"patient-{n % 20000}",
+            "patient_name": f"Patient {n % 20000}",
+            "ip_address": f"10.0.{n % 255}.{n % 250}",
+            "success": True,
+            "severity": "info",
+            "details": f"Viewed chart section {n % 40} during routine review",
+            "organization_id": "org-1",
+        }
+
+    async def to_list(self, length=None):
+        return [row async for row in self]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.batch:
+            if self.position >= self.rows:
+                raise StopAsyncIteration
+            end = min(self.rows, self.position + EXPORT_BATCH_SIZE)
+            self.batch = [self._row(n) for n in range(self.position, end)][::-1]
+            self.position = end
+            await asyncio.sleep(0)
+        return self.batch.pop()
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def legacy_export(rows: int, format: str) -> int:
+    """The previous audit_module.export_audit_logs body"""
+    logs = await SyntheticCursor(rows).to_list(rows)
+    if format == "json":
+        body = json.dumps({"record_count": len(logs), "logs": logs})
+        return len(body)
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=AUDIT_EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(logs)
+    output.seek(0)
+    return len(output.getvalue())
+
+
+async def streamed_export(rows: int, format: str) -> int:
+    response = export_response(
+        SyntheticCursor(rows), format, "audit_logs", fieldnames=AUDIT_EXPORT_FIELDS,
+        envelope={"export_date": "2024-01-01"}, rows_key="logs"
+    )
+    sent = 0
+    async for chunk in response.body_iterator:
+        sent += len(chunk)
+    return sent
+
+
+def run_case(mode: str, rows: int, format: str):
+    baseline = rss_mb()
+    started = time.perf_counter()
+    export = legacy_export if mode == "legacy" else streamed_export
+    size = asyncio.run(export(rows, format))
+    print(f"{rss_mb() - baseline:.1f} {rss_mb():.1f} {time.perf_counter() - started:.2f} {size}")
+
+
+def main(args):
+    print(f"{args.rows} rows")
+    for format in args.formats:
+        cases = [("streamed", "export_stream")] + ([] if format == "ndjson" else [("legacy", "to_list + StringIO (previous)")])
+        for mode, label in cases:
+            result = subprocess.run(
+                [sys.executable, __file__, "--case", mode, "--rows", str(args.rows), "--formats", format],
+                capture_output=True, text=True, check=True
+            )
+            growth, peak, seconds, size = result.stdout.split()
+            print(f"  {format:<7} {label:<30} peak RSS {float(peak):8.1f} MB (+{float(growth):7.1f})  "
+                  f"{float(seconds):6.2f} s  {int(size) / 1e6:8.1f} MB output")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson", "json"], choices=["csv", "ndjson", "json"])
+    parser.add_argument("--case", choices=["legacy", "streamed"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case:
+        run_case(args.case, args.rows, args.formats[0])
+    else:
+        main(args)
@@ -0,0 +1,94 @@
+"""
+Medication Search Microbenchmark
+Compares the previous linear search_medications scan with MedicationIndex
+on synthetic catalogs of 10k and 100k medications.
+
+Usage:
+    python scripts/bench_medication_search.py [--sizes 10000 100000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medication_database import GLOBAL_MEDICATIONS, MedicationIndex
+
+QUERIES = ["para", "amox", "amoxcilin", "augmentin", "pan", "cillin", "metformin", "zz"]
+
+
+def legacy_search(medications, query: str, category: str = None, limit: int = 50):
+    """The pre-index implementation: lowercases every name on every call"""
+    results = []
+    query_lower = query.lower() if query else ""
+    for med in medications:
+        match = False
+        if query_lower:
+            if query_lower in med["generic_name"].lower():
+                match = True
+            elif any(query_lower in brand.lower() for brand in med.get("brand_names", [])):
+                match = True
+        else:
+            match = True
+        if category and med.get("category") != category:
+            match = False
+        if match:
+            results.append(med)
+            if len(results) >= limit:
+                break
+    return results
+
+
+def synthetic_catalog(size: int, seed: int = 7):
+    """Real catalog entries plus random suffixed variants up to size"""
+    rng = random.Random(seed)
+    catalog = list(GLOBAL_MEDICATIONS)
+    while len(catalog) < size:
+        base = rng.choice(GLOBAL_MEDICATIONS)
+        suffix = "".join(rng.choices(string.ascii_lowercase, k=5))
+        catalog.append({
+            **base,
+            "generic_name": f"{base['generic_name']} {suffix}",
+            "brand_names": [f"{b}{suffix[:2]}" for b in base.get("brand_names", [])],
+        })
+    return catalog
+
+
+def time_calls(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for q in QUERIES:
+            fn(q)
+    return (time.perf_counter() - started) / (repeat * len(QUERIES)) * 1e6
+
+
+def main(sizes, repeat):
+    for size in sizes:
+        catalog = synthetic_catalog(size)
+
+        started = time.perf_counter()
+        index = MedicationIndex(catalog)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        legacy_us = time_calls(lambda q: legacy_search(catalog, q), repeat)
+        indexed_us = time_calls(lambda q: index.search(q), repeat)
+        categories_legacy_us = time_calls(lambda q: sorted({m.get("category", "uncategorized") for m in catalog}), 1)
+        categories_indexed_us = time_calls(lambda q: list(index.categories), repeat)
+
+        print(f"{size:>7} meds | build {build_ms:8.1f} ms | "
+              f"search legacy {legacy_us:9.1f} us  indexed {indexed_us:8.1f} us  "
+              f"({legacy_us / indexed_us:5.1f}x) | "
+              f"categories legacy {categories_legacy_us:9.1f} us  indexed {categories_indexed_us:6.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,159 @@
+"""
+Nurse Board Benchmark
+Times the nurse "my patients" board with the previous per-patient queries
+(patient, latest vitals, task count, medication count for every
+assignment) and with the single NurseBoard aggregation, for nurses with
+10, 30 and 60 assigned patients. Also reports the database commands each
+board load sends.
+
+Seeds a throwaway database on a MongoDB server (dropped afterwards).
+
+Usage:
+    python scripts/bench_nurse_board.py [--sizes 10 30 60] [--runs 30]
+    python scripts/bench_nurse_board.py --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from nurse_board import NurseBoard
+
+DB_NAME = "bench_nurse_board"
+INDEXES = {
+    "patients": [[("id", 1)]],
+    "nurse_assignments": [[("nurse_id", 1), ("is_active", 1)]],
+    "vitals": [[("patient_id", 1), ("recorded_at", -1)]],
+    "nurse_tasks": [[("patient_id", 1), ("status", 1)]],
+    "medications": [[("patient_id", 1), ("status", 1)]],
+}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def legacy_my_patients(db, nurse_id: str, include_vitals: bool = True):
+    """The previous nurse_portal_module.get_my_patients enrichment loop"""
+    assignments = await db.nurse_assignments.find({"nurse_id": nurse_id, "is_active": True}, {"_id": 0}).to_list(100)
+    enriched_patients = []
+    for assignment in assignments:
+        patient = await db.patients.find_one({"id": assignment["patient_id"]}, {"_id": 0})
+        if patient:
+            latest_vitals = None
+            if include_vitals:
+                vitals = await db.vitals.find({"patient_id": assignment["patient_id"]}).sort("recorded_at", -1).limit(1).to_list(1)
+                if vitals:
+                    latest_vitals = vitals[0]
+                    del latest_vitals["_id"]
+            pending_tasks = await db.nurse_tasks.count_documents({
+                "patient_id": assignment["patient_id"], "nurse_id": nurse_id, "status": {"$in": ["pending", "in_progress"]}
+            })
+            pending_meds = await db.medications.count_documents({"patient_id": assignment["patient_id"], "status": "active"})
+            enriched_patients.append({
+                "assignment": assignment, "patient": patient, "latest_vitals": latest_vitals,
+                "pending_tasks_count": pending_tasks, "active_medications_count": pending_meds,
+                "acuity_level": assignment.get("acuity_level", 2)
+            })
+    enriched_patients.sort(key=lambda x: (-x.get("acuity_level", 2), x["patient"]["last_name"]))
+    return enriched_patients
+
+
+async def seed(db, sizes, background_patients: int):
+    """One nurse per size with that many assignments, plus unassigned patients as background"""
+    rng = random.Random(4)
+    data = {name: [] for name in INDEXES}
+    nurses = {}
+    for n in range(sum(sizes) + background_patients):
+        patient_id = str(uuid.uuid4())
+        data["patients"].append({"id": patient_id, "first_name": "Bench", "last_name": f"Patient{n:05d}", "mrn": f"MRN{n:06d}"})
+        for v in range(rng.randint(5, 40)):
+            data["vitals"].append({"id": str(uuid.uuid4()), "patient_id": patient_id,
+                                   "recorded_at": f"2024-01-{v % 28 + 1:02d}T{v % 24:02d}:00:00", "heart_rate": rng.randint(55, 120)})
+        for _ in range(rng.randint(0, 8)):
+            data["nurse_tasks"].append({"id": str(uuid.uuid4()), "patient_id": patient_id, "nurse_id": None,
+                                        "status": rng.choice(["pending", "in_progress", "completed"])})
+        for _ in range(rng.randint(0, 12)):
+            data["medications"].append({"id": str(uuid.uuid4()), "patient_id": patient_id,
+                                        "status": rng.choice(["active", "active", "discontinued"])})
+
+    patients = iter(data["patients"])
+    for size in sizes:
+        nurse_id = f"nurse-{size}"
+        nurses[size] = nurse_id
+        for _ in range(size):
+            patient = next(patients)
+            data["nurse_assignments"].append({"id": str(uuid.uuid4()), "nurse_id": nurse_id, "patient_id": patient["id"],
+                                              "is_active": True, "acuity_level": rng.randint(1, 4)})
+            for task in data["nurse_tasks"]:
+                if task["patient_id"] == patient["id"]:
+                    task["nurse_id"] = nurse_id
+
+    for name, rows in data.items():
+        if rows:
+            await db[name].insert_many(rows)
+        for keys in INDEXES[name]:
+            await db[name].create_index(keys)
+    return nurses
+
+
+async def timed(label: str, load, counter: CommandCounter, runs: int):
+    latencies = []
+    commands = 0
+    for _ in range(runs):
+        before = counter.count
+        started = time.perf_counter()
+        await load()
+        latencies.append((time.perf_counter() - started) * 1000)
+        commands = counter.count - before
+    print(f"    {label:<24} median {statistics.median(latencies):8.2f} ms  p95 {sorted(latencies)[int(len(latencies) * 0.95)]:8.2f} ms  {commands:3d} commands")
+
+
+async def main(args):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(args.mongo_url, event_listeners=[counter])
+    db = client[DB_NAME]
+    await client.drop_database(DB_NAME)
+    try:
+        nurses = await seed(db, args.sizes, args.background_patients)
+        board = NurseBoard(db)
+        print(f"{args.runs} runs per case | {args.mongo_url}")
+        for size in args.sizes:
+            nurse_id = nurses[size]
+            assert await board.assigned_patients(nurse_id) == await legacy_my_patients(db, nurse_id)
+            print(f"  {size} assigned patients")
+            await timed("per-patient (previous)", lambda: legacy_my_patients(db, nurse_id), counter, args.runs)
+            await timed("NurseBoard $lookup", lambda: board.assigned_patients(nurse_id), counter, args.runs)
+    finally:
+        await client.drop_database(DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 30, 60], help="assigned patients per nurse")
+    parser.add_argument("--background-patients", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,165 @@
+"""
+Patient Bundle Benchmark
+Times loading a report bundle (patient, vitals, problems, medications,
+allergies, notes, orders, lab results) with the previous one-query-after-
+another code and with the concurrent PatientBundleLoader.
+
+By default each collection query is simulated with a fixed round-trip time
+(--query-ms); pass --mongo-url to seed a throwaway database on a real
+MongoDB (dropped afterwards) and query that instead.
+
+Usage:
+    python scripts/bench_patient_bundle.py [--bundles 200] [--patients 50] [--query-ms 2]
+    python scripts/bench_patient_bundle.py --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from patient_bundle import PatientBundleLoader
+from reports_module import REPORT_BUNDLE
+
+SECTION_ROWS = {"vitals": 40, "problems": 8, "medications": 12, "allergies": 3, "notes": 20, "orders": 25, "lab_results": 30}
+
+
+async def legacy_get_patient_data(db, patient_id: str):
+    """The previous reports_module.get_patient_data"""
+    patient = await db.patients.find_one({"id": patient_id}, {"_id": 0})
+    if not patient:
+        return None
+    vitals = await db.vitals.find({"patient_id": patient_id}, {"_id": 0}).sort("recorded_at", -1).to_list(10)
+    problems = await db.problems.find({"patient_id": patient_id}, {"_id": 0}).to_list(50)
+    medications = await db.medications.find({"patient_id": patient_id}, {"_id": 0}).to_list(50)
+    allergies = await db.allergies.find({"patient_id": patient_id}, {"_id": 0}).to_list(50)
+    notes = await db.notes.find({"patient_id": patient_id}, {"_id": 0}).sort("created_at", -1).to_list(10)
+    orders = await db.orders.find({"patient_id": patient_id}, {"_id": 0}).sort("created_at", -1).to_list(20)
+    lab_results = await db.lab_results.find({"patient_id": patient_id}, {"_id": 0}).sort("resulted_at", -1).to_list(10)
+    return {"patient": patient, "vitals": vitals, "problems": problems, "medications": medications,
+            "allergies": allergies, "notes": notes, "orders": orders, "lab_results": lab_results}
+
+
+# ============== Simulated collections ==============
+
+class SimulatedCursor:
+    def __init__(self, rows, delay: float):
+        self.rows = rows
+        self.delay = delay
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        self.rows = self.rows[:n]
+        return self
+
+    async def to_list(self, n):
+        await asyncio.sleep(self.delay)
+        return self.rows[:n]
+
+
+class SimulatedCollection:
+    def __init__(self, rows, delay: float):
+        self.by_patient = {}
+        for row in rows:
+            self.by_patient.setdefault(row.get("patient_id", row.get("id")), []).append(row)
+        self.delay = delay
+
+    def find(self, query, projection=None):
+        return SimulatedCursor(list(self.by_patient.get(query.get("patient_id"), [])), self.delay)
+
+    async def find_one(self, query, projection=None):
+        await asyncio.sleep(self.delay)
+        rows = self.by_patient.get(query.get("id"), [])
+        return rows[0] if rows else None
+
+
+class SimulatedDB(dict):
+    def __getattr__(self, name):
+        return self[name]
+
+
+def seed_rows(patients: int):
+    rng = random.Random(5)
+    data = {"patients": []}
+    for i in range(patients):
+        patient_id = str(uuid.uuid4())
+        data["patients"].append({"id": patient_id, "first_name": "Bench", "last_name": f"Patient{i}", "mrn": f"MRN{i:06d}"})
+        for section, count in SECTION_ROWS.items():
+            for n in range(rng.randint(count // 2, count)):
+                data.setdefault(REPORT_BUNDLE[section].collection, []).append({
+                    "id": str(uuid.uuid4()), "patient_id": patient_id,
+                    "recorded_at": f"2024-01-{n % 28 + 1:02d}", "created_at": f"2024-01-{n % 28 + 1:02d}",
+                    "resulted_at": f"2024-01-{n % 28 + 1:02d}", "value": rng.random()
+                })
+    return data
+
+
+# ============== Benchmark ==============
+
+async def run(label: str, load, patient_ids, bundles: int, concurrency: int):
+    rng = random.Random(11)
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            started = time.perf_counter()
+            bundle = await load(rng.choice(patient_ids))
+            latencies.append(time.perf_counter() - started)
+            assert bundle and bundle["patient"]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(bundles // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"  {label:<24} {len(latencies) / elapsed:8.1f} bundles/s  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+
+async def main(args):
+    data = seed_rows(args.patients)
+    patient_ids = [p["id"] for p in data["patients"]]
+
+    client = None
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+        db = client["bench_patient_bundle"]
+        for name, rows in data.items():
+            await db[name].insert_many(rows)
+            await db[name].create_index("id" if name == "patients" else "patient_id")
+        source = args.mongo_url
+    else:
+        db = SimulatedDB({name: SimulatedCollection(rows, args.query_ms / 1000) for name, rows in data.items()})
+        source = f"simulated {args.query_ms} ms per query"
+
+    print(f"{args.bundles} bundles | {args.patients} patients | concurrency {args.concurrency} | {source}")
+    try:
+        await run("sequential (previous)", lambda pid: legacy_get_patient_data(db, pid),
+                  patient_ids, args.bundles, args.concurrency)
+        for cap in args.caps:
+            loader = PatientBundleLoader(db, REPORT_BUNDLE, max_concurrency=cap)
+            await run(f"PatientBundleLoader cap={cap}", loader.load, patient_ids, args.bundles, args.concurrency)
+    finally:
+        if client is not None:
+            await client.drop_database("bench_patient_bundle")
+            client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bundles", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1, help="bundles loaded in parallel")
+    parser.add_argument("--caps", type=int, nargs="+", default=[2, 8], help="loader concurrency caps to compare")
+    parser.add_argument("--query-ms", type=float, default=2.0)
+    parser.add_argument("--mongo-url", default=None)
+    asyncio.run(main(parser.parse_args()))
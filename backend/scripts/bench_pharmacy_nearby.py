@@ -0,0 +1,92 @@
+"""
+Nearest Pharmacy Microbenchmark
+Times PharmacyDirectory.nearest on a synthetic national-scale directory
+(random points inside Ghana's bounding box) and checks results against a
+brute-force haversine scan.
+
+Usage:
+    python scripts/bench_pharmacy_nearby.py [--size 50000] [--queries 1000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pharmacy_directory import PharmacyDirectory, haversine_km
+
+GHANA_LAT = (4.7, 11.2)
+GHANA_LNG = (-3.3, 1.2)
+
+FILTERS = [
+    {},
+    {"has_24hr_service": True, "has_nhis": True},
+    {"region": "Greater Accra", "has_delivery": True},
+]
+
+
+def synthetic_directory(size: int, seed: int = 7):
+    rng = random.Random(seed)
+    regions = ["Greater Accra", "Ashanti", "Northern", "Volta", "Western"]
+    return [
+        {
+            "id": f"BENCH-{i}",
+            "name": f"Bench Pharmacy {i}",
+            "city": "Bench",
+            "address": "",
+            "region": rng.choice(regions),
+            "ownership_type": "retail",
+            "has_nhis": rng.random() < 0.8,
+            "has_24hr_service": rng.random() < 0.1,
+            "has_delivery": rng.random() < 0.3,
+            "coordinates": {"lat": rng.uniform(*GHANA_LAT), "lng": rng.uniform(*GHANA_LNG)},
+        }
+        for i in range(size)
+    ]
+
+
+def main(size: int, queries: int, k: int):
+    rng = random.Random(11)
+    rows = synthetic_directory(size)
+
+    started = time.perf_counter()
+    directory = PharmacyDirectory(rows)
+    print(f"{size} pharmacies | build {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    points = [(rng.uniform(*GHANA_LAT), rng.uniform(*GHANA_LNG)) for _ in range(queries)]
+    for filters in FILTERS:
+        directory.nearest(*points[0], k=k, **filters)  # build the filtered tree
+
+        started = time.perf_counter()
+        for lat, lng in points:
+            directory.nearest(lat, lng, k=k, **filters)
+        indexed_us = (time.perf_counter() - started) / queries * 1e6
+
+        ids = directory.filter_ids(**filters)
+        started = time.perf_counter()
+        mismatches = 0
+        sample = points[:20]
+        for lat, lng in sample:
+            brute = sorted(
+                (haversine_km(lat, lng, rows[i]["coordinates"]["lat"], rows[i]["coordinates"]["lng"]), i)
+                for i in ids
+            )[:k]
+            got = [r["id"] for r in directory.nearest(lat, lng, k=k, **filters)]
+            mismatches += got != [rows[i]["id"] for _, i in brute]
+        brute_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+        print(f"  {str(filters or 'no filter'):<55} nearest {indexed_us:8.1f} us  "
+              f"brute force {brute_us:10.1f} us  mismatches={mismatches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    main(args.size, args.queries, args.k)
@@ -0,0 +1,148 @@
+"""
+Pharmacy Sales Benchmark
+Measures sales/sec with concurrent cashiers against a local mongod and
+checks that stock stays consistent (no overselling, batches == drug stock).
+
+Compares the StockLedger engine with the previous per-item
+find_one / find / update_one loop used by create_sale.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python scripts/bench_pharmacy_sales.py \
+        [--cashiers 50] [--seconds 10] [--drugs 20]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+import logging
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from stock_ledger import StockLedger, StockError
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+BENCH_DB = os.environ.get('BENCH_DB_NAME', 'yacco_bench_sales')
+
+
+async def seed(db, pharmacy_id: str, drug_count: int, batch_qty: int):
+    await db["pharmacy_drugs"].delete_many({})
+    await db["pharmacy_inventory"].delete_many({})
+    await db["pharmacy_drugs"].create_index([("id", 1), ("pharmacy_id", 1)], unique=True)
+    await db["pharmacy_inventory"].create_index([("pharmacy_id", 1), ("drug_id", 1), ("expiry_date", 1)])
+    await db["pharmacy_inventory"].create_index([("id", 1)])
+
+    drugs, batches = [], []
+    for i in range(drug_count):
+        drug_id = str(uuid.uuid4())
+        drugs.append({
+            "id": drug_id, "pharmacy_id": pharmacy_id, "generic_name": f"Drug {i}",
+            "unit_price": 5.0, "current_stock": batch_qty * 3, "is_active": True
+        })
+        for b in range(3):
+            batches.append({
+                "id": str(uuid.uuid4()), "pharmacy_id": pharmacy_id, "drug_id": drug_id,
+                "quantity_remaining": batch_qty, "expiry_date": f"2027-0{b + 1}-01"
+            })
+    await db["pharmacy_drugs"].insert_many(drugs)
+    await db["pharmacy_inventory"].insert_many(batches)
+    return [d["id"] for d in drugs]
+
+
+async def legacy_sale(db, pharmacy_id: str, items):
+    """The pre-ledger create_sale loop: 3+N sequential round trips per item, unguarded"""
+    for item in items:
+        drug = await db["pharmacy_drugs"].find_one({"id": item["drug_id"], "pharmacy_id": pharmacy_id})
+        if drug.get("current_stock", 0) < item["quantity"]:
+            raise StockError("insufficient")
+        remaining_qty = item["quantity"]
+        batches = await db["pharmacy_inventory"].find({
+            "pharmacy_id": pharmacy_id, "drug_id": item["drug_id"], "quantity_remaining": {"$gt": 0}
+        }).sort("expiry_date", 1).to_list(10)
+        for batch in batches:
+            if remaining_qty <= 0:
+                break
+            deduct = min(remaining_qty, batch["quantity_remaining"])
+            await db["pharmacy_inventory"].update_one({"id": batch["id"]}, {"$inc": {"quantity_remaining": -deduct}})
+            remaining_qty -= deduct
+        await db["pharmacy_drugs"].update_one({"id": item["drug_id"]}, {"$inc": {"current_stock": -item["quantity"]}})
+
+
+async def run(db, mode: str, pharmacy_id: str, drug_ids, cashiers: int, seconds: float):
+    ledger = StockLedger(db)
+    stats = {"sales": 0, "rejected": 0, "latencies": []}
+    deadline = time.perf_counter() + seconds
+
+    async def cashier():
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            items = [{"drug_id": d, "quantity": rng.randint(1, 3)} for d in rng.sample(drug_ids, 3)]
+            started = time.perf_counter()
+            try:
+                if mode == "ledger":
+                    await ledger.deduct(pharmacy_id, items)
+                else:
+                    await legacy_sale(db, pharmacy_id, items)
+                stats["sales"] += 1
+                stats["latencies"].append(time.perf_counter() - started)
+            except StockError:
+                stats["rejected"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[cashier() for _ in range(cashiers)])
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+async def verify(db, pharmacy_id: str):
+    """Stock must never go negative and batch totals must equal drug stock"""
+    problems = 0
+    drugs = await db["pharmacy_drugs"].find({"pharmacy_id": pharmacy_id}).to_list(None)
+    for drug in drugs:
+        batches = await db["pharmacy_inventory"].find({"drug_id": drug["id"]}).to_list(None)
+        batch_total = sum(b["quantity_remaining"] for b in batches)
+        if drug["current_stock"] < 0 or any(b["quantity_remaining"] < 0 for b in batches):
+            problems += 1
+        elif batch_total != drug["current_stock"]:
+            problems += 1
+    return problems
+
+
+async def main(args):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[BENCH_DB]
+    pharmacy_id = "bench-pharmacy"
+
+    for mode in ("legacy", "ledger"):
+        drug_ids = await seed(db, pharmacy_id, args.drugs, args.batch_qty)
+        stats = await run(db, mode, pharmacy_id, drug_ids, args.cashiers, args.seconds)
+        problems = await verify(db, pharmacy_id)
+        latencies = sorted(stats["latencies"]) or [0]
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        logger.info(
+            f"{mode:>6}: {stats['sales'] / stats['elapsed']:.0f} sales/sec "
+            f"({stats['sales']} ok, {stats['rejected']} rejected) "
+            f"p50={p50:.1f}ms p99={p99:.1f}ms inconsistent_drugs={problems}"
+        )
+
+    await client.drop_database(BENCH_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cashiers", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--drugs", type=int, default=20)
+    parser.add_argument("--batch-qty", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+"""
+Principal Cache Benchmark
+Times the work get_current_user does per authenticated request (JWT decode
+plus user lookup) with and without the principal cache, for a pool of users
+issuing concurrent requests.
+
+By default the users lookup is simulated with a fixed round-trip time
+(--lookup-ms); pass --mongo-url to look users up in a real MongoDB instead
+(a throwaway collection is created and dropped).
+
+Usage:
+    python scripts/bench_principal_cache.py [--requests 20000] [--users 200] [--concurrency 50]
+    python scripts/bench_principal_cache.py --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+
+from principal_cache import PrincipalCache
+
+SECRET = "bench-secret"
+
+
+class SimulatedUsers:
+    def __init__(self, users, lookup_ms: float):
+        self.by_id = {u["id"]: u for u in users}
+        self.lookup_seconds = lookup_ms / 1000
+
+    async def find_one(self, query, projection=None):
+        await asyncio.sleep(self.lookup_seconds)
+        user = self.by_id.get(query["id"])
+        return dict(user) if user else None
+
+
+def make_users(count: int):
+    return [
+        {
+            "id": str(uuid.uuid4()), "email": f"user{i}@bench.test", "first_name": "Bench",
+            "last_name": f"User{i}", "role": "physician", "organization_id": "bench-org", "is_active": True
+        }
+        for i in range(count)
+    ]
+
+
+def make_token(user_id: str) -> str:
+    now = datetime.now(timezone.utc)
+    return jwt.encode({"user_id": user_id, "role": "physician", "iat": now,
+                       "exp": now + timedelta(hours=1)}, SECRET, algorithm="HS256")
+
+
+async def run(users_collection, tokens, requests: int, concurrency: int, cache):
+    rng = random.Random(9)
+    latencies = []
+
+    async def authenticate(token: str):
+        payload = jwt.decode(token, SECRET, algorithms=["HS256"])
+        user_id = payload["user_id"]
+        lookup = lambda: users_collection.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        if cache is None:
+            return await lookup()
+        return await cache.get_or_load(user_id, payload.get("iat"), lookup)
+
+    async def worker(count: int):
+        for _ in range(count):
+            token = rng.choice(tokens)
+            started = time.perf_counter()
+            user = await authenticate(token)
+            latencies.append(time.perf_counter() - started)
+            assert user is not None
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies
+
+
+async def main(args):
+    users = make_users(args.users)
+    tokens = [make_token(u["id"]) for u in users]
+
+    client = None
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+        collection = client["bench_principal_cache"]["users"]
+        await collection.drop()
+        await collection.insert_many([dict(u) for u in users])
+        await collection.create_index("id", unique=True)
+        source = args.mongo_url
+    else:
+        collection = SimulatedUsers(users, args.lookup_ms)
+        source = f"simulated {args.lookup_ms} ms lookup"
+
+    print(f"{args.requests} requests | {args.users} users | concurrency {args.concurrency} | {source}")
+    try:
+        for label, cache in (("no cache", None), ("principal cache", PrincipalCache(ttl_seconds=30))):
+            throughput, latencies = await run(collection, tokens, args.requests, args.concurrency, cache)
+            p50 = latencies[len(latencies) // 2] * 1e6
+            p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+            extra = f"  hit rate {cache.stats()['hit_rate']:.1%}" if cache else ""
+            print(f"  {label:<16} {throughput:9.0f} req/s  p50 {p50:8.1f} us  p99 {p99:8.1f} us{extra}")
+    finally:
+        if client is not None:
+            await client["bench_principal_cache"]["users"].drop()
+            client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--lookup-ms", type=float, default=0.5)
+    parser.add_argument("--mongo-url", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,142 @@
+"""
+Rate Limiter Benchmark
+Offers a fixed request rate (default 10k req/s, open loop) and reports the
+achieved throughput and p50/p99 latency for each rate limit store. The Redis
+store runs against the in-process RESP stand-in (scripts/resp_standin.py)
+unless --redis-url points at a real server.
+
+--middleware drives SecurityMiddleware through ASGI with a trivial route, so
+the numbers include header handling; this needs the full backend environment.
+
+Usage:
+    python scripts/bench_rate_limiter.py [--rate 10000] [--seconds 3] [--clients 500]
+    python scripts/bench_rate_limiter.py --middleware --stores memory shared
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from security.rate_limit import InProcessStore, RateLimiter, RedisStore, SharedMemoryStore
+from scripts.resp_standin import start_standin
+
+ENDPOINTS = ["/api/patients", "/api/prescriptions", "/api/health", "/api/auth/login"]
+
+
+async def drive(call, rate: int, seconds: float, clients: int):
+    """Start one call every 1/rate seconds regardless of completions; return latencies"""
+    rng = random.Random(5)
+    total = int(rate * seconds)
+    latencies = []
+    tasks = []
+
+    async def one(scheduled: float, ip: str, endpoint: str):
+        await call(ip, endpoint)
+        latencies.append(time.perf_counter() - scheduled)
+
+    started = time.perf_counter()
+    sent = 0
+    while sent < total:
+        # Release every request that is due, then yield for ~1ms
+        due = min(total, int((time.perf_counter() - started) * rate) + 1)
+        for i in range(sent, due):
+            client = rng.randrange(clients)
+            ip = f"10.0.{client // 256}.{client % 256}"
+            tasks.append(asyncio.create_task(one(started + i / rate, ip, rng.choice(ENDPOINTS))))
+        sent = due
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    return total / elapsed, sorted(latencies)
+
+
+def percentile(values, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))] * 1e6
+
+
+def limiter_call(limiter: RateLimiter):
+    async def call(ip: str, endpoint: str):
+        await limiter.check(ip, endpoint, 100, 60)
+    return call
+
+
+def middleware_call(limiter: RateLimiter):
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    import security.middleware as middleware
+
+    middleware.rate_limiter.store = limiter.store
+
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route(path, ok) for path in ENDPOINTS])
+    app.add_middleware(middleware.SecurityMiddleware, db=None)
+
+    async def call(ip: str, endpoint: str):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": endpoint, "raw_path": endpoint.encode(),
+            "query_string": b"", "root_path": "", "headers": [(b"x-forwarded-for", ip.encode())],
+            "client": (ip, 50000), "server": ("bench", 80),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        await app(scope, receive, send)
+    return call
+
+
+async def main(args):
+    for name in args.stores:
+        server = None
+        if name == "memory":
+            store = InProcessStore()
+        elif name == "shared":
+            store = SharedMemoryStore(f"bench_rate_limit_{os.getpid()}", 65536)
+        else:
+            url = args.redis_url
+            if not url:
+                server, port = await start_standin()
+                url = f"redis://127.0.0.1:{port}/0"
+            store = RedisStore(url, prefix=f"bench:{os.getpid()}:")
+
+        limiter = RateLimiter(store)
+        call = middleware_call(limiter) if args.middleware else limiter_call(limiter)
+        try:
+            await drive(call, args.rate, 0.2, args.clients)  # warm up connections and tables
+            achieved, latencies = await drive(call, args.rate, args.seconds, args.clients)
+        finally:
+            await store.close()
+            if name == "shared":
+                store.unlink()
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+
+        target = "middleware" if args.middleware else "limiter"
+        print(f"{name:<7} {target:<10} offered {args.rate:>6} req/s  achieved {achieved:8.0f} req/s  "
+              f"p50 {percentile(latencies, 0.50):8.1f} us  p99 {percentile(latencies, 0.99):9.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=int, default=10_000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--stores", nargs="+", default=["memory", "shared", "redis"],
+                        choices=["memory", "shared", "redis"])
+    parser.add_argument("--redis-url", default=None, help="benchmark a real Redis instead of the stand-in")
+    parser.add_argument("--middleware", action="store_true", help="go through SecurityMiddleware (needs starlette)")
+    asyncio.run(main(parser.parse_args()))
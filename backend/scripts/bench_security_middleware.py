@@ -0,0 +1,161 @@
+"""
+Security Middleware Benchmark
+Drives a small Starlette app through ASGI (no sockets) wrapped in the
+previous BaseHTTPMiddleware-based SecurityMiddleware and in the current
+pure-ASGI one, and reports req/s and p50/p99 latency at a fixed
+concurrency, plus time-to-first-chunk for a streaming response.
+
+Usage:
+    python scripts/bench_security_middleware.py [--requests 20000] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import security.middleware as middleware
+from security.middleware import RATE_LIMIT_CONFIG, SECURITY_HEADERS, SecurityMiddleware
+from security.rate_limit import InProcessStore, RateLimiter
+
+
+class LegacySecurityMiddleware(BaseHTTPMiddleware):
+    """The previous implementation (rate limiting and headers; audit calls omitted)"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        super().__init__(app)
+        self.limiter = limiter
+
+    async def dispatch(self, request, call_next):
+        request_id = str(uuid.uuid4())[:8]
+        request.state.request_id = request_id
+        start_time = time.time()
+        forwarded_for = request.headers.get("X-Forwarded-For")
+        client_ip = forwarded_for.split(",")[0].strip() if forwarded_for else request.client.host
+        endpoint = request.url.path
+        rate_config = RATE_LIMIT_CONFIG.get(endpoint, RATE_LIMIT_CONFIG["default"])
+        is_limited, rate_info = await self.limiter.check(
+            identifier=client_ip, endpoint=endpoint,
+            max_requests=rate_config["requests"], window_seconds=rate_config["window_seconds"]
+        )
+        if is_limited:
+            return JSONResponse(status_code=429, content={"detail": "Too many requests."})
+        response = await call_next(request)
+        response_time = time.time() - start_time
+        for header, value in SECURITY_HEADERS.items():
+            response.headers[header] = value
+        response.headers["X-RateLimit-Limit"] = str(rate_info["limit"])
+        response.headers["X-RateLimit-Remaining"] = str(rate_info["remaining"])
+        response.headers["X-RateLimit-Reset"] = str(rate_info["reset"])
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Response-Time"] = f"{response_time:.3f}s"
+        return response
+
+
+async def patients(request):
+    return JSONResponse([{"id": str(i), "first_name": "Ama", "last_name": "Mensah"} for i in range(20)])
+
+
+async def export(request):
+    async def rows():
+        for i in range(20):
+            yield f'{{"row": {i}}}\n'
+            await asyncio.sleep(0.005)
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+def build_app(kind: str):
+    app = Starlette(routes=[Route("/api/patients", patients), Route("/api/export", export)])
+    if kind == "legacy":
+        app.add_middleware(LegacySecurityMiddleware, limiter=RateLimiter(InProcessStore()))
+    elif kind == "asgi":
+        middleware.rate_limiter.store = InProcessStore()
+        app.add_middleware(SecurityMiddleware, db=None)
+    return app
+
+
+async def request(app, path: str, ip: str):
+    """One GET through the ASGI app; returns (seconds to first body chunk, total seconds, headers)"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"x-forwarded-for", ip.encode())],
+        "client": (ip, 50000), "server": ("bench", 80),
+    }
+    started = time.perf_counter()
+    first_chunk = None
+    headers = []
+    request_sent = False
+    finished = asyncio.Event()
+
+    async def receive():
+        # Like a server: the body once, then block until the response is done
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first_chunk, headers
+        if message["type"] == "http.response.start":
+            headers = message["headers"]
+        elif message["type"] == "http.response.body":
+            if message.get("body") and first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            if not message.get("more_body"):
+                finished.set()
+
+    await app(scope, receive, send)
+    return first_chunk, time.perf_counter() - started, headers
+
+
+async def load(app, requests: int, concurrency: int):
+    rng = random.Random(3)
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            ip = f"10.0.{rng.randrange(8)}.{rng.randrange(256)}"
+            _, total, _ = await request(app, "/api/patients", ip)
+            latencies.append(total)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies
+
+
+async def main(requests: int, concurrency: int):
+    print(f"{requests} requests, concurrency {concurrency}")
+    for kind in ("none", "legacy", "asgi"):
+        app = build_app(kind)
+        await load(app, 1000, concurrency)  # warm up
+        throughput, latencies = await load(app, requests, concurrency)
+        first_chunk, total, headers = await request(app, "/api/export", "10.9.9.9")
+        p50 = latencies[len(latencies) // 2] * 1e6
+        p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+        print(f"  {kind:<7} {throughput:8.0f} req/s  p50 {p50:8.1f} us  p99 {p99:8.1f} us  "
+              f"stream first chunk {first_chunk * 1000:5.1f} ms of {total * 1000:5.1f} ms  "
+              f"headers {len(headers)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,49 @@
+"""
+Chat Search Index Build
+Rebuilds `chat_search_tokens` from `chat_messages`, for messages sent
+before the token index existed or after changing the tokenizer. Searches
+during the rebuild may miss messages not yet re-indexed.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=test_database \
+        python scripts/build_chat_search_index.py [--conversation-id CONVERSATION_ID]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from chat_search import ChatSearchIndex
+from db_indexes import ensure_indexes
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.setdefault('DB_NAME', 'test_database')
+
+
+async def main(conversation_id):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    await ensure_indexes(db)
+    report = await ChatSearchIndex(db).rebuild(conversation_id)
+    logger.info(f"Messages indexed: {report['messages']} ({report['tokens']} tokens)")
+
+    client.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversation-id", default=None, help="only rebuild this conversation")
+    args = parser.parse_args()
+    asyncio.run(main(args.conversation_id))
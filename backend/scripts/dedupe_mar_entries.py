@@ -0,0 +1,47 @@
+"""
+MAR Entry Deduplication
+Removes duplicate MAR entries for the same (patient_id, medication_id,
+scheduled_time) left by the previous check-then-insert schedule generator,
+keeping an administered/held/refused entry over a scheduled one, then
+creates the unique index the bulk MAR scheduler relies on. Safe to run more
+than once.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=test_database \
+        python scripts/dedupe_mar_entries.py
+"""
+
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from mar_schedule import MARScheduler, MAR_KEY
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.setdefault('DB_NAME', 'test_database')
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    removed = await MARScheduler(db).remove_duplicates()
+    logger.info(f"Duplicate MAR entries removed: {removed}")
+    name = await db.mar_entries.create_index([(field, 1) for field in MAR_KEY], unique=True)
+    logger.info(f"Unique index ready: mar_entries.{name}")
+
+    client.close()
+    return removed
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
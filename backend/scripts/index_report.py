@@ -0,0 +1,73 @@
+"""
+MongoDB Index Report
+Lists missing, unused and undeclared indexes plus query probes that still
+collection-scan, using $indexStats and explain() against a running mongod.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=test_database \
+        python scripts/index_report.py [--apply] [--all-collections]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.setdefault('DB_NAME', 'test_database')
+
+
+async def main(apply: bool, all_collections: bool):
+    # Importing the app registers every module's indexes and query probes
+    import server  # noqa: F401
+    from db_indexes import INDEX_REGISTRY, ensure_indexes, report_indexes
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    total = sum(len(specs) for specs in INDEX_REGISTRY.values())
+    logger.info(f"{total} indexes declared across {len(INDEX_REGISTRY)} collections")
+
+    if apply:
+        summary = await ensure_indexes(db)
+        for name in summary["created"]:
+            logger.info(f"  ✅ created {name}")
+
+    report = await report_indexes(db, include_unregistered_collections=all_collections)
+
+    logger.info("-" * 40)
+    logger.info(f"Missing indexes: {len(report['missing'])}")
+    for item in report["missing"]:
+        logger.info(f"  ❌ {item['collection']}.{item['index']}")
+
+    logger.info(f"Unused indexes (no accesses since server start): {len(report['unused'])}")
+    for item in report["unused"]:
+        logger.info(f"  ⏭️  {item['collection']}.{item['index']} (since {item['since']})")
+
+    logger.info(f"Undeclared indexes: {len(report['unregistered'])}")
+    for item in report["unregistered"]:
+        logger.info(f"  ⚠️  {item['collection']}.{item['index']}")
+
+    logger.info(f"Query probes using COLLSCAN: {len(report['collscans'])}")
+    for item in report["collscans"]:
+        logger.info(f"  ❌ {item['collection']} filter={item['filter']} sort={item['sort']}")
+
+    client.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="create missing indexes before reporting")
+    parser.add_argument("--all-collections", action="store_true", help="also inspect collections with no declared indexes")
+    args = parser.parse_args()
+    asyncio.run(main(args.apply, args.all_collections))
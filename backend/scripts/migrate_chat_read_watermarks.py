@@ -0,0 +1,54 @@
+"""
+Chat Read Watermark Migration
+Converts the per-message `read_by` arrays in `chat_messages` into one read
+watermark per participant on each conversation (the latest message they
+read or sent) and recounts unread messages from the watermarks. Safe to
+run more than once; watermarks only move forward.
+
+Pass --drop-read-by once every server runs the watermark code to remove
+the read_by arrays from message history.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=test_database \
+        python scripts/migrate_chat_read_watermarks.py [--drop-read-by]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from chat_read_state import ChatReadState
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.setdefault('DB_NAME', 'test_database')
+
+
+async def main(drop_read_by):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    report = await ChatReadState(db).migrate(drop_read_by=drop_read_by)
+    logger.info(f"Watermarks written: {report['watermarks']}")
+    logger.info(f"Conversations recounted: {report['conversations']}")
+    if drop_read_by:
+        logger.info("read_by arrays removed from chat_messages")
+
+    client.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drop-read-by", action="store_true", help="remove read_by from every message afterwards")
+    args = parser.parse_args()
+    asyncio.run(main(args.drop_read_by))
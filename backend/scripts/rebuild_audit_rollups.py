@@ -0,0 +1,53 @@
+"""
+Audit Rollup Rebuild
+Sets the BSON date `ts` on audit_logs entries written before it existed and
+recomputes the hourly/daily `audit_rollups` buckets from the raw logs. The
+server does this once in the background after the first deploy; run it
+again whenever the rollups are suspected to have drifted, and the day after
+that first deploy to complete the deploy day's bucket. Only buckets that
+ended before the run started are replaced, so it is safe while the server
+is writing audit entries.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=test_database \
+        python scripts/rebuild_audit_rollups.py [--organization-id ORG_ID]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from audit_analytics import AuditAnalytics
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.setdefault('DB_NAME', 'test_database')
+
+
+async def main(organization_id):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    report = await AuditAnalytics(db).rebuild(organization_id)
+    logger.info(f"Audit entries scanned: {report['entries']}")
+    logger.info(f"Timestamps backfilled: {report['timestamps_backfilled']}")
+    logger.info(f"Rollup buckets written: {report['buckets']}")
+
+    client.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organization-id", help="rebuild one organization only")
+    args = parser.parse_args()
+    asyncio.run(main(args.organization_id))
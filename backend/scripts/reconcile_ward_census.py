@@ -0,0 +1,53 @@
+"""
+Ward Census Reconciliation
+Rebuilds the per-ward bed status counters in `ward_census` from `beds` and
+lists every ward whose counters had drifted. Safe to run on a schedule.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=test_database \
+        python scripts/reconcile_ward_census.py [--organization-id ORG_ID]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.insert(0, '/app/backend')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from ward_census import WardCensus
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.setdefault('DB_NAME', 'test_database')
+
+
+async def main(organization_id):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    report = await WardCensus(db).reconcile(organization_id)
+
+    logger.info(f"Wards checked: {report['wards_checked']}")
+    logger.info(f"Wards with drifted counters: {len(report['drifted'])}")
+    for item in report["drifted"]:
+        logger.info(
+            f"  ⚠️  org={item['organization_id']} ward={item['ward_id']} "
+            f"counted={item['counted']} expected={item['expected']}"
+        )
+
+    client.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organization-id", default=None, help="only reconcile this organization")
+    args = parser.parse_args()
+    asyncio.run(main(args.organization_id))
@@ -0,0 +1,142 @@
+"""
+RESP Stand-in Server
+A tiny in-memory server speaking the Redis protocol, implementing just the
+commands the rate limiter uses (GET/SET/INCR/DECR/PEXPIRE/DEL/PING/AUTH/
+SELECT/FLUSHALL) and the WebSocket bus uses (PUBLISH/SUBSCRIBE). For local
+testing and benchmarks without a Redis install.
+
+Usage:
+    python scripts/resp_standin.py [--port 6390]
+    RATE_LIMIT_BACKEND=redis RATE_LIMIT_REDIS_URL=redis://127.0.0.1:6390/0 uvicorn server:app
+    WS_BUS_BACKEND=redis WS_BUS_REDIS_URL=redis://127.0.0.1:6390/0 uvicorn server:app --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class RespStandin:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        # channel -> writers of subscribed connections
+        self.subscribers = {}
+
+    def _alive(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, command, args):
+        if command == b"PING":
+            return "+PONG"
+        if command in (b"AUTH", b"SELECT"):
+            return "+OK"
+        if command == b"FLUSHALL":
+            self.data.clear()
+            self.expires.clear()
+            return "+OK"
+        if command == b"GET":
+            return self.data.get(args[0]) if self._alive(args[0]) else None
+        if command == b"SET":
+            self.data[args[0]] = args[1]
+            self.expires.pop(args[0], None)
+            return "+OK"
+        if command in (b"INCR", b"DECR"):
+            value = int(self.data.get(args[0], b"0") if self._alive(args[0]) else 0)
+            value += 1 if command == b"INCR" else -1
+            self.data[args[0]] = str(value).encode()
+            return value
+        if command == b"PEXPIRE":
+            if not self._alive(args[0]):
+                return 0
+            self.expires[args[0]] = time.monotonic() + int(args[1]) / 1000
+            return 1
+        if command == b"DEL":
+            removed = 0
+            for key in args:
+                if self._alive(key):
+                    del self.data[key]
+                    self.expires.pop(key, None)
+                    removed += 1
+            return removed
+        if command == b"PUBLISH":
+            message = self.encode([b"message", args[0], args[1]])
+            writers = self.subscribers.get(args[0], set())
+            for writer in list(writers):
+                if writer.is_closing():
+                    writers.discard(writer)
+                else:
+                    writer.write(message)
+            return len(writers)
+        return Exception(f"ERR unknown command '{command.decode()}'")
+
+    def subscribe(self, writer: asyncio.StreamWriter, channels):
+        for count, channel in enumerate(channels, start=1):
+            self.subscribers.setdefault(channel, set()).add(writer)
+            writer.write(self.encode([b"subscribe", channel, count]))
+
+    @staticmethod
+    def encode(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, Exception):
+            return b"-%s\r\n" % str(reply).encode()
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, str):
+            return reply.encode() + b"\r\n"
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(RespStandin.encode(item) for item in reply)
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                count = int(header[1:-2])
+                parts = []
+                for _ in range(count):
+                    length = int((await reader.readline())[1:-2])
+                    parts.append((await reader.readexactly(length + 2))[:-2])
+                if parts[0].upper() == b"SUBSCRIBE":
+                    self.subscribe(writer, parts[1:])
+                else:
+                    writer.write(self.encode(self.execute(parts[0].upper(), parts[1:])))
+                if not reader._buffer:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            for writers in self.subscribers.values():
+                writers.discard(writer)
+            writer.close()
+
+
+async def start_standin(host: str = "127.0.0.1", port: int = 0):
+    """Start a stand-in server; returns (server, bound port)"""
+    standin = RespStandin()
+    server = await asyncio.start_server(standin.handle, host, port)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def main(port: int):
+    server, bound = await start_standin(port=port)
+    logger.info(f"RESP stand-in listening on 127.0.0.1:{bound}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=6390)
+    asyncio.run(main(parser.parse_args().port))
@@ -7,10 +7,9 @@ Enterprise Security Middleware for Yacco Health
 """
 
 import os
-import time
 import hashlib
 from datetime import datetime, timezone, timedelta
-from typing import Optional, List, Callable, Dict, Any
+from typing import Optional, List, Callable, Any
 from functools import wraps
 import jwt
 from fastapi import Request, HTTPException, Depends, status
@@ -190,62 +189,9 @@ async def require_hospital_admin(
 
 
 # ============== RATE LIMITING ==============
+# Shared with SecurityMiddleware; store chosen by RATE_LIMIT_BACKEND
 
-class RateLimiter:
-    """In-memory rate limiter (use Redis in production)"""
-    
-    def __init__(self):
-        self._requests: Dict[str, List[float]] = {}
-    
-    def _get_key(self, identifier: str, endpoint: str) -> str:
-        return f"{identifier}:{endpoint}"
-    
-    def _clean_old_requests(self, key: str, window: int):
-        """Remove requests outside the time window"""
-        now = time.time()
-        cutoff = now - window
-        if key in self._requests:
-            self._requests[key] = [
-                ts for ts in self._requests[key] if ts > cutoff
-            ]
-    
-    def is_rate_limited(
-        self,
-        identifier: str,
-        endpoint: str,
-        max_requests: int = RATE_LIMIT_MAX_REQUESTS,
-        window: int = RATE_LIMIT_WINDOW
-    ) -> bool:
-        """Check if the identifier is rate limited"""
-        key = self._get_key(identifier, endpoint)
-        self._clean_old_requests(key, window)
-        
-        if key not in self._requests:
-            self._requests[key] = []
-        
-        if len(self._requests[key]) >= max_requests:
-            return True
-        
-        self._requests[key].append(time.time())
-        return False
-    
-    def get_remaining(
-        self,
-        identifier: str,
-        endpoint: str,
-        max_requests: int = RATE_LIMIT_MAX_REQUESTS,
-        window: int = RATE_LIMIT_WINDOW
-    ) -> int:
-        """Get remaining requests in the window"""
-        key = self._get_key(identifier, endpoint)
-        self._clean_old_requests(key, window)
-        
-        current = len(self._requests.get(key, []))
-        return max(0, max_requests - current)
-
-
-# Global rate limiter instance
-rate_limiter = RateLimiter()
+from security.rate_limit import rate_limiter  # noqa: E402
 
 
 def rate_limit(max_requests: int = 100, window: int = 60):
@@ -266,15 +212,16 @@ def rate_limit(max_requests: int = 100, window: int = 60):
             
             endpoint = func.__name__
             
-            if rate_limiter.is_rate_limited(identifier, endpoint, max_requests, window):
-                remaining = rate_limiter.get_remaining(identifier, endpoint, max_requests, window)
+            is_limited, rate_info = await rate_limiter.check(identifier, endpoint, max_requests, window)
+            if is_limited:
                 raise HTTPException(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Rate limit exceeded. Try again in {window} seconds.",
+                    detail=f"Rate limit exceeded. Try again in {rate_info['retry_after']} seconds.",
                     headers={
                         "X-RateLimit-Limit": str(max_requests),
-                        "X-RateLimit-Remaining": str(remaining),
-                        "X-RateLimit-Reset": str(window)
+                        "X-RateLimit-Remaining": str(rate_info["remaining"]),
+                        "X-RateLimit-Reset": str(rate_info["reset"]),
+                        "Retry-After": str(rate_info["retry_after"])
                     }
                 )
             
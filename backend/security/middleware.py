@@ -17,16 +17,15 @@ import json
 import logging
 import hashlib
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, Any, Callable, List
+from typing import Optional, Dict, Any, Callable
 from functools import wraps
-from collections import defaultdict
 
-from fastapi import Request, Response, HTTPException, Depends
+from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
 import jwt
 
+from audit_pipeline import audit_pipeline
+
 # Try to import from database module
 try:
     from database import audit_logs, to_dict
@@ -65,6 +64,19 @@ SECURITY_HEADERS = {
     "Permissions-Policy": "geolocation=(), microphone=(), camera=()"
 }
 
+# Precomputed for SecurityMiddleware: (requests, window_seconds) per path and
+# lowercase header byte pairs ready to append to http.response.start
+_RATE_LIMITS = {
+    path: (config["requests"], config["window_seconds"]) for path, config in RATE_LIMIT_CONFIG.items()
+}
+_DEFAULT_RATE_LIMIT = _RATE_LIMITS["default"]
+_SECURITY_HEADER_BYTES = [
+    (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in SECURITY_HEADERS.items()
+]
+_OWNED_HEADERS = frozenset(name for name, _ in _SECURITY_HEADER_BYTES) | {
+    b"x-ratelimit-limit", b"x-ratelimit-remaining", b"x-ratelimit-reset", b"x-request-id", b"x-response-time"
+}
+
 # Sensitive fields to redact from logs
 SENSITIVE_FIELDS = {
     "password", "password_hash", "token", "secret", "api_key", 
@@ -72,82 +84,10 @@ SENSITIVE_FIELDS = {
 }
 
 
-# ============== In-Memory Rate Limiter ==============
-
-class RateLimiter:
-    """
-    Thread-safe in-memory rate limiter using sliding window algorithm.
-    For production, consider using Redis for distributed rate limiting.
-    """
-    
-    def __init__(self):
-        self.requests: Dict[str, List[float]] = defaultdict(list)
-        self.cleanup_interval = 300  # Cleanup every 5 minutes
-        self.last_cleanup = time.time()
-    
-    def _get_key(self, identifier: str, endpoint: str) -> str:
-        """Generate rate limit key"""
-        return f"{identifier}:{endpoint}"
-    
-    def _cleanup_old_requests(self):
-        """Remove expired request timestamps"""
-        now = time.time()
-        if now - self.last_cleanup < self.cleanup_interval:
-            return
-        
-        cutoff = now - 3600  # Keep last hour
-        keys_to_delete = []
-        
-        for key, timestamps in self.requests.items():
-            self.requests[key] = [ts for ts in timestamps if ts > cutoff]
-            if not self.requests[key]:
-                keys_to_delete.append(key)
-        
-        for key in keys_to_delete:
-            del self.requests[key]
-        
-        self.last_cleanup = now
-    
-    def is_rate_limited(
-        self, 
-        identifier: str, 
-        endpoint: str,
-        max_requests: int = 100,
-        window_seconds: int = 60
-    ) -> tuple[bool, Dict[str, Any]]:
-        """
-        Check if request should be rate limited.
-        Returns (is_limited, rate_limit_info)
-        """
-        self._cleanup_old_requests()
-        
-        key = self._get_key(identifier, endpoint)
-        now = time.time()
-        cutoff = now - window_seconds
-        
-        # Filter timestamps within window
-        self.requests[key] = [ts for ts in self.requests[key] if ts > cutoff]
-        current_count = len(self.requests[key])
-        
-        rate_limit_info = {
-            "limit": max_requests,
-            "remaining": max(0, max_requests - current_count - 1),
-            "reset": int(cutoff + window_seconds),
-            "window_seconds": window_seconds
-        }
-        
-        if current_count >= max_requests:
-            return True, rate_limit_info
-        
-        # Record this request
-        self.requests[key].append(now)
-        rate_limit_info["remaining"] = max(0, max_requests - current_count - 1)
-        
-        return False, rate_limit_info
-
+# ============== Rate Limiter ==============
+# Sliding-window counters with a pluggable store; see security/rate_limit.py
 
-# Global rate limiter instance
-rate_limiter = RateLimiter()
+from security.rate_limit import rate_limiter  # noqa: E402
 
 
 # ============== Audit Logger ==============
@@ -215,7 +155,7 @@ class AuditLogger:
                 log_entry["timestamp"] = log_entry["timestamp"].isoformat()
                 if log_entry.get("details"):
                     log_entry["details"] = json.dumps(log_entry["details"])
-                await self.db["audit_logs"].insert_one(log_entry)
+                await audit_pipeline.emit(self.db["audit_logs"], log_entry)
             except Exception as e:
                 logger.error(f"Failed to store audit log in MongoDB: {e}")
     
@@ -308,45 +248,47 @@ sanitizer = InputSanitizer()
 
 # ============== Security Middleware ==============
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+class SecurityMiddleware:
     """
     Main security middleware that applies:
     - Rate limiting
     - Security headers
-    - Request logging
-    - CORS handling
+    - Request ID and response timing headers
+    - Slow/failed request logging
+
+    Plain ASGI: headers are added to the http.response.start message as it
+    passes through and body messages are forwarded untouched, so streaming
+    responses stream and no extra task or buffer sits between app and server.
     """
     
     def __init__(self, app, db=None):
-        super().__init__(app)
+        self.app = app
         self.db = db
         global audit_logger
         audit_logger = AuditLogger(db)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Generate request ID for tracing
-        request_id = str(uuid.uuid4())[:8]
-        request.state.request_id = request_id
-        
-        start_time = time.time()
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Get client IP
-        client_ip = self._get_client_ip(request)
+        start_time = time.perf_counter()
+        request_id = os.urandom(4).hex()
+        scope.setdefault("state", {})["request_id"] = request_id
         
-        # Get endpoint path
-        endpoint = request.url.path
+        endpoint = scope["path"]
+        client_ip = self._get_client_ip(scope)
         
         # Apply rate limiting
-        rate_config = RATE_LIMIT_CONFIG.get(endpoint, RATE_LIMIT_CONFIG["default"])
-        is_limited, rate_info = rate_limiter.is_rate_limited(
+        max_requests, window_seconds = _RATE_LIMITS.get(endpoint, _DEFAULT_RATE_LIMIT)
+        is_limited, rate_info = await rate_limiter.check(
             identifier=client_ip,
             endpoint=endpoint,
-            max_requests=rate_config["requests"],
-            window_seconds=rate_config["window_seconds"]
+            max_requests=max_requests,
+            window_seconds=window_seconds
         )
         
         if is_limited:
-            # Log rate limit event
             if audit_logger:
                 await audit_logger.log(
                     action="RATE_LIMIT_EXCEEDED",
@@ -355,26 +297,31 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                     severity="WARNING",
                     request_id=request_id
                 )
-            
-            return JSONResponse(
-                status_code=429,
-                content={
-                    "detail": "Too many requests. Please try again later.",
-                    "retry_after": rate_info["reset"] - int(time.time())
-                },
-                headers={
-                    "X-RateLimit-Limit": str(rate_info["limit"]),
-                    "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(rate_info["reset"]),
-                    "Retry-After": str(rate_info["reset"] - int(time.time()))
-                }
-            )
+            await self._send_rate_limited(send, rate_info)
+            return
+        
+        rate_headers = [
+            (b"x-ratelimit-limit", str(rate_info["limit"]).encode()),
+            (b"x-ratelimit-remaining", str(rate_info["remaining"]).encode()),
+            (b"x-ratelimit-reset", str(rate_info["reset"]).encode()),
+            (b"x-request-id", request_id.encode()),
+        ]
+        status_code = 500
+        
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [h for h in message.get("headers", ()) if h[0].lower() not in _OWNED_HEADERS]
+                headers.extend(_SECURITY_HEADER_BYTES)
+                headers.extend(rate_headers)
+                headers.append((b"x-response-time", f"{time.perf_counter() - start_time:.3f}s".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
         
-        # Process request
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_with_headers)
         except Exception as e:
-            # Log error
             if audit_logger:
                 await audit_logger.log(
                     action="REQUEST_ERROR",
@@ -385,46 +332,52 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                 )
             raise
         
-        # Calculate response time
-        response_time = time.time() - start_time
-        
-        # Add security headers
-        for header, value in SECURITY_HEADERS.items():
-            response.headers[header] = value
-        
-        # Add rate limit headers
-        response.headers["X-RateLimit-Limit"] = str(rate_info["limit"])
-        response.headers["X-RateLimit-Remaining"] = str(rate_info["remaining"])
-        response.headers["X-RateLimit-Reset"] = str(rate_info["reset"])
-        
-        # Add request tracking headers
-        response.headers["X-Request-ID"] = request_id
-        response.headers["X-Response-Time"] = f"{response_time:.3f}s"
-        
         # Log significant requests (non-health checks, errors)
-        if endpoint != "/api/health" and (response.status_code >= 400 or response_time > 1.0):
+        response_time = time.perf_counter() - start_time
+        if endpoint != "/api/health" and (status_code >= 400 or response_time > 1.0):
             logger.info(
-                f"[{request_id}] {request.method} {endpoint} "
-                f"-> {response.status_code} ({response_time:.3f}s) "
+                f"[{request_id}] {scope['method']} {endpoint} "
+                f"-> {status_code} ({response_time:.3f}s) "
                 f"IP: {client_ip}"
             )
-        
-        return response
     
-    def _get_client_ip(self, request: Request) -> str:
+    @staticmethod
+    async def _send_rate_limited(send, rate_info: Dict[str, Any]):
+        body = json.dumps({
+            "detail": "Too many requests. Please try again later.",
+            "retry_after": rate_info["retry_after"]
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-ratelimit-limit", str(rate_info["limit"]).encode()),
+                (b"x-ratelimit-remaining", b"0"),
+                (b"x-ratelimit-reset", str(rate_info["reset"]).encode()),
+                (b"retry-after", str(rate_info["retry_after"]).encode()),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+    
+    @staticmethod
+    def _get_client_ip(scope) -> str:
         """Extract client IP from request headers"""
         # Check for forwarded headers (behind proxy/load balancer)
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
+        real_ip = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+            if name == b"x-real-ip":
+                real_ip = value.decode("latin-1")
         if real_ip:
             return real_ip
         
         # Fallback to direct client
-        if request.client:
-            return request.client.host
+        client = scope.get("client")
+        if client:
+            return client[0]
         
         return "unknown"
 
@@ -0,0 +1,438 @@
+"""
+Rate Limiting for Yacco Health
+==============================
+Sliding-window-counter rate limiter with pluggable stores.
+
+Each key keeps two counters (this window and the previous one); the request
+rate is estimated as prev * (time left in window / window) + curr. Memory per
+key is fixed, there are no timestamp lists to rebuild and no cleanup sweeps.
+
+Stores:
+- InProcessStore: dict in this process. Checks are plain dict operations on
+  the event loop thread - no locks, no awaits. Limits are per worker.
+- SharedMemoryStore: fixed-size hash table in POSIX shared memory with
+  striped fcntl locks, so every uvicorn worker on a host shares limits.
+- RedisStore: counters in Redis (or anything speaking RESP), one pipelined
+  round trip per check, shared across hosts.
+
+Select with RATE_LIMIT_BACKEND=memory|shared|redis (RATE_LIMIT_REDIS_URL,
+RATE_LIMIT_SHM_NAME, RATE_LIMIT_SHM_SLOTS). Store errors fail open.
+
+Usage:
+    from security.rate_limit import rate_limiter
+
+    limited, info = await rate_limiter.check(client_ip, "/api/auth/login", 5, 60)
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import struct
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+    from multiprocessing import resource_tracker, shared_memory
+    HAS_SHARED_MEMORY = True
+except ImportError:
+    HAS_SHARED_MEMORY = False
+
+logger = logging.getLogger(__name__)
+
+# (allowed, previous window count, current window count incl. this request if allowed)
+WindowResult = Tuple[bool, int, int]
+
+
+def _window(now: float, window_seconds: int) -> Tuple[int, float]:
+    index = int(now // window_seconds)
+    return index, now - index * window_seconds
+
+
+def _estimate(prev: int, curr: int, elapsed: float, window_seconds: int) -> float:
+    return prev * (window_seconds - elapsed) / window_seconds + curr
+
+
+# ============== Stores ==============
+
+class RateLimitStore(ABC):
+    """Applies one sliding-window step atomically for a key"""
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window_seconds: int, now: float) -> WindowResult:
+        ...
+
+    async def close(self):
+        pass
+
+
+class InProcessStore(RateLimitStore):
+    """Per-process counters; bounded by max_keys with idle keys evicted first"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._state: Dict[str, List[int]] = {}  # key -> [window index, curr, prev]
+
+    def hit_now(self, key: str, limit: int, window_seconds: int, now: float) -> WindowResult:
+        index, elapsed = _window(now, window_seconds)
+        state = self._state.get(key)
+        if state is None:
+            if len(self._state) >= self.max_keys:
+                self._evict(index)
+            state = self._state[key] = [index, 0, 0]
+        elif state[0] != index:
+            state[2] = state[1] if state[0] == index - 1 else 0
+            state[1] = 0
+            state[0] = index
+
+        allowed = _estimate(state[2], state[1], elapsed, window_seconds) + 1 <= limit
+        if allowed:
+            state[1] += 1
+        return allowed, state[2], state[1]
+
+    async def hit(self, key: str, limit: int, window_seconds: int, now: float) -> WindowResult:
+        return self.hit_now(key, limit, window_seconds, now)
+
+    def _evict(self, index: int):
+        """Drop keys idle for two windows, then the oldest-inserted if still full"""
+        stale = [k for k, s in self._state.items() if s[0] < index - 1]
+        for k in stale:
+            del self._state[k]
+        overflow = len(self._state) - self.max_keys * 3 // 4
+        if overflow > 0:
+            for k in list(self._state)[:overflow]:
+                del self._state[k]
+
+
+class SharedMemoryStore(RateLimitStore):
+    """
+    Open-addressing table in shared memory shared by all workers on a host.
+
+    Slots are grouped in buckets of GROUP_SIZE; a key hashes to one bucket and
+    only that bucket is probed, under an fcntl byte-range lock on its stripe.
+    When a bucket is full the slot with the oldest window is reused, so under
+    extreme key churn a key may lose its count (fails open, never closed).
+    """
+
+    SLOT = struct.Struct("<QqII")  # key hash, window index, curr, prev
+    GROUP_SIZE = 8
+    STRIPES = 64
+
+    def __init__(self, name: str = "yacco_rate_limit", slots: int = 65536):
+        if not HAS_SHARED_MEMORY:
+            raise RuntimeError("Shared memory rate limiting needs multiprocessing.shared_memory and fcntl")
+        self.groups = max(1, slots // self.GROUP_SIZE)
+        size = self.groups * self.GROUP_SIZE * self.SLOT.size
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+        # Otherwise the resource tracker unlinks the segment when any one worker exits
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._buf = self._shm.buf
+        lock_path = os.path.join(os.environ.get("TMPDIR", "/tmp"), f"{name}.lock")
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def hit_now(self, key: str, limit: int, window_seconds: int, now: float) -> WindowResult:
+        key_hash = self._hash(key)
+        group = key_hash % self.groups
+        stripe = group % self.STRIPES
+        index, elapsed = _window(now, window_seconds)
+        slot_size = self.SLOT.size
+        base = group * self.GROUP_SIZE * slot_size
+
+        fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, stripe)
+        try:
+            target = None
+            oldest = None
+            for n in range(self.GROUP_SIZE):
+                offset = base + n * slot_size
+                h, slot_index, curr, prev = self.SLOT.unpack_from(self._buf, offset)
+                if h == key_hash:
+                    target = (offset, slot_index, curr, prev)
+                    break
+                if h == 0 or slot_index < index - 1:
+                    if oldest is None or oldest[1] > -1:
+                        oldest = (offset, -1)
+                elif oldest is None or slot_index < oldest[1]:
+                    oldest = (offset, slot_index)
+
+            if target is None:
+                offset, slot_index, curr, prev = oldest[0], index, 0, 0
+            else:
+                offset, slot_index, curr, prev = target
+                if slot_index != index:
+                    prev = curr if slot_index == index - 1 else 0
+                    curr = 0
+
+            allowed = _estimate(prev, curr, elapsed, window_seconds) + 1 <= limit
+            if allowed:
+                curr += 1
+            self.SLOT.pack_into(self._buf, offset, key_hash, index, curr, prev)
+        finally:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+        return allowed, prev, curr
+
+    async def hit(self, key: str, limit: int, window_seconds: int, now: float) -> WindowResult:
+        return self.hit_now(key, limit, window_seconds, now)
+
+    async def close(self):
+        self._buf = None
+        self._shm.close()
+        os.close(self._lock_fd)
+
+    def unlink(self):
+        """Remove the segment (call once, from whichever process owns the host)"""
+        resource_tracker.register(self._shm._name, "shared_memory")
+        self._shm.unlink()
+
+
+class RespError(Exception):
+    """Error reply from a RESP server"""
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Read one RESP reply (error replies are returned, not raised)"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("RESP connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RespError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(rest)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"Unexpected RESP reply: {line!r}")
+
+
+class RespConnection:
+    """
+    Minimal pipelined RESP client over one asyncio connection.
+
+    Commands from many coroutines are written back to back; a single reader
+    task resolves replies in order, so concurrent checks share round trips.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, password: Optional[str] = None, db: int = 0):
+        self.host, self.port, self.password, self.db = host, port, password, db
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._waiting: Optional[asyncio.Queue] = None  # (future, reply count) per pipeline
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def from_url(cls, url: str) -> "RespConnection":
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, parsed.password, db)
+
+    async def _ensure_connected(self):
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._waiting = asyncio.Queue()
+            self._reader_task = asyncio.create_task(self._read_replies())
+            setup = []
+            if self.password:
+                setup.append(("AUTH", self.password))
+            if self.db:
+                setup.append(("SELECT", str(self.db)))
+            if setup:
+                await self._send(setup)
+
+    @staticmethod
+    def _encode(command) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def _read_one(self):
+        return await read_reply(self._reader)
+
+    async def _read_replies(self):
+        future = None
+        try:
+            while True:
+                future, count = await self._waiting.get()
+                replies = [await self._read_one() for _ in range(count)]
+                if not future.done():
+                    future.set_result(replies)
+                future = None
+        except Exception as e:
+            # Fail everything in flight; the next pipeline() reconnects
+            error = ConnectionError(str(e) or type(e).__name__)
+            failed = [future] if future is not None else []
+            while not self._waiting.empty():
+                failed.append(self._waiting.get_nowait()[0])
+            for pending in failed:
+                if not pending.done():
+                    pending.set_exception(error)
+            if self._writer is not None:
+                self._writer.close()
+
+    async def _send(self, commands) -> list:
+        future = asyncio.get_running_loop().create_future()
+        self._writer.write(b"".join(self._encode(c) for c in commands))
+        self._waiting.put_nowait((future, len(commands)))
+        replies = await future
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    async def pipeline(self, *commands) -> list:
+        await self._ensure_connected()
+        return await self._send(commands)
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class RedisStore(RateLimitStore):
+    """Counters under <prefix><key>:<window index>, expiring after two windows"""
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", prefix: str = "rl:"):
+        self.connection = RespConnection.from_url(url)
+        self.prefix = prefix
+
+    async def hit(self, key: str, limit: int, window_seconds: int, now: float) -> WindowResult:
+        index, elapsed = _window(now, window_seconds)
+        curr_key = f"{self.prefix}{key}:{index}"
+        prev_key = f"{self.prefix}{key}:{index - 1}"
+        prev, curr, _ = await self.connection.pipeline(
+            ("GET", prev_key),
+            ("INCR", curr_key),
+            ("PEXPIRE", curr_key, window_seconds * 2000),
+        )
+        prev = int(prev) if prev else 0
+        # INCR already counted this request; undo it if it is rejected
+        allowed = _estimate(prev, curr - 1, elapsed, window_seconds) + 1 <= limit
+        if not allowed:
+            await self.connection.pipeline(("DECR", curr_key))
+            curr -= 1
+        return allowed, prev, curr
+
+    async def close(self):
+        await self.connection.close()
+
+
+# ============== Limiter ==============
+
+class RateLimiter:
+    """Sliding-window-counter limiter over a RateLimitStore"""
+
+    ERROR_LOG_INTERVAL = 60
+
+    def __init__(self, store: Optional[RateLimitStore] = None):
+        self.store = store or InProcessStore()
+        self._last_error_log = 0.0
+
+    @staticmethod
+    def _get_key(identifier: str, endpoint: str) -> str:
+        return f"{identifier}:{endpoint}"
+
+    @staticmethod
+    def _info(allowed: bool, prev: int, curr: int, max_requests: int,
+              window_seconds: int, now: float) -> Dict[str, Any]:
+        index, elapsed = _window(now, window_seconds)
+        estimate = _estimate(prev, curr, elapsed, window_seconds)
+        info = {
+            "limit": max_requests,
+            "remaining": max(0, int(max_requests - estimate)),
+            "reset": (index + 1) * window_seconds,
+            "window_seconds": window_seconds,
+            "retry_after": 0
+        }
+        if not allowed:
+            if curr + 1 > max_requests:
+                # Wait for the next window and for this window's count to decay
+                wait = (window_seconds - elapsed) + window_seconds * (1 - (max_requests - 1) / max(curr, 1))
+            else:
+                wait = (window_seconds - (max_requests - 1 - curr) * window_seconds / prev) - elapsed
+            info["retry_after"] = max(1, math.ceil(wait))
+        return info
+
+    async def check(
+        self,
+        identifier: str,
+        endpoint: str,
+        max_requests: int = 100,
+        window_seconds: int = 60
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Count a request and report whether it is over the limit.
+        Returns (is_limited, rate_limit_info)
+        """
+        now = time.time()
+        key = self._get_key(identifier, endpoint)
+        try:
+            allowed, prev, curr = await self.store.hit(key, max_requests, window_seconds, now)
+        except (OSError, ConnectionError, RespError, asyncio.TimeoutError) as e:
+            if now - self._last_error_log > self.ERROR_LOG_INTERVAL:
+                logger.warning(f"Rate limit store unavailable, allowing requests: {e}")
+                self._last_error_log = now
+            allowed, prev, curr = True, 0, 0
+        return not allowed, self._info(allowed, prev, curr, max_requests, window_seconds, now)
+
+    def is_rate_limited(
+        self,
+        identifier: str,
+        endpoint: str,
+        max_requests: int = 100,
+        window_seconds: int = 60
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """Synchronous check; only available for local (in-process / shared memory) stores"""
+        if not hasattr(self.store, "hit_now"):
+            raise RuntimeError(f"{type(self.store).__name__} is async-only; use await check()")
+        now = time.time()
+        allowed, prev, curr = self.store.hit_now(self._get_key(identifier, endpoint), max_requests, window_seconds, now)
+        return not allowed, self._info(allowed, prev, curr, max_requests, window_seconds, now)
+
+
+def create_store_from_env() -> RateLimitStore:
+    backend = os.environ.get("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisStore(os.environ.get("RATE_LIMIT_REDIS_URL", "redis://127.0.0.1:6379/0"))
+    if backend == "shared":
+        return SharedMemoryStore(
+            os.environ.get("RATE_LIMIT_SHM_NAME", "yacco_rate_limit"),
+            int(os.environ.get("RATE_LIMIT_SHM_SLOTS", "65536"))
+        )
+    return InProcessStore()
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter(create_store_from_env())
@@ -21,6 +21,9 @@ import hashlib
 import secrets
 import os
 
+from audit_pipeline import audit_pipeline
+from notification_counters import UnreadCounters
+
 security_router = APIRouter(prefix="/api/security", tags=["Security & Compliance"])
 
 
@@ -547,6 +550,7 @@ CONSENT_ENFORCEMENT_RULES: List[Dict] = [
 
 def create_security_endpoints(db, get_current_user):
     """Create security and compliance endpoints"""
+    unread_counters = UnreadCounters(db)
     
     def require_admin(user: dict) -> dict:
         """Verify user has admin role"""
@@ -817,7 +821,7 @@ def create_security_endpoints(db, get_current_user):
             "severity": "alert",
             "details": f"Emergency access granted. Reason: {access_request.reason.value} - {access_request.reason_detail}"
         }
-        await db.audit_logs.insert_one(audit_log)
+        await audit_pipeline.emit(db.audit_logs, audit_log)
         
         # Send notification to admins
         admin_notification = {
@@ -831,7 +835,7 @@ def create_security_endpoints(db, get_current_user):
             "created_at": now.isoformat(),
             "is_read": False
         }
-        await db.notifications.insert_one(admin_notification)
+        await unread_counters.insert_one(admin_notification)
         
         return {
             "message": "Emergency access granted",
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Body
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Body, Query, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -37,6 +37,13 @@ from security import (
     create_access_token, decode_access_token
 )
 from security.middleware import SecurityMiddleware, setup_security
+from db_indexes import register_indexes, register_query_probe, IndexSpec, ensure_indexes
+from audit_pipeline import audit_pipeline
+from audit_analytics import AuditAnalytics
+from billing_analytics import BillingAnalytics
+from ws_bus import ws_bus, create_transport_from_env
+from principal_cache import principal_cache
+from pagination import KeysetPaginator, paginated_listing, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'yacco-emr-secret-key-2024')
@@ -329,6 +336,53 @@ class AIDocumentationRequest(BaseModel):
     symptoms: Optional[str] = None
     findings: Optional[str] = None
 
+# ============ INDEXES ============
+
+register_indexes(
+    "users",
+    IndexSpec([("id", 1)], unique=True),
+    IndexSpec([("email", 1)]),
+    IndexSpec([("organization_id", 1), ("role", 1)]),
+    IndexSpec([("organization_id", 1), ("last_name", 1), ("id", 1)]),
+)
+register_indexes(
+    "patients",
+    IndexSpec([("id", 1)], unique=True),
+    IndexSpec([("organization_id", 1), ("last_name", 1), ("id", 1)]),
+    IndexSpec([("mrn", 1)]),
+)
+register_indexes("vitals", IndexSpec([("patient_id", 1), ("recorded_at", -1)]))
+register_indexes("problems", IndexSpec([("id", 1)]), IndexSpec([("patient_id", 1)]))
+register_indexes("medications", IndexSpec([("id", 1)]), IndexSpec([("patient_id", 1), ("status", 1)]))
+register_indexes("allergies", IndexSpec([("patient_id", 1)]))
+register_indexes(
+    "clinical_notes",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("patient_id", 1), ("created_at", -1)]),
+)
+register_indexes(
+    "orders",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("organization_id", 1), ("created_at", -1), ("id", -1)]),
+    IndexSpec([("patient_id", 1), ("created_at", -1)]),
+    IndexSpec([("status", 1)]),
+)
+register_indexes(
+    "appointments",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("organization_id", 1), ("date", 1), ("id", 1)]),
+    IndexSpec([("provider_id", 1), ("date", 1)]),
+    IndexSpec([("patient_id", 1), ("date", 1)]),
+)
+register_indexes("organizations", IndexSpec([("id", 1)], unique=True), IndexSpec([("status", 1)]))
+register_indexes("regions", IndexSpec([("id", 1)]))
+
+register_query_probe("vitals", {"patient_id": "probe"}, sort=[("recorded_at", -1)])
+register_query_probe("orders", {"organization_id": "probe"}, sort=[("created_at", -1), ("id", -1)])
+register_query_probe("patients", {"organization_id": "probe"}, sort=[("last_name", 1), ("id", 1)])
+register_query_probe("appointments", {"organization_id": "probe", "date": "2024-01-01"})
+register_query_probe("users", {"id": "probe"})
+
 # ============ AUTH HELPERS ============
 
 def hash_password(password: str) -> str:
@@ -338,10 +392,12 @@ def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
 def create_token(user_id: str, role: str) -> str:
+    now = datetime.now(timezone.utc)
     payload = {
         "user_id": user_id,
         "role": role,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
+        "iat": now,
+        "exp": now + timedelta(hours=JWT_EXPIRATION_HOURS)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
@@ -349,7 +405,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     try:
         token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0, "password": 0})
+        user_id = payload["user_id"]
+        user = await principal_cache.get_or_load(
+            user_id,
+            payload.get("iat"),
+            lambda: db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        )
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -495,6 +556,7 @@ async def login_submit_phone(user_id: str = Body(...), phone_number: str = Body(
         {"id": user_id},
         {"$set": {"phone": phone_number, "phone_updated_at": datetime.now(timezone.utc).isoformat()}}
     )
+    principal_cache.invalidate_user(user_id)
     
     # Create OTP session and send SMS
     otp_result = await create_otp_session(
@@ -652,6 +714,13 @@ async def refresh_token(current_user: dict = Depends(get_current_user)):
     new_token = create_token(current_user["id"], current_user["role"])
     return {"token": new_token, "message": "Token refreshed"}
 
+@api_router.get("/auth/principal-cache/stats")
+async def get_principal_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Hit/miss counters of the authenticated-user cache in this worker process"""
+    if current_user.get("role") != "super_admin":
+        raise HTTPException(status_code=403, detail="Super admin access required")
+    return principal_cache.stats()
+
 @api_router.post("/auth/password-reset/request")
 async def request_password_reset(email: EmailStr):
     """Request password reset (sends reset token)"""
@@ -702,6 +771,7 @@ async def confirm_password_reset(token: str, new_password: str):
         {"id": reset_request["user_id"]},
         {"$set": {"password": hashed_password}}
     )
+    principal_cache.invalidate_user(reset_request["user_id"])
     
     # Mark token as used
     await db.password_resets.update_one(
@@ -728,13 +798,26 @@ async def change_password(
         {"id": current_user["id"]},
         {"$set": {"password": hashed_password}}
     )
+    principal_cache.invalidate_user(current_user["id"])
     
     return {"message": "Password changed successfully"}
 
 # ============ USER ROUTES ============
 
+# Keyset orderings for the list routes below (see pagination.py)
+USER_PAGES = KeysetPaginator("last_name")
+PATIENT_PAGES = KeysetPaginator("last_name")
+ORDER_PAGES = KeysetPaginator("created_at", direction=-1)
+APPOINTMENT_PAGES = KeysetPaginator("date")
+
 @api_router.get("/users", response_model=List[UserResponse])
-async def get_users(current_user: dict = Depends(get_current_user)):
+async def get_users(
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     query = {}
     org_id = current_user.get("organization_id")
     if org_id and current_user.get("role") not in ["super_admin", "hospital_admin"]:
@@ -745,8 +828,11 @@ async def get_users(current_user: dict = Depends(get_current_user)):
         query["organization_id"] = org_id
     # Super admin sees all
     
-    users = await db.users.find(query, {"_id": 0, "password": 0}).to_list(1000)
-    return [UserResponse(**u) for u in users]
+    return await paginated_listing(
+        USER_PAGES, db.users, query, {"_id": 0, "password": 0}, response,
+        limit=limit, cursor=cursor, format=format, filename="users.ndjson",
+        transform=lambda u: UserResponse(**u).model_dump(mode="json")
+    )
 
 @api_router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(user_id: str, current_user: dict = Depends(get_current_user)):
@@ -777,7 +863,11 @@ async def create_patient(patient_data: PatientCreate, current_user: dict = Depen
 
 @api_router.get("/patients", response_model=List[PatientResponse])
 async def get_patients(
+    response: Response,
     search: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     # Filter by organization_id (unless super_admin)
@@ -799,8 +889,11 @@ async def get_patients(
         else:
             query = search_query
     
-    patients = await db.patients.find(query, {"_id": 0}).to_list(1000)
-    return [PatientResponse(**p) for p in patients]
+    return await paginated_listing(
+        PATIENT_PAGES, db.patients, query, {"_id": 0}, response,
+        limit=limit, cursor=cursor, format=format, filename="patients.ndjson",
+        transform=lambda p: PatientResponse(**p).model_dump(mode="json")
+    )
 
 @api_router.get("/patients/{patient_id}", response_model=PatientResponse)
 async def get_patient(patient_id: str, current_user: dict = Depends(get_current_user)):
@@ -960,8 +1053,12 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(get
 
 @api_router.get("/orders")
 async def get_orders(
+    response: Response,
     patient_id: Optional[str] = None,
     status: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -972,8 +1069,10 @@ async def get_orders(
         query["patient_id"] = patient_id
     if status:
         query["status"] = status
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return orders
+    return await paginated_listing(
+        ORDER_PAGES, db.orders, query, {"_id": 0}, response,
+        limit=limit, cursor=cursor, format=format, filename="orders.ndjson"
+    )
 
 @api_router.put("/orders/{order_id}/status")
 async def update_order_status(order_id: str, status: OrderStatus, current_user: dict = Depends(get_current_user)):
@@ -1060,9 +1159,13 @@ async def create_appointment(appt_data: AppointmentCreate, current_user: dict =
 
 @api_router.get("/appointments")
 async def get_appointments(
+    response: Response,
     date: Optional[str] = None,
     provider_id: Optional[str] = None,
     patient_id: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -1075,8 +1178,10 @@ async def get_appointments(
         query["provider_id"] = provider_id
     if patient_id:
         query["patient_id"] = patient_id
-    appointments = await db.appointments.find(query, {"_id": 0}).sort("date", 1).to_list(1000)
-    return appointments
+    return await paginated_listing(
+        APPOINTMENT_PAGES, db.appointments, query, {"_id": 0}, response,
+        limit=limit, cursor=cursor, format=format, filename="appointments.ndjson"
+    )
 
 @api_router.put("/appointments/{appt_id}/status")
 async def update_appointment_status(appt_id: str, status: AppointmentStatus, current_user: dict = Depends(get_current_user)):
@@ -1481,6 +1586,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # ============ STARTUP - SEED SUPER ADMIN & REGIONS ============
@@ -1530,6 +1636,41 @@ async def seed_super_admin():
     except Exception as e:
         logger.error(f"❌ Error in startup seeding: {e}")
 
+@app.on_event("startup")
+async def provision_indexes():
+    """Create any MongoDB index declared by a module that does not exist yet"""
+    try:
+        summary = await ensure_indexes(db)
+        if summary["conflicts"]:
+            logger.warning(f"⚠️ Index conflicts: {', '.join(summary['conflicts'])}")
+        else:
+            logger.info(f"✅ Indexes provisioned: {len(summary['created'])} created")
+    except Exception as e:
+        logger.error(f"❌ Error provisioning indexes: {e}")
+
+@app.on_event("startup")
+async def start_audit_pipeline():
+    """Start the background writer that batches audit log inserts"""
+    await audit_pipeline.start()
+
+@app.on_event("startup")
+async def start_audit_rollup_backfill():
+    """Rebuild audit rollups from existing logs once per database, off the request path"""
+    AuditAnalytics(db).start_backfill()
+
+@app.on_event("startup")
+async def start_billing_rollup_backfill():
+    """Rebuild billing rollups from existing invoices and claims once per database, off the request path"""
+    BillingAnalytics(db).start_backfill()
+
+@app.on_event("startup")
+async def start_ws_bus():
+    """Connect the WebSocket fan-out bus to the configured cross-worker transport"""
+    await ws_bus.start(create_transport_from_env(db))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Flush queued audit entries while the client is still open
+    await audit_pipeline.stop()
+    await ws_bus.stop()
     client.close()
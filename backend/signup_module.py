@@ -19,6 +19,8 @@ import bcrypt
 import os
 import re
 
+from audit_pipeline import audit_pipeline
+
 signup_router = APIRouter(prefix="/api/signup", tags=["Signup & Onboarding"])
 
 # ============ Enums ============
@@ -532,7 +534,7 @@ def create_signup_endpoints(db, hash_password, get_current_user):
         )
         
         # Log action
-        await db["audit_logs"].insert_one({
+        await audit_pipeline.emit(db["audit_logs"], {
             "id": str(uuid.uuid4()),
             "action": "approve_registration",
             "user_id": user["id"],
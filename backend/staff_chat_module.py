@@ -27,9 +27,20 @@ import asyncio
 
 from security import get_current_user, TokenPayload, audit_log
 from db_service_v2 import get_db_service
+from db_indexes import register_indexes, IndexSpec
+from ws_bus import ws_bus, WebSocketBus, QueuedSocket
+from chat_search import ChatSearchIndex
+from chat_read_state import ChatReadState, read_by
 
 logger = logging.getLogger(__name__)
 
+register_indexes(
+    "chat_conversations",
+    IndexSpec([("id", 1)]),
+    IndexSpec([("participant_ids", 1), ("last_message_at", -1)]),
+)
+register_indexes("chat_messages", IndexSpec([("conversation_id", 1), ("sent_at", -1)]))
+
 
 # ============== Enums ==============
 
@@ -75,22 +86,46 @@ class ConversationUpdate(BaseModel):
 # ============== WebSocket Connection Manager ==============
 
 class ConnectionManager:
-    """Manages WebSocket connections for real-time chat"""
+    """
+    Manages WebSocket connections for real-time chat.
+
+    Sends go through the WebSocket bus, so a message reaches its recipients
+    whichever worker they are connected to; each worker delivers to the
+    sockets it holds by queueing on their QueuedSocket.
+    """
+    
+    CHANNEL = "chat"
     
-    def __init__(self):
+    def __init__(self, bus: WebSocketBus = ws_bus):
         # user_id -> WebSocket connection
         self.active_connections: Dict[str, WebSocket] = {}
+        # user_id -> outgoing queue for that connection
+        self.senders: Dict[str, QueuedSocket] = {}
         # conversation_id -> set of user_ids
         self.conversation_subscribers: Dict[str, set] = {}
+        self.bus = bus
+        bus.subscribe(self.CHANNEL, self.deliver)
     
     async def connect(self, websocket: WebSocket, user_id: str):
         """Accept and store a new WebSocket connection"""
         await websocket.accept()
+        previous = self.senders.get(user_id)
+        if previous is not None:
+            previous.close()
         self.active_connections[user_id] = websocket
+        self.senders[user_id] = QueuedSocket(websocket, on_close=lambda sender: self._closed(user_id, sender))
         logger.info(f"User {user_id} connected to chat")
     
+    def _closed(self, user_id: str, sender: QueuedSocket):
+        # Only forget the user if this is still their current connection
+        if self.senders.get(user_id) is sender:
+            self.disconnect(user_id)
+    
     def disconnect(self, user_id: str):
         """Remove a WebSocket connection"""
+        sender = self.senders.pop(user_id, None)
+        if sender is not None:
+            sender.close()
         if user_id in self.active_connections:
             del self.active_connections[user_id]
             logger.info(f"User {user_id} disconnected from chat")
@@ -106,21 +141,39 @@ class ConnectionManager:
         if conversation_id in self.conversation_subscribers:
             self.conversation_subscribers[conversation_id].discard(user_id)
     
+    def send_local(self, user_id: str, message: dict) -> bool:
+        """Queue a message for a user connected to this worker"""
+        sender = self.senders.get(user_id)
+        return sender.send(message) if sender is not None else False
+    
+    def deliver(self, envelope: dict):
+        """Bus handler: queue an envelope's messages for the users connected to this worker"""
+        if envelope.get("op") == "users":
+            for user_id, message in envelope.get("messages", {}).items():
+                self.send_local(user_id, message)
+        elif envelope.get("op") == "conversation":
+            exclude_user = envelope.get("exclude_user")
+            for user_id in list(self.conversation_subscribers.get(envelope.get("conversation_id"), ())):
+                if user_id != exclude_user:
+                    self.send_local(user_id, envelope["message"])
+    
     async def send_to_user(self, user_id: str, message: dict):
         """Send a message to a specific user"""
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending message to user {user_id}: {e}")
-                self.disconnect(user_id)
+        await self.send_to_users({user_id: message})
+    
+    async def send_to_users(self, messages: Dict[str, dict]):
+        """Send each user their own message with one bus publish"""
+        if messages:
+            await self.bus.publish(self.CHANNEL, {"op": "users", "messages": messages})
     
     async def broadcast_to_conversation(self, conversation_id: str, message: dict, exclude_user: str = None):
         """Broadcast a message to all users in a conversation"""
-        if conversation_id in self.conversation_subscribers:
-            for user_id in self.conversation_subscribers[conversation_id]:
-                if user_id != exclude_user:
-                    await self.send_to_user(user_id, message)
+        await self.bus.publish(self.CHANNEL, {
+            "op": "conversation",
+            "conversation_id": conversation_id,
+            "message": message,
+            "exclude_user": exclude_user
+        })
     
     async def send_typing_indicator(self, conversation_id: str, user_id: str, user_name: str, is_typing: bool):
         """Send typing indicator to conversation participants"""
@@ -144,6 +197,8 @@ def create_staff_chat_router(db) -> APIRouter:
     """Create the staff chat router with database dependency"""
     
     router = APIRouter(prefix="/api/chat", tags=["Staff Chat"])
+    chat_search = ChatSearchIndex(db)
+    read_state = ChatReadState(db)
     
     # ============== Helper Functions ==============
     
@@ -308,24 +363,19 @@ def create_staff_chat_router(db) -> APIRouter:
             "attachment_url": message.attachment_url,
             "attachment_name": message.attachment_name,
             "sent_at": now.isoformat(),
-            "read_by": [current_user.user_id],
             "organization_id": current_user.organization_id
         }
         
         await db_svc.insert("chat_messages", msg, generate_id=False)
+        await chat_search.index(msg)
         
-        # Update conversation with last message
-        unread_counts = conversation.get("unread_counts", {})
-        for pid in conversation["participant_ids"]:
-            if pid != current_user.user_id:
-                unread_counts[pid] = unread_counts.get(pid, 0) + 1
-        
-        await db_svc.update_by_id("chat_conversations", conversation_id, {
+        # Update conversation with last message; unread counts and the sender's watermark move atomically
+        await read_state.record_sent(conversation, msg, {
             "last_message": message.content[:100],
             "last_message_at": now.isoformat(),
-            "updated_at": now.isoformat(),
-            "unread_counts": unread_counts
+            "updated_at": now.isoformat()
         })
+        msg["read_by"] = [current_user.user_id]
         
         # Broadcast to connected users
         broadcast_msg = {
@@ -363,21 +413,11 @@ def create_staff_chat_router(db) -> APIRouter:
             limit=limit
         )
         
-        # Mark messages as read - use direct MongoDB for $addToSet
-        await db_svc.collection("chat_messages").update_many(
-            {
-                "conversation_id": conversation_id,
-                "sender_id": {"$ne": current_user.user_id},
-                "read_by": {"$ne": current_user.user_id}
-            },
-            {"$addToSet": {"read_by": current_user.user_id}}
-        )
-        
-        # Reset unread count for this user - use direct MongoDB for nested field update
-        await db_svc.collection("chat_conversations").update_one(
-            {"id": conversation_id},
-            {"$set": {f"unread_counts.{current_user.user_id}": 0}}
-        )
+        # Mark as read: move this user's watermark and reset their unread count
+        conversation = await get_conversation(conversation_id)
+        watermarks = await read_state.mark_read(conversation, current_user.user_id)
+        for msg in messages:
+            msg["read_by"] = read_by(msg, watermarks)
         
         return {
             "messages": list(reversed(messages)),  # Chronological order
@@ -393,25 +433,11 @@ def create_staff_chat_router(db) -> APIRouter:
         current_user: TokenPayload = Depends(get_current_user)
     ):
         """Mark all messages in a conversation as read"""
-        db_svc = get_db_service()
-        
         if not await user_in_conversation(current_user.user_id, conversation_id):
             raise HTTPException(status_code=403, detail="Not a member of this conversation")
         
-        # Use direct MongoDB for $addToSet
-        await db_svc.collection("chat_messages").update_many(
-            {
-                "conversation_id": conversation_id,
-                "sender_id": {"$ne": current_user.user_id},
-                "read_by": {"$ne": current_user.user_id}
-            },
-            {"$addToSet": {"read_by": current_user.user_id}}
-        )
-        
-        await db_svc.collection("chat_conversations").update_one(
-            {"id": conversation_id},
-            {"$set": {f"unread_counts.{current_user.user_id}": 0}}
-        )
+        conversation = await get_conversation(conversation_id)
+        await read_state.mark_read(conversation, current_user.user_id)
         
         return {"success": True}
     
@@ -420,32 +446,15 @@ def create_staff_chat_router(db) -> APIRouter:
     @router.get("/search", response_model=dict)
     async def search_messages(
         query: str = Query(..., min_length=2),
-        limit: int = 20,
+        limit: int = Query(20, ge=1, le=100),
         current_user: TokenPayload = Depends(get_current_user)
     ):
-        """Search messages across all user's conversations"""
-        db_svc = get_db_service()
-        
-        # Get user's conversations
-        conversations = await db_svc.find(
-            "chat_conversations",
-            {"participant_ids": current_user.user_id},
-            projection={"id": 1},
-            limit=1000
-        )
-        
-        conversation_ids = [c["id"] for c in conversations]
-        
-        # Search messages
-        messages = await db_svc.find(
-            "chat_messages",
-            {
-                "conversation_id": {"$in": conversation_ids},
-                "content": {"$regex": query, "$options": "i"}
-            },
-            sort=[("sent_at", -1)],
-            limit=limit
-        )
+        """
+        Search messages across all user's conversations.
+        Ranked by query words matched, then recency; each message carries a
+        snippet with highlight offsets.
+        """
+        messages = await chat_search.search(current_user.user_id, query, limit=limit)
         
         return {
             "messages": messages,
@@ -557,7 +566,7 @@ def create_chat_websocket_router(db) -> APIRouter:
                 chat_manager.subscribe_to_conversation(user_id, conv["id"])
             
             # Send connection confirmation
-            await websocket.send_json({
+            chat_manager.send_local(user_id, {
                 "type": "connected",
                 "user_id": user_id,
                 "conversations": len(conversations)
@@ -584,7 +593,7 @@ def create_chat_websocket_router(db) -> APIRouter:
                 
                 elif data.get("type") == "ping":
                     # Heartbeat
-                    await websocket.send_json({"type": "pong"})
+                    chat_manager.send_local(user_id, {"type": "pong"})
         
         except WebSocketDisconnect:
             chat_manager.disconnect(user_id)
@@ -0,0 +1,273 @@
+"""
+Pharmacy Stock Ledger for Yacco Health
+=======================================
+Atomic FIFO stock deduction for pharmacy sales.
+
+Every deduction is a conditional $inc guarded by `current_stock >= qty`
+(drug level) and `quantity_remaining >= deduct` (batch level), so two tills
+selling the last units of a drug can never both succeed.
+
+- Replica set / mongos: drug and batch decrements are two bulk_write calls
+  inside one multi-document transaction; a failed guard aborts everything,
+  and the transaction is re-planned if only a batch guard failed.
+- Standalone mongod: guarded updates are issued concurrently (one round trip
+  of wall-clock latency); successful drug reservations are compensated if any
+  line item fails, and batch allocations are re-planned if another till
+  drained a batch first.
+
+Usage:
+    from stock_ledger import StockLedger, InsufficientStockError
+
+    ledger = StockLedger(db)
+    lines = await ledger.deduct(pharmacy_id, [{"drug_id": ..., "quantity": 2}])
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Re-plan attempts when a concurrent sale drains a batch between read and write
+MAX_BATCH_REPLANS = 3
+
+
+class StockError(Exception):
+    """Base stock ledger error"""
+
+
+class DrugNotFoundError(StockError):
+    def __init__(self, drug_id: str):
+        self.drug_id = drug_id
+        super().__init__(f"Drug {drug_id} not found")
+
+
+class InsufficientStockError(StockError):
+    def __init__(self, drug: Dict[str, Any]):
+        self.drug = drug
+        super().__init__(f"Insufficient stock for {drug.get('generic_name')}")
+
+
+class _GuardFailed(Exception):
+    """Raised inside a transaction to abort it when a conditional update matched nothing"""
+
+    def __init__(self, drug_id: Optional[str] = None):
+        self.drug_id = drug_id
+
+
+class StockLedger:
+    """Deducts sale quantities from pharmacy_drugs and FIFO batches in pharmacy_inventory"""
+
+    def __init__(self, db):
+        self.db = db
+        self.client = getattr(db, "client", None)
+        self._supports_transactions: Optional[bool] = None
+
+    async def supports_transactions(self) -> bool:
+        """Transactions need a replica set member or mongos; cached after the first check"""
+        if self._supports_transactions is None:
+            try:
+                hello = await self.client.admin.command("hello")
+                self._supports_transactions = bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+            except Exception:
+                self._supports_transactions = False
+        return self._supports_transactions
+
+    # ============== Public API ==============
+
+    async def deduct(self, pharmacy_id: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Deduct stock for sale items [{drug_id, quantity, unit_price?, discount?}].
+        Returns priced sale lines. Raises DrugNotFoundError / InsufficientStockError
+        without changing any stock.
+        """
+        quantities: Dict[str, int] = {}
+        for item in items:
+            quantities[item["drug_id"]] = quantities.get(item["drug_id"], 0) + int(item["quantity"])
+
+        drugs = await self.db["pharmacy_drugs"].find(
+            {"pharmacy_id": pharmacy_id, "id": {"$in": list(quantities)}},
+            {"_id": 0}
+        ).to_list(len(quantities))
+        drugs_by_id = {d["id"]: d for d in drugs}
+
+        for drug_id, qty in quantities.items():
+            drug = drugs_by_id.get(drug_id)
+            if not drug:
+                raise DrugNotFoundError(drug_id)
+            if drug.get("current_stock", 0) < qty:
+                raise InsufficientStockError(drug)
+
+        if await self.supports_transactions():
+            await self._deduct_in_transaction(pharmacy_id, quantities, drugs_by_id)
+        else:
+            await self._deduct_with_compensation(pharmacy_id, quantities, drugs_by_id)
+
+        return self._price_lines(items, drugs_by_id)
+
+    # ============== Transactional path ==============
+
+    async def _deduct_in_transaction(self, pharmacy_id: str, quantities: Dict[str, int], drugs_by_id: Dict[str, dict]):
+        # batch_id -> (drug_id, deduct) planned by the latest attempt
+        planned: Dict[str, tuple] = {}
+
+        async def txn(session):
+            planned.clear()
+            result = await self.db["pharmacy_drugs"].bulk_write(
+                self._drug_ops(pharmacy_id, quantities), ordered=False, session=session
+            )
+            if result.matched_count != len(quantities):
+                raise _GuardFailed()
+
+            batches = await self._load_batches(pharmacy_id, list(quantities), session=session)
+            drug_for_batch = {b["id"]: b["drug_id"] for b in batches}
+            plan = self._plan_fifo(quantities, batches)
+            planned.update({batch_id: (drug_for_batch[batch_id], deduct) for batch_id, deduct in plan})
+            ops = [
+                UpdateOne(
+                    {"id": batch_id, "quantity_remaining": {"$gte": deduct}},
+                    {"$inc": {"quantity_remaining": -deduct}}
+                )
+                for batch_id, deduct in plan
+            ]
+            if ops:
+                result = await self.db["pharmacy_inventory"].bulk_write(ops, ordered=False, session=session)
+                if result.matched_count != len(ops):
+                    raise _GuardFailed()
+
+        async with await self.client.start_session() as session:
+            for attempt in range(MAX_BATCH_REPLANS):
+                try:
+                    await session.with_transaction(txn)
+                    return
+                except _GuardFailed:
+                    # Another till took the stock after our read; report the drug that ran short
+                    fresh = await self.db["pharmacy_drugs"].find(
+                        {"pharmacy_id": pharmacy_id, "id": {"$in": list(quantities)}},
+                        {"_id": 0}
+                    ).to_list(len(quantities))
+                    for drug in fresh:
+                        if drug.get("current_stock", 0) < quantities[drug["id"]]:
+                            raise InsufficientStockError(drug)
+                    # Drug stock still covers the sale, so a batch was drained under us; re-plan
+                    if attempt == MAX_BATCH_REPLANS - 1:
+                        drug_id = await self._drained_drug(pharmacy_id, quantities, planned)
+                        raise InsufficientStockError(drugs_by_id[drug_id])
+                except OperationFailure as e:
+                    logger.error(f"Stock transaction failed for pharmacy {pharmacy_id}: {e}")
+                    raise
+
+    # ============== Standalone path ==============
+
+    async def _deduct_with_compensation(self, pharmacy_id: str, quantities: Dict[str, int], drugs_by_id: Dict[str, dict]):
+        drug_ids = list(quantities)
+        results = await asyncio.gather(*[
+            self.db["pharmacy_drugs"].update_one(
+                {"id": drug_id, "pharmacy_id": pharmacy_id, "current_stock": {"$gte": quantities[drug_id]}},
+                {"$inc": {"current_stock": -quantities[drug_id]}}
+            )
+            for drug_id in drug_ids
+        ])
+
+        failed = [drug_id for drug_id, r in zip(drug_ids, results) if r.modified_count == 0]
+        if failed:
+            reserved = [drug_id for drug_id, r in zip(drug_ids, results) if r.modified_count == 1]
+            if reserved:
+                await self.db["pharmacy_drugs"].bulk_write([
+                    UpdateOne(
+                        {"id": drug_id, "pharmacy_id": pharmacy_id},
+                        {"$inc": {"current_stock": quantities[drug_id]}}
+                    )
+                    for drug_id in reserved
+                ], ordered=False)
+            raise InsufficientStockError(drugs_by_id[failed[0]])
+
+        # Drug-level stock is reserved; now take it out of the oldest batches
+        outstanding = dict(quantities)
+        for _ in range(MAX_BATCH_REPLANS):
+            batches = await self._load_batches(pharmacy_id, list(outstanding))
+            plan = self._plan_fifo(outstanding, batches)
+            if not plan:
+                break
+            drug_for_batch = {b["id"]: b["drug_id"] for b in batches}
+            results = await asyncio.gather(*[
+                self.db["pharmacy_inventory"].update_one(
+                    {"id": batch_id, "quantity_remaining": {"$gte": deduct}},
+                    {"$inc": {"quantity_remaining": -deduct}}
+                )
+                for batch_id, deduct in plan
+            ])
+            for (batch_id, deduct), r in zip(plan, results):
+                if r.modified_count:
+                    drug_id = drug_for_batch[batch_id]
+                    outstanding[drug_id] -= deduct
+            outstanding = {k: v for k, v in outstanding.items() if v > 0}
+            if not outstanding:
+                break
+
+        if outstanding:
+            # Batches drifted from current_stock; the sale stands but the gap is worth a look
+            logger.warning(f"Batch shortfall for pharmacy {pharmacy_id} after sale: {outstanding}")
+
+    # ============== Helpers ==============
+
+    @staticmethod
+    def _drug_ops(pharmacy_id: str, quantities: Dict[str, int]) -> List[UpdateOne]:
+        return [
+            UpdateOne(
+                {"id": drug_id, "pharmacy_id": pharmacy_id, "current_stock": {"$gte": qty}},
+                {"$inc": {"current_stock": -qty}}
+            )
+            for drug_id, qty in quantities.items()
+        ]
+
+    async def _load_batches(self, pharmacy_id: str, drug_ids: List[str], session=None) -> List[dict]:
+        return await self.db["pharmacy_inventory"].find(
+            {"pharmacy_id": pharmacy_id, "drug_id": {"$in": drug_ids}, "quantity_remaining": {"$gt": 0}},
+            {"_id": 0, "id": 1, "drug_id": 1, "quantity_remaining": 1, "expiry_date": 1},
+            session=session
+        ).sort([("drug_id", 1), ("expiry_date", 1)]).to_list(None)
+
+    async def _drained_drug(self, pharmacy_id: str, quantities: Dict[str, int], planned: Dict[str, tuple]) -> str:
+        """Drug whose planned batch no longer holds the planned deduction"""
+        batches = await self._load_batches(pharmacy_id, list(quantities))
+        remaining = {b["id"]: b["quantity_remaining"] for b in batches}
+        for batch_id, (drug_id, deduct) in planned.items():
+            if remaining.get(batch_id, 0) < deduct:
+                return drug_id
+        return next(iter(planned.values()))[0] if planned else next(iter(quantities))
+
+    @staticmethod
+    def _plan_fifo(quantities: Dict[str, int], batches: List[dict]) -> List[tuple]:
+        """(batch_id, deduct) pairs taking each drug's quantity from its earliest-expiring batches"""
+        remaining = dict(quantities)
+        plan = []
+        for batch in batches:
+            left = remaining.get(batch["drug_id"], 0)
+            if left <= 0:
+                continue
+            deduct = min(left, batch["quantity_remaining"])
+            plan.append((batch["id"], deduct))
+            remaining[batch["drug_id"]] = left - deduct
+        return plan
+
+    @staticmethod
+    def _price_lines(items: List[Dict[str, Any]], drugs_by_id: Dict[str, dict]) -> List[Dict[str, Any]]:
+        lines = []
+        for item in items:
+            drug = drugs_by_id[item["drug_id"]]
+            unit_price = item.get("unit_price", drug.get("unit_price", 0))
+            discount = item.get("discount", 0)
+            lines.append({
+                "drug_id": item["drug_id"],
+                "drug_name": drug.get("generic_name"),
+                "brand_name": drug.get("brand_name"),
+                "quantity": item["quantity"],
+                "unit_price": unit_price,
+                "discount": discount,
+                "total": item["quantity"] * unit_price - discount
+            })
+        return lines
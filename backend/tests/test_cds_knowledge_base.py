@@ -0,0 +1,86 @@
+"""
+CDS Knowledge Base Tests
+========================
+Unit tests for the compiled drug interaction lookup in cds_module.
+
+Features tested:
+- Resolving free-text medication names to canonical drugs and classes
+- Substring matching for names that are not an exact known name
+- Class names written with spaces ("ACE inhibitor")
+- check_interaction for drug-level and class-level pairs
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cds_module import CDS_KNOWLEDGE_BASE  # noqa: E402
+
+
+@pytest.fixture
+def kb():
+    return CDS_KNOWLEDGE_BASE
+
+
+class TestResolve:
+    """Medication name -> (drug, class) terms"""
+
+    def test_exact_name(self, kb):
+        assert kb.resolve("Warfarin") == ("warfarin", "anticoagulant")
+
+    def test_name_with_dose(self, kb):
+        assert kb.resolve("Lisinopril 10mg tablet") == ("lisinopril", "ace_inhibitor")
+
+    def test_multi_word_name(self, kb):
+        assert kb.resolve("IV contrast 100 mL") == ("contrast",)
+        assert kb.resolve("ACE inhibitor therapy") == ("ace_inhibitor",)
+
+    def test_substring_match(self, kb):
+        assert kb.resolve("Esomeprazole 40mg") == ("omeprazole",)
+
+    def test_class_name_with_space(self, kb):
+        assert kb.resolve("ACE inhibitor") == ("ace_inhibitor",)
+        assert kb.get_drug_class("ACE inhibitors") == "ace_inhibitor"
+
+    def test_class_name(self, kb):
+        assert kb.resolve("NSAIDs") == ("nsaids",)
+        assert kb.get_drug_class("NSAID") == "nsaids"
+
+    def test_unknown_drug(self, kb):
+        assert kb.resolve("Acetaminophen 500mg") == ()
+        assert kb.get_drug_class("Acetaminophen") is None
+
+    def test_empty_name(self, kb):
+        assert kb.resolve("") == ()
+
+
+class TestCheckInteraction:
+    """Pair checks in either order, drug-level before class-level"""
+
+    def test_substring_pair(self, kb):
+        result = kb.check_interaction("Clopidogrel 75mg", "Esomeprazole 40mg")
+        assert result is not None
+        assert result["severity"] == "warning"
+        assert result["drugs"] == ("Clopidogrel 75mg", "Esomeprazole 40mg")
+
+    def test_direct_pair_either_order(self, kb):
+        assert kb.check_interaction("Warfarin 5mg", "Ibuprofen 400mg") is not None
+        assert kb.check_interaction("Ibuprofen 400mg", "Warfarin 5mg") is not None
+
+    def test_class_pair(self, kb):
+        result = kb.check_interaction("Sertraline 50mg", "Phenelzine 15mg")
+        assert result is not None
+        assert result["severity"] == "critical"
+
+    def test_drug_with_class_member(self, kb):
+        assert kb.check_interaction("Methotrexate", "Naproxen 500mg") is not None
+
+    def test_potassium_salt(self, kb):
+        assert kb.check_interaction("Lisinopril 20mg", "Potassium chloride 20mEq") is not None
+
+    def test_no_interaction(self, kb):
+        assert kb.check_interaction("Metformin 500mg", "Atorvastatin 20mg") is None
+        assert kb.check_interaction("Acetaminophen", "Warfarin") is None
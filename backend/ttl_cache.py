@@ -0,0 +1,129 @@
+"""
+TTL Cache for Yacco Health
+==========================
+Small in-process cache with per-entry expiry, explicit invalidation and
+hit/miss counters. Concurrent misses for the same key share one computation,
+so a burst of polling clients triggers a single database round trip.
+
+Entries live in this worker's memory only; keep TTLs short enough that
+writes made by other workers become visible quickly.
+
+Usage:
+    from ttl_cache import TTLCache
+
+    dashboard_cache = TTLCache("pharmacy_dashboard", ttl_seconds=15)
+    data = await dashboard_cache.get_or_compute(pharmacy_id, lambda: build(pharmacy_id))
+    dashboard_cache.invalidate(pharmacy_id)
+    dashboard_cache.stats()  # {"hits": ..., "misses": ..., "hit_rate": ...}
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+# Every cache created in this process, by name, for stats endpoints
+CACHE_REGISTRY: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ttl_seconds after being stored"""
+
+    def __init__(self, name: str, ttl_seconds: float, maxsize: int = 1024):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        CACHE_REGISTRY[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return default
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Live-entry check that does not touch LRU order or counters"""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop key; an in-flight computation for it will not be stored"""
+        self.invalidations += 1
+        self._entries.pop(key, None)
+        self._pending.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._pending.clear()
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Counted as a miss by get(); it shares the in-flight computation instead
+            self.misses -= 1
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await compute()
+        except Exception as e:
+            self._forget_pending(key, future)
+            future.set_exception(e)
+            future.exception()  # mark retrieved; waiters (if any) still get the error
+            raise
+        except BaseException:
+            self._forget_pending(key, future)
+            future.cancel()
+            raise
+
+        # Only store if nobody invalidated the key while we were computing
+        if self._pending.get(key) is future:
+            del self._pending[key]
+            self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def _forget_pending(self, key: Hashable, future: asyncio.Future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            # Share of lookups answered without running the computation
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
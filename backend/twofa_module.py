@@ -18,6 +18,8 @@ import qrcode
 import io
 import base64 as b64
 
+from principal_cache import principal_cache
+
 twofa_router = APIRouter(prefix="/api/2fa", tags=["Two-Factor Authentication"])
 
 
@@ -287,6 +289,7 @@ def create_2fa_endpoints(db, get_current_user, verify_password_func, create_toke
             {"id": current_user["id"]},
             {"$set": {"two_factor_enabled": True}}
         )
+        principal_cache.invalidate_user(current_user["id"])
         
         return {
             "success": True,
@@ -340,6 +343,7 @@ def create_2fa_endpoints(db, get_current_user, verify_password_func, create_toke
             {"id": current_user["id"]},
             {"$set": {"two_factor_enabled": False}}
         )
+        principal_cache.invalidate_user(current_user["id"])
         
         return {
             "success": True,
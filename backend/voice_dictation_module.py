@@ -13,6 +13,8 @@ import tempfile
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
+from export_stream import export_cursor, export_response
+
 load_dotenv()
 
 # Medical terminology dictionary for common corrections
@@ -114,6 +116,12 @@ MEDICAL_ABBREVIATIONS = {
 }
 
 
+VOICE_LOG_EXPORT_FIELDS = [
+    "timestamp", "user_id", "user_name", "user_role", "context", "action", "language",
+    "duration_seconds", "corrections_count", "input_length", "output_length", "organization_id"
+]
+
+
 class TranscriptionResponse(BaseModel):
     text: str
     corrected_text: str
@@ -415,6 +423,35 @@ def create_voice_dictation_router(db, get_current_user) -> APIRouter:
             "skip": skip
         }
     
+    @router.get("/audit-logs/export")
+    async def export_voice_dictation_audit_logs(
+        format: str = "csv",
+        user_id: Optional[str] = None,
+        context: Optional[str] = None,
+        gzip: bool = False,
+        user: dict = Depends(get_current_user)
+    ):
+        """Stream voice dictation audit logs as CSV or NDJSON."""
+        allowed_roles = ["hospital_admin", "super_admin", "hospital_it_admin"]
+        if user.get("role") not in allowed_roles:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        if format not in ("csv", "ndjson"):
+            raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+        
+        org_id = user.get("organization_id")
+        query = {"organization_id": org_id} if org_id else {}
+        
+        if user_id:
+            query["user_id"] = user_id
+        if context:
+            query["context"] = context
+        
+        rows = export_cursor(db["voice_dictation_logs"], query, {"_id": 0}, sort=[("timestamp", -1)])
+        return export_response(
+            rows, format, f"voice_dictation_logs_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}",
+            fieldnames=VOICE_LOG_EXPORT_FIELDS, compress=gzip
+        )
+    
     # ============== AI REPORT AUTO-GENERATION ==============
     
     @router.post("/ai-expand")
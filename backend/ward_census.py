@@ -0,0 +1,211 @@
+"""
+Ward Census Counters for Yacco Health
+=====================================
+Per-ward bed status counters, kept in the `ward_census` collection (one
+document per organization + ward) and updated with $inc whenever a bed
+changes state, so the census dashboard reads one small document per ward
+instead of every bed in the hospital.
+
+Bed state changes go through claim_bed()/set_bed_status(), which update the
+bed with find_one_and_update and apply the exact old -> new transition to
+the counters. Counters can still drift (a crash between the two writes, a
+manual database edit); reconcile() rebuilds them from `beds` with one
+aggregation and reports what was off. Reconciled organizations are marked
+in `ward_census_reconciled`; the first read for an organization without a
+marker reconciles it first, so beds that existed before the counters did
+are counted even if a transition has already created a partial counter.
+
+Usage:
+    from ward_census import WardCensus
+
+    census = WardCensus(db)
+    bed = await census.claim_bed(bed_id, "occupied", {...})   # None if not available
+    await census.set_bed_status(bed_id, "cleaning", {...})
+    await census.release_claim(bed_id, admission_id)   # follow-up write failed
+    wards = await census.read(org_id)      # {ward_id: {"total": n, "counts": {...}}}
+    report = await census.reconcile(org_id)
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument, UpdateOne
+
+from db_indexes import register_indexes, IndexSpec
+
+logger = logging.getLogger(__name__)
+
+CENSUS_COLLECTION = "ward_census"
+RECONCILED_COLLECTION = "ward_census_reconciled"
+
+register_indexes(CENSUS_COLLECTION, IndexSpec([("organization_id", 1), ("ward_id", 1)], unique=True))
+register_indexes(RECONCILED_COLLECTION, IndexSpec([("organization_id", 1)], unique=True))
+
+
+def _status(value) -> str:
+    """BedStatus members and plain strings both become the stored string"""
+    return getattr(value, "value", value)
+
+
+class WardCensus:
+    """Bed state transitions plus the per-ward counters they maintain"""
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db[CENSUS_COLLECTION]
+        self.reconciled = db[RECONCILED_COLLECTION]
+        # Organizations known to be reconciled, so reads skip the marker lookup
+        self._reconciled_orgs = set()
+
+    # ============== Counter updates ==============
+
+    async def _apply(self, org_id: Optional[str], ward_id: Optional[str], inc: Dict[str, int]):
+        inc = {field: delta for field, delta in inc.items() if delta}
+        if not inc:
+            return
+        await self.collection.update_one(
+            {"organization_id": org_id, "ward_id": ward_id},
+            {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+
+    async def add_beds(self, org_id: Optional[str], ward_id: Optional[str], count: int, status: str = "available"):
+        """Count newly created beds"""
+        await self._apply(org_id, ward_id, {"total": count, f"counts.{_status(status)}": count})
+
+    async def record_transition(self, bed: Dict[str, Any], new_status):
+        """Apply one bed's old -> new status change to its ward's counters"""
+        old, new = _status(bed.get("status")), _status(new_status)
+        if old == new or not bed.get("is_active", True):
+            return
+        await self._apply(bed.get("organization_id"), bed.get("ward_id"), {f"counts.{old}": -1, f"counts.{new}": 1})
+
+    # ============== Bed state changes ==============
+
+    async def claim_bed(self, bed_id: str, new_status, fields: Optional[Dict[str, Any]] = None,
+                        required_status: str = "available") -> Optional[Dict[str, Any]]:
+        """
+        Move a bed from required_status to new_status atomically.
+        Returns the bed as it was before, or None if it was not in required_status.
+        """
+        bed = await self.db["beds"].find_one_and_update(
+            {"id": bed_id, "status": required_status},
+            {"$set": {"status": _status(new_status), **(fields or {})}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        if bed:
+            await self.record_transition(bed, new_status)
+        return bed
+
+    async def set_bed_status(self, bed_id: str, new_status,
+                             fields: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Set a bed's status whatever it was; returns the bed as it was before, or None if missing"""
+        bed = await self.db["beds"].find_one_and_update(
+            {"id": bed_id},
+            {"$set": {"status": _status(new_status), **(fields or {})}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        if bed:
+            await self.record_transition(bed, new_status)
+        return bed
+
+    async def release_claim(self, bed_id: str, admission_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Undo claim_bed() for an admission whose follow-up write failed: the bed
+        goes back to available, if admission_id still holds it. Returns the bed
+        as it was before, or None if it no longer held that admission.
+        """
+        bed = await self.db["beds"].find_one_and_update(
+            {"id": bed_id, "current_admission_id": admission_id},
+            {"$set": {
+                "status": "available",
+                "current_patient_id": None,
+                "current_admission_id": None,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        if bed:
+            await self.record_transition(bed, "available")
+        return bed
+
+    # ============== Reads ==============
+
+    async def read(self, org_id: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """Counters for every ward of an organization, keyed by ward id"""
+        if org_id not in self._reconciled_orgs:
+            if not await self.reconciled.find_one({"organization_id": org_id}):
+                # First read for this organization since counters were introduced
+                await self.reconcile(org_id)
+            self._reconciled_orgs.add(org_id)
+        docs = await self.collection.find({"organization_id": org_id}, {"_id": 0}).to_list(None)
+        return {doc.get("ward_id"): {"total": doc.get("total", 0), "counts": doc.get("counts", {})} for doc in docs}
+
+    # ============== Reconciliation ==============
+
+    async def _expected(self, org_id: Optional[str]) -> Dict[tuple, Dict[str, Any]]:
+        match: Dict[str, Any] = {"is_active": True}
+        if org_id is not None:
+            match["organization_id"] = org_id
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"org": "$organization_id", "ward": "$ward_id", "status": "$status"},
+                "count": {"$sum": 1}
+            }}
+        ]
+        expected: Dict[tuple, Dict[str, Any]] = {}
+        async for row in self.db["beds"].aggregate(pipeline):
+            key = (row["_id"].get("org"), row["_id"].get("ward"))
+            entry = expected.setdefault(key, {"total": 0, "counts": {}})
+            entry["total"] += row["count"]
+            entry["counts"][_status(row["_id"].get("status"))] = row["count"]
+        return expected
+
+    async def reconcile(self, org_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Rebuild counters from `beds` (one organization, or all when org_id is None)
+        and report the wards whose counters had drifted.
+        """
+        expected = await self._expected(org_id)
+        query = {} if org_id is None else {"organization_id": org_id}
+        stored = {
+            (doc.get("organization_id"), doc.get("ward_id")): doc
+            async for doc in self.collection.find(query, {"_id": 0})
+        }
+
+        now = datetime.now(timezone.utc).isoformat()
+        drift: List[Dict[str, Any]] = []
+        operations = []
+        for key in expected.keys() | stored.keys():
+            want = expected.get(key, {"total": 0, "counts": {}})
+            have = stored.get(key, {})
+            have_counts = {status: n for status, n in (have.get("counts") or {}).items() if n}
+            if have.get("total", 0) == want["total"] and have_counts == want["counts"]:
+                continue
+            drift.append({
+                "organization_id": key[0],
+                "ward_id": key[1],
+                "expected": want,
+                "counted": {"total": have.get("total", 0), "counts": have_counts}
+            })
+            selector = {"organization_id": key[0], "ward_id": key[1]}
+            if key in expected:
+                operations.append(ReplaceOne(selector, {**selector, **want, "updated_at": now}, upsert=True))
+            else:
+                operations.append(DeleteOne(selector))
+
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        orgs = {org_id} if org_id is not None else {org for org, _ in expected.keys() | stored.keys()}
+        if orgs:
+            await self.reconciled.bulk_write([
+                UpdateOne({"organization_id": org}, {"$set": {"reconciled_at": now}}, upsert=True) for org in orgs
+            ], ordered=False)
+        if drift and stored:
+            logger.warning(f"Ward census drift corrected in {len(drift)} ward(s)")
+        return {"wards_checked": len(expected), "drifted": drift, "reconciled_at": now}
@@ -0,0 +1,328 @@
+"""
+WebSocket Fan-out Bus for Yacco Health
+======================================
+Delivers WebSocket messages to clients connected to any uvicorn worker.
+
+Connection managers (staff chat, pharmacy notifications) publish an
+envelope on their channel instead of writing to sockets directly. The bus
+hands it to the local subscriber at once and, through the transport, to the
+same channel in every other worker, which delivers it to whatever clients
+it holds. Each worker ignores its own envelopes when they come back.
+
+Transports:
+- LocalTransport: nothing leaves the process (single worker; the default).
+- RespTransport: Redis (or anything speaking RESP) PUBLISH/SUBSCRIBE.
+- MongoTransport: inserts into `ws_bus_events` and follows a change stream
+  (needs a replica set; events expire after WS_BUS_EVENT_TTL seconds).
+
+Select with WS_BUS_BACKEND=local|redis|mongo (WS_BUS_REDIS_URL). Transport
+errors are logged and local delivery carries on.
+
+Every socket gets a QueuedSocket: a bounded outgoing queue drained by its
+own task, so a broadcast only enqueues and one slow client cannot hold up
+the others. A client whose queue fills up (WS_SEND_QUEUE, default 256) or
+whose send takes longer than WS_SEND_TIMEOUT seconds is disconnected.
+
+Usage:
+    from ws_bus import ws_bus, QueuedSocket
+
+    ws_bus.subscribe("chat", manager.deliver)       # deliver(envelope) runs in every worker
+    await ws_bus.publish("chat", {"op": "users", "messages": {user_id: message}})
+
+    # server startup / shutdown
+    await ws_bus.start(create_transport_from_env(db))
+    await ws_bus.stop()
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+from db_indexes import register_indexes, IndexSpec
+from security.rate_limit import RespConnection, RespError, read_reply
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = int(os.environ.get("WS_SEND_QUEUE", "256"))
+SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "10"))
+EVENTS_COLLECTION = "ws_bus_events"
+EVENT_TTL_SECONDS = int(os.environ.get("WS_BUS_EVENT_TTL", "300"))
+
+register_indexes(EVENTS_COLLECTION, IndexSpec([("created_at", 1)], expireAfterSeconds=EVENT_TTL_SECONDS))
+
+# receive(channel, payload) - called by a transport for every message from the channel
+Receiver = Callable[[str, Dict[str, Any]], None]
+
+
+# ============== Per-socket send queue ==============
+
+class QueuedSocket:
+    """A WebSocket with a bounded outgoing queue and its own writer task"""
+
+    def __init__(
+        self,
+        websocket,
+        on_close: Optional[Callable[["QueuedSocket"], None]] = None,
+        max_queue: int = SEND_QUEUE_SIZE,
+        send_timeout: float = SEND_TIMEOUT
+    ):
+        self.websocket = websocket
+        self.on_close = on_close
+        self.send_timeout = send_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(max(1, max_queue))
+        self.closed = False
+        self._task = asyncio.create_task(self._drain())
+
+    def send(self, message: Dict[str, Any]) -> bool:
+        """Queue a message without waiting; False if the socket is closed or has fallen too far behind"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning(f"WebSocket send queue full ({self.queue.maxsize}); disconnecting slow client")
+            self.close()
+            return False
+        return True
+
+    async def _drain(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_json(message), self.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"WebSocket send failed, dropping connection: {e}")
+        finally:
+            self.closed = True
+            try:
+                await self.websocket.close(code=1013)
+            except Exception:
+                pass
+            if self.on_close is not None:
+                self.on_close(self)
+
+    def close(self):
+        """Stop sending; queued messages are discarded"""
+        if not self.closed:
+            self.closed = True
+            self._task.cancel()
+
+
+# ============== Transports ==============
+
+class LocalTransport:
+    """Single process: the bus already delivered locally, nothing else to do"""
+
+    async def start(self, channels: List[str], receive: Receiver):
+        pass
+
+    async def publish(self, channel: str, payload: Dict[str, Any]):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class _Subscription:
+    """Background task that keeps one transport subscription alive, reconnecting with backoff"""
+
+    MAX_BACKOFF = 30
+
+    def __init__(self, name: str, listen: Callable[[], Awaitable[None]]):
+        self.name = name
+        self.listen = listen
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            started = time.monotonic()
+            try:
+                await self.listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"WebSocket bus {self.name} subscription lost: {e}")
+            if time.monotonic() - started > self.MAX_BACKOFF:
+                backoff = 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.MAX_BACKOFF)
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+class RespTransport:
+    """Redis pub/sub: PUBLISH on the shared pipelined connection, SUBSCRIBE on a dedicated one"""
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", prefix: str = "ws:"):
+        self.connection = RespConnection.from_url(url)
+        self.prefix = prefix
+        self._channels: List[str] = []
+        self._receive: Optional[Receiver] = None
+        self._subscription = _Subscription("redis", self._listen)
+
+    async def start(self, channels: List[str], receive: Receiver):
+        self._channels, self._receive = channels, receive
+        if channels:
+            self._subscription.start()
+
+    async def publish(self, channel: str, payload: Dict[str, Any]):
+        await self.connection.pipeline(("PUBLISH", self.prefix + channel, json.dumps(payload, default=str)))
+
+    async def _listen(self):
+        conn = self.connection
+        reader, writer = await asyncio.open_connection(conn.host, conn.port)
+        try:
+            if conn.password:
+                writer.write(RespConnection._encode(("AUTH", conn.password)))
+                reply = await read_reply(reader)
+                if isinstance(reply, RespError):
+                    raise reply
+            writer.write(RespConnection._encode(("SUBSCRIBE", *(self.prefix + c for c in self._channels))))
+            await writer.drain()
+            while True:
+                reply = await read_reply(reader)
+                if isinstance(reply, RespError):
+                    raise reply
+                if not isinstance(reply, list) or len(reply) != 3 or reply[0] != b"message":
+                    continue  # subscribe confirmations
+                channel = reply[1].decode()[len(self.prefix):]
+                try:
+                    payload = json.loads(reply[2])
+                except ValueError:
+                    logger.warning(f"WebSocket bus: undecodable message on {channel}")
+                    continue
+                self._receive(channel, payload)
+        finally:
+            writer.close()
+
+    async def stop(self):
+        await self._subscription.stop()
+        await self.connection.close()
+
+
+class MongoTransport:
+    """Events inserted into a TTL collection, followed with a change stream"""
+
+    def __init__(self, db):
+        self.collection = db[EVENTS_COLLECTION]
+        self._channels: List[str] = []
+        self._receive: Optional[Receiver] = None
+        self._resume_token = None
+        self._subscription = _Subscription("mongo", self._listen)
+
+    async def start(self, channels: List[str], receive: Receiver):
+        self._channels, self._receive = channels, receive
+        if channels:
+            self._subscription.start()
+
+    async def publish(self, channel: str, payload: Dict[str, Any]):
+        await self.collection.insert_one({
+            "channel": channel,
+            "payload": payload,
+            "created_at": datetime.now(timezone.utc)
+        })
+
+    async def _listen(self):
+        pipeline = [{"$match": {"operationType": "insert", "fullDocument.channel": {"$in": self._channels}}}]
+        async with self.collection.watch(pipeline, resume_after=self._resume_token) as stream:
+            async for change in stream:
+                self._resume_token = stream.resume_token
+                event = change["fullDocument"]
+                self._receive(event["channel"], event["payload"])
+
+    async def stop(self):
+        await self._subscription.stop()
+
+
+def create_transport_from_env(db=None):
+    backend = os.environ.get("WS_BUS_BACKEND", "local").lower()
+    if backend == "redis":
+        return RespTransport(os.environ.get("WS_BUS_REDIS_URL", "redis://127.0.0.1:6379/0"))
+    if backend == "mongo" and db is not None:
+        return MongoTransport(db)
+    return LocalTransport()
+
+
+# ============== Bus ==============
+
+class WebSocketBus:
+    """Channel -> local subscriber, mirrored to other workers through a transport"""
+
+    ERROR_LOG_INTERVAL = 60
+
+    def __init__(self, transport=None):
+        self.transport = transport or LocalTransport()
+        self.origin = uuid.uuid4().hex
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self.started = False
+        self._last_error_log = 0.0
+
+    def subscribe(self, channel: str, handler: Callable[[Dict[str, Any]], None]):
+        """Register the local handler for a channel (before start())"""
+        self.handlers[channel] = handler
+
+    async def start(self, transport=None):
+        if transport is not None:
+            self.transport = transport
+        await self.transport.start(list(self.handlers), self._receive)
+        self.started = True
+        logger.info(f"WebSocket bus started ({type(self.transport).__name__})")
+
+    async def stop(self):
+        if self.started:
+            await self.transport.stop()
+            self.started = False
+
+    async def publish(self, channel: str, envelope: Dict[str, Any]):
+        """Deliver locally now and hand the envelope to the other workers"""
+        self._dispatch(channel, envelope)
+        await self.publish_remote(channel, envelope)
+
+    async def publish_remote(self, channel: str, envelope: Dict[str, Any]):
+        """Hand the envelope to the other workers only (the caller delivered locally)"""
+        if not self.started:
+            return
+        try:
+            await self.transport.publish(channel, {"origin": self.origin, "envelope": envelope})
+        except (OSError, ConnectionError, RespError, PyMongoError, asyncio.TimeoutError) as e:
+            now = time.monotonic()
+            if now - self._last_error_log > self.ERROR_LOG_INTERVAL:
+                logger.warning(f"WebSocket bus publish failed, delivering to this worker only: {e}")
+                self._last_error_log = now
+
+    def _receive(self, channel: str, payload: Dict[str, Any]):
+        if payload.get("origin") != self.origin:
+            self._dispatch(channel, payload.get("envelope") or {})
+
+    def _dispatch(self, channel: str, envelope: Dict[str, Any]):
+        handler = self.handlers.get(channel)
+        if handler is None:
+            return
+        try:
+            handler(envelope)
+        except Exception as e:
+            logger.error(f"WebSocket bus handler for {channel} failed: {e}")
+
+
+# Global bus instance; server.py starts it with the configured transport
+ws_bus = WebSocketBus()